@@ -3,20 +3,21 @@ from typing import List, Union, Dict
 
 from fabfed.exceptions import ControllerException
 from fabfed.model.state import ResourceState, ProviderState
+from fabfed.util import tracing
 from fabfed.util.config import WorkflowConfig
 from .helper import ControllerResourceListener, partition_layer3_config
 from fabfed.policy.policy_helper import ProviderPolicy
 from .provider_factory import ProviderFactory
 from ..util.constants import Constants
 from ..util.config_models import ResourceConfig
-from ..util.stats import ProviderStats, Duration, Stages
+from ..util.stats import ProviderStats, Duration, Stages, resource_stats
 from fabfed.util.utils import get_logger
 
 
 class Controller:
     def __init__(self, *, config: WorkflowConfig, logger: Union[logging.Logger, None] = None,
                  policy: Union[Dict[str, ProviderPolicy], None] = None,
-                 use_local_policy=True):
+                 use_local_policy=True, ipam_store=None):
         import copy
 
         self.config = copy.deepcopy(config)
@@ -25,8 +26,11 @@ class Controller:
         self.resources: List[ResourceConfig] = []
         self.policy = policy
         self.use_local_policy = use_local_policy
+        self.ipam_store = ipam_store
         self.resource_listener = ControllerResourceListener()
+        self._first_span = len(tracing.get_tracer().spans)
 
+    @tracing.traced('init', cat=tracing.PHASE)
     def init(self, *, session: str, provider_factory: ProviderFactory, provider_states: List[ProviderState]):
         init_provider_map: Dict[str, bool] = dict()
 
@@ -116,8 +120,10 @@ class Controller:
         networks = [resource for resource in self.resources if resource.is_network]
 
         from .helper import populate_layer3_config
+        from fabfed.util.ipam import Ipam, read_only_store
 
-        populate_layer3_config(networks=networks)
+        ipam = Ipam(session=session, store=self.ipam_store or read_only_store())
+        populate_layer3_config(networks=networks, ipam=ipam)
 
         for network in networks:
             layer3 = network.attributes.get(Constants.RES_LAYER3)
@@ -129,7 +135,7 @@ class Controller:
                     layer3_to_network_mapping[layer3.label] = [network]
 
         for networks_with_same_layer3 in layer3_to_network_mapping.values():
-            partition_layer3_config(networks=networks_with_same_layer3)
+            partition_layer3_config(networks=networks_with_same_layer3, ipam=ipam)
 
         # Handle peering labels. The labels are inserted here to match it to a stitch port
         for network in networks:
@@ -186,6 +192,7 @@ class Controller:
             stitch_info = network.attributes.get(Constants.RES_STITCH_INFO)
             self.logger.info(f"{network}: stitch_info={stitch_info}")
 
+    @tracing.traced('plan', cat=tracing.PHASE)
     def plan(self, provider_states: List[ProviderState]):
         resources = self.resources
         resource_state_map = Controller._build_state_map(provider_states)
@@ -256,6 +263,7 @@ class Controller:
 
         self.resources = planned_resources
 
+    @tracing.traced('add', cat=tracing.PHASE)
     def add(self, provider_states: List[ProviderState]):
         resources = self.resources
         self.logger.info(f"Starting ADD_PHASE: Calling ADD ... for {len(resources)} resource(s)")
@@ -292,7 +300,18 @@ class Controller:
         if exceptions:
             raise ControllerException(exceptions)
 
+    @tracing.traced('apply', cat=tracing.PHASE)
     def apply(self, provider_states: List[ProviderState]):
+        from fabfed.util.inventory import flush_inventories
+
+        try:
+            self._apply(provider_states)
+        finally:
+            flush_inventories()
+
+    def _apply(self, provider_states: List[ProviderState]):
+        from fabfed.util.inventory import flush_inventories
+
         resources = self.resources
         self.logger.info(f"Starting APPLY_PHASE for {len(resources)} resource(s)")
         resource_state_map = Controller._build_state_map(provider_states)
@@ -356,17 +375,18 @@ class Controller:
         if not Constants.RUN_SSH_TESTER:
             return
 
-        from .helper import find_node_clusters
-        from fabfed.util.node_tester import SshNodeTester
-
         nodes = [n for prov in self.provider_factory.providers if prov.type != "dummy" for n in prov.nodes]
 
         if nodes:
+            from fabfed.util.node_tester import SshNodeTester
+
             clusters = [ nodes ] # find_node_clusters(resources=resources)
 
             for cluster in clusters:
                 tester = SshNodeTester(nodes=[n for n in nodes if n.label in [n.label for n in cluster]])
-                tester.run_tests()
+
+                with tracing.span('node_tests', cat=tracing.PHASE, nodes=len(nodes)):
+                    tester.run_tests()
 
                 from fabfed.model.state import get_dumper
                 import yaml
@@ -379,6 +399,8 @@ class Controller:
 
                 self.logger.info(f"Node testing over ssh passed for {[n.name for n in nodes]}")
 
+        # Services such as janus run ansible against the inventory of the nodes created above.
+        flush_inventories()
         exceptions = []
 
         for resource in filter(lambda r: r.is_service, resources):
@@ -414,7 +436,16 @@ class Controller:
 
         return resource_state_map
 
+    @tracing.traced('destroy', cat=tracing.PHASE)
     def destroy(self, *, provider_states: List[ProviderState]):
+        from fabfed.util.inventory import flush_inventories
+
+        try:
+            self._destroy(provider_states=provider_states)
+        finally:
+            flush_inventories()
+
+    def _destroy(self, *, provider_states: List[ProviderState]):
         exceptions = []
         resource_state_map = Controller._build_state_map(provider_states)
         provider_resource_map = dict()
@@ -503,6 +534,7 @@ class Controller:
 
     def get_stats(self) -> List[ProviderStats]:
         provider_stats = []
+        spans = tracing.get_tracer().spans[self._first_span:]
 
         for provider in self.provider_factory.providers:
             total_duration = provider.init_duration \
@@ -517,7 +549,8 @@ class Controller:
                                  provider_duration=total_duration,
                                  has_failures=len(provider.failed) > 0,
                                  has_pending=len(provider.pending) > 0,
-                                 stages=stages)
+                                 stages=stages,
+                                 resources=resource_stats(spans, provider.label))
             provider_stats.append(temp)
 
         return provider_stats
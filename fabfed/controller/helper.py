@@ -1,5 +1,6 @@
 from fabfed.provider.api.provider import Provider
 from fabfed.provider.api.resource_event_listener import ResourceListener
+from fabfed.util import tracing
 from fabfed.util.constants import Constants
 
 
@@ -10,10 +11,12 @@ class ControllerResourceListener(ResourceListener):
     def set_providers(self, providers: list):
         self.providers = providers
 
+    @tracing.traced('on_added', cat=tracing.LISTENER)
     def on_added(self, *, source, provider: Provider, resource: object):
         for temp_provider in self.providers:
             temp_provider.on_added(source=self, provider=provider, resource=resource)
 
+    @tracing.traced('on_created', cat=tracing.LISTENER)
     def on_created(self, *, source, provider: Provider, resource: object):
         for temp_provider in self.providers:
             if temp_provider == provider:
@@ -24,44 +27,30 @@ class ControllerResourceListener(ResourceListener):
             if temp_provider != provider:
                 temp_provider.on_created(source=self, provider=provider, resource=resource)
 
+    @tracing.traced('on_deleted', cat=tracing.LISTENER)
     def on_deleted(self, *, source, provider: Provider, resource: object):
         for temp_provider in self.providers:
             temp_provider.on_deleted(source=self, provider=provider, resource=resource)
 
 
-def populate_layer3_config(*, networks: list):
-    from fabfed.exceptions import ControllerException
+def populate_layer3_config(*, networks: list, ipam=None):
+    from fabfed.util.ipam import Ipam
+
+    ipam = ipam or Ipam()
+    seen = set()
 
     for network in networks:
         layer3 = network.attributes.get(Constants.RES_LAYER3)
 
-        if not layer3:
+        if not layer3 or layer3.label in seen:
             continue
 
-        if Constants.RES_SUBNET not in layer3.attributes:
-            raise ControllerException(f"network {network.label} must have a subnet in its layer3 config")
-
-        subnet = layer3.attributes[Constants.RES_SUBNET]
-
-        try:
-            addr = subnet[:subnet.rindex("/")]
-            prefix = addr[:addr.rindex(".")]
-
-            if Constants.RES_NET_GATEWAY not in layer3.attributes:
-                layer3.attributes[Constants.RES_NET_GATEWAY] = prefix + ".1"
-
-            if Constants.RES_LAYER3_DHCP_START not in layer3.attributes:
-                layer3.attributes[Constants.RES_LAYER3_DHCP_START] = prefix + ".2"
+        seen.add(layer3.label)
+        ipam.assign_layer3(layer3=layer3, network_label=network.label)
 
-            if Constants.RES_LAYER3_DHCP_END not in layer3.attributes:
-                layer3.attributes[Constants.RES_LAYER3_DHCP_END] = prefix + ".254"
-        except:
-            raise ControllerException(f"Error parsing {subnet} for layer3 config in network {network.label}")
 
-
-def partition_layer3_config(*, networks: list):
-    from ipaddress import IPv4Address
-    from ..util.constants import Constants
+def partition_layer3_config(*, networks: list, ipam=None):
+    from fabfed.util.ipam import Ipam
     from fabfed.util.config_models import Config
 
     if len(networks) <= 1:
@@ -78,22 +67,14 @@ def partition_layer3_config(*, networks: list):
     if "/" in layer3.attributes.get(Constants.RES_LAYER3_DHCP_END):
         return
 
-    layer3 = networks[0].attributes.get(Constants.RES_LAYER3)
-    dhcp_start = int(IPv4Address(layer3.attributes.get(Constants.RES_LAYER3_DHCP_START)))
-    last = dhcp_end = int(IPv4Address(layer3.attributes.get(Constants.RES_LAYER3_DHCP_END)))
-    interval = int((dhcp_end - dhcp_start) / len(networks))
+    ipam = ipam or Ipam()
+    ranges = ipam.assign_dhcp_slices(layer3=layer3, network_labels=[network.label for network in networks])
 
-    for index, network in enumerate(networks):
+    for index, (network, (dhcp_start, dhcp_end)) in enumerate(zip(networks, ranges)):
         layer3_config = Config(layer3.type, f"{layer3.name}-{index}", layer3.attributes.copy())
-        dhcp_end = dhcp_start + interval
-
-        if dhcp_end > last:
-            dhcp_end = last
-
-        layer3_config.attributes[Constants.RES_LAYER3_DHCP_START] = str(IPv4Address(dhcp_start))
-        layer3_config.attributes[Constants.RES_LAYER3_DHCP_END] = str(IPv4Address(dhcp_end))
+        layer3_config.attributes[Constants.RES_LAYER3_DHCP_START] = dhcp_start
+        layer3_config.attributes[Constants.RES_LAYER3_DHCP_END] = dhcp_end
         network.attributes[Constants.RES_LAYER3] = layer3_config
-        dhcp_start = dhcp_end + 1
 
 
 def find_peer_networks(*, network):
@@ -48,3 +48,7 @@ class ControllerException(FabfedException):
 
         self.message += "\n]"
         super().__init__(self.message)
+
+
+class CassetteException(FabfedException):
+    pass
@@ -1,6 +1,5 @@
 from abc import ABC, abstractmethod
 from collections import namedtuple
-from fabfed.util.utils import get_inventory_dir
 from typing import List
 
 class Resource(ABC):
@@ -22,7 +21,7 @@ class Resource(ABC):
         return self._depends_on
 
     @abstractmethod
-    def write_ansible(self, friendly_name):
+    def write_ansible(self, friendly_name, delete=False, provider_label=None):
         pass
 
 
@@ -48,34 +47,31 @@ class SSHNode():
         if self.jump_host and self.jump_user and self.jump_keyfile:
             return f"-o ProxyJump=\"{self.jump_user}@{self.jump_host}\""
 
-    def write_ansible(self, friendly_name, delete=False):
-        import os
-        file_path = os.path.join(get_inventory_dir(friendly_name), f"{friendly_name}-{self.label}-{self.name}")
+    def ansible_vars(self, friendly_name) -> dict:
+        dplane_addr = self.get_dataplane_address() or self.host
+
+        return dict(ansible_connection='ssh',
+                    ansible_ssh_common_args=self.proxyjump_str if self.proxyjump_str else "",
+                    ansible_ssh_private_key_file=self.keyfile,
+                    ansible_user=self.user,
+                    node=dplane_addr,
+                    name=f"{friendly_name}-{self.name}")
+
+    def write_ansible(self, friendly_name, delete=False, provider_label=None):
+        """
+        Adds this node to, or removes it from, the in-memory ansible inventory of friendly_name. The inventory is
+        written out by fabfed.util.inventory.flush_inventories.
+        """
+        from fabfed.util.inventory import get_inventory
+
+        inventory = get_inventory(friendly_name)
+
         if delete:
-            try:
-                os.unlink(file_path)
-            except:
-                pass
+            inventory.remove(self.name)
             return
-        dplane_addr = self.get_dataplane_address()
-        if not dplane_addr:
-            dplane_addr = self.host
-        hosts =f"""[{self.name}]
-{self.host}
-[{self.name}:vars]
-ansible_connection=ssh
-ansible_ssh_common_args={self.proxyjump_str if self.proxyjump_str else ""}
-ansible_ssh_private_key_file={self.keyfile}
-ansible_user={self.user}
-node={dplane_addr}
-name={friendly_name}-{self.name}
-"""
-        with open(file_path, "w") as stream:
-            try:
-                stream.write(hosts)
-            except Exception as e:
-                from fabfed.exceptions import AnsibleException
-                raise AnsibleException(f'Exception while saving ansible inventory at {file_path}:{e}')
+
+        inventory.add(name=self.name, host=self.host, host_vars=self.ansible_vars(friendly_name),
+                      provider_label=provider_label, label=self.label)
 
 
 class Node(Resource,SSHNode):
@@ -115,8 +111,8 @@ class Node(Resource,SSHNode):
     def get_dataplane_address(self, network=None, interface=None, af=None):
         pass
 
-    def write_ansible(self, friendly_name, delete=False):
-        SSHNode.write_ansible(self, friendly_name, delete)
+    def write_ansible(self, friendly_name, delete=False, provider_label=None):
+        SSHNode.write_ansible(self, friendly_name, delete, provider_label)
 
 
 class Network(Resource):
@@ -130,14 +126,14 @@ class Network(Resource):
     def get_reservation_id(self):
         pass
 
-    def write_ansible(self, friendly_name, delete=False):
+    def write_ansible(self, friendly_name, delete=False, provider_label=None):
         pass
 
 class Service(Resource):
     def __init__(self, *, label, name: str):
         super().__init__(label, name)
 
-    def write_ansible(self, friendly_name, delete=False):
+    def write_ansible(self, friendly_name, delete=False, provider_label=None):
         pass
 
 ResolvedDependency = namedtuple("ResolvedDependency", "resource_label attr value")
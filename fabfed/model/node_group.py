@@ -0,0 +1,176 @@
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+from fabfed.model import Node
+from fabfed.util.utils import get_logger
+
+logger = get_logger()
+
+NodeResult = namedtuple("NodeResult", "node exit_code stdout stderr duration error source")
+
+RELAY_THRESHOLD = 64 * 1024 * 1024
+RELAY_MARKER = "FABFED_RELAY_OK"
+DEFAULT_RELAY_COMMAND = "scp -q -o StrictHostKeyChecking=no -o UserKnownHostsFile=/dev/null {path} {user}@{host}:{path}"
+
+
+class GroupResult:
+    def __init__(self, results: List[NodeResult], duration: float):
+        self.results = results
+        self.duration = duration
+
+    def __iter__(self):
+        return iter(self.results)
+
+    def __len__(self):
+        return len(self.results)
+
+    def __getitem__(self, node_name: str) -> NodeResult:
+        return next(r for r in self.results if r.node == node_name)
+
+    @property
+    def ok(self) -> bool:
+        return all(r.exit_code == 0 for r in self.results)
+
+    @property
+    def failed(self) -> List[NodeResult]:
+        return [r for r in self.results if r.exit_code != 0]
+
+    def summary(self) -> dict:
+        durations = sorted(r.duration for r in self.results)
+
+        return dict(nodes=len(self.results),
+                    failed=len(self.failed),
+                    duration=round(self.duration, 3),
+                    slowest=round(durations[-1], 3) if durations else 0)
+
+    def to_dict(self) -> Dict[str, dict]:
+        return {r.node: r._asdict() for r in self.results}
+
+
+def _run(node: Node, call: Callable, source: str = 'local', expect_output=False) -> NodeResult:
+    """
+    Runs call on node. With expect_output, call returns the stdout, stderr and exit status of a command.
+    Otherwise it returns nothing and raises on failure.
+    """
+    start = time.time()
+
+    try:
+        ret = call(node)
+
+        if expect_output and ret is not None:
+            stdout, stderr, exit_code = ret
+    except Exception as e:
+        logger.warning(f"node {node.name}: {e}")
+        return NodeResult(node.name, -1, None, None, time.time() - start, str(e), source)
+
+    duration = time.time() - start
+
+    if not expect_output:
+        return NodeResult(node.name, 0, None, None, duration, None, source)
+
+    if ret is None:
+        return NodeResult(node.name, -1, None, None, duration, "no output. giving up after retries", source)
+
+    if exit_code is None:
+        return NodeResult(node.name, -1, stdout, stderr, duration, "no exit status", source)
+
+    error = f"exited with {exit_code}" if exit_code != 0 else None
+    return NodeResult(node.name, exit_code, stdout, stderr, duration, error, source)
+
+
+class NodeGroup:
+    """
+    Runs a command or distributes a file across many nodes of any provider on a bounded thread pool.
+
+    Nodes are driven through their own execute_with_status and upload_file, so retries and ssh handling stay
+    with the provider. execute_with_status returns the stdout, stderr and exit status of the command and
+    upload_file raises when it fails. Every call returns a GroupResult with one NodeResult per node.
+    """
+    def __init__(self, nodes: List[Node], max_workers: int = 16):
+        self.nodes = list(nodes)
+        self.max_workers = max_workers
+
+    def _map(self, nodes: List[Node], call: Callable, expect_output=False) -> List[NodeResult]:
+        if not nodes:
+            return []
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(nodes))) as executor:
+            futures = [executor.submit(_run, node, call, 'local', expect_output) for node in nodes]
+
+        return [future.result() for future in futures]
+
+    def execute(self, command: str, retry=3, retry_interval=10) -> GroupResult:
+        start = time.time()
+        results = self._map(self.nodes, lambda n: n.execute_with_status(command, retry=retry, retry_interval=retry_interval),
+                            expect_output=True)
+        result = GroupResult(results, time.time() - start)
+        logger.info(f"execute '{command}' on {len(self.nodes)} nodes: {result.summary()}")
+        return result
+
+    def upload_file(self, local_file_path: str, remote_file_path: str, retry=3, retry_interval=10,
+                    relay_threshold: int = RELAY_THRESHOLD, relay_command: str = None, seeds: int = 1) -> GroupResult:
+        """
+        Uploads local_file_path to every node. Files at or above relay_threshold are sent over a relay tree when
+        a relay_command is given: the local host uploads to a few seed nodes and in each round every node holding
+        the file forwards it to one that does not, so n nodes are covered in about log2(n) rounds. relay_command
+        runs on the sending node and must be able to reach its peers (see DEFAULT_RELAY_COMMAND). Nodes the tree
+        could not reach fall back to a direct upload.
+        """
+        start = time.time()
+
+        def upload(n):
+            return n.upload_file(local_file_path, remote_file_path, retry=retry, retry_interval=retry_interval)
+
+        if not relay_command or len(self.nodes) <= seeds or os.path.getsize(local_file_path) < relay_threshold:
+            results = self._map(self.nodes, upload)
+        else:
+            results = self._relay(upload, remote_file_path, relay_command, seeds, retry, retry_interval)
+
+        result = GroupResult(results, time.time() - start)
+        logger.info(f"upload {local_file_path} to {len(self.nodes)} nodes: {result.summary()}")
+        return result
+
+    def _relay(self, upload: Callable, remote_file_path: str, relay_command: str, seeds: int,
+               retry, retry_interval) -> List[NodeResult]:
+        results = {r.node: r for r in self._map(self.nodes[:seeds], upload)}
+        holders = [n for n in self.nodes[:seeds] if results[n.name].exit_code == 0]
+        pending = list(self.nodes[seeds:])
+
+        while holders and pending:
+            pairs = list(zip(holders, pending))
+            pending = pending[len(pairs):]
+
+            def forward(pair):
+                sender, receiver = pair
+                command = relay_command.format(path=remote_file_path, user=receiver.user,
+                                               host=receiver.get_dataplane_address() or receiver.host)
+                command = f"{command} && echo {RELAY_MARKER}"
+                res = _run(sender, lambda n: n.execute_with_status(command, retry=retry, retry_interval=retry_interval),
+                           source=sender.name, expect_output=True)
+
+                if res.exit_code == 0 and RELAY_MARKER not in str(res.stdout):
+                    res = res._replace(exit_code=1, error=f"relay from {sender.name} failed")
+
+                return res
+
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(pairs))) as executor:
+                forwarded = list(executor.map(forward, pairs))
+
+            for (_, receiver), res in zip(pairs, forwarded):
+                results[receiver.name] = res._replace(node=receiver.name)
+
+                if res.exit_code == 0:
+                    holders.append(receiver)
+
+        missed = [n for n in self.nodes if n.name not in results or results[n.name].exit_code != 0]
+
+        if missed:
+            logger.warning(f"relay did not reach {[n.name for n in missed]}. Uploading directly")
+
+            for res in self._map(missed, upload):
+                results[res.node] = res
+
+        return [results[n.name] for n in self.nodes]
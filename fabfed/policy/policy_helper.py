@@ -508,7 +508,7 @@ def handle_stitch_info(config, policy, resources):
                                              producer=stitch_info.producer,
                                              stitch_port=stitch_info.stitch_port)
                 else:
-                    logger.info(f"using supplied {Constants.NETWORK_STITCH_CONFIG}:{stitch_config.attributes}")
+                    logger.info("using supplied %s:%s", Constants.NETWORK_STITCH_CONFIG, stitch_config.attributes)
                     stitch_info = StitchInfo(consumer=stitch_config.attributes['consumer'],
                                              producer=stitch_config.attributes['producer'],
                                              stitch_port=stitch_config.attributes['stitch_port'])
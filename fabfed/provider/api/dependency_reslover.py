@@ -18,7 +18,7 @@ class DependencyResolver:
 
     def check_if_external_dependencies_are_resolved(self, *, resource: dict):
         label = resource[Constants.LABEL]
-        self.logger.info(f"Checking if all dependencies are resolved for {label} using {self.label}")
+        self.logger.info("Checking if all dependencies are resolved for %s using %s", label, self.label)
 
         if len(resource[self.dependency_label]) == len(resource[self.resolved_dependency_label]):
             ok = True
@@ -38,10 +38,10 @@ class DependencyResolver:
                     ok = False
                     break
 
-            self.logger.info(f"Checking if all dependencies are resolved for {label} using {self.label}:ret={ok}")
+            self.logger.info("Checking if all dependencies are resolved for %s using %s:ret=%s", label, self.label, ok)
             return ok
 
-        self.logger.info(f"Checking if all dependencies are resolved for {label} using {self.label}:ret=false")
+        self.logger.info("Checking if all dependencies are resolved for %s using %s:ret=false", label, self.label)
         return False
 
     def resolve_dependency(self, *, resource: dict, from_resource: Resource):
@@ -67,8 +67,7 @@ class DependencyResolver:
                     if value and isinstance(value, list):
                         value = tuple(value)
 
-                    self.logger.info(
-                        f"Resolving: {dependency} for {label}: value={value} using {self.label}")
+                    self.logger.info("Resolving: %s for %s: value=%s using %s", dependency, label, value, self.label)
 
                     if value:
                         resolved_dependencies = resource[self.resolved_dependency_label]
@@ -86,17 +85,16 @@ class DependencyResolver:
                                                                      attr=dependency.key,
                                                                      value=(value,))
                             resolved_dependencies.append(resolved_dependency)
-                            self.logger.info(f"Resolved dependency {dependency} for {label} using {self.label}")
+                            self.logger.info("Resolved dependency %s for %s using %s", dependency, label, self.label)
                         elif len(found.value) < count:
                             resolved_dependency = ResolvedDependency(resource_label=dependency.resource.label,
                                                                      attr=dependency.key,
                                                                      value=(value,) + found.value)
                             resolved_dependencies.remove(found)
                             resolved_dependencies.append(resolved_dependency)
-                            self.logger.info(f"Resolved dependency {dependency} for {label} using {self.label}")
+                            self.logger.info("Resolved dependency %s for %s using %s", dependency, label, self.label)
                     else:
-                        self.logger.warning(
-                            f"Could not resolve {dependency} for {label} using {self.label}")
+                        self.logger.warning("Could not resolve %s for %s using %s", dependency, label, self.label)
                 except Exception as e:
                     self.logger.warning(
                         f"Severe Exception occurred while resolving dependency: {e} using {self.label}")
@@ -109,7 +107,7 @@ class DependencyResolver:
             attribute = dependency.key
 
             label = resource.get(Constants.LABEL)
-            self.logger.debug(f"Extracting Values: {label}:{attribute} using {self.label}")
+            self.logger.debug("Extracting Values: %s:%s using %s", label, attribute, self.label)
 
             resolved_dependencies = [rd for rd in resource[self.resolved_dependency_label]
                                      if rd.attr == attribute]
@@ -118,4 +116,4 @@ class DependencyResolver:
 
             values = [rd.value for rd in resolved_dependencies]
             resource[attribute] = [rd.value for rd in resolved_dependencies]
-            self.logger.info(f"Extracted Values: {values}:{label}:{attribute} using {self.label}")
+            self.logger.info("Extracted Values: %s:%s:%s using %s", values, label, attribute, self.label)
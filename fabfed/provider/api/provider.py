@@ -1,12 +1,32 @@
 import logging
 from abc import ABC, abstractmethod
+from functools import wraps
 from typing import List, Dict, Union
 
 from fabfed.model import Resource, Node, Network, Service
 from fabfed.model.state import ProviderState
+from fabfed.util import tracing
 from fabfed.util.constants import Constants
 
 
+def _traced(phase: str):
+    """
+    Records a span per call of a provider stage, named after the stage and the resource label.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(self, *, resource: dict):
+            label = resource.get(Constants.LABEL)
+
+            with tracing.span(f"{phase}:{label}", cat=tracing.PROVIDER, phase=phase, provider=self.label,
+                              label=label):
+                return func(self, resource=resource)
+
+        return wrapper
+
+    return decorator
+
+
 class Provider(ABC):
     def __init__(self, *, type, label, name, logger: logging.Logger, config: dict):
         self.label = label
@@ -110,10 +130,10 @@ class Provider(ABC):
             resource.set_externally_depends_on(self._externally_depends_on_map[resource.label])
 
             try:
-                resource.write_ansible(provider.name)
+                resource.write_ansible(provider.name, provider_label=provider.label)
             except Exception as e:
-                self.logger.warning(
-                    f"exception occurred while writing ansible for resource={resource.name}/{provider.name}:{e}")
+                self.logger.warning("exception occurred while writing ansible for resource=%s/%s:%s",
+                                    resource.name, provider.name, e)
         else:
             for pending_resource in self.pending.copy():
                 resolver = self.get_dependency_resolver()
@@ -125,7 +145,7 @@ class Provider(ABC):
                     resolver.extract_values(resource=pending_resource)
                     self.pending.remove(pending_resource)
                     self.no_longer_pending.append(pending_resource)
-                    self.logger.info(f"Removing {label} from pending using {self.label}")
+                    self.logger.info("Removing %s from pending using %s", label, self.label)
 
             for r in self.resources:
                 if r.label in resource.get_externally_depends_on():
@@ -153,7 +173,9 @@ class Provider(ABC):
                     f"{self.label}: credential file {credential_file} does not have a section for keyword {profile}")
             self.config.update(config[profile])
 
-        self.setup_environment()
+        with tracing.span(f"setup:{self.label}", cat=tracing.PROVIDER, phase='setup', provider=self.label):
+            self.setup_environment()
+
         end = time.time()
         self.init_duration = (end - start)
 
@@ -216,6 +238,7 @@ class Provider(ABC):
                     return ret
         return defaultValue
 
+    @_traced('validate')
     def validate_resource(self, *, resource: dict):
         label = resource.get(Constants.LABEL)
 
@@ -241,6 +264,7 @@ class Provider(ABC):
             end = time.time()
             self.add_duration += (end - start)
 
+    @_traced('add')
     def add_resource(self, *, resource: dict):
         import time
 
@@ -293,6 +317,7 @@ class Provider(ABC):
             end = time.time()
             self.add_duration += (end - start)
 
+    @_traced('create')
     def create_resource(self, *, resource: dict):
         import time
 
@@ -351,6 +376,7 @@ class Provider(ABC):
                 end = time.time()
                 self.create_duration += (end - start)
 
+    @_traced('wait')
     def wait_for_create_resource(self, *, resource: dict):
         import time
         start = time.time()
@@ -371,6 +397,7 @@ class Provider(ABC):
                 end = time.time()
                 self.create_duration += (end - start)
 
+    @_traced('delete')
     def delete_resource(self, *, resource: dict):
         import time
 
@@ -0,0 +1,462 @@
+"""
+In-process stand-ins for the EC2 and Direct Connect endpoints used by aws_utils. They keep their resources in
+memory and move them through the states the real services report, taking the configured time for each transition:
+
+    fake = FakeAws(timing={'vpn_gateway.create': 30,
+                           'vif.create': {'distribution': 'uniform', 'min': 60, 'max': 120}},
+                   clock=ScaledClock(0.01))
+    vpc_id = fake.add_vpc('10.0.0.0/16')
+    fake.add_connection('dxcon-name', vlan=100)
+
+    with fake.installed():
+        ...  # aws_utils and AwsNetwork now talk to fake
+
+Describe calls return at most page_size items per page when it is set, which exercises the pagination of
+aws_utils. Deleted route tables and gateway associations disappear once their deletion is done, while deleted vpn
+gateways and virtual interfaces stay visible in the deleted state as they do on AWS.
+"""
+import copy
+from contextlib import contextmanager
+from typing import Dict, List
+
+from fabfed.util.fakes import FakeBackend, REQUEST
+from .aws_exceptions import AwsException
+
+
+def _tag_values(record: dict, key: str) -> list:
+    return [tag['Value'] for tag in record.get('Tags', []) if tag['Key'] == key]
+
+
+FILTERS = {
+    'vpc-id': lambda r: [r.get('VpcId')] + [a['VpcId'] for a in r.get('VpcAttachments', [])],
+    'cidr-block': lambda r: [r.get('CidrBlock')],
+    'vpn-gateway-id': lambda r: [r.get('VpnGatewayId')],
+    'state': lambda r: [r.get('State')],
+}
+
+
+def _matches(record: dict, filters: List[dict]) -> bool:
+    for f in filters or []:
+        name = f['Name']
+
+        if name.startswith('tag:'):
+            values = _tag_values(record, name[len('tag:'):])
+        elif name in FILTERS:
+            values = FILTERS[name](record)
+        else:
+            raise AwsException(f"InvalidParameterValue: filter {name} not supported by the fake")
+
+        if not set(values) & set(f['Values']):
+            return False
+
+    return True
+
+
+class FakeAws(FakeBackend):
+    TRANSITIONS = [REQUEST,
+                   'subnet.create', 'route_table.delete',
+                   'vpn_gateway.create', 'vpn_gateway.delete', 'vpn_gateway.attach', 'vpn_gateway.detach',
+                   'connection.confirm', 'vif.create', 'vif.delete', 'association.create', 'association.delete']
+
+    def __init__(self, *, page_size: int = None, **kwargs):
+        super().__init__(**kwargs)
+        self.page_size = page_size
+        self.vpcs: Dict[str, dict] = {}
+        self.subnets: Dict[str, dict] = {}
+        self.route_tables: Dict[str, dict] = {}
+        self.vpn_gateways: Dict[str, dict] = {}
+        self.connections: Dict[str, dict] = {}
+        self.dx_gateways: Dict[str, dict] = {}
+        self.vifs: Dict[str, dict] = {}
+        self.associations: Dict[str, dict] = {}
+
+    def add_vpc(self, cidr: str = '10.0.0.0/16') -> str:
+        """
+        Adds an available vpc with its main route table and returns its id.
+        """
+        with self._lock:
+            vpc_id = self.next_id('vpc')
+            self.vpcs[vpc_id] = dict(VpcId=vpc_id, CidrBlock=cidr, State='available')
+            route_table_id = self._add_route_table(vpc_id)
+            self.route_tables[route_table_id]['Associations'].append(
+                dict(Main=True, RouteTableAssociationId=self.next_id('rtbassoc'), RouteTableId=route_table_id))
+            return vpc_id
+
+    def add_connection(self, name: str, *, vlan: int, state: str = 'ordering') -> str:
+        """
+        Adds a hosted dx connection, which is in the ordering state until confirmed, and returns its id.
+        """
+        with self._lock:
+            connection_id = self.next_id('dxcon')
+            self.connections[connection_id] = dict(connectionId=connection_id, connectionName=name, vlan=vlan,
+                                                   connectionState=state)
+            return connection_id
+
+    def client(self, *, service: str, region: str = None, access_key: str = None, secret_key: str = None):
+        if service == 'ec2':
+            return FakeEc2Client(self, region)
+
+        if service == 'directconnect':
+            return FakeDirectConnectClient(self, region)
+
+        raise AwsException(f"service {service} not supported by the fake")
+
+    @contextmanager
+    def installed(self):
+        """
+        Makes aws_utils build clients of this fake and routes the sleeps of its wait loops through the clock.
+        """
+        from . import aws_utils
+
+        previous = aws_utils.client_pool.set_factory(self.client)
+
+        try:
+            with self.sleeping():
+                yield self
+        finally:
+            aws_utils.client_pool.set_factory(previous)
+
+    def _add_route_table(self, vpc_id: str) -> str:
+        route_table_id = self.next_id('rtb')
+        self.route_tables[route_table_id] = dict(RouteTableId=route_table_id, VpcId=vpc_id, Associations=[],
+                                                 PropagatingVgws=[], Routes=[], Tags=[])
+        return route_table_id
+
+    def view(self, record: dict, state_key: str = None) -> dict:
+        """
+        A copy of a resource as the service reports it now.
+        """
+        ret = copy.deepcopy({k: v for k, v in record.items() if not k.startswith('_')})
+
+        if state_key and '_lifecycle' in record:
+            ret[state_key] = record['_lifecycle'].state(self.clock())
+
+        if 'VpcAttachments' in record:
+            ret['VpcAttachments'] = [dict(VpcId=vpc_id, State=lifecycle.state(self.clock()))
+                                     for vpc_id, lifecycle in record['VpcAttachments'].items()]
+
+        return ret
+
+    def page(self, items: list, result_key: str, token_key: str, token: str = None) -> dict:
+        if not self.page_size:
+            return {result_key: items}
+
+        start = int(token or 0)
+        ret = {result_key: items[start:start + self.page_size]}
+
+        if start + self.page_size < len(items):
+            ret[token_key] = str(start + self.page_size)
+
+        return ret
+
+    def find(self, resources: Dict[str, dict], resource_id: str, code: str) -> dict:
+        record = resources.get(resource_id)
+
+        if record is None:
+            raise AwsException(f"{code}: {resource_id} does not exist")
+
+        return record
+
+
+class _FakeClient:
+    TOKEN_KEY = 'NextToken'
+
+    def __init__(self, fake: FakeAws, region: str):
+        self.fake = fake
+        self.region = region
+
+    def can_paginate(self, operation_name: str) -> bool:
+        return False
+
+    def _call(self, operation: str):
+        self.fake.call(f"{self.SERVICE}:{operation}")
+
+    def _describe(self, operation: str, result_key: str, records: list, kwargs: dict) -> dict:
+        self._call(operation)
+        return self.fake.page(records, result_key, self.TOKEN_KEY, kwargs.get(self.TOKEN_KEY))
+
+
+class FakeEc2Client(_FakeClient):
+    SERVICE = 'ec2'
+
+    def describe_vpcs(self, *, Filters=None, **kwargs):
+        with self.fake._lock:
+            vpcs = [self.fake.view(v) for v in self.fake.vpcs.values()]
+
+        return self._describe('describe_vpcs', 'Vpcs', [v for v in vpcs if _matches(v, Filters)], kwargs)
+
+    def describe_subnets(self, *, Filters=None, SubnetIds=None, **kwargs):
+        with self.fake._lock:
+            subnets = [self.fake.view(s, 'State') for s in self.fake.subnets.values()]
+
+        subnets = [s for s in subnets if _matches(s, Filters) and (not SubnetIds or s['SubnetId'] in SubnetIds)]
+        return self._describe('describe_subnets', 'Subnets', subnets, kwargs)
+
+    def create_subnet(self, *, CidrBlock, VpcId, **kwargs):
+        self._call('create_subnet')
+
+        with self.fake._lock:
+            self.fake.find(self.fake.vpcs, VpcId, 'InvalidVpcID.NotFound')
+
+            for subnet in self.fake.subnets.values():
+                if subnet['VpcId'] == VpcId and subnet['CidrBlock'] == CidrBlock:
+                    raise AwsException(f"InvalidSubnet.Conflict: {CidrBlock} conflicts with {subnet['SubnetId']}")
+
+            subnet_id = self.fake.next_id('subnet')
+            subnet = dict(SubnetId=subnet_id, VpcId=VpcId, CidrBlock=CidrBlock,
+                          _lifecycle=self.fake.lifecycle(subnet_id, ('pending', 'subnet.create'), final='available'))
+            self.fake.subnets[subnet_id] = subnet
+            return dict(Subnet=self.fake.view(subnet, 'State'))
+
+    def describe_route_tables(self, *, Filters=None, **kwargs):
+        with self.fake._lock:
+            route_tables = [self.fake.view(rt) for rt in self.fake.route_tables.values()
+                            if '_lifecycle' not in rt or rt['_lifecycle'].state(self.fake.clock()) != 'deleted']
+
+        route_tables = [rt for rt in route_tables if _matches(rt, Filters)]
+        return self._describe('describe_route_tables', 'RouteTables', route_tables, kwargs)
+
+    def create_route_table(self, *, VpcId, **kwargs):
+        self._call('create_route_table')
+
+        with self.fake._lock:
+            self.fake.find(self.fake.vpcs, VpcId, 'InvalidVpcID.NotFound')
+            route_table_id = self.fake._add_route_table(VpcId)
+            return dict(RouteTable=self.fake.view(self.fake.route_tables[route_table_id]))
+
+    def associate_route_table(self, *, RouteTableId, SubnetId, **kwargs):
+        self._call('associate_route_table')
+
+        with self.fake._lock:
+            route_table = self.fake.find(self.fake.route_tables, RouteTableId, 'InvalidRouteTableID.NotFound')
+            self.fake.find(self.fake.subnets, SubnetId, 'InvalidSubnetID.NotFound')
+
+            for rt in self.fake.route_tables.values():
+                if any(a.get('SubnetId') == SubnetId for a in rt['Associations']):
+                    raise AwsException(f"Resource.AlreadyAssociated: {SubnetId} is associated with "
+                                       f"{rt['RouteTableId']}")
+
+            association_id = self.fake.next_id('rtbassoc')
+            route_table['Associations'].append(dict(Main=False, RouteTableAssociationId=association_id,
+                                                    RouteTableId=RouteTableId, SubnetId=SubnetId))
+            return dict(AssociationId=association_id, AssociationState=dict(State='associated'))
+
+    def disassociate_route_table(self, *, AssociationId, **kwargs):
+        self._call('disassociate_route_table')
+
+        with self.fake._lock:
+            for rt in self.fake.route_tables.values():
+                for association in rt['Associations']:
+                    if association['RouteTableAssociationId'] == AssociationId:
+                        rt['Associations'].remove(association)
+                        return {}
+
+        raise AwsException(f"InvalidAssociationID.NotFound: {AssociationId} does not exist")
+
+    def enable_vgw_route_propagation(self, *, GatewayId, RouteTableId, **kwargs):
+        self._call('enable_vgw_route_propagation')
+
+        with self.fake._lock:
+            route_table = self.fake.find(self.fake.route_tables, RouteTableId, 'InvalidRouteTableID.NotFound')
+            self.fake.find(self.fake.vpn_gateways, GatewayId, 'InvalidVpnGatewayID.NotFound')
+
+            if {'GatewayId': GatewayId} not in route_table['PropagatingVgws']:
+                route_table['PropagatingVgws'].append({'GatewayId': GatewayId})
+
+            return {}
+
+    def delete_route_table(self, *, RouteTableId, **kwargs):
+        self._call('delete_route_table')
+
+        with self.fake._lock:
+            route_table = self.fake.find(self.fake.route_tables, RouteTableId, 'InvalidRouteTableID.NotFound')
+
+            if route_table['Associations']:
+                raise AwsException(f"DependencyViolation: {RouteTableId} has associations")
+
+            route_table['_lifecycle'] = self.fake.lifecycle(RouteTableId, ('deleting', 'route_table.delete'),
+                                                            final='deleted')
+            return {}
+
+    def describe_vpn_gateways(self, *, Filters=None, **kwargs):
+        with self.fake._lock:
+            vpn_gateways = [self.fake.view(vgw, 'State') for vgw in self.fake.vpn_gateways.values()]
+
+        vpn_gateways = [vgw for vgw in vpn_gateways if _matches(vgw, Filters)]
+        return self._describe('describe_vpn_gateways', 'VpnGateways', vpn_gateways, kwargs)
+
+    def create_vpn_gateway(self, *, Type, TagSpecifications=None, AmazonSideAsn=64512, **kwargs):
+        self._call('create_vpn_gateway')
+        tags = [tag for spec in TagSpecifications or [] for tag in spec['Tags']]
+
+        with self.fake._lock:
+            vpn_id = self.fake.next_id('vgw')
+            vpn_gateway = dict(VpnGatewayId=vpn_id, Type=Type, AmazonSideAsn=AmazonSideAsn, Tags=tags,
+                               VpcAttachments={},
+                               _lifecycle=self.fake.lifecycle(vpn_id, ('pending', 'vpn_gateway.create'),
+                                                              final='available'))
+            self.fake.vpn_gateways[vpn_id] = vpn_gateway
+            return dict(VpnGateway=self.fake.view(vpn_gateway, 'State'))
+
+    def delete_vpn_gateway(self, *, VpnGatewayId, **kwargs):
+        self._call('delete_vpn_gateway')
+
+        with self.fake._lock:
+            vpn_gateway = self.fake.find(self.fake.vpn_gateways, VpnGatewayId, 'InvalidVpnGatewayID.NotFound')
+            attached = [vpc_id for vpc_id, lifecycle in vpn_gateway['VpcAttachments'].items()
+                        if lifecycle.state(self.fake.clock()) != 'detached']
+
+            if attached:
+                raise AwsException(f"IncorrectState: {VpnGatewayId} is attached to {attached}")
+
+            vpn_gateway['_lifecycle'] = self.fake.lifecycle(VpnGatewayId, ('deleting', 'vpn_gateway.delete'),
+                                                            final='deleted')
+            return {}
+
+    def attach_vpn_gateway(self, *, VpcId, VpnGatewayId, **kwargs):
+        self._call('attach_vpn_gateway')
+
+        with self.fake._lock:
+            vpn_gateway = self.fake.find(self.fake.vpn_gateways, VpnGatewayId, 'InvalidVpnGatewayID.NotFound')
+            self.fake.find(self.fake.vpcs, VpcId, 'InvalidVpcID.NotFound')
+            lifecycle = vpn_gateway['VpcAttachments'].get(VpcId)
+
+            if lifecycle and lifecycle.state(self.fake.clock()) not in ['detaching', 'detached']:
+                raise AwsException(f"VpnGatewayAttachmentLimitExceeded: {VpnGatewayId} is attached to {VpcId}")
+
+            lifecycle = self.fake.lifecycle(f"{VpnGatewayId}:{VpcId}", ('attaching', 'vpn_gateway.attach'),
+                                            final='attached')
+            vpn_gateway['VpcAttachments'][VpcId] = lifecycle
+            return dict(VpcAttachment=dict(VpcId=VpcId, State=lifecycle.state(self.fake.clock())))
+
+    def detach_vpn_gateway(self, *, VpcId, VpnGatewayId, **kwargs):
+        self._call('detach_vpn_gateway')
+
+        with self.fake._lock:
+            vpn_gateway = self.fake.find(self.fake.vpn_gateways, VpnGatewayId, 'InvalidVpnGatewayID.NotFound')
+
+            if VpcId not in vpn_gateway['VpcAttachments']:
+                raise AwsException(f"InvalidVpnGatewayAttachment.NotFound: {VpnGatewayId} is not attached to {VpcId}")
+
+            vpn_gateway['VpcAttachments'][VpcId] = self.fake.lifecycle(f"{VpnGatewayId}:{VpcId}",
+                                                                       ('detaching', 'vpn_gateway.detach'),
+                                                                       final='detached')
+            return {}
+
+
+class FakeDirectConnectClient(_FakeClient):
+    SERVICE = 'directconnect'
+    TOKEN_KEY = 'nextToken'
+
+    def describe_connections(self, *, connectionId=None, **kwargs):
+        with self.fake._lock:
+            connections = [self.fake.view(c, 'connectionState') for c in self.fake.connections.values()
+                           if not connectionId or c['connectionId'] == connectionId]
+
+        return self._describe('describe_connections', 'connections', connections, kwargs)
+
+    def confirm_connection(self, *, connectionId, **kwargs):
+        self._call('confirm_connection')
+
+        with self.fake._lock:
+            connection = self.fake.find(self.fake.connections, connectionId, 'DirectConnectClientException')
+            connection['_lifecycle'] = self.fake.lifecycle(connectionId, ('pending', 'connection.confirm'),
+                                                           final='available')
+            return dict(connectionState=self.fake.view(connection, 'connectionState')['connectionState'])
+
+    def describe_direct_connect_gateways(self, **kwargs):
+        with self.fake._lock:
+            dx_gateways = [self.fake.view(gw) for gw in self.fake.dx_gateways.values()]
+
+        return self._describe('describe_direct_connect_gateways', 'directConnectGateways', dx_gateways, kwargs)
+
+    def create_direct_connect_gateway(self, *, directConnectGatewayName, amazonSideAsn=64512, **kwargs):
+        self._call('create_direct_connect_gateway')
+
+        with self.fake._lock:
+            gateway_id = self.fake.next_id('dxgw')
+            gateway = dict(directConnectGatewayId=gateway_id, directConnectGatewayName=directConnectGatewayName,
+                           amazonSideAsn=amazonSideAsn, directConnectGatewayState='available')
+            self.fake.dx_gateways[gateway_id] = gateway
+            return dict(directConnectGateway=self.fake.view(gateway))
+
+    def delete_direct_connect_gateway(self, *, directConnectGatewayId, **kwargs):
+        self._call('delete_direct_connect_gateway')
+
+        with self.fake._lock:
+            gateway = self.fake.find(self.fake.dx_gateways, directConnectGatewayId, 'DirectConnectClientException')
+            del self.fake.dx_gateways[directConnectGatewayId]
+            return dict(directConnectGateway=dict(self.fake.view(gateway), directConnectGatewayState='deleted'))
+
+    def describe_virtual_interfaces(self, *, connectionId=None, virtualInterfaceId=None, **kwargs):
+        with self.fake._lock:
+            vifs = [self.fake.view(vif, 'virtualInterfaceState') for vif in self.fake.vifs.values()
+                    if (not connectionId or vif['connectionId'] == connectionId)
+                    and (not virtualInterfaceId or vif['virtualInterfaceId'] == virtualInterfaceId)]
+
+        return self._describe('describe_virtual_interfaces', 'virtualInterfaces', vifs, kwargs)
+
+    def create_private_virtual_interface(self, *, connectionId, newPrivateVirtualInterface, **kwargs):
+        self._call('create_private_virtual_interface')
+        spec = newPrivateVirtualInterface
+
+        with self.fake._lock:
+            connection = self.fake.find(self.fake.connections, connectionId, 'DirectConnectClientException')
+
+            if spec['vlan'] != connection['vlan']:
+                raise AwsException(f"DirectConnectClientException: vlan {spec['vlan']} does not match "
+                                   f"{connection['vlan']} of {connectionId}")
+
+            self.fake.find(self.fake.vpn_gateways, spec['virtualGatewayId'], 'DirectConnectClientException')
+            vif_id = self.fake.next_id('dxvif')
+            vif = dict(virtualInterfaceId=vif_id, virtualInterfaceName=spec['virtualInterfaceName'],
+                       virtualInterfaceType='private', connectionId=connectionId, vlan=spec['vlan'],
+                       asn=spec.get('asn'), amazonSideAsn=64512, mtu=spec.get('mtu', 1500),
+                       amazonAddress=spec.get('amazonAddress'), customerAddress=spec.get('customerAddress'),
+                       virtualGatewayId=spec['virtualGatewayId'],
+                       _lifecycle=self.fake.lifecycle(vif_id, ('pending', 'vif.create'), final='available'))
+            self.fake.vifs[vif_id] = vif
+            return self.fake.view(vif, 'virtualInterfaceState')
+
+    def delete_virtual_interface(self, *, virtualInterfaceId, **kwargs):
+        self._call('delete_virtual_interface')
+
+        with self.fake._lock:
+            vif = self.fake.find(self.fake.vifs, virtualInterfaceId, 'DirectConnectClientException')
+            vif['_lifecycle'] = self.fake.lifecycle(virtualInterfaceId, ('deleting', 'vif.delete'), final='deleted')
+            return dict(virtualInterfaceState=self.fake.view(vif, 'virtualInterfaceState')['virtualInterfaceState'])
+
+    def describe_direct_connect_gateway_associations(self, *, virtualGatewayId=None, directConnectGatewayId=None,
+                                                     **kwargs):
+        with self.fake._lock:
+            associations = [self.fake.view(a, 'associationState') for a in self.fake.associations.values()
+                            if (not virtualGatewayId or a['virtualGatewayId'] == virtualGatewayId)
+                            and (not directConnectGatewayId or a['directConnectGatewayId'] == directConnectGatewayId)]
+
+        associations = [a for a in associations if a['associationState'] != 'disassociated']
+        return self._describe('describe_direct_connect_gateway_associations', 'directConnectGatewayAssociations',
+                              associations, kwargs)
+
+    def create_direct_connect_gateway_association(self, *, directConnectGatewayId, virtualGatewayId, **kwargs):
+        self._call('create_direct_connect_gateway_association')
+
+        with self.fake._lock:
+            self.fake.find(self.fake.dx_gateways, directConnectGatewayId, 'DirectConnectClientException')
+            self.fake.find(self.fake.vpn_gateways, virtualGatewayId, 'DirectConnectClientException')
+            association_id = self.fake.next_id('dxgwassoc')
+            association = dict(associationId=association_id, directConnectGatewayId=directConnectGatewayId,
+                               virtualGatewayId=virtualGatewayId,
+                               _lifecycle=self.fake.lifecycle(association_id, ('associating', 'association.create'),
+                                                              final='associated'))
+            self.fake.associations[association_id] = association
+            return dict(directConnectGatewayAssociation=self.fake.view(association, 'associationState'))
+
+    def delete_direct_connect_gateway_association(self, *, associationId, **kwargs):
+        self._call('delete_direct_connect_gateway_association')
+
+        with self.fake._lock:
+            association = self.fake.find(self.fake.associations, associationId, 'DirectConnectClientException')
+            association['_lifecycle'] = self.fake.lifecycle(associationId,
+                                                            ('disassociating', 'association.delete'),
+                                                            final='disassociated')
+            return dict(directConnectGatewayAssociation=self.fake.view(association, 'associationState'))
@@ -43,9 +43,7 @@ class AwsNetwork(Network):
 
         logger.info(f'{self.name} using region {region}')
 
-        ec2_client = aws_utils.create_ec2_client(region=region,
-                                                 access_key=self._provider.access_key,
-                                                 secret_key=self._provider.secret_key)
+        ec2_client = aws_utils.CachedClient(self._provider.ec2_client(region))
         self.vpc_id = self.peering.attributes.get(Constants.RES_CLOUD_VPC)
 
         if not self.vpc_id:
@@ -56,10 +54,7 @@ class AwsNetwork(Network):
 
         logger.info(f'Vpc {self.vpc_id} is available')
 
-        direct_connect_client = aws_utils.create_direct_connect_client(
-            region=region,
-            access_key=self._provider.access_key,
-            secret_key=self._provider.secret_key)
+        direct_connect_client = aws_utils.CachedClient(self._provider.direct_connect_client(region))
 
         connection_id, vlan = aws_utils.find_available_dx_connection(
             direct_connect_client=direct_connect_client,
@@ -84,20 +79,24 @@ class AwsNetwork(Network):
         else:
             logger.info(f'Found vpn gateway: name={self.vpn_gateway_name}')
 
-        aws_utils.attach_vpn_gateway_if_needed(ec2_client=ec2_client, vpn_id=self.vpn_id, vpc_id=self.vpc_id)
-
-        self.route_table_details = aws_utils.create_route_table_if_needed(ec2_client=ec2_client,
-                                                                    cidr=self.layer3.attributes['subnet'],
-                                                                    vpc_id=self.vpc_id,
-                                                                    vpn_id=self.vpn_id)
-
-        self.vif_details = aws_utils.create_private_virtual_interface(
-            direct_connect_client=direct_connect_client,
-            vpn_gateway_id=self.vpn_id,
-            connection_id=connection_id,
-            vlan=vlan,
-            peering=self.peering,
-            vif_name=f"{self.vif_name}")
+        def attach_and_route():
+            aws_utils.attach_vpn_gateway_if_needed(ec2_client=ec2_client, vpn_id=self.vpn_id, vpc_id=self.vpc_id)
+            return aws_utils.create_route_table_if_needed(ec2_client=ec2_client,
+                                                          cidr=self.layer3.attributes['subnet'],
+                                                          vpc_id=self.vpc_id,
+                                                          vpn_id=self.vpn_id)
+
+        def create_vif():
+            return aws_utils.create_private_virtual_interface(
+                direct_connect_client=direct_connect_client,
+                vpn_gateway_id=self.vpn_id,
+                connection_id=connection_id,
+                vlan=vlan,
+                peering=self.peering,
+                vif_name=f"{self.vif_name}")
+
+        # The vgw attachment and the vif only depend on the vgw. Wait on both at the same time.
+        self.route_table_details, self.vif_details = aws_utils.run_concurrently(attach_and_route, create_vif)
 
     def delete(self):
         region = self.peering.attributes.get(Constants.RES_CLOUD_REGION)
@@ -108,9 +107,7 @@ class AwsNetwork(Network):
         if not region:
            raise AwsException(f"Missing cloud region")
 
-        ec2_client = aws_utils.create_ec2_client(region=region,
-                                                 access_key=self._provider.access_key,
-                                                 secret_key=self._provider.secret_key)
+        ec2_client = aws_utils.CachedClient(self._provider.ec2_client(region))
 
         vpc_id = self.peering.attributes.get(Constants.RES_CLOUD_VPC)
         if not vpc_id:
@@ -130,15 +127,14 @@ class AwsNetwork(Network):
             route_table_details = self._state.attributes.get('route_table_details', {})
 
         route_table_id = route_table_details.get('RouteTableId')
-        aws_utils.delete_route_table_if_needed(ec2_client=ec2_client, vpc_id=vpc_id, route_table_id=route_table_id)
-
-        direct_connect_client = aws_utils.create_direct_connect_client(
-            region=region,
-            access_key=self._provider.access_key,
-            secret_key=self._provider.secret_key)
-
-        aws_utils.delete_private_virtual_interface(direct_connect_client=direct_connect_client,
-                                                   vif_name=f"{self.vif_name}")
+        direct_connect_client = aws_utils.CachedClient(self._provider.direct_connect_client(region))
+
+        aws_utils.run_concurrently(
+            lambda: aws_utils.delete_route_table_if_needed(ec2_client=ec2_client,
+                                                           vpc_id=vpc_id,
+                                                           route_table_id=route_table_id),
+            lambda: aws_utils.delete_private_virtual_interface(direct_connect_client=direct_connect_client,
+                                                               vif_name=f"{self.vif_name}"))
 
         aws_utils.detach_vpn_gateway_if_needed(ec2_client=ec2_client, vpn_id=vpn_id, vpc_id=vpc_id)
         aws_utils.delete_vpn_gateway(ec2_client=ec2_client, name=self.vpn_gateway_name)
@@ -20,6 +20,18 @@ class AwsProvider(Provider):
     def secret_key(self):
         return self.config.get(aws_constants.SECRET_KEY)
 
+    def ec2_client(self, region: str):
+        from . import aws_utils
+
+        return aws_utils.create_ec2_client(region=region, access_key=self.access_key, secret_key=self.secret_key)
+
+    def direct_connect_client(self, region: str):
+        from . import aws_utils
+
+        return aws_utils.create_direct_connect_client(region=region,
+                                                      access_key=self.access_key,
+                                                      secret_key=self.secret_key)
+
     def setup_environment(self):
         from fabfed.util import utils
 
@@ -1,7 +1,6 @@
-import time
-
-import boto3
+import threading
 
+from fabfed.util import cassette, tracing
 from fabfed.util.utils import get_logger
 from fabfed.util.constants import Constants
 from .aws_constants import *
@@ -10,54 +9,188 @@ from .aws_exceptions import AwsException
 logger = get_logger()
 
 
-def create_ec2_client(*, region: str, access_key: str, secret_key: str):
-    ec2_client = boto3.client(
-        'ec2',
+class ClientPool:
+    """
+    Process wide pool of boto3 clients keyed by (service, region, access key). Building a client resolves
+    credentials and loads endpoint and service models which costs hundreds of milliseconds, while a built
+    client is thread safe and can be shared by every network, session and thread of the parallel runner.
+
+    Clients are built by a factory, boto3 by default. The fake endpoints in aws_fake replace it.
+    """
+    def __init__(self):
+        self._clients = {}
+        self._lock = threading.Lock()
+        self._factory = None
+
+    def set_factory(self, factory=None):
+        """
+        Sets the function building clients given service, region, access_key and secret_key and drops the built
+        clients. Returns the previous factory. Without a factory, boto3 is used.
+        """
+        with self._lock:
+            previous = self._factory
+            self._factory = factory
+            self._clients.clear()
+
+        return previous
+
+    def get(self, *, service: str, region: str, access_key: str, secret_key: str):
+        key = (service, region, access_key)
+        client = self._clients.get(key)
+
+        if client:
+            return client
+
+        # boto3's default session is not thread safe, so clients are built one at a time.
+        with self._lock:
+            client = self._clients.get(key)
+
+            if not client:
+                logger.debug(f"Creating aws client: service={service}:region={region}")
+                factory = self._factory or _create_boto3_client
+                client = cassette.wrap(f"aws:{service}:{region}",
+                                       lambda: factory(service=service, region=region, access_key=access_key,
+                                                       secret_key=secret_key),
+                                       nested=('get_paginator',), iterables=('paginate',))
+                self._clients[key] = client
+
+        return client
+
+    def clear(self):
+        with self._lock:
+            self._clients.clear()
+
+
+def _create_boto3_client(*, service: str, region: str, access_key: str, secret_key: str):
+    import boto3
+
+    return boto3.Session().client(
+        service,
         region_name=region,
         aws_access_key_id=access_key,
         aws_secret_access_key=secret_key
     )
 
-    return ec2_client
 
+client_pool = ClientPool()
 
-def is_vpc_available(*, ec2_client, vpc_id: str):
-    response = ec2_client.describe_vpcs(VpcIds=[vpc_id])
 
-    if response and isinstance(response, dict) and 'Vpcs' in response:
-        vpc = next(iter(response['Vpcs']), None)
+def create_ec2_client(*, region: str, access_key: str, secret_key: str):
+    return client_pool.get(service='ec2', region=region, access_key=access_key, secret_key=secret_key)
 
-        if vpc:
-            state = vpc['State']
 
-            if state == 'available':
-                return True
+class CachedClient:
+    """
+    Wraps a boto3 client for the duration of a create or delete. Describe responses are fetched through
+    paginators, kept per (operation, arguments) and dropped on any mutating call. Wait loops pass fresh=True.
+    """
+    def __init__(self, client):
+        self.client = client
+        self._cache = {}
+        self._lock = threading.Lock()
 
-            logger.warning(f'found vpc {vpc_id} with state={state}')
-        else:
-            raise AwsException(f"Vpc not found {vpc_id}")
+    def invalidate(self):
+        with self._lock:
+            self._cache.clear()
 
-    return False
+    def describe(self, operation: str, result_key: str, *, fresh=False, **kwargs) -> list:
+        key = (operation, repr(sorted(kwargs.items())))
+
+        if not fresh:
+            with self._lock:
+                if key in self._cache:
+                    return self._cache[key]
+
+        with tracing.span(f'aws:{operation}'):
+            items = _paginate(self.client, operation, result_key, **kwargs)
+
+        with self._lock:
+            self._cache[key] = items
+
+        return items
+
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+
+        if not callable(attr) or name.startswith(('describe_', 'get_', 'list_', 'can_')):
+            return attr
+
+        def mutate(*args, **kwargs):
+            try:
+                with tracing.span(f'aws:{name}'):
+                    return attr(*args, **kwargs)
+            finally:
+                self.invalidate()
+
+        return mutate
+
+
+def _paginate(client, operation: str, result_key: str, **kwargs) -> list:
+    items = []
+
+    if client.can_paginate(operation):
+        for page in client.get_paginator(operation).paginate(**kwargs):
+            items.extend(page.get(result_key, []))
+
+        return items
+
+    response = getattr(client, operation)(**kwargs)
+    items.extend(response.get(result_key, []))
+    token_key = 'nextToken' if 'nextToken' in response else 'NextToken'
+
+    while response.get(token_key):
+        response = getattr(client, operation)(**kwargs, **{token_key: response[token_key]})
+        items.extend(response.get(result_key, []))
+
+    return items
+
+
+def describe(client, operation: str, result_key: str, *, fresh=False, **kwargs) -> list:
+    if isinstance(client, CachedClient):
+        return client.describe(operation, result_key, fresh=fresh, **kwargs)
+
+    with tracing.span(f'aws:{operation}'):
+        return _paginate(client, operation, result_key, **kwargs)
+
+
+def run_concurrently(*calls):
+    """
+    Runs independent calls (i.e. waits on different aws resources) in threads and returns their results.
+    The first exception is raised once all calls are done.
+    """
+    from concurrent.futures import ThreadPoolExecutor
 
+    with ThreadPoolExecutor(max_workers=len(calls)) as executor:
+        futures = [executor.submit(tracing.propagate(call)) for call in calls]
 
-def find_route_tables(*, ec2_client, vpc_id):
-    response = ec2_client.describe_route_tables()
-    route_tables = []
+    return [future.result() for future in futures]
 
-    if response and isinstance(response, dict) and 'RouteTables' in response:
-        for route_table in response['RouteTables']:
-            if route_table['VpcId'] == vpc_id:
-                route_tables.append(route_table)
 
-    return route_tables
+def is_vpc_available(*, ec2_client, vpc_id: str):
+    vpcs = describe(ec2_client, 'describe_vpcs', 'Vpcs', Filters=[{'Name': 'vpc-id', 'Values': [vpc_id]}])
+    vpc = next(iter(vpcs), None)
+
+    if not vpc:
+        raise AwsException(f"Vpc not found {vpc_id}")
+
+    state = vpc['State']
+
+    if state == 'available':
+        return True
+
+    logger.warning(f'found vpc {vpc_id} with state={state}')
+    return False
+
+
+def find_route_tables(*, ec2_client, vpc_id, fresh=False):
+    return describe(ec2_client, 'describe_route_tables', 'RouteTables', fresh=fresh,
+                    Filters=[{'Name': 'vpc-id', 'Values': [vpc_id]}])
 
 
 def create_subnet_if_needed(*, ec2_client, cidr, vpc_id):
-    response = ec2_client.describe_subnets()
-    subnet = next(
-        filter(lambda sub: sub['CidrBlock'] == cidr and sub['VpcId'] == vpc_id, response['Subnets']),
-        None
-    )
+    subnets = describe(ec2_client, 'describe_subnets', 'Subnets',
+                       Filters=[{'Name': 'vpc-id', 'Values': [vpc_id]}, {'Name': 'cidr-block', 'Values': [cidr]}])
+    subnet = next(iter(subnets), None)
 
     if not subnet:
         logger.info(f'Creating subnet {cidr}')
@@ -78,15 +211,14 @@ def create_subnet_if_needed(*, ec2_client, cidr, vpc_id):
         return subnet_id
 
     for i in range(RETRY):
-        response = ec2_client.describe_subnets(SubnetIds=[subnet_id])
-        subnet = next(filter(lambda sub: sub['CidrBlock'] == cidr and sub['VpcId'] == vpc_id, response['Subnets']))
-        state = subnet['State']
+        subnets = describe(ec2_client, 'describe_subnets', 'Subnets', fresh=True, SubnetIds=[subnet_id])
+        state = subnets[0]['State']
         logger.info(f'Waiting on subnet {subnet_id}: state={state}')
 
         if state == 'available':
             return subnet_id
 
-        time.sleep(20)
+        tracing.sleep(20, name='aws:wait')
 
     raise AwsException(f'Timed out. subnet {subnet_id}:state={state}')
 
@@ -96,21 +228,13 @@ def create_subnet_if_needed(*, ec2_client, cidr, vpc_id):
 
 def print_route_tables(ec2_client, vpc_id):
     route_tables = find_route_tables(ec2_client=ec2_client, vpc_id=vpc_id)
-    print()
-    print("Number of route tables", len(route_tables))
+    logger.info(f"vpc {vpc_id}: number of route tables {len(route_tables)}")
 
     for route in route_tables:
-        print()
-        print("Begin Routetable")
-        print(route)
-
-        print("PropagatingVgws", route['PropagatingVgws'])
-
-        for asso in route['Associations']:
-            print('ASSOCIATION=', asso, "::::")
-        print("END Routetable")
-
-    print()
+        # One record per table so the tables of vpcs handled in other threads do not interleave with it.
+        associations = "".join(f"\nASSOCIATION={asso}::::" for asso in route['Associations'])
+        logger.info(f"vpc {vpc_id}: Begin Routetable\n{route}\n"
+                    f"PropagatingVgws {route['PropagatingVgws']}{associations}\nEND Routetable")
 
 
 def create_route_table_if_needed(*, ec2_client, cidr, vpc_id, vpn_id):
@@ -168,26 +292,21 @@ def delete_route_table_if_needed(*, ec2_client, vpc_id, route_table_id):
     logger.info(f'deleted route_table:{route_table_id}:response={response}')
 
     for i in range(RETRY):
-        route_tables = find_route_tables(ec2_client=ec2_client, vpc_id=vpc_id)
+        route_tables = find_route_tables(ec2_client=ec2_client, vpc_id=vpc_id, fresh=True)
         route_table = next(filter(lambda rt: rt['RouteTableId'] == route_table_id, route_tables), None)
 
         if not route_table:
             break
         logger.info(f'waiting on deleting route_table:{route_table_id}:response={response}')
-        time.sleep(20)
+        tracing.sleep(20, name='aws:wait')
 
     logger.info(f'done deleting route_table:{route_table_id}:response={response}')
     print_route_tables(ec2_client=ec2_client, vpc_id=vpc_id)
 
 
 def find_available_dx_connection(*, direct_connect_client, name: str):
-    response = direct_connect_client.describe_connections()
-
-    if not isinstance(response, dict) and 'connections' not in response:
-        raise AwsException(f'did not find dx connection {name}')
-
-    # connection = next(filter(lambda con: con['connectionName'] == name, response['connections']), None)
-    connections = list(filter(lambda con: con['connectionName'] == name, response['connections']))
+    connections = describe(direct_connect_client, 'describe_connections', 'connections')
+    connections = list(filter(lambda con: con['connectionName'] == name, connections))
 
     if not connections:
         raise AwsException(f'did not find dx connection {name}')
@@ -210,42 +329,31 @@ def find_available_dx_connection(*, direct_connect_client, name: str):
             logger.info(f'response from confirm dx connection {response}')
     
         for i in range(RETRY):
-            response = direct_connect_client.describe_connections(connectionId=connection_id)
-            connection = next(filter(lambda con: con['connectionName'] == name, response['connections']))
+            connections = describe(direct_connect_client, 'describe_connections', 'connections', fresh=True,
+                                   connectionId=connection_id)
+            connection = next(filter(lambda con: con['connectionName'] == name, connections))
             state = connection['connectionState']
             logger.info(f'state={state}. dx connection {connection}')
     
             if state == 'available':
                 return connection_id, vlan
     
-            time.sleep(20)
+            tracing.sleep(20, name='aws:wait')
 
     raise AwsException(f'Timed out. dx connection {name}:state={state}')
 
 
 def find_vpn_gateway(*, ec2_client, name: str):
-    response = ec2_client.describe_vpn_gateways()
-
-    if isinstance(response, dict) and 'VpnGateways' in response:
-        for gw in response['VpnGateways']:
-            if 'Tags' in gw and gw['Tags']:
-                name_tag = next(filter(lambda t: t['Key'] == 'Name' and t['Value'] == name, gw['Tags']), None)
-
-                if name_tag:
-                    return gw['VpnGatewayId']
-
-    return None
-
+    vpn_gateways = describe(ec2_client, 'describe_vpn_gateways', 'VpnGateways',
+                            Filters=[{'Name': 'tag:Name', 'Values': [name]}])
+    vpn_gateway = next(iter(vpn_gateways), None)
+    return vpn_gateway['VpnGatewayId'] if vpn_gateway else None
 
-def _find_vpn_gateway_by_id(*, ec2_client, vpn_id: str):
-    response = ec2_client.describe_vpn_gateways()
 
-    if response and isinstance(response, dict) and 'VpnGateways' in response:
-        for gw in response['VpnGateways']:
-            if gw['VpnGatewayId'] == vpn_id:
-                return gw
-
-    return None
+def _find_vpn_gateway_by_id(*, ec2_client, vpn_id: str, fresh=False):
+    vpn_gateways = describe(ec2_client, 'describe_vpn_gateways', 'VpnGateways', fresh=fresh,
+                            Filters=[{'Name': 'vpn-gateway-id', 'Values': [vpn_id]}])
+    return next(iter(vpn_gateways), None)
 
 
 def attach_vpn_gateway_if_needed(*, ec2_client, vpn_id: str, vpc_id: str):
@@ -268,7 +376,7 @@ def attach_vpn_gateway_if_needed(*, ec2_client, vpn_id: str, vpc_id: str):
         return
 
     for i in range(RETRY):
-        vpn_gateway = _find_vpn_gateway_by_id(ec2_client=ec2_client, vpn_id=vpn_id)
+        vpn_gateway = _find_vpn_gateway_by_id(ec2_client=ec2_client, vpn_id=vpn_id, fresh=True)
         attachments = vpn_gateway['VpcAttachments']
         attachment = next(filter(lambda at: at['VpcId'] == vpc_id, attachments))
         state = attachment['State']
@@ -278,7 +386,7 @@ def attach_vpn_gateway_if_needed(*, ec2_client, vpn_id: str, vpc_id: str):
             return
 
         logger.info(f"Waiting on attaching VPN {vpn_id}:state={state}")
-        time.sleep(20)
+        tracing.sleep(20, name='aws:wait')
 
     raise AwsException(f"Timed out on attaching vpn_gateway: state={state}")
 
@@ -307,7 +415,7 @@ def detach_vpn_gateway_if_needed(*, ec2_client, vpn_id: str, vpc_id: str):
     state = None
 
     for i in range(RETRY):
-        vpn_gateway = _find_vpn_gateway_by_id(ec2_client=ec2_client, vpn_id=vpn_id)
+        vpn_gateway = _find_vpn_gateway_by_id(ec2_client=ec2_client, vpn_id=vpn_id, fresh=True)
         attachments = vpn_gateway['VpcAttachments']
         state = None
 
@@ -320,7 +428,7 @@ def detach_vpn_gateway_if_needed(*, ec2_client, vpn_id: str, vpc_id: str):
             return
 
         logger.info(f"Waiting on detached vpn state={state}")
-        time.sleep(20)
+        tracing.sleep(20, name='aws:wait')
 
     raise AwsException(f"Timed out on detaching vpn_gateway: state={state}")
 
@@ -351,7 +459,7 @@ def create_vpn_gateway(*, ec2_client, name: str, amazon_asn: int):
         return vpn_id
 
     for i in range(RETRY):
-        vpn_gateway = _find_vpn_gateway_by_id(ec2_client=ec2_client, vpn_id=vpn_id)
+        vpn_gateway = _find_vpn_gateway_by_id(ec2_client=ec2_client, vpn_id=vpn_id, fresh=True)
 
         if vpn_gateway:
             state = vpn_gateway['State']
@@ -360,7 +468,7 @@ def create_vpn_gateway(*, ec2_client, name: str, amazon_asn: int):
                 return vpn_id
 
         logger.info(f"Waiting on VPN {name}:state={state}")
-        time.sleep(20)
+        tracing.sleep(20, name='aws:wait')
 
     raise AwsException(f"Timed out on creating vpn_gateway: state={state}")
 
@@ -375,7 +483,7 @@ def delete_vpn_gateway(*, ec2_client, name: str):
     state = None
 
     for i in range(RETRY):
-        vpn_gateway = _find_vpn_gateway_by_id(ec2_client=ec2_client, vpn_id=vpn_id)
+        vpn_gateway = _find_vpn_gateway_by_id(ec2_client=ec2_client, vpn_id=vpn_id, fresh=True)
 
         if vpn_gateway:
             state = vpn_gateway['State']
@@ -383,29 +491,19 @@ def delete_vpn_gateway(*, ec2_client, name: str):
         if not state or state == 'deleted':
             return vpn_id
 
-        time.sleep(20)
+        tracing.sleep(20, name='aws:wait')
 
     raise AwsException(f"Timed out on creating vpn_gateway: state={state}")
 
 
 def create_direct_connect_client(*, region: str, access_key: str, secret_key: str):
-    direct_connect_client = boto3.client(
-        'directconnect',
-        region_name=region,
-        aws_access_key_id=access_key,
-        aws_secret_access_key=secret_key
-    )
-
-    return direct_connect_client
+    return client_pool.get(service='directconnect', region=region, access_key=access_key, secret_key=secret_key)
 
 
 def find_direct_connect_gateway_by_name(*, direct_connect_client, gateway_name: str):
-    response = direct_connect_client.describe_direct_connect_gateways()
-
-    if response and isinstance(response, dict) and 'directConnectGateways' in response:
-        for gw in response['directConnectGateways']:
-            if gw['directConnectGatewayName'] == gateway_name:
-                return gw['directConnectGatewayId']
+    for gw in describe(direct_connect_client, 'describe_direct_connect_gateways', 'directConnectGateways'):
+        if gw['directConnectGatewayName'] == gateway_name:
+            return gw['directConnectGatewayId']
 
     return None
 
@@ -451,18 +549,17 @@ def create_private_virtual_interface(*,
                                      vlan,
                                      peering,
                                      vif_name: str):
-    response = direct_connect_client.describe_virtual_interfaces()
     details = {}
 
-    if isinstance(response, dict) and 'virtualInterfaces' in response:
-        for vif in response['virtualInterfaces']:
-            if vif['virtualGatewayId'] == vpn_gateway_id and vif['virtualInterfaceName'] == vif_name:
-                logger.info(f"Found existing private virtual interface {vif_name}")
+    for vif in describe(direct_connect_client, 'describe_virtual_interfaces', 'virtualInterfaces',
+                        connectionId=connection_id):
+        if vif['virtualGatewayId'] == vpn_gateway_id and vif['virtualInterfaceName'] == vif_name:
+            logger.info(f"Found existing private virtual interface {vif_name}")
 
-                for k in VIF_DETAILS:
-                    details[k] = vif[k]
+            for k in VIF_DETAILS:
+                details[k] = vif[k]
 
-                break
+            break
 
     if not details:
         logger.info(f"Creating private virtual interface {vif_name}:connection_id={connection_id}:vlan={vlan}")
@@ -497,10 +594,11 @@ def create_private_virtual_interface(*,
 
     for i in range(RETRY):
         logger.warning(f"Waiting on private virtual interface {vif_name}:state={details[VIF_STATE]}:attempt={i + 1}")
-        time.sleep(20)
+        tracing.sleep(20, name='aws:wait')
 
-        response = direct_connect_client.describe_virtual_interfaces()
-        vif = next(filter(lambda v: v[VIF_ID] == details[VIF_ID], response['virtualInterfaces']))
+        vifs = describe(direct_connect_client, 'describe_virtual_interfaces', 'virtualInterfaces', fresh=True,
+                        virtualInterfaceId=details[VIF_ID])
+        vif = next(filter(lambda v: v[VIF_ID] == details[VIF_ID], vifs))
 
         for k in VIF_DETAILS:
             details[k] = vif[k]
@@ -520,18 +618,16 @@ def create_private_virtual_interface(*,
 def delete_private_virtual_interface(*,
                                      direct_connect_client,
                                      vif_name: str):
-    response = direct_connect_client.describe_virtual_interfaces()
     details = {}
 
-    if isinstance(response, dict) and 'virtualInterfaces' in response:
-        for vif in response['virtualInterfaces']:
-            if vif['virtualInterfaceName'] == vif_name:
-                logger.info(f"Found existing private virtual interface {vif_name}")
+    for vif in describe(direct_connect_client, 'describe_virtual_interfaces', 'virtualInterfaces'):
+        if vif['virtualInterfaceName'] == vif_name:
+            logger.info(f"Found existing private virtual interface {vif_name}")
 
-                for k in VIF_DETAILS:
-                    details[k] = vif[k]
+            for k in VIF_DETAILS:
+                details[k] = vif[k]
 
-                break
+            break
 
     if not details:
         return
@@ -547,10 +643,11 @@ def delete_private_virtual_interface(*,
 
     for i in range(RETRY):
         logger.warning(f"Waiting on private virtual interface {vif_name}:state={details[VIF_STATE]}:attempt={i + 1}")
-        time.sleep(20)
+        tracing.sleep(20, name='aws:wait')
 
-        response = direct_connect_client.describe_virtual_interfaces()
-        vif = next(filter(lambda v: v[VIF_ID] == details[VIF_ID], response['virtualInterfaces']))
+        vifs = describe(direct_connect_client, 'describe_virtual_interfaces', 'virtualInterfaces', fresh=True,
+                        virtualInterfaceId=details[VIF_ID])
+        vif = next(filter(lambda v: v[VIF_ID] == details[VIF_ID], vifs))
 
         for k in VIF_DETAILS:
             details[k] = vif[k]
@@ -567,19 +664,11 @@ def delete_private_virtual_interface(*,
     return details
 
 
-def find_association_dxgw_vpn(*, direct_connect_client, direct_connect_gateway_id: str, vpn_id: str):
-    response = direct_connect_client.describe_direct_connect_gateway_associations(
-        virtualGatewayId=vpn_id,
-        directConnectGatewayId=direct_connect_gateway_id,
-    )
-
-    if response and isinstance(response, dict) and 'directConnectGatewayAssociations' in response:
-        associations = response['directConnectGatewayAssociations']
-
-        if associations:
-            return associations[0]
-
-    return None
+def find_association_dxgw_vpn(*, direct_connect_client, direct_connect_gateway_id: str, vpn_id: str, fresh=False):
+    associations = describe(direct_connect_client, 'describe_direct_connect_gateway_associations',
+                            'directConnectGatewayAssociations', fresh=fresh,
+                            virtualGatewayId=vpn_id, directConnectGatewayId=direct_connect_gateway_id)
+    return next(iter(associations), None)
 
 
 def find_association_dxgw_vpn_id(*, direct_connect_client, direct_connect_gateway_id: str, vpn_id: str):
@@ -621,12 +710,13 @@ def associate_dxgw_vpn(direct_connect_client, direct_connect_gateway_id, vpn_id:
 
     for i in range(RETRY):
         logger.warning(f'Waiting on association. state={state}: association:{association}')
-        time.sleep(20)
+        tracing.sleep(20, name='aws:wait')
 
         association = find_association_dxgw_vpn(
             direct_connect_client=direct_connect_client,
             direct_connect_gateway_id=direct_connect_gateway_id,
-            vpn_id=vpn_id
+            vpn_id=vpn_id,
+            fresh=True
         )
 
         state = association['associationState']
@@ -660,7 +750,8 @@ def dissociate_dxgw_vpn(*, direct_connect_client, association_id: str):
         association = find_association_dxgw_vpn(
             direct_connect_client=direct_connect_client,
             direct_connect_gateway_id=direct_connect_gateway_id,
-            vpn_id=vpn_id
+            vpn_id=vpn_id,
+            fresh=True
         )
 
         if not association or not isinstance(association, dict) or 'associationState' not in association:
@@ -672,6 +763,6 @@ def dissociate_dxgw_vpn(*, direct_connect_client, association_id: str):
         if state == 'disassociated':
             return
 
-        time.sleep(20)
+        tracing.sleep(20, name='aws:wait')
 
     raise AwsException(f"Timed out on deleting direct_connect_gateway_association:id={association_id}:state={state}")
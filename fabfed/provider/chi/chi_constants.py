@@ -49,4 +49,8 @@ DEFAULT_PROJECT_IDS = dict(
 
 DEFAULT_DISCOVERY_URL = "https://auth.chameleoncloud.org/auth/realms/chameleon/.well-known/openid-configuration"
 
-INCLUDE_ROUTER = True 
+INCLUDE_ROUTER = True
+
+NODE_TYPE = "compute_cascadelake_r"
+HOST_RESOURCE_TYPE = "physical:host"
+NETWORK_RESOURCE_TYPE = "network" 
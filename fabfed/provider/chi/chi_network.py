@@ -1,18 +1,18 @@
 import json
 import logging
-import time
 
 import chi
 import chi.network
 import chi.server
 
 from fabfed.model import Network
-from .chi_util import LeaseHelper
+from .chi_util import LeaseHelper, SiteSession
 from ...util.config_models import Config
 from ...util.constants import Constants
-from .chi_constants import INCLUDE_ROUTER
+from .chi_constants import INCLUDE_ROUTER, NETWORK_RESOURCE_TYPE
 
 
+from fabfed.util import tracing
 from fabfed.util.utils import get_logger
 
 logger: logging.Logger = get_logger()
@@ -20,7 +20,7 @@ logger: logging.Logger = get_logger()
 
 class ChiNetwork(Network):
     def __init__(self, *, label, name: str, site: str, project_name: str, layer3: Config,
-                 stitch_info, vlan: int):
+                 stitch_info, vlan: int, lease_helper: LeaseHelper = None, site_session: SiteSession = None):
         super().__init__(label=label, name=name, site=site)
         self.project_name = project_name
         self.layer3 = layer3
@@ -35,7 +35,6 @@ class ChiNetwork(Network):
             self.stitch_provider = stitch_info.stitch_port['peer']['provider']
 
         self._retry = 10 
-        self.lease_name = f'{name}-lease'
         self.subnet_name = f'{name}-subnet'
         self.router_name = f'{name}-router'
 
@@ -60,10 +59,18 @@ class ChiNetwork(Network):
         self.vlans = list()
         self.interface = list()
         self.logger = logger
-        self._lease_helper = LeaseHelper(lease_name=self.lease_name, logger=self.logger)
+        self._shared_lease = lease_helper is not None
+        self._lease_helper = lease_helper or LeaseHelper(lease_name=f'{name}-lease', logger=self.logger)
+        self.lease_name = self._lease_helper.lease_name
+        self._site_session = site_session or SiteSession(project_name=project_name)
+
+    def use_lease(self, lease_helper: LeaseHelper):
+        self._shared_lease = True
+        self._lease_helper = lease_helper
+        self.lease_name = lease_helper.lease_name
 
     def get_reservation_id(self):
-        return self._lease_helper.get_reservation_id()
+        return self._lease_helper.get_reservation_id(resource_type=NETWORK_RESOURCE_TYPE, network_name=self.name)
 
     def get_vlans(self) -> list:
         return self.vlans
@@ -71,10 +78,11 @@ class ChiNetwork(Network):
     def create(self):
         import json
 
-        chi.set('project_name', self.project_name)
-        chi.set('project_domain_name', 'default')
-        chi.use_site(self.site)
-        self._lease_helper.create_lease_if_needed(reservations=self.reservations, retry=self._retry)
+        self._site_session.use(self.site)
+
+        if not self._shared_lease:
+            self._lease_helper.create_lease_if_needed(reservations=self.reservations, retry=self._retry)
+
         self.logger.debug(f"Using active lease {self.lease_name}:lease={json.dumps(self._lease_helper.lease, indent=3)}")
 
         self.vlans = []
@@ -95,7 +103,7 @@ class ChiNetwork(Network):
                 self.logger.error(f'Error while retrieving vlan:{self.name}:{e}')
 
             self.logger.warning(f'Network is not ready {self.name}. Trying again! attempt={attempt}:network_details=={chameleon_network}')
-            time.sleep(12)
+            tracing.sleep(12, name='chi:network')
 
         if network_vlan is None:
              temp = dict()
@@ -168,9 +176,7 @@ class ChiNetwork(Network):
         chi.neutron().update_subnet(subnet=chameleon_subnet['id'], body=body)
 
     def _delete(self):
-        chi.set('project_name', self.project_name)
-        chi.set('project_domain_name', 'default')
-        chi.use_site(self.site)
+        self._site_session.use(self.site)
 
         from neutronclient.common.exceptions import NotFound
 
@@ -217,11 +223,10 @@ class ChiNetwork(Network):
             if "No networks found with" not in str(re):
                 raise re
 
-        self._lease_helper.delete_lease()
+        if not self._shared_lease:
+            self._lease_helper.delete_lease()
 
     def delete(self):
-        import time
-
         ex = None
 
         for attempt in range(self._retry):
@@ -232,6 +237,6 @@ class ChiNetwork(Network):
                 self.logger.warning(f"Error deleting network {self.name} {e}")
                 ex = e
 
-            time.sleep(12)
+            tracing.sleep(12, name='chi:network')
 
         raise Exception(f"Error while deleting network {self.name}:{ex}")
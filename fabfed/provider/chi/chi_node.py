@@ -25,6 +25,7 @@
 import logging
 import os
 import time
+from typing import List
 
 import chi
 import chi.server
@@ -34,8 +35,9 @@ import chi.network
 from fabfed.model import Node
 import fabfed.provider.chi.chi_util as util
 from fabfed.util.constants import Constants
-from .chi_constants import INCLUDE_ROUTER
+from .chi_constants import INCLUDE_ROUTER, NODE_TYPE, HOST_RESOURCE_TYPE
 
+from fabfed.util import tracing
 from fabfed.util.utils import get_logger
 
 logger: logging.Logger = get_logger()
@@ -43,7 +45,8 @@ logger: logging.Logger = get_logger()
 
 class ChiNode(Node):
     def __init__(self, *, label, name: str, image: str, site: str, flavor: str, project_name: str,
-                 key_pair: str, network: str):
+                 key_pair: str, network: str, lease_helper: util.LeaseHelper = None,
+                 site_session: util.SiteSession = None):
         super().__init__(label=label, name=name, image=image, site=site, flavor=flavor)
         self.project_name = project_name
         self.key_pair = key_pair
@@ -54,21 +57,29 @@ class ChiNode(Node):
         self.username = "cc"
         self.user = self.username
         self.state = None
-        self.lease_name = f'{self.name}-lease'
         self.addresses = []
         self.reservations = []
-        chi.lease.add_node_reservation(self.reservations, count=1, node_type="compute_cascadelake_r")
-        self._lease_helper = util.LeaseHelper(lease_name=self.lease_name, logger=self.logger)
+        chi.lease.add_node_reservation(self.reservations, count=1, node_type=NODE_TYPE)
+        self._shared_lease = lease_helper is not None
+        self._lease_helper = lease_helper or util.LeaseHelper(lease_name=f'{self.name}-lease', logger=self.logger)
+        self.lease_name = self._lease_helper.lease_name
+        self._site_session = site_session or util.SiteSession(project_name=project_name)
         self.id = ''
+        self.server_id = None
         self.dataplane_ipv4 = None
 
+    def use_lease(self, lease_helper: util.LeaseHelper):
+        self._shared_lease = True
+        self._lease_helper = lease_helper
+        self.lease_name = lease_helper.lease_name
+
     def get_reservation_id(self):
-        return self._lease_helper.get_reservation_id()
+        return self._lease_helper.get_reservation_id(resource_type=HOST_RESOURCE_TYPE)
 
     def get_reservation_state(self) -> str:
         return self.state
 
-    def __populate_state(self, node_info):
+    def _populate_state(self, node_info):
         self.logger.debug(f"Node Info for {self.name}: {node_info}")
         self.state = node_info['OS-EXT-STS:vm_state']
         addresses = node_info['addresses'][self.network]
@@ -95,11 +106,9 @@ class ChiNode(Node):
                                         reservation_id=self._lease_helper.get_reservation_id())
 
     def create(self):
-        chi.set('project_name', self.project_name)
-        chi.set('project_domain_name', 'default')
+        self._site_session.use(self.site, select_site=self.site != "KVM@TACC")
 
-        if self.site != "KVM@TACC":
-            chi.use_site(self.site)
+        if self.site != "KVM@TACC" and not self._shared_lease:
             self._lease_helper.create_lease_if_needed(reservations=self.reservations, retry=self._retry)
 
         try:
@@ -110,63 +119,42 @@ class ChiNode(Node):
             node = self.__create_kvm() if self.site == "KVM@TACC" else self.__create_baremetal()
             node_id = node.id
 
+        self.server_id = node_id
         self.logger.info(f"Got node {self.name} with {node_id}")
 
     def wait_for_active(self):
-        chi.set('project_name', self.project_name)
-        chi.set('project_domain_name', 'default')
-
-        if self.site != "KVM@TACC":
-            chi.use_site(self.site)
-
-        self.logger.info(f"Waiting for node {self.name} to be Active!")
-        node_id = chi.server.get_server_id(self.name)
-        chi.server.wait_for_active(node_id, timeout=(60 * 40))
-        node = chi.server.get_server(node_id)
-        self.__populate_state(node.to_dict())
+        wait_for_active_nodes([self])
+
+    def _associate_floating_ip(self, *, neutron, unbound_ips: list, port_ids: dict):
+        self.logger.info(f"Associating the Floating IP to {self.name}!")
+        # We do not use chi.server.associate_floating_ip(server_id=node.id) as it stopped working
+
+        if unbound_ips:
+            fip = unbound_ips.pop(0)
+            self.logger.info(f"Found Floating IP for {self.name}:{fip}")
+        else:
+            self.logger.info(f"Creating Floating IP for {self.name}")
+            fip = neutron.create_floatingip({
+                "floatingip": {
+                    "floating_network_id": chi.network.get_network_id(chi.network.PUBLIC_NETWORK),
+                }
+            })["floatingip"]
+            self.logger.info(f"Created Floating IP for {self.name}:{fip}")
 
-        if not INCLUDE_ROUTER:
-            return
+        port_id = port_ids.get(self.dataplane_ipv4)
 
-        if not self.mgmt_ip:
-            self.logger.info(f"Associating the Floating IP to {self.name}!")
-            # We do not use chi.server.associate_floating_ip(server_id=node.id) as it stopped working
-            _neutron = chi.clients.neutron()
-            ips = _neutron.list_floatingips()['floatingips']
-            unbound = (ip for ip in ips if ip['port_id'] is None)
+        if not port_id:
+            raise Exception(f"Did not find port id for {self.name} using dataplane_ipv4={self.dataplane_ipv4}")
 
-            try:
-                fip = next(unbound)
-                self.logger.info(f"Found Floating IP for {self.name}:{fip}")
-            except StopIteration:
-                self.logger.info(f"Creating Floating IP for {self.name}")
-                fip = _neutron.create_floatingip({
-                    "floatingip": {
-                        "floating_network_id": chi.network.get_network_id(chi.network.PUBLIC_NETWORK),
-                    }
-                })["floatingip"]
-                self.logger.info(f"Created Floating IP for {self.name}:{fip}")
-
-            ports = chi.network.list_ports()
-            port_id = None
-
-            for port in ports:
-                if port['fixed_ips'][0]['ip_address'] == self.dataplane_ipv4:
-                    port_id = port['id']
-                    break
-
-            if not port_id:
-                raise Exception(f"Did not find port id for {self.name} using dataplane_ipv4={self.dataplane_ipv4}")
-
-            self.logger.info(f"Updating Floating IP for {self.name}:{fip}")
-            _neutron.update_floatingip(fip["id"], body={
-                "floatingip": {
-                    "port_id": port_id,
-                    "fixed_ip_address": None,
-                }
-            })
+        self.logger.info(f"Updating Floating IP for {self.name}:{fip}")
+        neutron.update_floatingip(fip["id"], body={
+            "floatingip": {
+                "port_id": port_id,
+                "fixed_ip_address": None,
+            }
+        })
 
-            self.mgmt_ip = self.host = fip['floating_ip_address']
+        self.mgmt_ip = self.host = fip['floating_ip_address']
 
     def wait_for_ssh(self):
         if not INCLUDE_ROUTER:
@@ -178,13 +166,10 @@ class ChiNode(Node):
         self.logger.info(
             f"Waiting on SSH. Node {self.name}: mgmt_ip={self.mgmt_ip}. This can take some time ... up to 30 minutes")
         chi.server.wait_for_tcp(self.mgmt_ip, 22, timeout=(60 * 40))
+        self.logger.info(f"SSH is up. Node {self.name}: mgmt_ip={self.mgmt_ip}")
 
     def delete(self):
-        chi.set('project_name', self.project_name)
-        chi.set('project_domain_name', 'default')
-
-        if self.site != "KVM@TACC":
-            chi.use_site(self.site)
+        self._site_session.use(self.site, select_site=self.site != "KVM@TACC")
 
         try:
             self.logger.info(f"Disassociating floating ip if any. node: {self.name}")
@@ -213,7 +198,8 @@ class ChiNode(Node):
         except ValueError as ve:
             self.logger.warning(f"Error deleting node {self.name}: {ve}")
 
-        self._lease_helper.delete_lease()
+        if not self._shared_lease:
+            self._lease_helper.delete_lease()
 
     def upload_file(self, local_file_path, remote_file_path, retry=3, retry_interval=10):
         self.logger.debug(f"upload node: {self.name}, local_file_path: {local_file_path}")
@@ -224,12 +210,17 @@ class ChiNode(Node):
             try:
                 helper.connect_ftp()
                 helper.ftp_client.put(local_file_path, remote_file_path)
+                return
             except Exception as e:
                 self.logger.info(f"SCP upload fail {e}. Node: {self.name}, tried {attempt + 1}")
-                time.sleep(retry_interval)
+
+                if attempt < retry - 1:
+                    tracing.sleep(retry_interval, name='chi:node')
             finally:
                 helper.close_quietly()
 
+        raise Exception(f"Node {self.name} unable to upload {local_file_path} after {retry} attempts")
+
     def download_file(self, local_file_path, remote_file_path, retry=3, retry_interval=10):
         self.logger.debug(f"download node: {self.name}, remote_file_path: {remote_file_path}")
         key = util.get_paramiko_key(private_key_file=self.keyfile)
@@ -241,46 +232,28 @@ class ChiNode(Node):
                 helper.ftp_client.get(remote_file_path, local_file_path)
             except Exception as e:
                 self.logger.info(f"SCP download fail {e}. Node: {self.name}, tried {attempt + 1}")
-                time.sleep(retry_interval)
+                tracing.sleep(retry_interval, name='chi:node')
             finally:
                 helper.close_quietly()
 
     def upload_directory(self, local_directory_path, remote_directory_path, retry=3, retry_interval=10):
-        import tarfile
-        import os
-
         self.logger.debug(f"upload node: {self.name}, local_directory_path: {local_directory_path}")
-
-        output_filename = local_directory_path.split('/')[-1]
-        root_size = len(local_directory_path) - len(output_filename)
-        temp_file = "/tmp/" + output_filename + ".tar.gz"
-
-        with tarfile.open(temp_file, "w:gz") as tar_handle:
-            for root, dirs, files in os.walk(local_directory_path):
-                for file in files:
-                    tar_handle.add(os.path.join(root, file), arcname=os.path.join(root, file)[root_size:])
-
-        self.upload_file(temp_file, temp_file, retry, retry_interval)
-        os.remove(temp_file)
-        self.execute("mkdir -p "+remote_directory_path + "; tar -xf " + temp_file + " -C " + remote_directory_path +
-                     "; rm " + temp_file, retry, retry_interval)
+        return util.transfer(self, 'stream_upload_directory', local_directory_path, remote_directory_path,
+                             retry=retry, retry_interval=retry_interval)
 
     def download_directory(self, local_directory_path, remote_directory_path, retry=3, retry_interval=10):
-        import tarfile
-        import os
-        self.logger.debug(f"upload node: {self.name}, local_directory_path: {local_directory_path}")
-
-        temp_file = "/tmp/unpackingfile.tar.gz"
-        self.execute("tar -czf " + temp_file + " " + remote_directory_path, retry, retry_interval)
-
-        self.download_file(temp_file, temp_file, retry, retry_interval)
-        tar_file = tarfile.open(temp_file)
-        tar_file.extractall(local_directory_path)
-
-        self.execute("rm " + temp_file, retry, retry_interval)
-        os.remove(temp_file)
+        self.logger.debug(f"download node: {self.name}, remote_directory_path: {remote_directory_path}")
+        return util.transfer(self, 'stream_download_directory', local_directory_path, remote_directory_path,
+                             retry=retry, retry_interval=retry_interval)
 
     def execute(self, command, retry=3, retry_interval=10):
+        ret = self.execute_with_status(command, retry=retry, retry_interval=retry_interval)
+        return ret[:2] if ret else None
+
+    def execute_with_status(self, command, retry=3, retry_interval=10):
+        """
+        Returns stdout, stderr and the exit status of command, or None if it could not be run.
+        """
         self.logger.debug(f"execute node: {self.name}, management_ip: {self.mgmt_ip}, command: {command}")
         key = util.get_paramiko_key(private_key_file=self.keyfile)
         helper = util.SshHelper(self.mgmt_ip, self.username, key)
@@ -292,12 +265,12 @@ class ChiNode(Node):
             try:
                 helper.connect()
                 _, stdout, stderr = helper.client.exec_command(cmd)
-                stdout = str(stdout.read(), 'utf-8').replace('\\n', '\n')
-                stderr = str(stderr.read(), 'utf-8').replace('\\n', '\n')
-                return stdout, stderr
+                stdout_text = str(stdout.read(), 'utf-8').replace('\\n', '\n')
+                stderr_text = str(stderr.read(), 'utf-8').replace('\\n', '\n')
+                return stdout_text, stderr_text, stdout.channel.recv_exit_status()
             except Exception as e:
                 self.logger.info(f"SSH execute fail {e}. Node: {self.name}, tried {attempt + 1}")
-                time.sleep(retry_interval)
+                tracing.sleep(retry_interval, name='chi:node')
             finally:
                 helper.close_quietly()
 
@@ -306,3 +279,127 @@ class ChiNode(Node):
 
     def add_route(self, subnet, gateway):
         pass
+
+
+def wait_for_active_nodes(nodes: List[ChiNode], timeout=60 * 40, interval=10):
+    """
+    Waits on all nodes with a single list servers sweep per interval. The sweep is narrowed to the node names
+    and its servers are matched to the nodes by the server ids handed out on create. Once all are active, the
+    floating ips and ports of the project are listed once and matched in memory to the nodes missing a
+    management ip. The nodes are expected to share a site and project, which holds for the nodes of a resource
+    label.
+    """
+    import re
+
+    if not nodes:
+        return
+
+    nodes[0]._site_session.use(nodes[0].site, select_site=nodes[0].site != "KVM@TACC")
+
+    pending = {node.server_id or chi.server.get_server_id(node.name): node for node in nodes}
+    logger.info(f"Waiting for nodes {[node.name for node in nodes]} to be Active!")
+    start = time.time()
+
+    while True:
+        names = "|".join(re.escape(node.name) for node in pending.values())
+
+        for server in chi.clients.nova().servers.list(search_opts={'name': f"^({names})$"}):
+            node = pending.get(server.id)
+
+            if not node:
+                continue
+
+            if server.status == 'ERROR':
+                raise Exception(f"Node {node.name} went into ERROR state: {getattr(server, 'fault', '')}")
+
+            if server.status == 'ACTIVE':
+                node._populate_state(server.to_dict())
+                pending.pop(server.id)
+                logger.info(f"Node {node.name} is Active after {time.time() - start:.1f} seconds")
+
+        if not pending:
+            break
+
+        if time.time() - start > timeout:
+            raise TimeoutError(f"Timed out waiting on nodes {[node.name for node in pending.values()]} to be Active")
+
+        tracing.sleep(interval, name='chi:wait_for_active')
+
+    if not INCLUDE_ROUTER:
+        return
+
+    nodes = [node for node in nodes if not node.mgmt_ip]
+
+    if not nodes:
+        return
+
+    neutron = chi.clients.neutron()
+    unbound_ips = [ip for ip in neutron.list_floatingips()['floatingips'] if ip['port_id'] is None]
+    port_ids = {}
+
+    for port in chi.network.list_ports():
+        if port['fixed_ips']:
+            port_ids.setdefault(port['fixed_ips'][0]['ip_address'], port['id'])
+
+    for node in nodes:
+        node._associate_floating_ip(neutron=neutron, unbound_ips=unbound_ips, port_ids=port_ids)
+
+
+def wait_for_ssh_nodes(nodes: List[ChiNode], max_workers=16):
+    """
+    Waits on ssh for all nodes concurrently so a group waits as long as its slowest node.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    if not nodes:
+        return
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(nodes))) as executor:
+        futures = [executor.submit(tracing.propagate(node.wait_for_ssh)) for node in nodes]
+
+    for future in futures:
+        future.result()
+
+
+def _fan_out(nodes: List[ChiNode], call, max_workers: int) -> dict:
+    from concurrent.futures import ThreadPoolExecutor
+
+    results = {}
+
+    if not nodes:
+        return results
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(nodes))) as executor:
+        futures = {node.name: executor.submit(tracing.propagate(call), node) for node in nodes}
+
+    for name, future in futures.items():
+        try:
+            results[name] = future.result()
+        except Exception as e:
+            logger.warning(f"Transfer failed for node {name}: {e}")
+            results[name] = e
+
+    return results
+
+
+def upload_directory_to_nodes(nodes: List[ChiNode], local_directory_path, remote_directory_path, max_workers=8):
+    """
+    Streams local_directory_path to every node concurrently. Returns a dict of node name to TransferStats, or to
+    the exception raised for that node.
+    """
+    start = time.time()
+    results = _fan_out(nodes, lambda n: n.upload_directory(local_directory_path, remote_directory_path), max_workers)
+    total = sum(r.bytes for r in results.values() if isinstance(r, util.TransferStats))
+    duration = time.time() - start
+    logger.info(f"Uploaded {local_directory_path} to {len(nodes)} nodes: bytes={total}:duration={duration:.1f}s:"
+                f"throughput={util.throughput(util.TransferStats('all', total, duration)):.2f}MB/s")
+    return results
+
+
+def download_directory_from_nodes(nodes: List[ChiNode], local_directory_path, remote_directory_path, max_workers=8):
+    """
+    Streams remote_directory_path from every node concurrently into local_directory_path/<node name>.
+    """
+    return _fan_out(nodes,
+                    lambda n: n.download_directory(os.path.join(local_directory_path, n.name), remote_directory_path),
+                    max_workers)
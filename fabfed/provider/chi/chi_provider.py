@@ -17,6 +17,95 @@ class ChiProvider(Provider):
     def __init__(self, *, type, label, name, config: dict[str, str]):
         super().__init__(type=type, label=label, name=name, logger=logger, config=config)
         self.helper = None
+        self._site_session = None
+        self._site_leases = {}
+        self._deleted = set()
+
+    @property
+    def site_session(self):
+        if self._site_session is None:
+            from .chi_util import SiteSession
+
+            self._site_session = SiteSession(project_name=self.config[CHI_PROJECT_NAME])
+
+        return self._site_session
+
+    def _site_lease_name(self, site: str):
+        return f"{self.name}-{site.lower().replace('@', '-')}-lease"
+
+    def _saved_lease_names(self) -> dict:
+        from fabfed.model.state import ProviderState
+
+        if not isinstance(self.saved_state, ProviderState):
+            return {}
+
+        states = self.saved_state.node_states + self.saved_state.network_states
+        return {state.attributes.get('name'): state.attributes.get('lease_name') for state in states}
+
+    def _ensure_site_lease(self, *, site: str):
+        """
+        Builds one lease per site holding the node and network reservations of every resource of this provider
+        at that site, and waits on it once. Resources saved with their own lease keep it. So do resources added
+        after the site lease was created, since blazar leases can not grow.
+        """
+        if site in self._site_leases:
+            return
+
+        import chi.lease
+        from .chi_util import LeaseHelper
+        from fabfed.provider.chi.chi_node import ChiNode
+
+        lease_helper = LeaseHelper(lease_name=self._site_lease_name(site), logger=self.logger)
+        saved_lease_names = self._saved_lease_names()
+        candidates = [r for r in self._nodes + self._networks if r.site == site]
+        candidates = [r for r in candidates if not (isinstance(r, ChiNode) and site == "KVM@TACC")]
+        candidates = [r for r in candidates
+                      if saved_lease_names.get(r.name, lease_helper.lease_name) == lease_helper.lease_name]
+        self.site_session.use(site)
+        lease = lease_helper.find_lease()
+
+        if lease and lease['status'] not in ['ERROR', 'TERMINATED']:
+            candidates = [r for r in candidates if saved_lease_names.get(r.name) == lease_helper.lease_name]
+
+        if candidates:
+            reservations = []
+            node_count = len([r for r in candidates if isinstance(r, ChiNode)])
+
+            if node_count:
+                chi.lease.add_node_reservation(reservations, count=node_count, node_type=NODE_TYPE)
+
+            for net in [r for r in candidates if not isinstance(r, ChiNode)]:
+                reservations.extend(net.reservations)
+
+            self.logger.info(f"Using lease {lease_helper.lease_name} for {[r.name for r in candidates]}")
+            lease_helper.create_lease_if_needed(reservations=reservations, retry=10)
+
+            for resource in candidates:
+                resource.use_lease(lease_helper)
+
+        self._site_leases[site] = lease_helper
+
+    def _lease_helper_for(self, resource_name: str):
+        from .chi_util import LeaseHelper
+
+        lease_name = self._saved_lease_names().get(resource_name)
+
+        if not lease_name or lease_name == f'{resource_name}-lease':
+            return None
+
+        return LeaseHelper(lease_name=lease_name, logger=self.logger)
+
+    def _on_deleted(self, *, resource_name: str, lease_helper):
+        self._deleted.add(resource_name)
+
+        if not lease_helper:
+            return
+
+        users = [name for name, lease_name in self._saved_lease_names().items()
+                 if lease_name == lease_helper.lease_name]
+
+        if all(name in self._deleted for name in users):
+            lease_helper.delete_lease()
 
     def setup_environment(self):
         site = "CHI@UC"
@@ -147,7 +236,8 @@ class ChiProvider(Provider):
                 from fabfed.provider.chi.chi_node import ChiNode
 
                 node = ChiNode(label=label, name=node_name, image=image, site=site, flavor=flavor,
-                               key_pair=key_pair, network=network, project_name=project_name)
+                               key_pair=key_pair, network=network, project_name=project_name,
+                               site_session=self.site_session)
                 self.nodes.append(node)
 
                 if self.resource_listener:
@@ -214,7 +304,7 @@ class ChiProvider(Provider):
 
         net = ChiNetwork(label=label, name=net_name, site=site,
                          layer3=layer3, stitch_info=stitch_infos[0],
-                         project_name=project_name, vlan=vlan)
+                         project_name=project_name, vlan=vlan, site_session=self.site_session)
         self._networks.append(net)
 
         if self.resource_listener:
@@ -238,7 +328,8 @@ class ChiProvider(Provider):
                     project_name = self.config[CHI_PROJECT_NAME]
 
                     net = ChiNetwork(label=label, name=net_name, site=site,
-                                     layer3=layer3, stitch_info=None, project_name=project_name, vlan=-1)
+                                     layer3=layer3, stitch_info=None, project_name=project_name, vlan=-1,
+                                     lease_helper=self._lease_helper_for(net_name), site_session=self.site_session)
                     net.delete()
 
                     self.logger.info(f"Deleted network: {net_name} at site {site}")
@@ -248,6 +339,7 @@ class ChiProvider(Provider):
 
                     return
 
+            self._ensure_site_lease(site=site)
             net = next(filter(lambda n: n.label == label, self.networks))
             net.create()
 
@@ -268,7 +360,9 @@ class ChiProvider(Provider):
                         from fabfed.provider.chi.chi_node import ChiNode
 
                         node = ChiNode(label=label, name=node_name, image='', site=site, flavor='',
-                                       key_pair=key_pair, network='', project_name=project_name)
+                                       key_pair=key_pair, network='', project_name=project_name,
+                                       lease_helper=self._lease_helper_for(node_name),
+                                       site_session=self.site_session)
                         node.delete()
 
                         self.logger.info(f"Deleted node: {node_name} at site {site}")
@@ -276,6 +370,8 @@ class ChiProvider(Provider):
                         if self.resource_listener:
                             self.resource_listener.on_deleted(source=self, provider=self, resource=node)
 
+            self._ensure_site_lease(site=site)
+
             for node in temp:
                 node.create()
 
@@ -288,16 +384,13 @@ class ChiProvider(Provider):
         if rtype == Constants.RES_TYPE_NETWORK:
             pass
         else:
-            from fabfed.provider.chi.chi_node import ChiNode
+            from fabfed.provider.chi.chi_node import ChiNode, wait_for_active_nodes, wait_for_ssh_nodes
 
             temp: List[ChiNode] = [node for node in self._nodes if node.label == label]
+            wait_for_active_nodes(temp)
+            wait_for_ssh_nodes(temp)
 
             for node in temp:
-                node.wait_for_active()
-
-            for node in temp:
-                node.wait_for_ssh()
-
                 if self.resource_listener:
                     self.resource_listener.on_created(source=self, provider=self, resource=node)
 
@@ -322,9 +415,12 @@ class ChiProvider(Provider):
 
             layer3 = Config("", "", {})
 
+            lease_helper = self._lease_helper_for(net_name)
             net = ChiNetwork(label=label, name=net_name, site=site,
-                             layer3=layer3, stitch_info=None, project_name=project_name, vlan=-1)
+                             layer3=layer3, stitch_info=None, project_name=project_name, vlan=-1,
+                             lease_helper=lease_helper, site_session=self.site_session)
             net.delete()
+            self._on_deleted(resource_name=net_name, lease_helper=lease_helper)
             self.logger.info(f"Deleted network: {net_name} at site {site}")
 
             if self.resource_listener:
@@ -338,9 +434,12 @@ class ChiProvider(Provider):
 
                 from fabfed.provider.chi.chi_node import ChiNode
 
+                lease_helper = self._lease_helper_for(node_name)
                 node = ChiNode(label=label, name=node_name, image=None, site=site, flavor=None,
-                               key_pair=key_pair, network=None, project_name=project_name)
+                               key_pair=key_pair, network=None, project_name=project_name,
+                               lease_helper=lease_helper, site_session=self.site_session)
                 node.delete()
+                self._on_deleted(resource_name=node_name, lease_helper=lease_helper)
                 self.logger.info(f"Deleted node: {node_name} at site {site}")
 
                 if self.resource_listener:
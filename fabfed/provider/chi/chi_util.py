@@ -1,9 +1,53 @@
 import logging
+import threading
+import time
+from collections import namedtuple
 
 import chi
 import chi.lease
 import paramiko
 
+from fabfed.util import tracing
+
+TRANSFER_BUFFER_SIZE = 1024 * 1024
+
+TransferStats = namedtuple("TransferStats", "node bytes duration")
+
+
+def throughput(stats: TransferStats) -> float:
+    return stats.bytes / stats.duration / (1024 * 1024) if stats.duration > 0 else 0.0
+
+
+_site_lock = threading.Lock()
+_applied_site = None
+
+
+class SiteSession:
+    """
+    Selects the project and site of a provider through chi. chi.set and chi.use_site rebuild the keystone
+    session of the whole process, so the project and site last applied are remembered per process and only
+    re-applied when some session, of this provider or another, selected a different one.
+    """
+    def __init__(self, *, project_name: str):
+        self.project_name = project_name
+
+    def use(self, site: str, select_site=True):
+        global _applied_site
+
+        key = (self.project_name, site if select_site else None)
+
+        with _site_lock:
+            if _applied_site == key:
+                return
+
+            chi.set('project_name', self.project_name)
+            chi.set('project_domain_name', 'default')
+
+            if select_site:
+                chi.use_site(site)
+
+            _applied_site = key
+
 
 class LeaseHelper:
     def __init__(self, *, lease_name: str, logger: logging.Logger):
@@ -11,8 +55,25 @@ class LeaseHelper:
         self.logger = logger
         self.lease = None
 
-    def get_reservation_id(self):
-        return self.lease["reservations"][0]["id"]
+    def get_reservation_id(self, resource_type: str = None, network_name: str = None):
+        reservations = self.lease["reservations"]
+
+        if resource_type:
+            reservations = [r for r in reservations if r.get("resource_type") == resource_type] or reservations
+
+        if network_name:
+            reservations = [r for r in reservations if r.get("network_name") == network_name] or reservations
+
+        return reservations[0]["id"]
+
+    def find_lease(self):
+        try:
+            return chi.lease.get_lease(self.lease_name)
+        except ValueError as ve:
+            if "No leases found for name" not in str(ve):
+                raise ve
+
+        return None
 
     def delete_lease(self):
         try:
@@ -116,14 +177,138 @@ class SshHelper:
     def close_quietly(self):
         if self.ftp_client:
             try:
-                self.ftp_client.close_quietly()
+                self.ftp_client.close()
                 self.ftp_client = None
             except Exception:
                 pass
 
         if self.client:
             try:
-                self.client.close_quietly()
+                self.client.close()
                 self.client = None
             except Exception:
                 pass
+
+    def _exec(self, command: str):
+        self.connect()
+        channel = self.client.get_transport().open_session()
+        channel.exec_command(command)
+        return channel
+
+    @staticmethod
+    def _check_exit_status(channel, command: str):
+        status = channel.recv_exit_status()
+
+        if status != 0:
+            stderr = channel.recv_stderr(64 * 1024).decode('utf-8', errors='replace')
+            raise Exception(f"remote command '{command}' failed: exit_status={status}:{stderr}")
+
+    def stream_upload_directory(self, local_directory_path: str, remote_directory_path: str,
+                                buffer_size=TRANSFER_BUFFER_SIZE) -> int:
+        """
+        Pipes a gzipped tar of local_directory_path into a remote tar over a single ssh channel. At most
+        buffer_size bytes are held in memory and nothing is written to local or remote disk besides the files.
+        Returns the number of bytes sent.
+        """
+        import os
+        import shlex
+        import tarfile
+
+        local_directory_path = local_directory_path.rstrip('/')
+        remote = shlex.quote(remote_directory_path)
+        command = f"mkdir -p {remote} && tar -xzf - -C {remote}"
+        channel = self._exec(command)
+        writer = _ChannelWriter(channel)
+
+        with tarfile.open(fileobj=writer, mode="w|gz", bufsize=buffer_size) as tar:
+            tar.add(local_directory_path, arcname=os.path.basename(local_directory_path))
+
+        channel.shutdown_write()
+        self._check_exit_status(channel, command)
+        return writer.count
+
+    def stream_download_directory(self, local_directory_path: str, remote_directory_path: str,
+                                  buffer_size=TRANSFER_BUFFER_SIZE) -> int:
+        """
+        Extracts a gzipped tar of remote_directory_path, streamed over a single ssh channel, into
+        local_directory_path. Returns the number of bytes received.
+        """
+        import shlex
+        import tarfile
+
+        command = f"tar -czf - {shlex.quote(remote_directory_path)}"
+        channel = self._exec(command)
+        reader = _ChannelReader(channel)
+        extract_args = dict(filter='data') if hasattr(tarfile, 'data_filter') else {}
+
+        with tarfile.open(fileobj=reader, mode="r|gz", bufsize=buffer_size) as tar:
+            tar.extractall(local_directory_path, **extract_args)
+
+        self._check_exit_status(channel, command)
+        return reader.count
+
+
+class _ChannelWriter:
+    def __init__(self, channel):
+        self.channel = channel
+        self.count = 0
+
+    def write(self, data):
+        self.channel.sendall(data)
+        self.count += len(data)
+        return len(data)
+
+
+class _ChannelReader:
+    def __init__(self, channel):
+        self.channel = channel
+        self.count = 0
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = TRANSFER_BUFFER_SIZE
+
+        chunks = []
+        remaining = size
+
+        while remaining > 0:
+            data = self.channel.recv(remaining)
+
+            if not data:
+                break
+
+            chunks.append(data)
+            remaining -= len(data)
+
+        data = b''.join(chunks)
+        self.count += len(data)
+        return data
+
+
+def transfer(node, method: str, *args, retry=3, retry_interval=10) -> TransferStats:
+    """
+    Runs a streaming transfer against node and returns its stats. method is stream_upload_directory or
+    stream_download_directory.
+    """
+    helper = SshHelper(node.mgmt_ip, node.username, get_paramiko_key(private_key_file=node.keyfile))
+    ex = None
+
+    for attempt in range(retry):
+        start = time.time()
+
+        try:
+            count = getattr(helper, method)(*args)
+            stats = TransferStats(node=node.name, bytes=count, duration=time.time() - start)
+            node.logger.info(f"{method}: node={node.name}:bytes={count}:"
+                             f"duration={stats.duration:.1f}s:throughput={throughput(stats):.2f}MB/s")
+            return stats
+        except Exception as e:
+            ex = e
+            node.logger.info(f"{method} fail {e}. Node: {node.name}, tried {attempt + 1}")
+
+            if attempt < retry - 1:
+                tracing.sleep(retry_interval, name='chi:transfer')
+        finally:
+            helper.close_quietly()
+
+    raise Exception(f"{method} failed for node {node.name}: {ex}")
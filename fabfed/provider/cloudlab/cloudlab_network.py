@@ -6,6 +6,7 @@ from fabfed.util.utils import get_logger
 from .cloudlab_constants import *
 from .cloudlab_exceptions import CloudlabException
 from .cloudlab_provider import CloudlabProvider
+from .cloudlab_utils import experiment_poller, manifest_rspec, parse_rspec
 
 logger = get_logger()
 
@@ -20,6 +21,7 @@ class CloudNetwork(Network):
         self.interface = interfaces or []
         self.layer3 = layer3
         self.cluster = cluster
+        self._manifest = None
 
     @property
     def provider(self):
@@ -76,79 +78,84 @@ class CloudNetwork(Network):
         else:
             raise CloudlabException(exitval=exitval, response=response)
 
-    def wait_for_create(self):
-        import time
+        experiment_poller.register(self.name, self._poll_ready)
+
+    def _poll_ready(self):
         import emulab_sslxmlrpc.client.api as api
-        import emulab_sslxmlrpc.xmlrpc as xmlrpc
 
         server = self.provider.rpc_server()
         exp_params = self.provider.experiment_params(self.name)
         exitval, response = api.experimentStatus(server, exp_params).apply()
 
-        for attempt in range(CLOUDLAB_RETRY):
-            exitval, response = api.experimentStatus(server, exp_params).apply()
-
-            # sometimes the response is not what we expect (network glitch). We keep checking status ...
-            if response and hasattr(response, "value"):
-                if exitval:
-                    code = response.value
-
-                    if code == api.GENIRESPONSE_REFUSED or code == api.GENIRESPONSE_NETWORK_ERROR:
-                        logger.debug("Server is offline, waiting for a bit")
-                    elif code == api.GENIRESPONSE_BUSY:
-                        logger.debug("Experiment is busy, waiting for a bit")
-                    elif code == api.GENIRESPONSE_SEARCHFAILED:
-                        raise CloudlabException(message="Experiment is gone", exitval=exitval, response=response)
-                    else:
-                        raise CloudlabException(exitval=exitval, response=response)
+        # sometimes the response is not what we expect (network glitch). We keep checking status ...
+        if response and hasattr(response, "value"):
+            if exitval:
+                code = response.value
+
+                if code == api.GENIRESPONSE_REFUSED or code == api.GENIRESPONSE_NETWORK_ERROR:
+                    logger.debug("Server is offline, waiting for a bit")
+                elif code == api.GENIRESPONSE_BUSY:
+                    logger.debug("Experiment is busy, waiting for a bit")
+                elif code == api.GENIRESPONSE_SEARCHFAILED:
+                    raise CloudlabException(message="Experiment is gone", exitval=exitval, response=response)
                 else:
-                    status = json.loads(response.value)
-                    logger.info(json.dumps(status, indent=2))
-
-                    if status["status"] == "failed":
-                        raise CloudlabException(exitval=exitval, response=response,
-                                                message="Experiment failed to instantiate")
-                    elif status["status"] == "ready":
-                        if "execute_status" not in status:
-                            logger.info("No execute service to wait for!")
-                            break
+                    raise CloudlabException(exitval=exitval, response=response)
+            else:
+                status = json.loads(response.value)
+                logger.info(json.dumps(status, indent=2))
 
-                        total = status["execute_status"]["total"]
-                        finished = status["execute_status"]["finished"]
+                if status["status"] == "failed":
+                    raise CloudlabException(exitval=exitval, response=response,
+                                            message="Experiment failed to instantiate")
+                elif status["status"] == "ready":
+                    if "execute_status" not in status:
+                        logger.info("No execute service to wait for!")
+                        return True, status
 
-                        if total != finished:
-                            logger.info("Still waiting for execute service to finish")
-                            continue
+                    total = status["execute_status"]["total"]
+                    finished = status["execute_status"]["finished"]
 
+                    if total == finished:
                         logger.info("Execute services have finished")
-                        break
+                        return True, status
 
-            if response and hasattr(response, "value"):
-                logger.info(f"Still waiting for experiment to be ready exitval={exitval}:{response.value}")
-            else:
-                logger.warning(f"Still waiting for experiment to be ready exitval={exitval}:{response}")
+                    logger.info("Still waiting for execute service to finish")
 
-            time.sleep(CLOUDLAB_SLEEP_TIME)
+            logger.info(f"Still waiting for experiment {self.name} to be ready exitval={exitval}:{response.value}")
+        else:
+            logger.warning(f"Still waiting for experiment {self.name} to be ready exitval={exitval}:{response}")
 
-        if attempt == CLOUDLAB_RETRY:
-            raise CloudlabException("Please Apply Again. Giving up on waiting for experiment ...")
+        return False, None
 
-        exitval, response = api.experimentManifests(server, exp_params).apply()
+    def manifest(self) -> dict:
+        """
+        The vlan tag and node attributes of the experiment's manifest rspec. See cloudlab_utils.parse_rspec.
+        """
+        if self._manifest is None:
+            import emulab_sslxmlrpc.client.api as api
 
-        if exitval:
-            raise CloudlabException(exitval=exitval, response=response)
+            server = self.provider.rpc_server()
+            exp_params = self.provider.experiment_params(self.name)
+            exitval, response = api.experimentManifests(server, exp_params).apply()
 
-        status = json.loads(response.value)
-        logger.debug(json.dumps(status, indent=2))
-        logger.info(f"STATUS_KEYS={status.keys()}")
+            if exitval:
+                raise CloudlabException(exitval=exitval, response=response)
 
-        import xmltodict
+            status = json.loads(response.value)
+            logger.info(f"STATUS_KEYS={status.keys()}")
+            self._manifest = parse_rspec(manifest_rspec(status))
+            logger.info(f"RSPEC: {json.dumps(self._manifest, indent=2)}")
+
+        return self._manifest
+
+    def wait_for_create(self):
+        if self.name not in experiment_poller:
+            experiment_poller.register(self.name, self._poll_ready)
 
-        data_dict = xmltodict.parse(next(iter(status.values())))
-        logger.info(f"RSPEC: {json.dumps(data_dict['rspec'], indent=2)}")
-        link = data_dict['rspec']['link']
+        experiment_poller.wait(self.name)
+        manifest = self.manifest()
 
-        temp = dict(id=self.label, vlan=link['@vlantag'])
+        temp = dict(id=self.label, vlan=manifest['vlantag'])
         temp.update(self.stitch_info.stitch_port['peer'])
         temp['provider'] = self.stitch_info.stitch_port['provider']
         self.interface = [temp]
@@ -156,37 +163,42 @@ class CloudNetwork(Network):
         if not [n for n in self.provider.nodes if n.net == self]:
             return
 
-        all_nodes = data_dict['rspec']['node']
-        nodes = [n for n in all_nodes if 'stitch' not in ['@component_manager_id']]
-        n = nodes[0]
-        self.stich_node_ip = n['interface']['ip']['@address']
-        self.stich_site = n['jacks:site']['@id']
-        nodes = [n for n in all_nodes if 'stitch' not in n['@component_manager_id']]
-        self.site = nodes[0]['jacks:site']['@id']
+        all_nodes = manifest['nodes']
+        n = all_nodes[0]
+        self.stich_node_ip = n['ips'][0]['address'] if n['ips'] else None
+        self.stich_site = n['site']
+        nodes = [n for n in all_nodes if 'stitch' not in n['component_manager_id']]
+        self.site = nodes[0]['site']
 
-    def delete(self):
+    def _poll_gone(self):
         import emulab_sslxmlrpc.client.api as api
         import emulab_sslxmlrpc.xmlrpc as xmlrpc
-        import time
 
         server = self.provider.rpc_server()
         exp_params = self.provider.experiment_params(self.name)
         exitval, response = api.experimentStatus(server, exp_params).apply()
 
         if exitval == xmlrpc.RESPONSE_SEARCHFAILED:
-            return
+            return True, None
 
-        exitval, response = api.terminateExperiment(server, exp_params).apply()
+        logger.info(f"Still waiting for experiment {self.name} to be terminated")
+        return False, None
 
-        if exitval == xmlrpc.RESPONSE_SUCCESS:
-            while True:
-                exitval, response = api.experimentStatus(server, exp_params).apply()
+    def delete(self):
+        import emulab_sslxmlrpc.client.api as api
+        import emulab_sslxmlrpc.xmlrpc as xmlrpc
 
-                if exitval == xmlrpc.RESPONSE_SEARCHFAILED:
-                    break
+        server = self.provider.rpc_server()
+        exp_params = self.provider.experiment_params(self.name)
+        exitval, response = api.experimentStatus(server, exp_params).apply()
 
-                logger.info("Still waiting for experiment to be terminated")
-                time.sleep(CLOUDLAB_SLEEP_TIME)
+        if exitval == xmlrpc.RESPONSE_SEARCHFAILED:
+            return
 
-        if exitval != xmlrpc.RESPONSE_SEARCHFAILED:
+        exitval, response = api.terminateExperiment(server, exp_params).apply()
+
+        if exitval != xmlrpc.RESPONSE_SUCCESS:
             raise CloudlabException(exitval=exitval, response=response)
+
+        experiment_poller.register(self.name, self._poll_gone)
+        experiment_poller.wait(self.name)
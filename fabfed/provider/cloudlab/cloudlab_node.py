@@ -52,29 +52,16 @@ class CloudlabNode(Node):
 
         self.mgmt_ip = node_info[IPV4]
         self.host = node_info[IPV4]
-        exitval, response = api.experimentManifests(server, exp_params).apply()
+        manifest = self._net.manifest()
+        nodes = [n for n in manifest['nodes'] if self._net.cluster == n['component_manager_id']]
+        ip = nodes[idx]['ips'][0]
 
-        if exitval:
-            raise CloudlabException(exitval=exitval, response=response)
-
-        status = json.loads(response.value)
-
-        logger.debug(json.dumps(status, indent=2))
-
-        import xmltodict
-
-        data_dict = xmltodict.parse(list(status.values())[0])
-        logger.debug(f"RSPEC: {json.dumps(data_dict['rspec'], indent=2)}")
-        nodes = data_dict['rspec']['node']
-        nodes = [n for n in nodes if self._net.cluster == n['@component_manager_id']]
-        n = nodes[idx]
-
-        if n['interface']['ip']['@type'] == 'ipv4':
-            self.dataplane_ipv4 = n['interface']['ip']['@address']
+        if ip['type'] == 'ipv4':
+            self.dataplane_ipv4 = ip['address']
         else:
-            self.dataplane_ipv6 = n['interface']['ip']['@address']
+            self.dataplane_ipv6 = ip['address']
 
-        self.site = n['jacks:site']['@id']
+        self.site = nodes[idx]['site']
 
     def delete(self):
         pass
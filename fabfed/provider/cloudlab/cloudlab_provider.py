@@ -1,7 +1,9 @@
+import threading
 from typing import List
 
 from fabfed.exceptions import ResourceTypeNotSupported, ProviderException
 from fabfed.provider.api.provider import Provider
+from fabfed.util import cassette
 from fabfed.util.constants import Constants
 from fabfed.util.utils import get_logger
 from .cloudlab_constants import *
@@ -16,6 +18,8 @@ class CloudlabProvider(Provider):
         self.supported_resources = [Constants.RES_TYPE_NETWORK, Constants.RES_TYPE_NODE]
         self._handled_modify = False
         self._stitch_info_map = dict()
+        self._rpc_server = None
+        self._rpc_server_lock = threading.Lock()
 
     def setup_environment(self):
         for attr in CLOUDLAB_CONF_ATTRS:
@@ -68,16 +72,26 @@ class CloudlabProvider(Provider):
         return exp_params
 
     def rpc_server(self):
-        server_config = {
-            "debug": 0,
-            "impotent": 0,
-            "verify": 0,
-            "certificate": self.cert
-        }
-
-        import emulab_sslxmlrpc.xmlrpc as xmlrpc
-
-        return xmlrpc.EmulabXMLRPC(server_config)
+        """
+        The provider's xmlrpc server. It is built once and shared by the provider's network and nodes, also when
+        they run in other threads. emulab_sslxmlrpc takes no transport, so the connections it opens per call are
+        not kept alive.
+        """
+        with self._rpc_server_lock:
+            if self._rpc_server is None:
+                server_config = {
+                    "debug": 0,
+                    "impotent": 0,
+                    "verify": 0,
+                    "certificate": self.cert
+                }
+
+                import emulab_sslxmlrpc.xmlrpc as xmlrpc
+
+                self._rpc_server = cassette.wrap(f"cloudlab:{self.label}",
+                                                 lambda: xmlrpc.EmulabXMLRPC(server_config))
+
+        return self._rpc_server
 
     def do_validate_resource(self, *, resource: dict):
         label = resource.get(Constants.LABEL)
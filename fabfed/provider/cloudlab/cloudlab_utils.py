@@ -0,0 +1,130 @@
+import threading
+from typing import Callable, Dict, Tuple
+
+from fabfed.util import tracing
+from fabfed.util.utils import get_logger
+from .cloudlab_constants import *
+from .cloudlab_exceptions import CloudlabException
+
+logger = get_logger()
+
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit('}', 1)[-1]
+
+
+def parse_rspec(rspec: str) -> dict:
+    """
+    Extracts the vlan tag of the first link and, per node, its component manager, jacks site and interface ips
+    from a manifest rspec. The rspec is parsed incrementally and node elements are dropped once read, so only
+    the attributes needed are kept.
+    """
+    import io
+    from xml.etree.ElementTree import iterparse
+
+    vlantag = None
+    nodes = []
+    node = None
+    depth = 0
+
+    for event, elem in iterparse(io.BytesIO(rspec.encode()), events=('start', 'end')):
+        name = _local_name(elem.tag)
+
+        if event == 'start':
+            depth += 1
+
+            if depth == 2 and name == 'link' and vlantag is None:
+                vlantag = elem.get('vlantag')
+            elif depth == 2 and name == NODE:
+                node = dict(component_manager_id=elem.get('component_manager_id', ''), site=None, ips=[])
+            elif node is not None and depth == 3 and name == 'site':
+                if 'jacks' in elem.tag or '}' not in elem.tag:
+                    node['site'] = elem.get('id')
+            elif node is not None and name == 'ip':
+                node['ips'].append(dict(address=elem.get('address'), type=elem.get('type')))
+
+            continue
+
+        depth -= 1
+
+        if depth == 1 and name == NODE:
+            nodes.append(node)
+            node = None
+            elem.clear()
+
+    return dict(vlantag=vlantag, nodes=nodes)
+
+
+def manifest_rspec(status: dict) -> str:
+    return next(iter(status.values()))
+
+
+class ExperimentPoller:
+    """
+    Polls the status of several experiments in one loop so they progress together. Each experiment registers
+    a poll function returning (done, result). Waiting on one experiment keeps polling the others and keeps
+    their results, so waiting on them afterwards returns at once. A poll that raises ends the wait on its own
+    experiment only.
+    """
+    def __init__(self, *, sleep_time=CLOUDLAB_SLEEP_TIME, retry=CLOUDLAB_RETRY):
+        self.sleep_time = sleep_time
+        self.retry = retry
+        self._pending: Dict[str, Callable[[], Tuple[bool, object]]] = {}
+        self._results: Dict[str, Tuple[bool, object]] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, poll: Callable[[], Tuple[bool, object]]):
+        with self._lock:
+            self._results.pop(name, None)
+            self._pending[name] = poll
+
+    def __contains__(self, name: str):
+        return name in self._pending
+
+    def _poll_all(self):
+        for name, poll in list(self._pending.items()):
+            try:
+                with tracing.span('cloudlab:poll', experiment=name):
+                    done, result = poll()
+            except Exception as e:
+                logger.warning(f"experiment {name}: {e}")
+                self._results[name] = (False, e)
+                del self._pending[name]
+                continue
+
+            if done:
+                self._results[name] = (True, result)
+                del self._pending[name]
+
+    def wait(self, name: str):
+        # The lock covers the sweep and the bookkeeping but not the sleep, so other threads can register and
+        # wait on their own experiments in between.
+        for attempt in range(self.retry):
+            with self._lock:
+                if name in self._pending:
+                    self._poll_all()
+
+                if name not in self._pending:
+                    if name not in self._results:
+                        raise CloudlabException(message=f"Not polling experiment {name}")
+
+                    ok, result = self._results.pop(name)
+                    break
+
+                pending = list(self._pending)
+
+            logger.info(f"Still waiting on experiments {pending}:attempt={attempt}")
+            tracing.sleep(self.sleep_time, name='cloudlab:experiments', pending=len(pending))
+        else:
+            with self._lock:
+                self._pending.pop(name, None)
+
+            raise CloudlabException(message=f"Please Apply Again. Giving up on waiting for experiment {name}")
+
+        if not ok:
+            raise result
+
+        return result
+
+
+experiment_poller = ExperimentPoller()
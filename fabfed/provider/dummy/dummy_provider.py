@@ -1,6 +1,6 @@
 import logging
 
-from fabfed.model import Service, Node, SSHNode
+from fabfed.model import Service, Node, SSHNode, Network
 from fabfed.provider.api.provider import Provider
 from fabfed.util.constants import Constants
 
@@ -15,6 +15,10 @@ see tests/examples/dummy-service-dependency for en example with an external depe
 This example also show how to hide attributes by using underscores and how to expose interesting attributes
 to other resources by extracting it and using yaml python supported types.
 
+The provider creates and deletes resources instantly unless its config has a simulate section. It then injects
+latencies, failures, pending states and read delays per resource type. See Simulator in dummy_simulator.py and
+tests/examples/dummy-simulation.
+
 Useful Commands:
 see tests/examples/dummy-service  # for a simple example
 see tests/examples/dummy-service/config.fab 
@@ -62,6 +66,19 @@ class DummyNode(Node, SSHNode):
     def get_dataplane_address(self, network=None, interface=None, af=None):
         return "192.168.1.10"
 
+
+class DummyNetwork(Network):
+    def __init__(self, *, label, name: str, site, logger: logging.Logger):
+        super().__init__(label=label, name=name, site=site)
+        self.logger = logger
+
+    def create(self):
+        self.logger.info(f" Dummy Network {self.name} created.")
+
+    def delete(self):
+        self.logger.info(f" Dummy Network {self.name} deleted")
+
+
 class DummyService(Service):
     def __init__(self, *, label, name: str, image, x=None, logger: logging.Logger):
         super().__init__(label=label, name=name)
@@ -85,6 +102,7 @@ class DummyService(Service):
         self.logger.info(f" Dummy Service {self.name} deleted")
 
 from fabfed.util.utils import get_logger
+from .dummy_simulator import Simulator, STATUS_READY
 
 logger: logging.Logger = get_logger()
 
@@ -96,13 +114,14 @@ class DummyProvider(Provider):
 
     def __init__(self, *, type, label, name, config: dict):
         super().__init__(type=type, label=label, name=name, logger=logger, config=config)
+        self.simulator = Simulator(config)
 
     def _validate_resource(self, resource: dict):
         assert resource.get(Constants.LABEL)
         assert resource.get(Constants.RES_TYPE) in Constants.RES_SUPPORTED_TYPES
         assert resource.get(Constants.RES_NAME_PREFIX)
         assert resource.get(Constants.RES_COUNT, 1)
-        assert resource.get(Constants.RES_IMAGE)
+        assert resource.get(Constants.RES_TYPE) == Constants.RES_TYPE_NETWORK or resource.get(Constants.RES_IMAGE)
 
         label = resource.get(Constants.LABEL)
         self.logger.info(f"Validated:OK Resource={label} using {self.label}")
@@ -122,6 +141,7 @@ class DummyProvider(Provider):
         label = resource.get(Constants.LABEL)
         self.logger.info(f"Adding resource={label} using {self.label}")
         self._validate_resource(resource)
+        self.simulator.operation('add', resource.get(Constants.RES_TYPE), label)
         image = resource.get(Constants.RES_IMAGE)
         exposed_attribute_x = resource.get("exposed_attribute_x")
 
@@ -156,6 +176,13 @@ class DummyProvider(Provider):
                 self.nodes.append(node)
                 self.resource_listener.on_added(source=self, provider=self, resource=node)
 
+        elif rtype == Constants.RES_TYPE_NETWORK.lower():
+            name_prefix = resource.get(Constants.RES_NAME_PREFIX)
+            site = resource.get(Constants.RES_SITE)
+            net = DummyNetwork(label=label, name=f"{self.name}-{name_prefix}", site=site, logger=self.logger)
+            self._networks.append(net)
+            self.resource_listener.on_added(source=self, provider=self, resource=net)
+
         elif rtype == Constants.RES_TYPE_SERVICE.lower():
             service_count = resource.get(Constants.RES_COUNT, 1)
             service_name_prefix = resource.get(Constants.RES_NAME_PREFIX)
@@ -178,19 +205,41 @@ class DummyProvider(Provider):
 
         rtype = resource.get(Constants.RES_TYPE)
 
-        if rtype == Constants.RES_TYPE_NODE.lower():
-            for node in self.nodes:
-                node.create()
-                self.resource_listener.on_created(source=self, provider=self, resource=node)
-        elif rtype == Constants.RES_TYPE_NETWORK.lower():
-            for net in self.networks:
-                net.create()
-                self.resource_listener.on_created(source=self, provider=self, resource=net)
-        elif rtype == Constants.RES_TYPE_SERVICE.lower():
-            temp = [service for service in self.services if service.label == label]
-            for service in temp:
-                service.create()
-                self.resource_listener.on_created(source=self, provider=self, resource=service)
+        temp = [r for r in self.resources if r.label == label]
+
+        for r in temp:
+            self.simulator.create(rtype, r.name)
+
+        # Services are not waited on. Nodes and networks are created once they are ready. See do_wait_for_create
+        if rtype == Constants.RES_TYPE_SERVICE.lower():
+            self._wait_and_create(rtype, temp)
+        elif not self.simulator.enabled:
+            self._created(temp)
+
+    def do_wait_for_create_resource(self, *, resource: dict):
+        label = resource.get(Constants.LABEL)
+        rtype = resource.get(Constants.RES_TYPE)
+
+        if rtype == Constants.RES_TYPE_SERVICE.lower() or not self.simulator.enabled:
+            return
+
+        created = self.creation_details[label]['resources']
+        self._wait_and_create(rtype, [r for r in self.resources if r.label == label and r.name not in created])
+
+    def _wait_and_create(self, rtype: str, resources: list):
+        statuses = self.simulator.wait(rtype, [r.name for r in resources])
+        self._created([r for r in resources if statuses[r.name] == STATUS_READY])
+        not_ready = {name: status for name, status in statuses.items() if status != STATUS_READY}
+
+        if not_ready:
+            from fabfed.exceptions import ProviderException
+
+            raise ProviderException(f"Resources not ready using {self.label}:{not_ready}")
+
+    def _created(self, resources: list):
+        for r in resources:
+            r.create()
+            self.resource_listener.on_created(source=self, provider=self, resource=r)
 
     def do_delete_resource(self, *, resource: dict):
         self.logger.info(f"Deleting resource={resource} using {self.label}")
@@ -204,15 +253,20 @@ class DummyProvider(Provider):
             for i in range(node_count):
                 name = f"{name_prefix}{i}"
                 node = DummyNode(label=label, name=name, site=None, image=None, flavor=None, logger=self.logger)
+                self.simulator.delete(rtype, name)
                 node.delete()
                 self.resource_listener.on_deleted(source=self, provider=self, resource=node)
         elif rtype == Constants.RES_TYPE_NETWORK.lower():
-            pass
+            net = DummyNetwork(label=label, name=f"{self.name}-{name_prefix}", site=None, logger=self.logger)
+            self.simulator.delete(rtype, net.name)
+            net.delete()
+            self.resource_listener.on_deleted(source=self, provider=self, resource=net)
         elif rtype == Constants.RES_TYPE_SERVICE.lower():
             service_count = resource.get(Constants.RES_COUNT, 1)
             image = resource.get(Constants.RES_IMAGE)
             for n in range(0, service_count):
                 service_name = f"{self.name}-{name_prefix}-{n}"
                 service = DummyService(label=label, name=service_name, image=image, logger=self.logger)
+                self.simulator.delete(rtype, service_name)
                 service.delete()
                 self.resource_listener.on_deleted(source=self, provider=self, resource=service)
@@ -0,0 +1,206 @@
+import random
+import threading
+from typing import Callable, Dict, List, Union
+
+from fabfed.exceptions import FabfedException, ProviderException
+from fabfed.util import tracing
+from fabfed.util.distribution import Distribution
+from fabfed.util.utils import get_logger
+
+logger = get_logger()
+
+SIMULATE = 'simulate'
+SEED = 'seed'
+DEFAULT = 'default'
+
+LATENCY = 'latency'
+FAILURE = 'failure'
+PENDING = 'pending'
+READ_DELAY = 'read_delay'
+PROFILE_ATTRS = [LATENCY, FAILURE, PENDING, READ_DELAY]
+
+OPERATIONS = ['add', 'create', 'read', 'wait', 'delete']
+
+STATUS_PENDING = 'PENDING'
+STATUS_READY = 'READY'
+STATUS_FAILED = 'FAILED'
+
+DEFAULT_POLL_INITIAL_INTERVAL = 1
+DEFAULT_POLL_MAX_INTERVAL = 10
+DEFAULT_POLL_BACKOFF = 1.5
+DEFAULT_WAIT_TIMEOUT = 600
+
+
+class ResourceProfile:
+    """
+    How resources of one type behave. All attributes are optional:
+
+        latency:    seconds each operation takes, per operation (add, create, read, delete)
+        failure:    probability each operation fails, per operation (add, create, wait, delete).
+                    A failed wait means the resource ends up in a failed state.
+        pending:    seconds a created resource stays pending before it is ready
+        read_delay: seconds before a created resource shows up when reading its status (eventual consistency)
+    """
+    def __init__(self, config: dict):
+        config = config or {}
+
+        for key in config:
+            if key not in PROFILE_ATTRS:
+                raise ProviderException(f"{key} not in {PROFILE_ATTRS}")
+
+        try:
+            self.latency = {op: Distribution(v) for op, v in (config.get(LATENCY) or {}).items()}
+            self.pending = Distribution(config.get(PENDING))
+            self.read_delay = Distribution(config.get(READ_DELAY))
+        except FabfedException as e:
+            raise ProviderException(str(e))
+
+        self.failure = {op: float(v) for op, v in (config.get(FAILURE) or {}).items()}
+
+        for op in list(self.latency) + list(self.failure):
+            if op not in OPERATIONS:
+                raise ProviderException(f"operation {op} not in {OPERATIONS}")
+
+
+class SimulatedResource:
+    def __init__(self, *, created: float, pending: float, read_delay: float, fails: bool):
+        self.visible_at = created + read_delay
+        self.ready_at = created + pending
+        self.fails = fails
+
+
+class Simulator:
+    """
+    Injects latencies, failures, pending states and read delays into the dummy provider using the simulate
+    section of its config:
+
+        seed: 42
+        wait_timeout: 60
+        simulate:
+          node:
+            latency: { create: { distribution: uniform, min: 1, max: 3 }, delete: 0.5 }
+            failure: { create: 0.05 }
+            pending: { distribution: normal, mean: 20, stddev: 5 }
+            read_delay: 2
+          default:
+            latency: { create: 0.2 }
+
+    Resource types without a section use the default section. Every operation on a resource draws from a random
+    generator seeded by the seed, the resource name and the operation, so a seeded run is reproducible
+    regardless of the order or the threads in which resources are handled. Without a seed, one is drawn and
+    logged.
+
+    Waiting polls the status of the resources using the same backoff policy as the sense provider, configured
+    with poll_initial_interval, poll_max_interval, poll_backoff and wait_timeout.
+    """
+    def __init__(self, config: dict, *, clock: Callable[[], float] = tracing.monotonic,
+                 sleep: Callable[[float], None] = None):
+        config = config or {}
+        simulate = config.get(SIMULATE) or {}
+
+        self.enabled = bool(simulate)
+        self.seed = config.get(SEED)
+
+        if self.seed is None:
+            self.seed = random.randrange(2 ** 32)
+
+            if self.enabled:
+                logger.info(f"Simulating with seed={self.seed}")
+
+        self.profiles = {rtype: ResourceProfile(profile) for rtype, profile in simulate.items()}
+        self.clock = clock
+        self.sleep = sleep or self._sleep
+        self.resources: Dict[str, SimulatedResource] = {}
+        self.reads: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        from fabfed.util.waiter import WaitPolicy
+
+        self.policy = WaitPolicy(initial_interval=float(config.get('poll_initial_interval',
+                                                                   DEFAULT_POLL_INITIAL_INTERVAL)),
+                                 max_interval=float(config.get('poll_max_interval', DEFAULT_POLL_MAX_INTERVAL)),
+                                 backoff=float(config.get('poll_backoff', DEFAULT_POLL_BACKOFF)),
+                                 timeout=float(config.get('wait_timeout', DEFAULT_WAIT_TIMEOUT)),
+                                 cancel_ready_settle=0)
+
+    @staticmethod
+    def _sleep(seconds: float):
+        tracing.sleep(seconds, name='dummy:poll')
+
+    def profile(self, rtype: str) -> ResourceProfile:
+        return self.profiles.get(rtype) or self.profiles.get(DEFAULT) or ResourceProfile({})
+
+    def rng(self, name: str, operation: str) -> random.Random:
+        return random.Random(f"{self.seed}:{name}:{operation}")
+
+    def operation(self, operation: str, rtype: str, name: str):
+        """
+        Takes the latency of operation on the named resource and raises a ProviderException if it fails.
+        """
+        if not self.enabled:
+            return
+
+        profile = self.profile(rtype)
+        rng = self.rng(name, operation)
+        latency = profile.latency[operation].sample(rng) if operation in profile.latency else 0
+
+        if latency:
+            # The latency stands for a remote call, so it is traced as one rather than as a poll sleep.
+            tracing.sleep(latency, name=f"dummy:{operation}", cat=tracing.REMOTE, resource=name)
+
+        if rng.random() < profile.failure.get(operation, 0):
+            raise ProviderException(f"Simulated failure of {operation} of {name}")
+
+    def create(self, rtype: str, name: str):
+        self.operation('create', rtype, name)
+
+        if not self.enabled:
+            return
+
+        profile = self.profile(rtype)
+        rng = self.rng(name, 'wait')
+
+        with self._lock:
+            self.resources[name] = SimulatedResource(created=self.clock(),
+                                                     pending=profile.pending.sample(rng),
+                                                     read_delay=profile.read_delay.sample(rng),
+                                                     fails=rng.random() < profile.failure.get('wait', 0))
+
+    def status(self, rtype: str, name: str) -> Union[str, None]:
+        """
+        Status of the named resource or None while it is not visible yet.
+        """
+        with self._lock:
+            resource = self.resources.get(name)
+            reads = self.reads[name] = self.reads.get(name, 0) + 1
+
+        self.operation('read', rtype, f"{name}:{reads}")
+
+        now = self.clock()
+
+        if resource is None or now < resource.visible_at:
+            return None
+
+        if now < resource.ready_at:
+            return STATUS_PENDING
+
+        return STATUS_FAILED if resource.fails else STATUS_READY
+
+    def wait(self, rtype: str, names: List[str]) -> Dict[str, str]:
+        """
+        Polls the named resources until each is ready or failed or the wait times out and returns their last
+        status.
+        """
+        if not self.enabled or not names:
+            return {name: STATUS_READY for name in names}
+
+        from fabfed.util.waiter import wait_for_statuses
+
+        return wait_for_statuses(lambda name: self.status(rtype, name), names=names, targets=[STATUS_READY],
+                                 failures=[STATUS_FAILED], policy=self.policy, sleep=self.sleep, clock=self.clock)
+
+    def delete(self, rtype: str, name: str):
+        self.operation('delete', rtype, name)
+
+        with self._lock:
+            self.resources.pop(name, None)
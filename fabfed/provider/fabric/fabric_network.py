@@ -1,4 +1,3 @@
-from ipaddress import IPv4Address
 from typing import List, Dict, Union
 
 from fabrictestbed_extensions.fablib.network_service import NetworkService
@@ -7,6 +6,7 @@ from fabrictestbed_extensions.fablib.slice import Slice
 from fabfed.model import Network
 from fabfed.policy.policy_helper import get_stitch_port_for_provider
 from fabfed.util.constants import Constants
+from fabfed.util.ip_pool import IPPool
 from fabfed.util.utils import get_logger
 from .fabric_provider import FabricProvider
 from ...util.config_models import Config
@@ -57,21 +57,19 @@ class FabricNetwork(Network):
     def delegate(self):
         return self._delegate
 
-    def available_ips(self) -> list:
-        available_ips = []
-
+    def available_ips(self) -> Union[IPPool, list]:
+        """
+        Pool of the addresses of the dhcp range of the layer3 config. Without a range there is nothing to hand out
+        and, as before, an empty list is returned.
+        """
         if self.layer3:
             ip_start = self.layer3.attributes.get(Constants.RES_LAYER3_DHCP_START)
             ip_end = self.layer3.attributes.get(Constants.RES_LAYER3_DHCP_END)
 
             if ip_start and ip_end:
-                pool_start = int(IPv4Address(ip_start))
-                pool_end = int(IPv4Address(ip_end))
-
-                for ip_int in range(pool_start + 1, pool_end + 1):
-                    available_ips.append(IPv4Address(ip_int))
+                return IPPool.from_layer3(ip_start, ip_end)
 
-        return available_ips
+        return []
 
     def get_reservation_id(self):
         self._delegate.get_reservation_id()
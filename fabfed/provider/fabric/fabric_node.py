@@ -8,6 +8,8 @@ from .fabric_constants import *
 
 logger = get_logger()
 
+EXIT_STATUS_MARKER = "FABFED_EXIT_STATUS="
+
 
 class FabricNode(Node):
     def __init__(self, *, label, delegate: Delegate, nic_model: str, network_label: str):
@@ -157,7 +159,24 @@ class FabricNode(Node):
         self._delegate.download_directory(local_directory_path, remote_directory_path, retry, retry_interval)
 
     def execute(self, command, retry=3, retry_interval=10):
-        self._delegate.execute(command, retry, retry_interval)
+        return self._delegate.execute(command, retry, retry_interval)
+
+    def execute_with_status(self, command, retry=3, retry_interval=10):
+        """
+        Returns stdout, stderr and the exit status of command. fablib does not report the exit status, so command
+        runs unchanged in its own shell and the status of that shell is echoed after it and taken off stdout.
+        The status is None if it did not come back.
+        """
+        import shlex
+
+        wrapped = f"bash -c {shlex.quote(command)}; echo {EXIT_STATUS_MARKER}$?"
+        stdout, stderr = self._delegate.execute(wrapped, retry, retry_interval)
+        output, marker, status = stdout.rpartition(EXIT_STATUS_MARKER)
+
+        if not marker or not status.strip().isdigit():
+            return stdout, stderr, None
+
+        return output, stderr, int(status.strip())
 
     def add_route(self, subnet, gateway):
         self._delegate.ip_route_add(subnet=subnet, gateway=gateway)
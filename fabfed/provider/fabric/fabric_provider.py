@@ -88,7 +88,7 @@ class FabricProvider(Provider):
         if not self.slice_init:
             self.logger.info(f"Initializing slice {self.name}")
 
-            import time
+            from fabfed.util import tracing
             from fabfed.util.utils import get_log_level, get_log_location
 
             location = get_log_location()
@@ -120,7 +120,7 @@ class FabricProvider(Provider):
                         raise e
 
                     self.logger.info(f"Initializing slice {self.name}. Going to sleep. Will retry ...{e}")
-                time.sleep(2)
+                tracing.sleep(2, name='fabric:init_slice')
 
             self.logger.info(f"Initialized slice {self.name}")
             self.slice_init = True
@@ -8,6 +8,8 @@ from .fabric_node import FabricNode, NodeBuilder
 from .fabric_provider import FabricProvider
 from ...util.constants import Constants
 from .fabric_constants import *
+from .fabric_slice_helper import SliceSnapshot
+from fabfed.util import tracing
 
 
 # noinspection PyUnresolvedReferences
@@ -24,6 +26,7 @@ class FabricSlice:
         from fabrictestbed_extensions.fablib.slice import Slice
 
         self.slice_object: Union[Slice, None] = None
+        self.snapshot = SliceSnapshot(name=self.provider.name)
         self.retry = 10
         self.existing_nodes = []
         self.existing_networks = []
@@ -35,20 +38,24 @@ class FabricSlice:
         self.slice_object = fabric_slice_helper.init_slice(self.provider.name, destroy_phase)
 
         if self.slice_object and self.slice_object.get_state() == "StableOK":
-            self.slice_created = self.slice_object.get_state() == "StableOK"
-            self.existing_nodes = [node.get_name() for node in self.slice_object.get_nodes()]
-            self.existing_networks = []
+            self.snapshot.load(self.slice_object)
+            self.slice_created = True
+            self.existing_nodes = self.snapshot.node_names()
+            self.existing_networks = self._list_existing_networks()
 
-            for net in self.slice_object.get_networks():
-                net_name = net.get_name()
+    def _list_existing_networks(self):
+        existing_networks = []
 
-                if "_aux" in net_name or FABRIC_IPV4_NET_NAME in net_name or FABRIC_IPV6_NET_NAME in net_name:
-                    continue
+        for net_name in self.snapshot.network_names():
+            if "_aux" in net_name or FABRIC_IPV4_NET_NAME in net_name or FABRIC_IPV6_NET_NAME in net_name:
+                continue
 
-                if FABNET_IPV4_PREFIX in net_name or FABNET_IPV6_PREFIX in net_name:
-                    continue
+            if FABNET_IPV4_PREFIX in net_name or FABNET_IPV6_PREFIX in net_name:
+                continue
 
-                self.existing_networks.append(net_name)
+            existing_networks.append(net_name)
+
+        return existing_networks
 
     @property
     def name(self) -> str:
@@ -110,7 +117,7 @@ class FabricSlice:
         net_name = self.provider.resource_name(resource)
 
         if net_name in self.existing_networks:
-            delegate = self.slice_object.get_network(net_name)
+            delegate = self.snapshot.get_network(net_name)
             assert delegate is not None, "expected to find network {net_name} in slice {self.name}"
             layer3 = resource.get(Constants.RES_LAYER3)
             peer_layer3 = resource.get(Constants.RES_PEER_LAYER3)
@@ -140,7 +147,7 @@ class FabricSlice:
             if name in self.existing_nodes:
                 from fabrictestbed_extensions.fablib.node import Node as NodeDelegate
 
-                delegate: NodeDelegate = self.slice_object.get_node(name)
+                delegate: NodeDelegate = self.snapshot.get_node(name)
                 assert delegate is not None, "expected to find node {name} in slice {self.name}"
                 network_label = self.provider.retrieve_attribute_from_saved_state(resource, name, 'network_label')
                 dataplane_ipv4 = self.provider.retrieve_attribute_from_saved_state(resource, name, 'dataplane_ipv4')
@@ -289,13 +296,11 @@ class FabricSlice:
             raise Exception("Unknown resource ....")
 
     def _reload_nodes(self):
-        from fabrictestbed_extensions.fablib.fablib import fablib
-
         temp = []
-        self.slice_object = fablib.get_slice(name=self.provider.name)
+        self.slice_object = self.snapshot.get_slice()
 
         for node in self.nodes:
-            delegate = self.slice_object.get_node(node.name)
+            delegate = self.snapshot.get_node(node.name)
             n = FabricNode(label=node.label, delegate=delegate,
                            nic_model=node.nic_model, network_label=node.network_label)
             n.set_network_label(node.network_label)
@@ -306,14 +311,12 @@ class FabricSlice:
         self.provider._nodes = temp
 
     def _reload_networks(self):
-        from fabrictestbed_extensions.fablib.fablib import fablib
-
-        self.slice_object = fablib.get_slice(name=self.provider.name)
+        self.slice_object = self.snapshot.get_slice()
 
         temp = []
 
         for net in self.provider.networks:
-            delegate = self.slice_object.get_network(net.name)
+            delegate = self.snapshot.get_network(net.name)
             fabric_network = FabricNetwork(label=net.label,
                                            delegate=delegate,
                                            layer3=net.layer3,
@@ -328,34 +331,28 @@ class FabricSlice:
         if len(self.nodes) == 0:
             return
 
-        for attempt in range(self.retry):
-            mngmt_ips = []
-            from fabrictestbed_extensions.fablib.fablib import fablib
-
-            self.slice_object = fablib.get_slice(name=self.provider.name)
-
-            for node in self.nodes:
-                delegate = self.slice_object.get_node(node.name)
-                mgmt_ip = delegate.get_management_ip()
+        names = [node.name for node in self.nodes]
 
-                if mgmt_ip:
-                    mngmt_ips.append(mgmt_ip)
+        for attempt in range(self.retry):
+            missing = self.snapshot.missing_management_ips(names)
 
-            if len(self.nodes) == len(mngmt_ips):
+            if not missing:
+                mngmt_ips = [self.snapshot.get_management_ip(name) for name in names]
                 self.logger.info(f"Got All management ips for slice {self.provider.label}:{mngmt_ips}")
                 break
 
-            if attempt == self.retry:
+            if attempt == self.retry - 1:
                 self.logger.warning(f"Giving up on checking node management ips ...slice "
-                                    f"{self.provider.label} {self.nodes}:{mngmt_ips}:")
+                                    f"{self.provider.label} missing={missing}")
                 break
 
-            import time
-
             self.logger.info(
                 f"Going to sleep. Will try checking node management ips ... slice {self.provider.label}")
 
-            time.sleep(2)
+            tracing.sleep(2, name='fabric:management_ips')
+            self.snapshot.refresh()
+
+        self.slice_object = self.snapshot.get_slice()
 
     def _do_handle_node_networking(self):
         from fabrictestbed_extensions.fablib.fablib import fablib
@@ -366,7 +363,7 @@ class FabricSlice:
         for network in self.networks:
             from ipaddress import IPv4Network
 
-            available_ips: list = network.available_ips()
+            available_ips = network.available_ips()
 
             if available_ips and network.subnet:
                 net_name = network.name
@@ -374,11 +371,11 @@ class FabricSlice:
                 temp = [n for n in self.nodes if n.network_label == network.label]
 
                 for node in temp:
-                    if node.used_dataplane_ipv4() and node.used_dataplane_ipv4() in available_ips:
-                        available_ips.remove(node.used_dataplane_ipv4())
+                    if node.used_dataplane_ipv4():
+                        available_ips.reserve(node.used_dataplane_ipv4())
 
                 for node in temp:
-                    node_addr = node.used_dataplane_ipv4() if node.used_dataplane_ipv4() else available_ips.pop(0)
+                    node_addr = node.used_dataplane_ipv4() if node.used_dataplane_ipv4() else available_ips.allocate()
                     fabric_slice_helper.add_ip_address_to_network(self.slice_object,
                                                                   node, net_name, node_addr, subnet, self.retry)
                     node.set_used_dataplane_ipv4(node_addr)
@@ -400,7 +397,8 @@ class FabricSlice:
 
     def _handle_node_networking(self):
         try:
-            self._do_handle_node_networking()
+            with tracing.span('fabric:node_networking', cat=tracing.POST_CONFIG, slice=self.name):
+                self._do_handle_node_networking()
         except Exception as e:
             raise Exception(
                 f"Please Apply again. Fabric slice {self.name} has exception during post networking setup: {e}")
@@ -489,7 +487,10 @@ class FabricSlice:
 
         self.logger.info(f"Submitting request for slice {self.name}")
         # self.slice_object.validate()
-        slice_id = self.slice_object.submit(wait=False)
+        with tracing.span('fabric:submit', slice=self.name):
+            slice_id = self.slice_object.submit(wait=False)
+
+        self.snapshot.invalidate()
         self.logger.info(f"Done Submitting request for slice {self.name}:{slice_id}")
         self.submitted = True
 
@@ -513,23 +514,28 @@ class FabricSlice:
         self.logger.info(f"Waiting for slice {self.name} to be stable")
 
         try:
-            self.slice_object.wait(timeout=24 * 60, progress=True)
+            with tracing.span('fabric:wait', slice=self.name):
+                self.slice_object.wait(timeout=24 * 60, progress=True)
         except Exception as e:
             state = self.slice_object.get_state()
             self.logger.warning(f"Exception occurred while waiting state={state}:{e}")
             raise e
 
         try:
-            self.slice_object.wait_ssh()
+            with tracing.span('fabric:wait_ssh', slice=self.name):
+                self.slice_object.wait_ssh()
         except Exception as e:
             self.logger.warning(f"Exception occurred while waiting on ssh: {e}")
 
         try:
-            self.slice_object.post_boot_config()
+            with tracing.span('fabric:post_boot_config', cat=tracing.POST_CONFIG, slice=self.name):
+                self.slice_object.post_boot_config()
         except Exception as e:
             self.logger.warning(f"Exception occurred while update/post_boot_config: {e}")
 
-        self.logger.info(f"Slice provisioning successful {self.slice_object.get_state()}")
+        # wait() and post_boot_config() leave slice_object up to date. Use it as the new snapshot.
+        self.snapshot.load(self.slice_object)
+        self.logger.info(f"Slice provisioning successful {self.snapshot.state}")
 
         # days = DEFAULT_RENEWAL_IN_DAYS
         # try:
@@ -542,18 +548,7 @@ class FabricSlice:
         self.slice_created = True
         self.slice_modified = False
         self.existing_nodes = [n.name for n in self.nodes]
-        self.existing_networks = []
-
-        for net in self.slice_object.get_networks():
-            net_name = net.get_name()
-
-            if "_aux" in net_name or FABRIC_IPV4_NET_NAME in net_name or FABRIC_IPV6_NET_NAME in net_name:
-                continue
-
-            if FABNET_IPV4_PREFIX in net_name or FABNET_IPV6_PREFIX in net_name:
-                continue
-
-            self.existing_networks.append(net_name)
+        self.existing_networks = self._list_existing_networks()
 
         if self.nodes:
             self._handle_node_networking()
@@ -580,5 +575,6 @@ class FabricSlice:
         if self.slice_object:
             self.slice_object.delete()
             self.slice_object = None
+            self.snapshot.invalidate()
             self.slice_created = False
             self.logger.info(f"Destroyed slice {self.name}")  # TODO EMIT DELETE EVENT
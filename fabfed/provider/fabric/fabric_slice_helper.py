@@ -1,11 +1,96 @@
-import time
-
+from fabfed.util import tracing
 from fabfed.util.utils import get_logger
 from .fabric_constants import *
 
 logger = get_logger()
 
 
+class SliceSnapshot:
+    """
+    Holds the topology of a fablib slice fetched once per slice state transition. Nodes, networks and
+    management ips are served from memory until the snapshot is invalidated (i.e. after a submit) or
+    explicitly refreshed (i.e. while waiting on management ips).
+    """
+    def __init__(self, *, name: str):
+        self.name = name
+        self.fetch_count = 0
+        self._slice_object = None
+        self._state = None
+        self._stale = True
+        self._nodes = {}
+        self._networks = {}
+        self._mgmt_ips = {}
+
+    @property
+    def stale(self) -> bool:
+        return self._stale or self._slice_object is None
+
+    @property
+    def state(self):
+        return self._state
+
+    def invalidate(self):
+        self._stale = True
+
+    def load(self, slice_object):
+        state = slice_object.get_state()
+
+        if self._state != state:
+            logger.info(f"Slice {self.name}: snapshot state {self._state} -> {state}")
+
+        self._slice_object = slice_object
+        self._state = state
+        self._nodes = {node.get_name(): node for node in slice_object.get_nodes()}
+        self._networks = {net.get_name(): net for net in slice_object.get_networks()}
+        self._mgmt_ips = {}
+
+        for name, node in self._nodes.items():
+            mgmt_ip = node.get_management_ip()
+
+            if mgmt_ip:
+                self._mgmt_ips[name] = mgmt_ip
+
+        self._stale = False
+        return slice_object
+
+    def refresh(self):
+        from fabrictestbed_extensions.fablib.fablib import fablib
+
+        self.fetch_count += 1
+        logger.debug(f"Slice {self.name}: fetching slice topology: fetch_count={self.fetch_count}")
+        return self.load(fablib.get_slice(name=self.name))
+
+    def get_slice(self):
+        if self.stale:
+            self.refresh()
+
+        return self._slice_object
+
+    def node_names(self) -> list:
+        self.get_slice()
+        return list(self._nodes.keys())
+
+    def network_names(self) -> list:
+        self.get_slice()
+        return list(self._networks.keys())
+
+    def get_node(self, name: str):
+        self.get_slice()
+        return self._nodes.get(name)
+
+    def get_network(self, name: str):
+        self.get_slice()
+        return self._networks.get(name)
+
+    def get_management_ip(self, name: str):
+        self.get_slice()
+        return self._mgmt_ips.get(name)
+
+    def missing_management_ips(self, names) -> list:
+        self.get_slice()
+        return [name for name in names if not self._mgmt_ips.get(name)]
+
+
 def has_ip_address(slice_delegate, node, addr):
     addrs = []
     delegate = slice_delegate.get_node(node.name)
@@ -91,7 +176,7 @@ def add_ip_address_to_network(slice_delegate, node, net_name, node_addr, subnet,
         if attempt == retry:
             break
 
-        time.sleep(2)
+        tracing.sleep(2, name='fabric:add_ip_address')
 
     logger.warning(f'Giving up: adding ip addr: {node_addr} after {retry} attempts')
 
@@ -113,7 +198,7 @@ def add_route(slice_delegate, node, vpc_subnet, gateway, retry):
         if attempt == retry:
             break
 
-        time.sleep(2)
+        tracing.sleep(2, name='fabric:add_route')
 
     logger.warning(f"Giving up:adding route: {vpc_subnet}:gateway={gateway} after {retry} attempts")
 
@@ -142,16 +227,15 @@ def init_slice(name: str, destroy_phase):
         logger.warning(f"Destroying slice {name}:state={slice_object.get_state()}")
         slice_object.delete()
 
-        import time
-
-        time.sleep(5)
+        tracing.sleep(5, name='fabric:delete_slice')
         return fablib.new_slice(name=name)
 
     if slice_object.get_state() in ["Nascent", "Configuring", "Modifying", "ModifyOK"]:
         logger.warning(f"slice {name}:state={slice_object.get_state()}. Waiting for StableOK")
 
         try:
-            slice_object.wait(timeout=24 * 60, progress=True)
+            with tracing.span('fabric:wait', slice=name):
+                slice_object.wait(timeout=24 * 60, progress=True)
         except Exception as e:
             state = slice_object.get_state()
             logger.warning(f"Exception occurred while waiting for StableOK: state={state}:{e}")
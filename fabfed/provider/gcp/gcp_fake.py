@@ -0,0 +1,317 @@
+"""
+In-process stand-ins for the compute endpoints used by gcp_utils: networks, routers, interconnect attachments
+and region operations. Inserts, patches and deletes return a running region operation that is done after the
+configured time and only then takes effect. The server side wait of an operation blocks until it is done or for
+at most MAX_WAIT seconds, like the real one:
+
+    fake = FakeGcp(timing={'router.insert': 20, 'attachment.insert': 60}, clock=ScaledClock(0.01))
+    fake.add_network('my-vpc')
+
+    with fake.installed():
+        ...  # gcp_utils and GcpNetwork now talk to fake
+
+Like gcp_utils, the fake needs the google-cloud-compute library, whose request and resource types it uses.
+"""
+from contextlib import contextmanager
+from typing import Dict, Tuple
+
+from fabfed.util.fakes import FakeBackend, REQUEST
+from .gcp_exceptions import GcpException
+
+MAX_WAIT = 120
+
+
+def _field(request, kwargs: dict, name: str):
+    return getattr(request, name) if request is not None else kwargs[name]
+
+
+def _copy(message):
+    return type(message)(message)
+
+
+def _patch(stored, patch):
+    """
+    Patch semantics: fields set in the patch replace those of the stored resource, repeated fields as a whole.
+    """
+    stored_pb, patch_pb = type(stored).pb(stored), type(patch).pb(patch)
+
+    for field, _ in patch_pb.ListFields():
+        if field.label == field.LABEL_REPEATED:
+            stored_pb.ClearField(field.name)
+
+    stored_pb.MergeFrom(patch_pb)
+
+
+class FakeOperation:
+    def __init__(self, *, name: str, region: str, lifecycle, apply, error: str = None):
+        self.name = name
+        self.region = region
+        self.lifecycle = lifecycle
+        self.apply = apply
+        self.error = error
+        self.applied = False
+
+
+class FakeGcp(FakeBackend):
+    TRANSITIONS = [REQUEST, 'router.insert', 'router.patch', 'router.delete', 'attachment.insert',
+                   'attachment.delete']
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.networks: Dict[str, object] = {}
+        self.routers: Dict[Tuple[str, str], object] = {}
+        self.attachments: Dict[Tuple[str, str], object] = {}
+        self.operations: Dict[str, FakeOperation] = {}
+
+    def add_network(self, name: str):
+        from google.cloud import compute_v1
+
+        with self._lock:
+            self.networks[name] = compute_v1.Network(name=name, auto_create_subnetworks=False)
+
+    def client(self, client_class):
+        clients = dict(NetworksClient=FakeNetworksClient, RoutersClient=FakeRoutersClient,
+                       InterconnectAttachmentsClient=FakeInterconnectAttachmentsClient,
+                       RegionOperationsClient=FakeRegionOperationsClient)
+
+        if client_class.__name__ not in clients:
+            raise GcpException(f"client {client_class.__name__} not supported by the fake")
+
+        return clients[client_class.__name__](self)
+
+    @contextmanager
+    def installed(self):
+        """
+        Makes the sessions of gcp_utils build clients of this fake.
+        """
+        from . import gcp_utils
+
+        previous = gcp_utils.set_client_factory(self.client)
+
+        try:
+            with self.sleeping():
+                yield self
+        finally:
+            gcp_utils.set_client_factory(previous)
+
+    def settle(self):
+        """
+        Applies the operations that are done. Called on each request, so resources change when they are observed.
+        """
+        now = self.clock()
+
+        with self._lock:
+            for operation in self.operations.values():
+                if not operation.applied and operation.lifecycle.state(now) == 'DONE':
+                    operation.applied = True
+
+                    if not operation.error:
+                        operation.apply()
+
+    def start(self, *, transition: str, target: str, region: str, apply):
+        from google.cloud import compute_v1
+
+        name = self.next_id('operation')
+        error = f"Simulated failure of {transition} of {target}" if self.fails(transition, target) else None
+        lifecycle = self.lifecycle(target, ('RUNNING', transition), final='DONE')
+
+        with self._lock:
+            self.operations[name] = FakeOperation(name=name, region=region, lifecycle=lifecycle, apply=apply,
+                                                  error=error)
+
+        self.settle()
+        return compute_v1.Operation(name=name, region=region, status=compute_v1.Operation.Status.RUNNING,
+                                    operation_type=transition.split('.')[1], target_link=target)
+
+    def operation(self, name: str):
+        from google.cloud import compute_v1
+
+        self.settle()
+
+        with self._lock:
+            operation = self.operations.get(name)
+
+        if not operation:
+            from google.api_core.exceptions import NotFound
+
+            raise NotFound(f"The resource 'operations/{name}' was not found")
+
+        status = operation.lifecycle.state(self.clock())
+        ret = compute_v1.Operation(name=name, region=operation.region,
+                                   status=getattr(compute_v1.Operation.Status, status))
+
+        if status == 'DONE' and operation.error:
+            ret.error = compute_v1.Error(errors=[compute_v1.Errors(code='SIMULATED', message=operation.error)])
+
+        return ret
+
+    def get(self, resources: dict, key, kind: str):
+        self.settle()
+
+        with self._lock:
+            resource = resources.get(key)
+
+            if resource is None:
+                from google.api_core.exceptions import NotFound
+
+                raise NotFound(f"The resource '{kind}/{key[-1] if isinstance(key, tuple) else key}' was not found")
+
+            return _copy(resource)
+
+
+class _FakeClient:
+    def __init__(self, fake: FakeGcp):
+        self.fake = fake
+
+    def _call(self, operation: str):
+        self.fake.call(f"{self.SERVICE}:{operation}")
+
+
+class FakeNetworksClient(_FakeClient):
+    SERVICE = 'networks'
+
+    def get(self, request=None, **kwargs):
+        self._call('get')
+        return self.fake.get(self.fake.networks, _field(request, kwargs, 'network'), 'networks')
+
+
+class FakeRoutersClient(_FakeClient):
+    SERVICE = 'routers'
+
+    def get(self, request=None, **kwargs):
+        self._call('get')
+        key = (_field(request, kwargs, 'region'), _field(request, kwargs, 'router'))
+        return self.fake.get(self.fake.routers, key, 'routers')
+
+    def insert(self, request=None, **kwargs):
+        from google.api_core.exceptions import Conflict, NotFound
+
+        self._call('insert')
+        region = _field(request, kwargs, 'region')
+        router = _copy(_field(request, kwargs, 'router_resource'))
+        router.region = region
+        key = (region, router.name)
+        self.fake.settle()
+
+        with self.fake._lock:
+            if key in self.fake.routers:
+                raise Conflict(f"The resource 'routers/{router.name}' already exists")
+
+            if router.network.split('/')[-1] not in self.fake.networks:
+                raise NotFound(f"The resource '{router.network}' was not found")
+
+        def apply():
+            self.fake.routers[key] = router
+
+        return self.fake.start(transition='router.insert', target=router.name, region=region, apply=apply)
+
+    def patch(self, request=None, **kwargs):
+        self._call('patch')
+        region, name = _field(request, kwargs, 'region'), _field(request, kwargs, 'router')
+        patch = _copy(_field(request, kwargs, 'router_resource'))
+        self.fake.get(self.fake.routers, (region, name), 'routers')
+
+        def apply():
+            _patch(self.fake.routers[(region, name)], patch)
+
+        return self.fake.start(transition='router.patch', target=name, region=region, apply=apply)
+
+    def delete(self, request=None, **kwargs):
+        from google.api_core.exceptions import BadRequest
+
+        self._call('delete')
+        region, name = _field(request, kwargs, 'region'), _field(request, kwargs, 'router')
+        self.fake.get(self.fake.routers, (region, name), 'routers')
+
+        with self.fake._lock:
+            users = [a.name for (r, _), a in self.fake.attachments.items()
+                     if r == region and a.router.split('/')[-1] == name]
+
+        if users:
+            raise BadRequest(f"The router resource '{name}' is already being used by {users}")
+
+        def apply():
+            self.fake.routers.pop((region, name), None)
+
+        return self.fake.start(transition='router.delete', target=name, region=region, apply=apply)
+
+
+class FakeInterconnectAttachmentsClient(_FakeClient):
+    SERVICE = 'interconnect_attachments'
+
+    def get(self, request=None, **kwargs):
+        self._call('get')
+        key = (_field(request, kwargs, 'region'), _field(request, kwargs, 'interconnect_attachment'))
+        return self.fake.get(self.fake.attachments, key, 'interconnectAttachments')
+
+    def insert(self, request=None, **kwargs):
+        from google.api_core.exceptions import Conflict
+        from google.cloud import compute_v1
+
+        self._call('insert')
+        region = _field(request, kwargs, 'region')
+        attachment = _copy(_field(request, kwargs, 'interconnect_attachment_resource'))
+        attachment.region = region
+        router_name = attachment.router.split('/')[-1]
+        key = (region, attachment.name)
+        self.fake.get(self.fake.routers, (region, router_name), 'routers')
+
+        with self.fake._lock:
+            if key in self.fake.attachments:
+                raise Conflict(f"The resource 'interconnectAttachments/{attachment.name}' already exists")
+
+        def apply():
+            attachment.pairing_key = f"{self.fake.next_id('pairing')}/{region}/1"
+            self.fake.attachments[key] = attachment
+
+            # Partner attachments come with a bgp peer on their router.
+            router = self.fake.routers.get((region, router_name))
+
+            if router is not None:
+                router.bgp_peers.append(compute_v1.RouterBgpPeer(name=f"auto-ia-bgp-{attachment.name}",
+                                                                 interface_name=f"auto-ia-if-{attachment.name}",
+                                                                 peer_asn=16550))
+
+        return self.fake.start(transition='attachment.insert', target=attachment.name, region=region, apply=apply)
+
+    def delete(self, request=None, **kwargs):
+        self._call('delete')
+        region = _field(request, kwargs, 'region')
+        name = _field(request, kwargs, 'interconnect_attachment')
+        attachment = self.fake.get(self.fake.attachments, (region, name), 'interconnectAttachments')
+        router_name = attachment.router.split('/')[-1]
+
+        def apply():
+            self.fake.attachments.pop((region, name), None)
+            router = self.fake.routers.get((region, router_name))
+
+            if router is not None:
+                peers = [p for p in router.bgp_peers if p.name != f"auto-ia-bgp-{name}"]
+                del router.bgp_peers[:]
+                router.bgp_peers.extend(peers)
+
+        return self.fake.start(transition='attachment.delete', target=name, region=region, apply=apply)
+
+
+class FakeRegionOperationsClient(_FakeClient):
+    SERVICE = 'region_operations'
+
+    def get(self, request=None, **kwargs):
+        self._call('get')
+        return self.fake.operation(_field(request, kwargs, 'operation'))
+
+    def wait(self, request=None, **kwargs):
+        self._call('wait')
+        name = _field(request, kwargs, 'operation')
+        operation = self.fake.operation(name)
+
+        with self.fake._lock:
+            done_at = self.fake.operations[name].lifecycle.done_at
+
+        remaining = done_at - self.fake.clock()
+
+        if remaining > 0:
+            self.fake._sleep(min(remaining, MAX_WAIT))
+            operation = self.fake.operation(name)
+
+        return operation
@@ -1,4 +1,5 @@
 from fabfed.model import Network
+from fabfed.util import tracing
 from fabfed.util.utils import get_logger, Constants
 from . import gcp_utils
 from .gcp_exceptions import GcpException
@@ -16,36 +17,49 @@ class GcpNetwork(Network):
         self.stitch_port = stitch_port
         self.interface = []
 
+    def _region(self):
+        region = self.peering.attributes.get(Constants.RES_CLOUD_REGION)
+
+        if not region:
+            region = self.stitch_port['peer'].get(Constants.STITCH_PORT_REGION)
+
+        if not region:
+            raise GcpException(f"Missing cloud region")
+
+        return region
+
     def create(self):
-        project = self._provider.project
-        service_key_path = self._provider.service_key_path
+        session = self._provider.session
         vpc = self.peering.attributes.get(Constants.RES_CLOUD_VPC)
 
         if not vpc:
             raise GcpException(f"Must supply Vpc using peering config and {Constants.RES_CLOUD_VPC}")
 
-        vpc_details = gcp_utils.find_vpc(service_key_path=service_key_path,
-                                         project=project,
-                                         vpc=vpc)
+        region = self._region()
+        router_name = f'{self.name}-router'
+        attachment_name = f'{self.name}-vlan-attachment'
 
-        if not vpc_details:
-            raise GcpException(f"Vpc {vpc} not found")
+        # The lookups are independent of each other so they run concurrently.
+        from concurrent.futures import ThreadPoolExecutor
 
-        logger.info(f"vpc_details={vpc_details}")
+        find_vpc = tracing.propagate(gcp_utils.find_vpc)
+        find_router = tracing.propagate(gcp_utils.find_router)
+        find_attachment = tracing.propagate(gcp_utils.find_interconnect_attachment)
 
-        region = self.peering.attributes.get(Constants.RES_CLOUD_REGION)
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            vpc_future = executor.submit(find_vpc, session=session, vpc=vpc)
+            router_future = executor.submit(find_router, session=session, region=region, router_name=router_name)
+            attachment_future = executor.submit(find_attachment, session=session, region=region,
+                                                attachment_name=attachment_name)
 
-        if not region:
-            region = self.stitch_port['peer'].get(Constants.STITCH_PORT_REGION)
+        vpc_details = vpc_future.result()
 
-        if not region:
-            raise GcpException(f"Missing cloud region")
+        if not vpc_details:
+            raise GcpException(f"Vpc {vpc} not found")
 
-        router_name = f'{self.name}-router'
-        router = gcp_utils.find_router(service_key_path=service_key_path,
-                                       project=project,
-                                       region=region,
-                                       router_name=router_name)
+        logger.info(f"vpc_details={vpc_details}")
+
+        router = router_future.result()
 
         if not router:
             google_asn = self.peering.attributes.get(Constants.RES_REMOTE_ASN)
@@ -53,30 +67,22 @@ class GcpNetwork(Network):
             if isinstance(google_asn, str):
                 google_asn = int(google_asn)
 
-            vpc = self.peering.attributes.get(Constants.RES_CLOUD_VPC)
-            gcp_utils.create_router(service_key_path=service_key_path,
-                                    project=project,
+            gcp_utils.create_router(session=session,
                                     region=region,
                                     router_name=router_name,
                                     vpc=vpc,
                                     bgp_asn=google_asn)
 
-        attachment_name = f'{self.name}-vlan-attachment'
-        attachment = gcp_utils.find_interconnect_attachment(service_key_path=service_key_path,
-                                                            project=project,
-                                                            region=region,
-                                                            attachment_name=attachment_name)
+        attachment = attachment_future.result()
 
         if not attachment:
             mtu = self.peering.attributes.get(Constants.RES_CLOUD_MTU, 1460)
-            gcp_utils.create_interconnect_attachment(service_key_path=service_key_path,
-                                                     project=project,
+            gcp_utils.create_interconnect_attachment(session=session,
                                                      region=region,
                                                      mtu=int(mtu),
                                                      router_name=router_name,
                                                      attachment_name=attachment_name)
-            attachment = gcp_utils.find_interconnect_attachment(service_key_path=service_key_path,
-                                                                project=project,
+            attachment = gcp_utils.find_interconnect_attachment(session=session,
                                                                 region=region,
                                                                 attachment_name=attachment_name)
 
@@ -84,8 +90,7 @@ class GcpNetwork(Network):
         assert Constants.RES_SECURITY in self.peering.attributes
         bgp_key = self.peering.attributes[Constants.RES_SECURITY]
 
-        gcp_utils.patch_router(service_key_path=service_key_path,
-                               project=project,
+        gcp_utils.patch_router(session=session,
                                region=region,
                                router_name=router_name,
                                bgp_key=bgp_key)
@@ -94,36 +99,28 @@ class GcpNetwork(Network):
         self.interface.append(dict(id=attachment.pairing_key, provider=self._provider.type))
 
     def delete(self):
-        project = self._provider.project
-        service_key_path = self._provider.service_key_path
-        region = self.peering.attributes.get(Constants.RES_CLOUD_REGION)
+        session = self._provider.session
+        region = self._region()
+        router_name = f'{self.name}-router'
+        attachment_name = f'{self.name}-vlan-attachment'
 
-        if not region:
-            region = self.stitch_port['peer'].get(Constants.STITCH_PORT_REGION)
+        from concurrent.futures import ThreadPoolExecutor
 
-        if not region:
-            raise GcpException(f"Missing cloud region")
+        find_router = tracing.propagate(gcp_utils.find_router)
+        find_attachment = tracing.propagate(gcp_utils.find_interconnect_attachment)
 
-        attachment_name = f'{self.name}-vlan-attachment'
-        attachment = gcp_utils.find_interconnect_attachment(service_key_path=service_key_path,
-                                                            project=project,
-                                                            region=region,
-                                                            attachment_name=attachment_name)
-
-        if attachment:
-            gcp_utils.delete_interconnect_vlan_attachment(service_key_path=service_key_path,
-                                                          project=project,
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            router_future = executor.submit(find_router, session=session, region=region, router_name=router_name)
+            attachment_future = executor.submit(find_attachment, session=session, region=region,
+                                                attachment_name=attachment_name)
+
+        # The attachment refers to the router, so it is deleted first.
+        if attachment_future.result():
+            gcp_utils.delete_interconnect_vlan_attachment(session=session,
                                                           region=region,
                                                           attachment_name=attachment_name)
 
-        router_name = f'{self.name}-router'
-        router = gcp_utils.find_router(service_key_path=service_key_path,
-                                       project=project,
-                                       region=region,
-                                       router_name=router_name)
-
-        if router:
-            gcp_utils.delete_router(service_key_path=service_key_path,
-                                    project=project,
+        if router_future.result():
+            gcp_utils.delete_router(session=session,
                                     region=region,
                                     router_name=router_name)
@@ -1,5 +1,6 @@
 from fabfed.exceptions import ResourceTypeNotSupported, ProviderException
 from fabfed.provider.api.provider import Provider
+from fabfed.util import tracing
 from fabfed.util.constants import Constants
 from fabfed.util.utils import get_logger
 from . import gcp_constants
@@ -11,6 +12,16 @@ class GcpProvider(Provider):
     def __init__(self, *, type, label, name, config: dict):
         super().__init__(type=type, label=label, name=name, logger=logger, config=config)
         self.supported_resources = [Constants.RES_TYPE_NETWORK.lower()]
+        self._session = None
+
+    @property
+    def session(self):
+        if self._session is None:
+            from .gcp_utils import GcpSession
+
+            self._session = GcpSession(service_key_path=self.service_key_path, project=self.project)
+
+        return self._session
 
     @property
     def project(self):
@@ -82,14 +93,38 @@ class GcpProvider(Provider):
         assert rtype in self.supported_resources
         label = resource.get(Constants.LABEL)
 
-        for net in [net for net in self._networks if net.label == label]:
+        nets = [net for net in self._networks if net.label == label]
+
+        if not nets:
+            return
+
+        def create(net):
             self.logger.debug(f"Creating network: {vars(net)}")
             net.create()
             self.logger.debug(f"Created network: {vars(net)}")
 
+        # Networks of a label do not depend on each other so they are created concurrently.
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=len(nets)) as executor:
+            futures = [executor.submit(tracing.propagate(create), net) for net in nets]
+
+        exceptions = []
+
+        for net, future in zip(nets, futures):
+            try:
+                future.result()
+            except Exception as e:
+                self.logger.error(f"Exception creating network {net.name}: {e}")
+                exceptions.append(e)
+                continue
+
             if self.resource_listener:
                 self.resource_listener.on_created(source=self, provider=self, resource=net)
 
+        if exceptions:
+            raise exceptions[0]
+
     def do_delete_resource(self, *, resource: dict):
         rtype = resource.get(Constants.RES_TYPE)
         assert rtype in self.supported_resources
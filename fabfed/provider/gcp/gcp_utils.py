@@ -1,3 +1,4 @@
+import threading
 import time
 
 from google.cloud import compute_v1
@@ -14,52 +15,132 @@ from google.cloud.compute_v1.types import (
 )
 from google.oauth2 import service_account
 
+from fabfed.util import cassette, tracing
 from fabfed.util.utils import get_logger
+from .gcp_exceptions import GcpException
 
 logger = get_logger()
 
 
-GCP_REQUEST_RETRY_MAX = 10 
+GCP_OPERATION_TIMEOUT = 600
 
+_client_factory = None
 
-def find_vpc(*, service_key_path, project, vpc):
-    credentials = service_account.Credentials.from_service_account_file(service_key_path)
-    network_client = compute_v1.NetworksClient(credentials=credentials)
-    request = compute_v1.GetNetworkRequest(project=project, network=vpc)
 
-    from google.api_core.exceptions import NotFound
+def set_client_factory(factory=None):
+    """
+    Sets the function building compute clients given their class, i.e. the fake endpoints in gcp_fake, and returns
+    the previous one. Without a factory, clients are built using the service account key of the session.
+    """
+    global _client_factory
 
-    try:
-        return network_client.get(request=request)
-    except NotFound:
-        return None
+    previous = _client_factory
+    _client_factory = factory
+    return previous
 
 
-def check_operation_result(*, credentials, project, region, operation_name):
-    client = compute_v1.RegionOperationsClient(credentials=credentials)
-    request = compute_v1.GetRegionOperationRequest(
-        operation=operation_name,
-        project=project,
-        region=region,
-    )
+class GcpSession:
+    """
+    Credentials and compute clients of a provider. The service account key is read once and each client type is
+    built once. Compute clients are thread safe, so the networks of a provider share them.
+    """
+    def __init__(self, *, service_key_path: str, project: str):
+        self.service_key_path = service_key_path
+        self.project = project
+        self._credentials = None
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    @property
+    def credentials(self):
+        with self._lock:
+            if self._credentials is None:
+                self._credentials = service_account.Credentials.from_service_account_file(self.service_key_path)
+
+            return self._credentials
+
+    def client(self, client_class):
+        client = self._clients.get(client_class)
+
+        if client:
+            return client
+
+        factory = _client_factory
+        credentials = None if factory or cassette.replaying() else self.credentials
+
+        def create():
+            return factory(client_class) if factory else client_class(credentials=credentials)
+
+        with self._lock:
+            client = self._clients.get(client_class)
+
+            if not client:
+                logger.debug(f"Creating gcp client {client_class.__name__}")
+                client = cassette.wrap(f"gcp:{client_class.__name__}", create)
+                self._clients[client_class] = client
+
+        return client
+
+    @property
+    def networks(self) -> compute_v1.NetworksClient:
+        return self.client(compute_v1.NetworksClient)
+
+    @property
+    def routers(self) -> compute_v1.RoutersClient:
+        return self.client(compute_v1.RoutersClient)
+
+    @property
+    def attachments(self) -> compute_v1.InterconnectAttachmentsClient:
+        return self.client(compute_v1.InterconnectAttachmentsClient)
+
+    @property
+    def region_operations(self) -> compute_v1.RegionOperationsClient:
+        return self.client(compute_v1.RegionOperationsClient)
+
+    @tracing.traced('gcp:wait')
+    def wait(self, *, region, operation_name, timeout=GCP_OPERATION_TIMEOUT):
+        """
+        Waits on a region operation using the server side wait, which returns as soon as the operation is done or
+        after about two minutes, in which case it is called again.
+        """
+        request = compute_v1.WaitRegionOperationRequest(
+            operation=operation_name,
+            project=self.project,
+            region=region,
+        )
+        deadline = time.time() + timeout
 
-    for attemp in range(GCP_REQUEST_RETRY_MAX):
-        response = client.get(request=request)
+        while True:
+            response = self.region_operations.wait(request=request)
 
-        if response.status == Operation.Status.DONE:
-            return
-        else:
-            logger.info(f"Operation {operation_name} not done: Status={response.status}. Retrying in 5 seconds...")
-            time.sleep(5)           
-    
-    raise Exception(f"Operation {operation_name} failed after maximum retries {GCP_REQUEST_RETRY_MAX}.")
+            if response.status == Operation.Status.DONE:
+                if response.error and response.error.errors:
+                    raise GcpException(f"Operation {operation_name} failed: {response.error.errors}")
 
+                return response
 
-def find_router(*, service_key_path, project, region, router_name):
-    credentials = service_account.Credentials.from_service_account_file(service_key_path)
-    compute_client = compute_v1.RoutersClient(credentials=credentials)
+            if time.time() > deadline:
+                raise GcpException(f"Operation {operation_name} not done after {timeout}s: Status={response.status}")
+
+            logger.info(f"Operation {operation_name} not done: Status={response.status}. Waiting ...")
+
+
+@tracing.traced('gcp:find_vpc')
+def find_vpc(*, session: GcpSession, vpc):
+    request = compute_v1.GetNetworkRequest(project=session.project, network=vpc)
+
+    from google.api_core.exceptions import NotFound
+
+    try:
+        return session.networks.get(request=request)
+    except NotFound:
+        return None
+
+
+@tracing.traced('gcp:find_router')
+def find_router(*, session: GcpSession, region, router_name):
     request = compute_v1.GetRouterRequest(
-                    project=project,
+                    project=session.project,
                     region=region,
                     router=router_name
     )
@@ -67,14 +148,14 @@ def find_router(*, service_key_path, project, region, router_name):
     from google.api_core.exceptions import NotFound
 
     try:
-        return compute_client.get(request=request)
+        return session.routers.get(request=request)
     except NotFound:
         return None
 
 
-def create_router(*, service_key_path, project, region, router_name, vpc, bgp_asn):
-    credentials = service_account.Credentials.from_service_account_file(service_key_path)
-    compute_client = compute_v1.RoutersClient(credentials=credentials)
+@tracing.traced('gcp:create_router')
+def create_router(*, session: GcpSession, region, router_name, vpc, bgp_asn):
+    project = session.project
     router_resource = Router(
         name=router_name,
         network=f'projects/{project}/global/networks/{vpc}',
@@ -85,26 +166,26 @@ def create_router(*, service_key_path, project, region, router_name, vpc, bgp_as
         region=region,
         router_resource=router_resource
     )
-    response = compute_client.insert(request=request)
+    response = session.routers.insert(request=request)
     logger.info(f'Response={response}')
-    check_operation_result(credentials=credentials, project=project, region=region, operation_name=response.name)
+    session.wait(region=region, operation_name=response.name)
     logger.info(f'Router {router_name} created successfully.')
 
 
-def patch_router(*, service_key_path, project, region, router_name, bgp_key):
-    credentials = service_account.Credentials.from_service_account_file(service_key_path)
-    compute_client = compute_v1.RoutersClient(credentials=credentials)
-    
+@tracing.traced('gcp:patch_router')
+def patch_router(*, session: GcpSession, region, router_name, bgp_key):
+    project = session.project
+
     # Get the router resource
-    router = compute_client.get(project=project, region=region, router=router_name)
-    
+    router = session.routers.get(project=project, region=region, router=router_name)
+
     # Access the BGP peers associated with the router
     bgp_peers = router.bgp_peers
-    
+
     # Add md5 authentication
     peer = bgp_peers[0]
     peer.md5_authentication_key_name = 'md5-key-name-1'
-    
+
     router_resource = Router(
         name=router_name,
         md5_authentication_keys=[RouterMd5AuthenticationKey(key=bgp_key, name='md5-key-name-1')],
@@ -115,33 +196,29 @@ def patch_router(*, service_key_path, project, region, router_name, bgp_key):
         region=region,
         router=router_name,
         router_resource=router_resource)
-    response = compute_client.patch(request=request)
+    response = session.routers.patch(request=request)
     logger.info(f'Response={response}')
-    check_operation_result(credentials=credentials, project=project, region=region, operation_name=response.name)
+    session.wait(region=region, operation_name=response.name)
     logger.info(f'Router {router_name} patched successfully.')
 
 
-def delete_router(*, service_key_path, project, region, router_name):
-    credentials = service_account.Credentials.from_service_account_file(service_key_path)
-    client = compute_v1.RoutersClient(credentials=credentials)
+@tracing.traced('gcp:delete_router')
+def delete_router(*, session: GcpSession, region, router_name):
     request = compute_v1.DeleteRouterRequest(
-        project=project,
+        project=session.project,
         region=region,
         router=router_name,
     )
-    
-    response = client.delete(request=request)
-    check_operation_result(credentials=credentials, project=project,
-                           region=region, operation_name=response.name)
-    logger.info(f"Router '{router_name}' deleted successfully.")
 
+    response = session.routers.delete(request=request)
+    session.wait(region=region, operation_name=response.name)
+    logger.info(f"Router '{router_name}' deleted successfully.")
 
-def find_interconnect_attachment(*, service_key_path, project, region, attachment_name):
-    credentials = service_account.Credentials.from_service_account_file(service_key_path)
-    compute_client = compute_v1.InterconnectAttachmentsClient(credentials=credentials)
 
+@tracing.traced('gcp:find_interconnect_attachment')
+def find_interconnect_attachment(*, session: GcpSession, region, attachment_name):
     request = compute_v1.GetInterconnectAttachmentRequest(
-                    project=project,
+                    project=session.project,
                     region=region,
                     interconnect_attachment=attachment_name
     )
@@ -149,14 +226,14 @@ def find_interconnect_attachment(*, service_key_path, project, region, attachmen
     from google.api_core.exceptions import NotFound
 
     try:
-        return compute_client.get(request=request)
+        return session.attachments.get(request=request)
     except NotFound:
         return None
 
 
-def create_interconnect_attachment(*, service_key_path, project, region, mtu, router_name, attachment_name):
-    credentials = service_account.Credentials.from_service_account_file(service_key_path)
-    compute_client = compute_v1.InterconnectAttachmentsClient(credentials=credentials)
+@tracing.traced('gcp:create_interconnect_attachment')
+def create_interconnect_attachment(*, session: GcpSession, region, mtu, router_name, attachment_name):
+    project = session.project
     interconnect_attachment_resource = InterconnectAttachment(
         name=f'{attachment_name}',
         admin_enabled=True,
@@ -165,26 +242,25 @@ def create_interconnect_attachment(*, service_key_path, project, region, mtu, ro
         type_='PARTNER',
         mtu=mtu
     )
-    
+
     request = compute_v1.InsertInterconnectAttachmentRequest(
         project=project,
         region=region,
         interconnect_attachment_resource=interconnect_attachment_resource
     )
-    response = compute_client.insert(request=request)
-    check_operation_result(credentials=credentials, project=project, region=region, operation_name=response.name)
+    response = session.attachments.insert(request=request)
+    session.wait(region=region, operation_name=response.name)
     logger.info(f"Interconnect VLAN Attachment '{attachment_name}' created successfully.")
 
 
-def delete_interconnect_vlan_attachment(*, service_key_path, project, region, attachment_name):
-    credentials = service_account.Credentials.from_service_account_file(service_key_path)
-    client = compute_v1.InterconnectAttachmentsClient(credentials=credentials)
+@tracing.traced('gcp:delete_interconnect_vlan_attachment')
+def delete_interconnect_vlan_attachment(*, session: GcpSession, region, attachment_name):
     request = compute_v1.DeleteInterconnectAttachmentRequest(
-        project=project,
+        project=session.project,
         region=region,
         interconnect_attachment=attachment_name,
     )
 
-    response = client.delete(request=request)
-    check_operation_result(credentials=credentials, project=project, region=region, operation_name=response.name)
+    response = session.attachments.delete(request=request)
+    session.wait(region=region, operation_name=response.name)
     logger.info(f"Interconnect VLAN Attachment '{attachment_name}' deleted successfully.")
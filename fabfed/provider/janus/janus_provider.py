@@ -7,7 +7,7 @@ from fabfed.provider.api.provider import Provider
 from fabfed.util.constants import Constants
 from fabfed.util.utils import get_inventory_dir
 from fabfed.util import state
-from fabfed.provider.janus.util.ansible_helper import AnsibleRunnerHelper
+from fabfed.provider.janus.util.ansible_helper import AnsibleRunnerHelper, DEFAULT_FORKS
 
 
 JANUS_CTRL_PORT=5000
@@ -32,24 +32,30 @@ class JanusService(Service):
         self.controller_ssh_tunnel_cmd = ssh_tunnel_cmd
 
     def _do_ansible(self, delete=False):
-        def _helper(host_file, tags, extra_vars = dict(), limit = ""):
-            script_dir = os.path.dirname(__file__)
-            helper = AnsibleRunnerHelper(host_file, self.logger)
-            helper.set_extra_vars(extra_vars)
-            helper.run_playbook(os.path.join(script_dir, "ansible/janus.yml"), tags=tags, limit=limit)
-
+        script_dir = os.path.dirname(__file__)
         friendly_name = self._provider.name
         host_file = get_inventory_dir(friendly_name)
-        janus_vars = self._provider.config
+        janus_vars = dict(self._provider.config)
         janus_vars['url'] = self.controller_url
+        helper = AnsibleRunnerHelper(host_file, self.logger, forks=int(janus_vars.get('forks', DEFAULT_FORKS)))
+
         if delete:
-            _helper(host_file, ["janus-del"], janus_vars)
-        else:
-            _helper(host_file, ["docker", "janus"], janus_vars)
-            if self._internal_controller:
-                _helper(host_file, ["controller"], janus_vars, limit=self.controller_host)
-            _helper(host_file, ["janus-add"], janus_vars)
-            self.created = True
+            helper.set_extra_vars(janus_vars)
+            helper.run_playbook(os.path.join(script_dir, "ansible/janus.yml"), tags=["janus-del"])
+            return
+
+        # One run goes through the plays of janus.yml in order: docker and janus on every node, then the
+        # controller, then adding the nodes to the controller.
+        tags = ["docker", "janus"]
+
+        if self._internal_controller:
+            janus_vars['janus_controller_host'] = self.controller_host
+            tags.append("controller")
+
+        tags.append("janus-add")
+        helper.set_extra_vars(janus_vars)
+        helper.run_playbook(os.path.join(script_dir, "ansible/janus.yml"), tags=tags)
+        self.created = True
 
     def create(self):
         self._do_ansible()
@@ -236,16 +236,47 @@ class AnsibleHelper:
         self.variable_manager._extra_vars = extra_vars
 
 
+DEFAULT_FORKS = 100
+DEFAULT_CONTROL_PERSIST = '300s'
+
+
+class RunnerResultsCallback:
+    """
+    Keeps the ok, failed and unreachable results of each host from the events of an ansible-runner run.
+    """
+    def __init__(self):
+        self.host_ok = {}
+        self.host_unreachable = {}
+        self.host_failed = {}
+
+    def __call__(self, event: dict) -> bool:
+        results = dict(runner_on_ok=self.host_ok,
+                       runner_on_failed=self.host_failed,
+                       runner_on_unreachable=self.host_unreachable).get(event.get('event'))
+        event_data = event.get('event_data', {})
+
+        if results is not None and event_data.get('host'):
+            results[event_data['host']] = event_data.get('res')
+
+        return True
+
+
 class AnsibleRunnerHelper:
     """
-    Helper class to invoke the Ansible Playbook
+    Helper class to invoke the Ansible Playbook using ansible-runner. The inventory is left for ansible-runner to
+    parse once per run. Host variables added through add_vars are layered on top of it as a second inventory
+    source instead of loading and rewriting the inventory. Ssh connections are kept open between tasks
+    (ControlPersist) and modules are piped over them (pipelining), so each host is connected to once per run.
     """
-    def __init__(self, inventory_path: str, logger):
-        self.loader = DataLoader()
+    def __init__(self, inventory_path: str, logger, forks: int = DEFAULT_FORKS,
+                 control_persist: str = DEFAULT_CONTROL_PERSIST):
         self.inventory_path = inventory_path
-        self.inventory = InventoryManager(loader=self.loader, sources=[inventory_path])
-        self.variable_manager = VariableManager(loader=self.loader, inventory=self.inventory)
         self.logger = logger
+        self.forks = forks
+        self.control_persist = control_persist
+        self.extra_vars = dict()
+        self.host_vars = dict()
+        self.results_callback = RunnerResultsCallback()
 
     def add_vars(self, host: str, var_name: str, value: str):
         """
@@ -254,24 +285,56 @@ class AnsibleRunnerHelper:
         @param var_name variable name
         @param value value
         """
-        self.variable_manager.set_host_variable(host=host, varname=var_name, value=value)
+        self.host_vars.setdefault(host, dict())[var_name] = value
+
+    def envvars(self) -> dict:
+        return {
+            'ANSIBLE_PIPELINING': 'True',
+            'ANSIBLE_HOST_KEY_CHECKING': 'False',
+            'ANSIBLE_SSH_ARGS': f'-o ControlMaster=auto -o ControlPersist={self.control_persist}',
+        }
+
+    def _write_host_vars(self, directory: str) -> str:
+        import yaml
+
+        path = os.path.join(directory, 'host_vars.yml')
+
+        with open(path, 'w') as stream:
+            yaml.safe_dump(dict(all=dict(hosts=self.host_vars)), stream, default_flow_style=False)
+
+        return path
 
     def run_playbook(self, playbook_path: str, tags: list = [], limit: str = None):
-        rc = RunnerConfig(
-            forks = 100,
-            private_data_dir = '../',
-            project_dir = 'ansible',
-            playbook=playbook_path,
-            tags = ','.join(tags),
-            limit = limit,
-            inventory = self.inventory_path,
-            extravars = self.variable_manager.get_vars()
-        )
-        rc.prepare()
-        r = Runner(config=rc)
-        r.run()
+        import tempfile
+
+        with tempfile.TemporaryDirectory() as directory:
+            inventory = self.inventory_path
+
+            if self.host_vars:
+                inventory = [self.inventory_path, self._write_host_vars(directory)]
+
+            rc = RunnerConfig(
+                forks = self.forks,
+                private_data_dir = '../',
+                project_dir = 'ansible',
+                playbook=playbook_path,
+                tags = ','.join(tags),
+                limit = limit,
+                inventory = inventory,
+                extravars = self.extra_vars,
+                envvars = self.envvars()
+            )
+            rc.prepare()
+            r = Runner(config=rc, event_handler=self.results_callback)
+            r.run()
+
         self.logger.debug(f"Playbook result: {r.stats}")
 
+        if r.rc:
+            self.logger.error(f"Playbook {playbook_path} with tags={tags} ended with status={r.status}:rc={r.rc}")
+
+        return r
+
     def get_result_callback(self):
         """
         Fetch the Result Callback which contains all the results
@@ -285,4 +348,4 @@ class AnsibleRunnerHelper:
         :param extra_vars: Extra variable dict
         :return:
         """
-        self.variable_manager._extra_vars = extra_vars
+        self.extra_vars = dict(extra_vars)
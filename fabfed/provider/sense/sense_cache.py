@@ -0,0 +1,138 @@
+import hashlib
+import json
+import threading
+import time
+from typing import Callable
+
+from fabfed.util.utils import get_logger
+from .sense_constants import SENSE_PROFILE_CACHE_FILE, SENSE_PROFILE_CACHE_TTL
+
+logger = get_logger()
+
+UUIDS = 'uuids'
+DESCRIPTIONS = 'descriptions'
+VERSION_ATTRS = ['version', 'last_edited', 'lastEdited', 'modified', 'updated']
+
+
+def profile_version(response: str) -> str:
+    """
+    Version of a profile as returned by a profile search. Falls back to a digest of the response so that any
+    edit to the profile changes its version.
+    """
+    try:
+        profile = json.loads(response)
+    except (TypeError, ValueError):
+        profile = None
+
+    if isinstance(profile, dict):
+        for attr in VERSION_ATTRS:
+            if profile.get(attr) is not None:
+                return str(profile[attr])
+
+    return hashlib.sha1(str(response).encode()).hexdigest()
+
+
+class ProfileCache:
+    """
+    Cache of SENSE profile uuid lookups and profile descriptions keyed by orchestrator endpoint.
+
+    Entries expire after ttl seconds. When a lookup is refreshed and the profile version changed, the cached
+    description of that profile is dropped. With a store the cache is kept on disk and shared across sessions.
+    """
+    def __init__(self, *, store=None, ttl: int = SENSE_PROFILE_CACHE_TTL, clock: Callable[[], float] = time.time):
+        self.store = store
+        self.ttl = ttl
+        self.clock = clock
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def _read(self) -> dict:
+        if self.store:
+            try:
+                return self.store.read()
+            except Exception as e:
+                logger.warning(f"sense profile cache: could not read {self.store.file_path}:{e}")
+
+        with self._lock:
+            return json.loads(json.dumps(self._data))
+
+    def _update(self, endpoint: str, section: str, key: str, entry: dict, drop: dict = None):
+        def apply(data):
+            entries = data.setdefault(endpoint, {})
+
+            for name in [UUIDS, DESCRIPTIONS]:
+                entries[name] = {k: v for k, v in entries.get(name, {}).items() if self._fresh(v)}
+
+            entries[section][key] = entry
+
+            for name, k in (drop or {}).items():
+                entries[name].pop(k, None)
+
+        if self.store:
+            try:
+                with self.store.transaction() as data:
+                    apply(data)
+
+                return
+            except Exception as e:
+                logger.warning(f"sense profile cache: could not update {self.store.file_path}:{e}")
+
+        with self._lock:
+            apply(self._data)
+
+    def _fresh(self, entry: dict) -> bool:
+        return bool(entry) and self.clock() - entry.get('fetched', 0) < self.ttl
+
+    def get_uuid(self, *, endpoint: str, profile: str, fetch: Callable[[], str]) -> str:
+        """
+        fetch runs the profile search and returns the raw response.
+        """
+        entries = self._read().get(endpoint, {})
+        entry = entries.get(UUIDS, {}).get(profile)
+
+        if self._fresh(entry):
+            return entry['uuid']
+
+        response = fetch()
+        uuid = json.loads(response)['uuid']
+        version = profile_version(response)
+        drop = {}
+        description = entries.get(DESCRIPTIONS, {}).get(uuid)
+
+        if description and description.get('version') != version:
+            logger.info(f"sense profile cache: profile {profile} changed. Dropping its description")
+            drop[DESCRIPTIONS] = uuid
+
+        self._update(endpoint, UUIDS, profile, dict(uuid=uuid, version=version, fetched=self.clock()), drop)
+        return uuid
+
+    def get_description(self, *, endpoint: str, uuid: str, fetch: Callable[[], str]) -> str:
+        """
+        fetch runs the profile describe and returns the raw response.
+        """
+        entries = self._read().get(endpoint, {})
+        versions = [e['version'] for e in entries.get(UUIDS, {}).values() if e['uuid'] == uuid and self._fresh(e)]
+        version = versions[0] if versions else None
+        entry = entries.get(DESCRIPTIONS, {}).get(uuid)
+
+        if self._fresh(entry) and (version is None or entry.get('version') == version):
+            return entry['body']
+
+        body = fetch()
+        self._update(endpoint, DESCRIPTIONS, uuid, dict(version=version, fetched=self.clock(), body=body))
+        return body
+
+
+_profile_cache = None
+
+
+def get_profile_cache() -> ProfileCache:
+    global _profile_cache
+
+    if _profile_cache is None:
+        from fabfed.util.utils import get_cache_file
+        from fabfed.util.yaml_store import YamlStore
+
+        _profile_cache = ProfileCache(store=YamlStore(get_cache_file(SENSE_PROFILE_CACHE_FILE)))
+
+    return _profile_cache
@@ -1,5 +1,7 @@
 from sense.client.requestwrapper import RequestWrapper
 
+from fabfed.util import cassette
+
 SENSE_CLIENT = None
 
 
@@ -7,7 +9,8 @@ def init_client(config):
     global SENSE_CLIENT
 
     if not SENSE_CLIENT:
-        SENSE_CLIENT = SenseClient(config)
+        # While replaying, the apis of sense-o-api only use the headers of the config.
+        SENSE_CLIENT = cassette.wrap('sense', lambda: SenseClient(config), attributes=dict(config=dict(headers={})))
 
 
 def get_client():
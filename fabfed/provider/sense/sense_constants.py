@@ -72,6 +72,25 @@ SENSE_IMAGE = 'Image'
 
 SENSE_RETRY = 50
 
+SENSE_CREATE_READY = 'CREATE - READY'
+SENSE_CANCEL_READY = 'CANCEL - READY'
+SENSE_FAILED = 'FAILED'
+
+# Status polling starts fast and backs off while the status does not change.
+SENSE_POLL_INITIAL_INTERVAL = 2.0
+SENSE_POLL_MAX_INTERVAL = 30.0
+SENSE_POLL_BACKOFF = 1.5
+SENSE_WAIT_TIMEOUT = 1800.0
+# CANCEL - READY can show up prematurely. It must hold this many seconds before the instance is deleted.
+SENSE_CANCEL_READY_SETTLE = 10.0
+SENSE_OPERATION_RETRY = 5
+
+SENSE_WAIT_ATTRS = ['poll_initial_interval', 'poll_max_interval', 'poll_backoff', 'wait_timeout',
+                    'cancel_ready_settle']
+
+SENSE_PROFILE_CACHE_FILE = 'sense_profiles.yml'
+SENSE_PROFILE_CACHE_TTL = 3600
+
 class SupportedCloud(str, enum.Enum):
     """
     The Cloud supported by SENSE.
@@ -0,0 +1,245 @@
+"""
+In-process stand-in for the SENSE orchestrator. It implements the request method of the sense-o-api
+RequestWrapper, so the workflow, profile and discover apis of sense-o-api, and so sense_utils, run against it:
+
+    fake = FakeSense(timing={'provision': 120, 'verify': {'distribution': 'normal', 'mean': 60, 'stddev': 10}},
+                     clock=ScaledClock(0.01))
+    fake.add_profile('my-profile', intent={'service': 'dnc', 'data': {...}})
+
+    with fake.installed():
+        ...  # sense_utils and the sense provider now talk to fake
+
+Instances go through the states the orchestrator reports, each lasting the timing of its transition:
+
+    create:      CREATE - COMPILED, compiling takes the time of the create request
+    provision:   CREATE - COMMITTING (provision), CREATE - COMMITTED (verify), CREATE - READY
+    cancel:      CANCEL - COMMITTING (cancel), CANCEL - COMMITTED (verify), CANCEL - READY
+    reprovision: REINSTATE - COMMITTING (provision), REINSTATE - COMMITTED (verify), REINSTATE - READY
+    delete:      takes the time of the delete request
+
+A failed provision, cancel or reprovision ends in the FAILED state of its phase, i.e. CREATE - FAILED. Requests the
+orchestrator would reject raise the ValueError the RequestWrapper raises for error responses.
+"""
+import json
+import uuid as uuid_lib
+from contextlib import contextmanager
+from typing import Dict
+
+from fabfed.util.fakes import FakeBackend, REQUEST
+
+PHASES = dict(provision='CREATE', cancel='CANCEL', reprovision='REINSTATE')
+
+
+def _is_uuid(value: str) -> bool:
+    try:
+        uuid_lib.UUID(value)
+        return True
+    except ValueError:
+        return False
+
+
+def _error(code: int, message: str):
+    return ValueError(f"Returned code {code} with error '{message}'")
+
+
+class FakeInstance:
+    def __init__(self, *, si_uuid: str, alias: str, intent_uuid: str, intent: dict, lifecycle):
+        self.si_uuid = si_uuid
+        self.alias = alias
+        self.intents = [dict(id=intent_uuid, json=json.dumps(intent))]
+        self.lifecycle = lifecycle
+        self.manifest = {}
+
+
+class FakeSense(FakeBackend):
+    TRANSITIONS = [REQUEST, 'create', 'provision', 'cancel', 'verify', 'delete']
+
+    def __init__(self, *, endpoint: str = 'https://sense.fake:8443', **kwargs):
+        super().__init__(**kwargs)
+        self.config = dict(API_ENDPOINT=endpoint, headers={})
+        self.profiles: Dict[str, dict] = {}
+        self.instances: Dict[str, FakeInstance] = {}
+        self.new_uuids = set()
+
+    def add_profile(self, name: str, *, intent: dict = None, edit: list = None, manifest: dict = None,
+                    version: int = 1) -> str:
+        """
+        Adds a service profile and returns its uuid. The intent of the instances created using the profile is its
+        intent. The manifest is what manifest requests on those instances return.
+        """
+        profile_uuid = self._uuid('profile', name)
+
+        with self._lock:
+            self.profiles[profile_uuid] = dict(uuid=profile_uuid, name=name, version=version,
+                                               intent=intent or dict(service='dnc', data={}),
+                                               edit=edit or [], manifest=manifest or {})
+
+        return profile_uuid
+
+    @contextmanager
+    def installed(self):
+        """
+        Makes this fake the client of sense_utils and routes the sleeps of its wait loops through the clock.
+        """
+        from . import sense_client
+
+        previous = sense_client.SENSE_CLIENT
+        sense_client.SENSE_CLIENT = self
+
+        try:
+            with self.sleeping():
+                yield self
+        finally:
+            sense_client.SENSE_CLIENT = previous
+
+    def status(self, si_uuid: str) -> str:
+        instance = self._instance(si_uuid)
+        return instance.lifecycle.state(self.clock())
+
+    def request(self, call_type, api_path, **kwargs):
+        parts = [part for part in api_path.split('/') if part]
+        params = dict(kwargs.get('query_params') or [])
+        self.call(f"{call_type} /" + '/'.join('{uuid}' if _is_uuid(part) else part for part in parts))
+
+        if call_type == 'GET' and parts == ['instance']:
+            return self._new_uuid()
+
+        if call_type == 'POST' and len(parts) == 2 and parts[0] == 'instance':
+            return self._create(parts[1], kwargs.get('body_params'))
+
+        if call_type == 'PUT' and len(parts) == 3 and parts[0] == 'instance':
+            return self._operate(parts[1], parts[2], force=params.get('force') == 'true')
+
+        if call_type == 'GET' and len(parts) == 3 and parts[0] == 'instance' and parts[2] == 'status':
+            return self.status(parts[1])
+
+        if call_type == 'DELETE' and len(parts) == 2 and parts[0] in ['instance', 'service']:
+            return self._delete(parts[1])
+
+        if call_type == 'GET' and len(parts) == 2 and parts[0] == 'profile':
+            return json.dumps(self._profile(parts[1]))
+
+        if call_type == 'GET' and parts == ['discover', 'service', 'instances']:
+            return json.dumps(dict(instances=self._discover(params.get('search'))))
+
+        if call_type == 'GET' and len(parts) == 3 and parts[:2] == ['intent', 'instance']:
+            return json.dumps(self._instance(parts[2]).intents)
+
+        if call_type == 'POST' and len(parts) == 3 and parts[:2] == ['service', 'manifest']:
+            return json.dumps(dict(serviceUUID=parts[2], jsonTemplate=json.dumps(self._instance(parts[2]).manifest)))
+
+        raise _error(404, f"{call_type} {api_path} not supported by the fake")
+
+    def _uuid(self, kind: str, name: str) -> str:
+        return str(uuid_lib.UUID(int=self.rng(kind, name).getrandbits(128)))
+
+    def _new_uuid(self) -> str:
+        si_uuid = self._uuid('instance', self.next_id('instance'))
+
+        with self._lock:
+            self.new_uuids.add(si_uuid)
+
+        return si_uuid
+
+    def _instance(self, si_uuid: str) -> FakeInstance:
+        with self._lock:
+            instance = self.instances.get(si_uuid)
+
+        if not instance:
+            raise _error(404, f"service instance {si_uuid} not found")
+
+        return instance
+
+    def _profile(self, search: str) -> dict:
+        with self._lock:
+            for profile in self.profiles.values():
+                if search in [profile['uuid'], profile['name']]:
+                    return {k: v for k, v in profile.items() if k != 'manifest'}
+
+        raise _error(404, f"profile {search} not found")
+
+    def _create(self, si_uuid: str, body: str):
+        intent = json.loads(body)
+        alias = intent.get('alias')
+        profile = self._profile(intent.get('service_profile_uuid', ''))
+
+        with self._lock:
+            if si_uuid not in self.new_uuids:
+                raise _error(400, f"unknown service instance uuid {si_uuid}")
+
+            if any(instance.alias == alias for instance in self.instances.values()):
+                raise _error(409, f"service instance with alias {alias} already exists")
+
+            self.new_uuids.discard(si_uuid)
+
+        compiling = self.duration('create', alias)
+
+        if compiling:
+            self._sleep(compiling)
+
+        instance = FakeInstance(si_uuid=si_uuid, alias=alias, intent_uuid=self._uuid('intent', si_uuid),
+                                intent=dict(profile['intent'], alias=alias, queries=intent.get('queries', [])),
+                                lifecycle=self.lifecycle(alias, final='CREATE - COMPILED'))
+        instance.manifest = self.profiles[profile['uuid']]['manifest']
+
+        with self._lock:
+            self.instances[si_uuid] = instance
+
+        return json.dumps(dict(service_uuid=si_uuid, intent_uuid=instance.intents[0]['id'], queries=[], model=''))
+
+    def _operate(self, si_uuid: str, action: str, *, force: bool):
+        instance = self._instance(si_uuid)
+
+        with self._lock:
+            status = instance.lifecycle.state(self.clock())
+            failed = 'FAILED' in status
+            final = status == instance.lifecycle.final
+
+            if action == 'provision':
+                allowed = status == 'CREATE - COMPILED' or (failed and force)
+            elif action == 'cancel':
+                allowed = status.startswith(('CREATE', 'REINSTATE', 'MODIFY')) and status != 'CREATE - COMPILED' \
+                    and (final or force)
+            elif action == 'reprovision':
+                allowed = status == 'CANCEL - READY' or (failed and force)
+            else:
+                raise _error(400, f"unknown action {action}")
+
+            if not allowed:
+                raise _error(409, f"cannot {action} service instance {si_uuid} in status {status}")
+
+            transition = 'provision' if action == 'reprovision' else action
+            phase = PHASES[action]
+            name = f"{instance.alias}:{len(instance.intents)}:{action}"
+            fails = self.fails(transition, name)
+            steps = [(f"{phase} - COMMITTING", transition)] + ([] if fails else [(f"{phase} - COMMITTED", 'verify')])
+            instance.lifecycle = self.lifecycle(name, *steps, final=f"{phase} - {'FAILED' if fails else 'READY'}")
+
+        return ''
+
+    def _delete(self, si_uuid: str):
+        instance = self._instance(si_uuid)
+        status = instance.lifecycle.state(self.clock())
+
+        if status not in ['CREATE - COMPILED', 'CANCEL - READY'] and 'FAILED' not in status:
+            raise _error(409, f"cannot delete service instance {si_uuid} in status {status}")
+
+        deleting = self.duration('delete', instance.alias)
+
+        if deleting:
+            self._sleep(deleting)
+
+        with self._lock:
+            self.instances.pop(si_uuid, None)
+
+        return ''
+
+    def _discover(self, search: str = None) -> list:
+        now = self.clock()
+
+        with self._lock:
+            instances = [i for i in self.instances.values() if not search or search in (i.alias or '')]
+
+        return [dict(referenceUUID=i.si_uuid, alias=i.alias, state=i.lifecycle.state(now), owner='fabfed',
+                     lastState=i.lifecycle.state(now), timestamp=None, archived=False,
+                     intents=[dict(intent) for intent in i.intents]) for i in instances]
@@ -18,9 +18,17 @@ class SenseNetwork(Network):
         self.switch_ports = []
         self.dtn = []
         self.id = ''
+        self._si_uuid = None
+
+    @property
+    def si_uuid(self):
+        return self._si_uuid
 
     # CREATE - COMPILED, CREATE - COMMITTING, CREATE - COMMITTED, CREATE - READY
-    def create(self):
+    def submit(self):
+        """
+        Creates the service instance if needed and starts provisioning it without waiting. Returns its status.
+        """
         si_uuid = sense_utils.find_instance_by_alias(alias=self.name)
 
         if not si_uuid:
@@ -40,10 +48,23 @@ class SenseNetwork(Network):
 
         if 'CREATE - READY' not in status:
             logger.debug(f"Provisioning {self.name}")
-            status = sense_utils.instance_operate(si_uuid=si_uuid)
+            sense_utils.instance_provision(si_uuid=si_uuid, status=status)
+
+        self._si_uuid = si_uuid
+        return status
+
+    def create(self):
+        self.submit()
+        self.complete(sense_utils.instance_wait(si_uuid=self._si_uuid))
+
+    def complete(self, status):
+        """
+        Retrieves the details of a provisioned service instance given its final status.
+        """
+        si_uuid = self._si_uuid
 
         if 'CREATE - READY' not in status:
-            raise Exception(f"Creation failed for {si_uuid} {status}")
+            raise SenseException(f"Creation failed for {si_uuid} {status}")
 
         logger.debug(f"Retrieving details {self.name} {status}")
         instance_dict = sense_utils.service_instance_details(si_uuid=si_uuid, alias=self.name)
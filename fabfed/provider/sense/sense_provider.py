@@ -14,6 +14,8 @@ class SenseProvider(Provider):
         self.supported_resources = [Constants.RES_TYPE_NETWORK,  Constants.RES_TYPE_NODE]
         self.initialized = False
         self._handled_modify = False
+        self._submitted = []
+        self._wait_errors = {}
 
     def setup_environment(self):
         for attr in SENSE_CONF_ATTRS:
@@ -64,8 +66,14 @@ class SenseProvider(Provider):
         if not self.initialized:
             self.logger.info(f"{self.name}: Initializing sense client")
             from .sense_client import init_client
-
-            init_client(self.config)
+            from .sense_waiter import set_wait_policy
+
+            set_wait_policy(initial_interval=self.config.get('poll_initial_interval'),
+                            max_interval=self.config.get('poll_max_interval'),
+                            backoff=self.config.get('poll_backoff'),
+                            timeout=self.config.get('wait_timeout'),
+                            cancel_ready_settle=self.config.get('cancel_ready_settle'))
+            init_client({k: v for k, v in self.config.items() if k.lower() not in SENSE_WAIT_ATTRS})
             self.logger.info(f"{self.name}: Initialized sense client")
             self.initialized = True
 
@@ -171,6 +179,58 @@ class SenseProvider(Provider):
 
         label = resource.get(Constants.LABEL)
 
+        if rtype == Constants.RES_TYPE_NODE:
+            # Nodes are looked up once their network is ready. See do_wait_for_create_resource.
+            return
+
+        errors = []
+
+        for net in [net for net in self._networks if net.label == label]:
+            self.logger.debug(f"Submitting network: {vars(net)}")
+
+            try:
+                status = net.submit()
+                self._submitted.append(net)
+                self.logger.info(f"Submitted network: {net.name} {net.si_uuid} status={status}")
+            except Exception as e:
+                self.logger.error(f"Exception submitting network {net.name}: {e}")
+                errors.append(e)
+
+        if errors:
+            raise SenseException(f"Failed submitting {len(errors)} network(s) for {label}: {errors}")
+
+    def _wait_for_submitted(self):
+        """
+        Waits on every submitted network as a batch. Networks whose instance failed are recorded in _wait_errors.
+        """
+        if not self._submitted:
+            return
+
+        from . import sense_utils
+
+        submitted = self._submitted
+        self._submitted = []
+        statuses = sense_utils.wait_for_instances(si_uuids=[net.si_uuid for net in submitted])
+
+        for net in submitted:
+            try:
+                net.complete(statuses[net.si_uuid])
+            except Exception as e:
+                self.logger.error(f"Exception completing network {net.name}: {e}")
+                self._wait_errors[net.name] = e
+                continue
+
+            if self.resource_listener:
+                self.resource_listener.on_created(source=self, provider=self, resource=net)
+
+            self.logger.debug(f"Created network: {vars(net)}")
+
+    def do_wait_for_create_resource(self, *, resource: dict):
+        rtype = resource.get(Constants.RES_TYPE)
+        label = resource.get(Constants.LABEL)
+
+        self._wait_for_submitted()
+
         if rtype == Constants.RES_TYPE_NODE:
             for node in [node for node in self._nodes if node.label == label]:
                 self.logger.debug(f"Creating node: {vars(node)}")
@@ -183,14 +243,11 @@ class SenseProvider(Provider):
 
             return
 
-        for net in [net for net in self._networks if net.label == label]:
-            self.logger.debug(f"Creating network: {vars(net)}")
-            net.create()
-
-            if self.resource_listener:
-                self.resource_listener.on_created(source=self, provider=self, resource=net)
+        errors = [self._wait_errors.pop(net.name) for net in self._networks
+                  if net.label == label and net.name in self._wait_errors]
 
-            self.logger.debug(f"Created network: {vars(net)}")
+        if errors:
+            raise SenseException(f"Failed creating {len(errors)} network(s) for {label}: {errors}")
 
     def do_delete_resource(self, *, resource: dict):
         self._init_client()
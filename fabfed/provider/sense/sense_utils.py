@@ -1,27 +1,36 @@
 import json
+from functools import lru_cache
 from types import SimpleNamespace
 
 from sense.client.discover_api import DiscoverApi
 from sense.client.profile_api import ProfileApi
 from sense.client.workflow_combined_api import WorkflowCombinedApi
 
+from .sense_cache import get_profile_cache
 from .sense_client import get_client
 
 from .sense_constants import *
 from .sense_exceptions import SenseException
+from .sense_waiter import get_wait_policy, retry_operation, wait_for_status, wait_for_statuses
 
-from fabfed.util.utils import get_logger
+from fabfed.util import tracing
+from fabfed.util.utils import get_logger, Lazy
 
 logger = get_logger()
 
 
-def get_image_info(image_spec, attr=None):
+@lru_cache(maxsize=None)
+def _load_image_infos():
     import os
 
     path_file = os.path.join(os.path.dirname(__file__), 'inventory', 'sense_image_info.json')
 
     with open(path_file, 'r') as fp:
-        infos = json.load(fp)
+        return json.load(fp)
+
+
+def get_image_info(image_spec, attr=None):
+    infos = _load_image_infos()
 
     if not attr:
         return infos.get(image_spec)
@@ -29,10 +38,16 @@ def get_image_info(image_spec, attr=None):
     return infos.get(image_spec, dict()).get(attr)
 
 
+def _endpoint(client):
+    config = getattr(client, 'config', None) or {}
+    return config.get('API_ENDPOINT', '')
+
+
 def describe_profile(*, client=None, uuid: str):
     client = client or get_client()
     profile_api = ProfileApi(req_wrapper=client)
-    profile_details = profile_api.profile_describe(uuid)
+    profile_details = get_profile_cache().get_description(endpoint=_endpoint(client), uuid=uuid,
+                                                          fetch=lambda: profile_api.profile_describe(uuid))
     profile_details = json.loads(profile_details, object_hook=lambda dct: SimpleNamespace(**dct))
 
     if hasattr(profile_details, "edit"):
@@ -90,14 +105,13 @@ def get_profile_uuid(*, client=None, profile):
     profile_api = ProfileApi(req_wrapper=client)
 
     try:
-        profile = profile_api.profile_search_get_with_http_info(search=profile)
-        profile = json.loads(profile, object_hook=lambda dct: SimpleNamespace(**dct))
-        profile_uuid = profile.uuid
-        return profile_uuid
+        return get_profile_cache().get_uuid(endpoint=_endpoint(client), profile=profile,
+                                            fetch=lambda: profile_api.profile_search_get_with_http_info(search=profile))
     except Exception as e:
         raise SenseException(f"Exception searching for profile:{e}")
 
 
+@tracing.traced('sense:create_instance')
 def create_instance(*, client=None, bandwidth, profile, alias, layer3, peering, interfaces):
     client = client or get_client()
     profile_uuid = get_profile_uuid(client=client, profile=profile)
@@ -107,12 +121,12 @@ def create_instance(*, client=None, bandwidth, profile, alias, layer3, peering,
     edit_entries = []
     profile_details = describe_profile(client=client, uuid=profile_uuid)
 
-    logger.debug(f'Profile Details: {profile_details}')
+    logger.debug('Profile Details: %s', profile_details)
 
     if hasattr(profile_details, "edit"):
         edit_entries = profile_details.edit
         temp_entries = [e.__dict__ for e in edit_entries]
-        logger.info(f'Edit Entries: {json.dumps(temp_entries, indent=2)}')
+        logger.info('Edit Entries: %s', Lazy(json.dumps, temp_entries, indent=2))
 
     edit_uri_entries = [e for e in edit_entries if e.path.endswith(SENSE_URI)]
     options = []
@@ -163,67 +177,59 @@ def create_instance(*, client=None, bandwidth, profile, alias, layer3, peering,
         query = dict([("ask", "edit"), ("options", options)])
         intent["queries"] = [query]
 
-    logger.info(f'Intent: {json.dumps(intent, indent=2)}')
+    logger.info('Intent: %s', Lazy(json.dumps, intent, indent=2))
     intent = json.dumps(intent)
 
-    import time
-    from random import randint
+    def create():
+        logger.info(f"creating instance: {alias}")
+        response = workflow_api.instance_create(intent)  # service_uuid, intent_uuid, queries, model
+        temp = json.loads(response)
+        return temp['service_uuid'], workflow_api.instance_get_status()
 
-    for attempt in range(SENSE_RETRY):
-        try:
-            logger.info(f"creating instance: {alias}:attempt={attempt + 1}")
-            response = workflow_api.instance_create(intent)  # service_uuid, intent_uuid, queries, model
-            temp = json.loads(response)
-            status = workflow_api.instance_get_status()
-            return temp['service_uuid'], status
-        except Exception as e:
-            logger.warning(f"exception while creating instance {e}")
-
-        time.sleep(randint(30, 35))
-
-    raise SenseException(f"could not create instance {alias}")
+    try:
+        return retry_operation(create, name=alias, operation='instance_create', attempts=SENSE_RETRY)
+    except Exception as e:
+        raise SenseException(f"could not create instance {alias}:{e}")
 
 
-def instance_operate(*, client=None, si_uuid):
+@tracing.traced('sense:instance_provision')
+def instance_provision(*, client=None, si_uuid, status=None):
     client = client or get_client()
     workflow_api = WorkflowCombinedApi(req_wrapper=client)
-
-    import time
-    from random import randint
-
-    status = workflow_api.instance_get_status(si_uuid=si_uuid)
+    status = status or workflow_api.instance_get_status(si_uuid=si_uuid)
 
     if "CREATE - COMMITTING" not in status:
         try:
-            time.sleep(randint(5, 30))
-            workflow_api.instance_operate('provision', si_uuid=si_uuid, sync='false')  # AES TODO THIS GUY
+            retry_operation(lambda: workflow_api.instance_operate('provision', si_uuid=si_uuid, sync='false'),
+                            name=si_uuid, operation='provision')
         except Exception as e:
             logger.warning(f"exception from  instance_operate {e}")
-            pass
 
-    for attempt in range(SENSE_RETRY):
-        try:
-            status = workflow_api.instance_get_status(si_uuid=si_uuid)
-            logger.info(f"Waiting on CREATED-READY: status={status}:attempt={attempt} out of {SENSE_RETRY}")
 
-            if 'CREATE - READY' in status:
-                break
+def instance_wait(*, client=None, si_uuid):
+    return wait_for_instances(client=client, si_uuids=[si_uuid])[si_uuid]
 
-            if 'FAILED' in status:
-                break
-        except Exception as e:
-            logger.warning(f"exception from  instance_get_status {e}")
-            pass
 
-        logger.info(f"Waiting on CREATED-READY: going to sleep attempt={attempt}")
-        time.sleep(randint(30, 35))
+@tracing.traced('sense:wait_for_instances')
+def wait_for_instances(*, client=None, si_uuids: list):
+    """
+    Waits on several service instances to be provisioned in a single polling loop and returns the final status of
+    each. An instance that fails or cannot be polled does not stop the wait on the others.
+    """
+    client = client or get_client()
+    workflow_api = WorkflowCombinedApi(req_wrapper=client)
 
-    return workflow_api.instance_get_status(si_uuid=si_uuid)
+    return wait_for_statuses(lambda si_uuid: workflow_api.instance_get_status(si_uuid=si_uuid), names=si_uuids,
+                             targets=[SENSE_CREATE_READY], failures=[SENSE_FAILED, 'CANCEL'])
 
 
-def delete_instance(*, client=None, si_uuid):
-    import time, random
+def instance_operate(*, client=None, si_uuid):
+    instance_provision(client=client, si_uuid=si_uuid)
+    return instance_wait(client=client, si_uuid=si_uuid)
+
 
+@tracing.traced('sense:delete_instance')
+def delete_instance(*, client=None, si_uuid):
     client = client or get_client()
     workflow_api = WorkflowCombinedApi(req_wrapper=client)
 
@@ -232,54 +238,43 @@ def delete_instance(*, client=None, si_uuid):
     if 'error' in status:
         raise SenseException("error deleting got " + status)
 
-    if 'FAILED' in status:
+    if SENSE_FAILED in status:
         raise SenseException(f'cannot delete instance - contact admin. {status}')
 
     if "CREATE - COMPILED" in status:
-        time.sleep(random.randint(5, 30))
-
-        workflow_api.instance_delete(si_uuid=si_uuid)
+        retry_operation(lambda: workflow_api.instance_delete(si_uuid=si_uuid), name=si_uuid, operation='delete')
         return
 
     if "CANCEL" not in status:
         if 'CREATE' not in status and 'REINSTATE' not in status and 'MODIFY' not in status:
             raise ValueError(f"cannot cancel an instance in '{status}' status...")
 
-        time.sleep(random.randint(5, 30))
-
         if 'READY' not in status:
-            workflow_api.instance_operate('cancel', si_uuid=si_uuid, sync='false', force='true')
+            cancel = lambda: workflow_api.instance_operate('cancel', si_uuid=si_uuid, sync='false', force='true')
         else:
-            workflow_api.instance_operate('cancel', si_uuid=si_uuid, sync='false')
-
-    for attempt in range(SENSE_RETRY):
-        time.sleep(random.randint(30, 35))  # This sleep is here to workaround issue where CANCEL-READY shows up prematurely.
-
-        status = workflow_api.instance_get_status(si_uuid=si_uuid)
-        # print("LOOPING:DELETE:Status=", status, "attempt=", attempt)
-        logger.info(f"Waiting on CANCEL-READY: status={status}:attempt={attempt} out of {SENSE_RETRY}")
+            cancel = lambda: workflow_api.instance_operate('cancel', si_uuid=si_uuid, sync='false')
 
-        if 'CANCEL - READY' in status:  # This got triggered very quickly ...
-            break
+        retry_operation(cancel, name=si_uuid, operation='cancel')
 
-        if 'FAILED' in status:
-            break
+    status = wait_for_status(lambda: workflow_api.instance_get_status(si_uuid=si_uuid), name=si_uuid,
+                             targets=[SENSE_CANCEL_READY], settle=get_wait_policy().cancel_ready_settle)
 
-    if 'CANCEL - READY' in status:
+    if SENSE_CANCEL_READY in status:
         logger.info(f"Deleting instance: {si_uuid}")
-        time.sleep(random.randint(5, 30))
-        ret = workflow_api.instance_delete(si_uuid=si_uuid)
+        ret = retry_operation(lambda: workflow_api.instance_delete(si_uuid=si_uuid), name=si_uuid, operation='delete')
         logger.info(f"Deleted instance: {si_uuid}: ret={ret}")
     else:
         raise SenseException(f'cancel operation disrupted - instance not deleted - contact admin. {status}')
 
 
+@tracing.traced('sense:instance_get_status')
 def instance_get_status(*, client=None, si_uuid):
     client = client or get_client()
     workflow_api = WorkflowCombinedApi(req_wrapper=client)
     return workflow_api.instance_get_status(si_uuid=si_uuid)
 
 
+@tracing.traced('sense:service_instance_details')
 def service_instance_details(*, client=None, si_uuid, alias):
     client = client or get_client()
     discover_api = DiscoverApi(req_wrapper=client)
@@ -303,6 +298,7 @@ def service_instance_details(*, client=None, si_uuid, alias):
     raise SenseException('no details found')
 
 
+@tracing.traced('sense:discover_service_instances')
 def discover_service_instances(*, client=None):
     client = client or get_client()
     discover_api = DiscoverApi(req_wrapper=client)
@@ -346,9 +342,9 @@ def get_vms_specs_from_profile(*, client=None, profile_uuid):
     return all_vms
 
 
+@tracing.traced('sense:manifest_create')
 def manifest_create(*, client=None, template_file=None, alias=None, si_uuid=None):
     import os
-    import time
     from json.decoder import JSONDecodeError
 
     client = client or get_client()
@@ -371,6 +367,6 @@ def manifest_create(*, client=None, template_file=None, alias=None, si_uuid=None
         except JSONDecodeError:
             logger.warning(f"Could not decode sense manifest from response={response}")
 
-        time.sleep(10)
+        tracing.sleep(10, name='sense:manifest')
 
     raise SenseException(f"Unable to retrieve manifest using {template_file}")
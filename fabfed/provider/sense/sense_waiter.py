@@ -0,0 +1,62 @@
+from typing import Callable, Dict, List
+
+from fabfed.util import tracing, waiter
+from fabfed.util.waiter import WaitPolicy
+from .sense_constants import *
+
+DEFAULT_WAIT_POLICY = WaitPolicy(initial_interval=SENSE_POLL_INITIAL_INTERVAL,
+                                 max_interval=SENSE_POLL_MAX_INTERVAL,
+                                 backoff=SENSE_POLL_BACKOFF,
+                                 timeout=SENSE_WAIT_TIMEOUT,
+                                 cancel_ready_settle=SENSE_CANCEL_READY_SETTLE)
+
+_wait_policy = DEFAULT_WAIT_POLICY
+
+
+def _sleep(seconds: float):
+    tracing.sleep(seconds, name='sense:poll')
+
+
+def set_wait_policy(**overrides):
+    """
+    Overrides fields of the default policy. Unknown fields and None values are ignored.
+    """
+    global _wait_policy
+
+    fields = {k: type(getattr(DEFAULT_WAIT_POLICY, k))(v) for k, v in overrides.items()
+              if k in WaitPolicy._fields and v is not None}
+    _wait_policy = DEFAULT_WAIT_POLICY._replace(**fields)
+
+
+def get_wait_policy() -> WaitPolicy:
+    return _wait_policy
+
+
+def wait_for_statuses(get_status: Callable[[str], str], *, names: List[str], targets: List[str],
+                      failures: List[str] = None, settle: float = 0, policy: WaitPolicy = None,
+                      sleep: Callable[[float], None] = _sleep,
+                      clock: Callable[[], float] = tracing.monotonic) -> Dict[str, str]:
+    """
+    Waits on service instances with the sense policy. See fabfed.util.waiter.wait_for_statuses.
+    """
+    return waiter.wait_for_statuses(get_status, names=names, targets=targets, failures=failures or [SENSE_FAILED],
+                                    settle=settle, policy=policy or get_wait_policy(), sleep=sleep, clock=clock)
+
+
+def wait_for_status(get_status: Callable[[], str], *, name: str, targets: List[str], failures: List[str] = None,
+                    settle: float = 0, policy: WaitPolicy = None,
+                    sleep: Callable[[float], None] = _sleep, clock: Callable[[], float] = tracing.monotonic) -> str:
+    """
+    Waits on a single status. See wait_for_statuses.
+    """
+    return wait_for_statuses(lambda _: get_status(), names=[name], targets=targets, failures=failures,
+                             settle=settle, policy=policy, sleep=sleep, clock=clock)[name]
+
+
+def retry_operation(call: Callable, *, name: str, operation: str, attempts: int = SENSE_OPERATION_RETRY,
+                    policy: WaitPolicy = None, sleep: Callable[[float], None] = _sleep):
+    """
+    Runs an orchestrator operation, retrying with backoff when it raises.
+    """
+    return waiter.retry_operation(call, name=name, operation=operation, attempts=attempts,
+                                  policy=policy or get_wait_policy(), sleep=sleep)
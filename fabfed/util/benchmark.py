@@ -0,0 +1,262 @@
+import copy
+import os
+import platform
+import time
+import tracemalloc
+from contextlib import contextmanager, redirect_stdout
+from typing import Dict, List
+
+from fabfed.util.utils import get_logger
+
+logger = get_logger()
+
+SCALES = (10, 100, 1000, 10000)
+DEFAULT_THRESHOLD = 0.25
+NOISE_FLOOR = 0.005
+
+
+def generate_config(*, resources: int, fan_out: int = 1, stitch: int = 0, providers: int = 2,
+                    node_every: int = 5) -> str:
+    """
+    Generates a workflow of dummy resources spread round-robin over providers. The first 2 * stitch resources
+    are networks stitched in pairs across providers. The rest are services, and every node_every-th one a node.
+    Every other service depends on the last fan_out independent services that precede it on other providers.
+    """
+    assert resources > 0 and providers > 0
+    assert 2 * stitch <= resources, "not enough resources for the stitched networks"
+    assert stitch == 0 or providers > 1, "stitching needs at least two providers"
+
+    lines = ["provider:"]
+
+    for idx in range(providers):
+        lines.extend(["  - dummy:", f"    - prov{idx}:", f"        url: https://dummy{idx}:5000"])
+
+    if stitch:
+        lines.extend(["config:",
+                      "  - policy:",
+                      "    - dummy_policy:",
+                      "        producer: dummy",
+                      "        consumer: dummy",
+                      "        stitch_port:",
+                      "          name: dummy-port",
+                      "          provider: dummy",
+                      "          site: DUMMY",
+                      "          peer:",
+                      "            provider: dummy",
+                      "            site: DUMMY"])
+
+    lines.append("resource:")
+    independent = []
+    service_count = 0
+
+    for idx in range(resources):
+        provider = f"'{{{{ dummy.prov{idx % providers} }}}}'"
+
+        if idx < 2 * stitch:
+            lines.extend(["  - network:", f"      - net{idx}:", f"          provider: {provider}",
+                          "          site: DUMMY"])
+
+            if idx % 2:
+                lines.extend([f"          stitch_with: '{{{{ network.net{idx - 1} }}}}'",
+                              "          stitch_option:",
+                              "            policy: '{{ policy.dummy_policy }}'"])
+        elif node_every and idx % node_every == 0:
+            lines.extend(["  - node:", f"      - node{idx}:", f"          provider: {provider}",
+                          "          image: dummy_image", "          site: DUMMY"])
+        else:
+            lines.extend(["  - service:", f"      - svc{idx}:", f"          provider: {provider}",
+                          "          image: dummy_image"])
+            dependent = service_count % 2
+            service_count += 1
+            deps = [dep for dep, prov in independent if prov != idx % providers] if dependent else []
+            deps = deps[-fan_out:] if fan_out else []
+
+            if deps:
+                lines.append("          exposed_attribute_x: [" + ", ".join(
+                    f"'{{{{ service.{dep} }}}}'" for dep in deps) + "]")
+
+            if not dependent:
+                independent.append((f"svc{idx}", idx % providers))
+
+    return "\n".join(lines) + "\n"
+
+
+class StageTimer:
+    """
+    Times the stages of a benchmark run and tracks the peak memory allocated by each stage using tracemalloc.
+    """
+    def __init__(self):
+        self.stages: Dict[str, dict] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        tracemalloc.reset_peak()
+        current, _ = tracemalloc.get_traced_memory()
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            self.stages[name] = dict(duration=round(duration, 6), peak_memory=max(peak - current, 0))
+
+
+def run_benchmark(*, resources: int, fan_out: int = 1, stitch: int = 0, providers: int = 2,
+                  session: str = None) -> dict:
+    """
+    Runs a generated workflow through the parser and the controller against the dummy provider and returns
+    the duration and peak memory of each stage. The session is destroyed when done.
+    """
+    from fabfed.controller.controller import Controller
+    from fabfed.controller.provider_factory import ProviderFactory
+    from fabfed.policy.policy_helper import handle_stitch_info
+    from fabfed.util import state as sutil
+    from fabfed.util import tracing
+    from fabfed.util.config import WorkflowConfig
+    from fabfed.util.constants import Constants
+    from fabfed.util.parser import Parser
+    from fabfed.util.resource_dependency_helper import ResourceDependencyEvaluator, order_resources
+    from fabfed.util.utils import load_as_ns_from_yaml
+    from fabfed.util.variable_evaluator import Evaluator, VariableEvaluator
+
+    session = session or f"benchmark-{resources}-{os.getpid()}"
+    content = generate_config(resources=resources, fan_out=fan_out, stitch=stitch, providers=providers)
+    timer = StageTimer()
+    tracing.get_tracer().clear()
+    provider_factory = ProviderFactory()
+    started = tracemalloc.is_tracing()
+
+    if not started:
+        tracemalloc.start()
+
+    try:
+        with timer.stage('load_yaml'):
+            ns_list = load_as_ns_from_yaml(content=content)
+
+        with timer.stage('variables'):
+            variables = Parser.parse_variables(ns_list, None)
+            provider_configs = Parser.parse_providers(ns_list)
+            configs = Parser.parse_configs(ns_list)
+            base_configs = Parser.parse_resource_base_configs(ns_list)
+            variable_evaluator = VariableEvaluator(variables=variables, providers=provider_configs, configs=configs,
+                                                   resources=base_configs)
+            provider_configs, configs, base_configs = variable_evaluator.evaluate()
+
+        with timer.stage('evaluator'):
+            evaluator = Evaluator(providers=provider_configs, configs=configs, resources=base_configs)
+            provider_configs, configs, base_configs = evaluator.evaluate()
+            resource_configs = Parser._filter_resources(base_configs, provider_configs)
+            Parser._validate_resources(resource_configs)
+
+        with timer.stage('order_resources'):
+            dependency_map = ResourceDependencyEvaluator(resource_configs, provider_configs).evaluate()
+            resource_configs = order_resources(dependency_map)
+
+        config = WorkflowConfig(provider_configs=provider_configs, resource_configs=resource_configs)
+
+        with timer.stage('handle_stitch_info'):
+            temp = copy.deepcopy(config)
+            handle_stitch_info(temp, None, temp.get_resource_configs())
+
+        controller = Controller(config=config)
+
+        with timer.stage('init'):
+            controller.init(session=session, provider_factory=provider_factory, provider_states=[])
+
+        with timer.stage('plan'):
+            controller.plan(provider_states=[])
+
+        with timer.stage('dump_plan'), open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            sutil.dump_plan(resources=controller.resources, to_json=True, summary=False)
+
+        with timer.stage('add'):
+            controller.add(provider_states=[])
+
+        with timer.stage('apply'):
+            controller.apply(provider_states=[])
+
+        states = controller.get_states()
+
+        with timer.stage('save_states'):
+            sutil.save_states(states, session)
+
+        with timer.stage('load_states'):
+            saved_states = sutil.load_states(session)
+
+        with timer.stage('reconcile_states'):
+            sutil.reconcile_states(states, session)
+    finally:
+        if not started:
+            tracemalloc.stop()
+
+        tracing.get_tracer().clear()
+
+        if os.path.isdir(sutil.get_base_dir(session)):
+            sutil.destroy_session(session)
+
+    created = sum(state.number_of_created_resources() for state in saved_states)
+    total = sum(state.number_of_total_resources() for state in saved_states)
+
+    if created != total:
+        from fabfed.exceptions import FabfedException
+
+        raise FabfedException(f"Benchmark created {created} out of {total} resource(s)")
+
+    return dict(resources=resources, fan_out=fan_out, stitch=stitch, providers=providers,
+                resource_count=len(resource_configs),
+                networks=len([r for r in resource_configs if r.type == Constants.RES_TYPE_NETWORK]),
+                stages=timer.stages)
+
+
+def benchmark_key(result: dict) -> str:
+    return f"resources={result['resources']},fan_out={result['fan_out']},stitch={result['stitch']}," \
+           f"providers={result['providers']}"
+
+
+def to_record(result: dict, now: float = None) -> dict:
+    now = now or time.time()
+    return dict(timestamp=time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(now)),
+                time=now,
+                key=benchmark_key(result),
+                python=platform.python_version(),
+                result=result)
+
+
+def get_history():
+    from fabfed.util.stats_history import StatsHistory
+    from fabfed.util.utils import get_benchmark_history_file
+
+    return StatsHistory(get_benchmark_history_file())
+
+
+def regressions(result: dict, records: List[dict], *, threshold=DEFAULT_THRESHOLD, noise_floor=NOISE_FLOOR,
+                baseline_runs=5) -> Dict[str, dict]:
+    """
+    Compares the stage durations of a result to the median of the last baseline_runs recorded runs with the
+    same parameters. A stage regressed when it is slower by more than threshold and by more than noise_floor
+    seconds.
+    """
+    from fabfed.util.stats_history import percentile
+
+    key = benchmark_key(result)
+    previous = [r['result'] for r in records if r.get('key') == key][-baseline_runs:]
+    ret = {}
+
+    if not previous:
+        return ret
+
+    for name, stage in result['stages'].items():
+        durations = [p['stages'][name]['duration'] for p in previous if name in p.get('stages', {})]
+
+        if not durations:
+            continue
+
+        baseline = percentile(durations, 50)
+        delta = stage['duration'] - baseline
+
+        if delta > noise_floor and delta > baseline * threshold:
+            ret[name] = dict(baseline=round(baseline, 6), duration=stage['duration'],
+                             change=f"{delta / baseline * 100:+.1f}%" if baseline else None)
+
+    return ret
@@ -0,0 +1,486 @@
+"""
+Record and replay of the traffic between the providers and their endpoints.
+
+While recording, every call a provider makes through its api client is written to a cassette, one json line per
+call: the service, the operation, its arguments, its response or exception and when it started and how long it
+took. Clients are recorded where the providers build them:
+
+    aws       the boto3 clients of aws_utils.client_pool
+    gcp       the compute clients of gcp_utils.GcpSession
+    sense     the RequestWrapper of sense_client
+    cloudlab  the xmlrpc server of CloudlabProvider
+
+fablib and python-chi expose object models rather than clients, so their traffic, and any other traffic not made
+through one of the clients above, is recorded below them as http requests sent through urllib3.
+
+While replaying, the clients are not built and no request leaves the process. Each call gets the response of the
+next recorded call with the same service, operation and arguments, or, as arguments often hold generated names
+and timestamps, of the next one of the same operation. Calls take the time they took when recorded, times the
+scale, and the wait loops of the providers run on a clock of the same scale. Cassettes can hold credentials,
+tokens among them, and replaying one imports the classes it names, so only replay cassettes you recorded.
+
+    with Cassette(file_path, mode=REPLAY, scale=0.1).installed():
+        ...  # the workflow runs against the recorded responses, ten times faster
+"""
+import base64
+import datetime
+import hashlib
+import importlib
+import io
+import json
+import os
+import threading
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Callable, Dict, List
+
+from fabfed.exceptions import CassetteException
+from fabfed.util import tracing
+from fabfed.util.utils import get_logger
+
+logger = get_logger()
+
+RECORD = 'record'
+REPLAY = 'replay'
+HTTP = 'http'
+CASSETTE_DIR = 'cassettes'
+MAX_DEPTH = 16
+
+_cassette = None
+_local = threading.local()
+
+
+def get_cassette_path(friendly_name: str, action: str) -> str:
+    from fabfed.util.utils import get_stats_base_dir
+
+    return os.path.join(get_stats_base_dir(friendly_name), CASSETTE_DIR, f"{action}.jsonl")
+
+
+def get_cassette():
+    return _cassette
+
+
+def replaying() -> bool:
+    cassette = _cassette
+    return cassette is not None and not cassette.recording
+
+
+def wrap(service: str, create: Callable, **options):
+    """
+    The client built by create, recorded or replayed by the installed cassette. Without a cassette, the client.
+    """
+    cassette = _cassette
+    return cassette.wrap(service, create, **options) if cassette else create()
+
+
+@contextmanager
+def _claim():
+    """
+    Marks the calls made by the current thread as recorded, so the http requests they send are not recorded twice.
+    """
+    _local.depth = getattr(_local, 'depth', 0) + 1
+
+    try:
+        yield
+    finally:
+        _local.depth -= 1
+
+
+def _claimed() -> bool:
+    return getattr(_local, 'depth', 0) > 0
+
+
+def _name(cls) -> str:
+    return f"{cls.__module__}:{cls.__qualname__}"
+
+
+def _lookup(name: str):
+    module, _, qualname = name.partition(':')
+
+    try:
+        obj = importlib.import_module(module)
+
+        for part in qualname.split('.'):
+            obj = getattr(obj, part)
+    except (ImportError, AttributeError) as e:
+        raise CassetteException(f"cannot load {name}:{e}")
+
+    return obj
+
+
+def to_data(value, _path=()):
+    """
+    A json representation of the arguments and responses of calls. Values that cannot be represented are kept as
+    their repr.
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+
+    if isinstance(value, bytes):
+        return {'__bytes__': base64.b64encode(value).decode()}
+
+    if isinstance(value, datetime.datetime):
+        return {'__datetime__': value.isoformat()}
+
+    if id(value) in _path or len(_path) >= MAX_DEPTH:
+        return repr(value)
+
+    path = _path + (id(value),)
+
+    if isinstance(value, (list, tuple, set)):
+        return [to_data(v, path) for v in value]
+
+    if isinstance(value, dict):
+        if all(isinstance(k, str) for k in value):
+            return {k: to_data(v, path) for k, v in value.items()}
+
+        return {'__items__': [[to_data(k, path), to_data(v, path)] for k, v in value.items()]}
+
+    cls = type(value)
+
+    # The proto-plus messages of the google clients.
+    if hasattr(cls, 'pb') and hasattr(cls, 'to_json'):
+        return {'__proto__': _name(cls), 'json': cls.to_json(value)}
+
+    if hasattr(value, '__dict__') and not callable(value):
+        return {'__object__': _name(cls), 'attrs': to_data(vars(value), path)}
+
+    return repr(value)
+
+
+def _hashable(value):
+    return tuple(_hashable(v) for v in value) if isinstance(value, list) else value
+
+
+def from_data(data):
+    if isinstance(data, list):
+        return [from_data(v) for v in data]
+
+    if not isinstance(data, dict):
+        return data
+
+    keys = set(data)
+
+    if keys == {'__bytes__'}:
+        return base64.b64decode(data['__bytes__'])
+
+    if keys == {'__datetime__'}:
+        return datetime.datetime.fromisoformat(data['__datetime__'])
+
+    if keys == {'__items__'}:
+        return {_hashable(from_data(k)): from_data(v) for k, v in data['__items__']}
+
+    if keys == {'__proto__', 'json'}:
+        return _lookup(data['__proto__']).from_json(data['json'], ignore_unknown_fields=True)
+
+    if keys == {'__object__', 'attrs'}:
+        cls = _lookup(data['__object__'])
+        obj = cls.__new__(cls)
+        obj.__dict__.update(from_data(data['attrs']))
+        return obj
+
+    return {k: from_data(v) for k, v in data.items()}
+
+
+def _error_data(e: Exception) -> dict:
+    try:
+        message = str(e)
+    except Exception:
+        message = repr(e)
+
+    return dict(type=_name(type(e)), message=message, args=to_data(e.args), attrs=to_data(vars(e)))
+
+
+def _error(data: dict) -> Exception:
+    try:
+        cls = _lookup(data['type'])
+    except CassetteException:
+        cls = None
+
+    if not isinstance(cls, type) or not issubclass(cls, Exception):
+        return CassetteException(f"{data['type']}:{data['message']}")
+
+    # Built without calling the constructor, whose signature varies, so handlers see the recorded type and fields.
+    e = cls.__new__(cls)
+    e.args = tuple(from_data(data['args']))
+    e.__dict__.update(from_data(data['attrs']))
+    return e
+
+
+def _digest(body):
+    if body is None:
+        return None
+
+    if isinstance(body, str):
+        body = body.encode()
+
+    return hashlib.sha256(body).hexdigest() if isinstance(body, bytes) else 'stream'
+
+
+class CassetteProxy:
+    """
+    Stands for a client. Its methods are recorded or replayed. Methods listed in nested return clients whose
+    methods are in turn recorded, i.e. boto3 paginators, and the results of methods listed in iterables are
+    recorded as lists. While replaying, attributes are read from the given ones.
+    """
+    def __init__(self, cassette, service: str, target=None, *, nested=(), iterables=(), attributes=None):
+        self._cassette = cassette
+        self._service = service
+        self._target = target
+        self._nested = nested
+        self._iterables = iterables
+        self._attributes = attributes or {}
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        attr = None
+
+        if self._target is not None:
+            attr = getattr(self._target, name)
+
+            if not callable(attr):
+                return attr
+        elif name in self._attributes:
+            return self._attributes[name]
+
+        def method(*args, **kwargs):
+            if name in self._nested:
+                target = attr(*args, **kwargs) if attr else None
+                signature = json.dumps(to_data([args, kwargs]), sort_keys=True)
+                return CassetteProxy(self._cassette, f"{self._service}.{name}{signature}", target,
+                                     iterables=self._iterables)
+
+            if name in self._iterables:
+                return self._cassette.call(self._service, name, dict(args=args, kwargs=kwargs),
+                                           lambda: list(attr(*args, **kwargs)))
+
+            return self._cassette.call(self._service, name, dict(args=args, kwargs=kwargs),
+                                       lambda: attr(*args, **kwargs))
+
+        return method
+
+
+class Cassette:
+    """
+    A cassette recording to, or replaying from, a json lines file. See the module documentation.
+    """
+    def __init__(self, file_path: str, *, mode: str = RECORD, scale: float = 1.0):
+        if mode not in [RECORD, REPLAY]:
+            raise CassetteException(f"cassette mode must be one of {[RECORD, REPLAY]}:{mode}")
+
+        if scale <= 0:
+            raise CassetteException(f"cassette scale must be positive:{scale}")
+
+        self.file_path = file_path
+        self.mode = mode
+        self.scale = scale
+        self.interactions: List[dict] = []
+        self._by_request: Dict[str, deque] = defaultdict(deque)
+        self._by_operation: Dict[tuple, deque] = defaultdict(deque)
+        self._stream = None
+        self._started = 0
+        self._undo = []
+        self._lock = threading.Lock()
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == RECORD
+
+    def load(self):
+        if not os.path.exists(self.file_path):
+            raise CassetteException(f"cassette {self.file_path} not found")
+
+        with open(self.file_path, 'r') as stream:
+            for line in stream:
+                if line.strip():
+                    self._index(json.loads(line))
+
+    def _index(self, entry: dict):
+        self.interactions.append(entry)
+        key = self._key(entry['service'], entry['operation'], entry.get('request'))
+        self._by_request[key].append(entry)
+        self._by_operation[(entry['service'], entry['operation'])].append(entry)
+
+    @staticmethod
+    def _key(service: str, operation: str, request) -> str:
+        return json.dumps([service, operation, request], sort_keys=True)
+
+    def start(self):
+        global _cassette
+
+        if _cassette is not None:
+            raise CassetteException(f"cassette {_cassette.file_path} already installed")
+
+        if self.recording:
+            os.makedirs(os.path.dirname(os.path.abspath(self.file_path)), exist_ok=True)
+            self._stream = open(self.file_path, 'w')
+            logger.info(f"Recording provider traffic to {self.file_path}")
+        else:
+            from fabfed.util.fakes import ScaledClock
+
+            self.load()
+            clock = ScaledClock(self.scale)
+            previous = tracing.set_clock(clock.sleep, clock)
+            self._undo.append(lambda: tracing.set_clock(*previous))
+            logger.info(f"Replaying {len(self.interactions)} calls from {self.file_path}:scale={self.scale}")
+
+        unpatch = _patch_urllib3(self)
+
+        if unpatch:
+            self._undo.append(unpatch)
+
+        self._started = tracing.monotonic()
+        _cassette = self
+
+    def stop(self):
+        global _cassette
+
+        if _cassette is not self:
+            return
+
+        _cassette = None
+
+        while self._undo:
+            self._undo.pop()()
+
+        if self._stream:
+            self._stream.close()
+            self._stream = None
+            logger.info(f"Recorded {len(self.interactions)} calls to {self.file_path}")
+        elif self.unused():
+            logger.warning(f"{len(self.unused())} recorded calls of {self.file_path} were not replayed")
+
+    @contextmanager
+    def installed(self):
+        self.start()
+
+        try:
+            yield self
+        finally:
+            self.stop()
+
+    def unused(self) -> List[dict]:
+        with self._lock:
+            return [entry for entry in self.interactions if not entry.get('replayed')]
+
+    def wrap(self, service: str, create: Callable, *, nested=(), iterables=(), attributes=None):
+        if not self.recording:
+            return CassetteProxy(self, service, nested=nested, iterables=iterables, attributes=attributes)
+
+        with _claim():
+            target = create()
+
+        return CassetteProxy(self, service, target, nested=nested, iterables=iterables)
+
+    def call(self, service: str, operation: str, request, func: Callable):
+        """
+        Records the call made by func, or replays the recorded response, or exception, of the call.
+        """
+        request = to_data(request)
+
+        if not self.recording:
+            return self._replay(service, operation, request)
+
+        start = tracing.monotonic()
+        entry = dict(service=service, operation=operation, request=request,
+                     thread=threading.current_thread().name, start=start - self._started)
+
+        try:
+            with _claim():
+                result = func()
+
+            entry['response'] = to_data(result)
+            return result
+        except Exception as e:
+            entry['error'] = _error_data(e)
+            raise
+        finally:
+            entry['duration'] = tracing.monotonic() - start
+            self._write(entry)
+
+    def _write(self, entry: dict):
+        line = json.dumps(entry, default=repr)
+
+        with self._lock:
+            self.interactions.append(entry)
+
+            if self._stream:
+                self._stream.write(line + '\n')
+                self._stream.flush()
+
+    @staticmethod
+    def _take(entries: deque):
+        while entries:
+            entry = entries.popleft()
+
+            if not entry.get('replayed'):
+                entry['replayed'] = True
+                return entry
+
+        return None
+
+    def _replay(self, service: str, operation: str, request):
+        with self._lock:
+            entry = self._take(self._by_request[self._key(service, operation, request)])
+
+            if entry is None:
+                entry = self._take(self._by_operation[(service, operation)])
+
+                if entry is not None:
+                    logger.debug(f"Replaying {service}:{operation} recorded with other arguments")
+
+        if entry is None:
+            raise CassetteException(f"no recorded call {service}:{operation} left to replay for {request}")
+
+        if entry.get('duration'):
+            tracing.sleep(entry['duration'], name=f"replay:{service}:{operation}")
+
+        if 'error' in entry:
+            raise _error(entry['error'])
+
+        return from_data(entry.get('response'))
+
+
+def _patch_urllib3(cassette: Cassette):
+    """
+    Routes the requests urllib3 sends, other than those of recorded calls, through the cassette. Returns the
+    function undoing it, or None without urllib3.
+    """
+    try:
+        from urllib3.connectionpool import HTTPConnectionPool
+        from urllib3.response import HTTPResponse
+    except ImportError:
+        return None
+
+    original = HTTPConnectionPool.urlopen
+
+    def urlopen(pool, method, url, body=None, headers=None, *args, **kwargs):
+        if args or _claimed():
+            return original(pool, method, url, body, headers, *args, **kwargs)
+
+        def send():
+            response = original(pool, method, url, body, headers, **dict(kwargs, preload_content=False))
+
+            try:
+                content = response.read(decode_content=False)
+            finally:
+                response.release_conn()
+
+            return dict(status=response.status, reason=response.reason, headers=list(response.headers.items()),
+                        body=content)
+
+        recorded = cassette.call(HTTP, f"{method} {pool.scheme}://{pool.host}:{pool.port}",
+                                 dict(url=url, body=_digest(body)), send)
+        return HTTPResponse(body=io.BytesIO(recorded['body']), headers=recorded['headers'],
+                            status=recorded['status'], reason=recorded['reason'],
+                            preload_content=kwargs.get('preload_content', True),
+                            decode_content=kwargs.get('decode_content', True), request_method=method)
+
+    HTTPConnectionPool.urlopen = urlopen
+
+    def unpatch():
+        HTTPConnectionPool.urlopen = original
+
+    return unpatch
@@ -38,6 +38,8 @@ class Constants:
     RES_PEER_LAYER3 = 'peer_layer3'
     RES_LAYER3_DHCP_START = 'ip_start'
     RES_LAYER3_DHCP_END = 'ip_end'
+    RES_SUBNET_POOL = 'subnet_pool'
+    RES_SUBNET_PREFIX_LENGTH = 'prefix_length'
 
     RES_INTERFACES = 'interface'
     RES_NODES = 'node'
@@ -0,0 +1,50 @@
+import random
+from typing import Union
+
+from fabfed.exceptions import FabfedException
+
+
+class Distribution:
+    """
+    A number of seconds. The config is either a number, which is used as is, or a dictionary naming a
+    distribution and its parameters:
+
+        {distribution: uniform, min: 1, max: 5}
+        {distribution: normal, mean: 10, stddev: 2}
+        {distribution: lognormal, mu: 2, sigma: 0.5}
+        {distribution: exponential, mean: 3}
+
+    Samples are never negative.
+    """
+    SAMPLERS = dict(constant=lambda rng, value=0: value,
+                    uniform=lambda rng, min=0, max=0: rng.uniform(min, max),
+                    normal=lambda rng, mean=0, stddev=0: rng.gauss(mean, stddev),
+                    lognormal=lambda rng, mu=0, sigma=0: rng.lognormvariate(mu, sigma),
+                    exponential=lambda rng, mean=0: rng.expovariate(1 / mean) if mean else 0)
+
+    def __init__(self, config: Union[int, float, dict, None]):
+        if config is None:
+            config = 0
+
+        if isinstance(config, (int, float)):
+            config = dict(distribution='constant', value=config)
+
+        if not isinstance(config, dict):
+            raise FabfedException(f"bad distribution {config}")
+
+        params = config.copy()
+        name = params.pop('distribution', 'constant')
+
+        if name not in self.SAMPLERS:
+            raise FabfedException(f"distribution {name} not in {list(self.SAMPLERS)}")
+
+        try:
+            self.SAMPLERS[name](random.Random(0), **params)
+        except (TypeError, ValueError) as e:
+            raise FabfedException(f"bad parameters for distribution {name}:{params}:{e}")
+
+        self.name = name
+        self.params = params
+
+    def sample(self, rng: random.Random) -> float:
+        return max(0.0, float(self.SAMPLERS[self.name](rng, **self.params)))
@@ -0,0 +1,150 @@
+import random
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Dict, List, Tuple
+
+from fabfed.exceptions import FabfedException
+from fabfed.util import tracing
+from fabfed.util.distribution import Distribution
+
+REQUEST = 'request'
+
+
+class ScaledClock:
+    """
+    The time of fake endpoints. With a scale below 1 time runs faster: sleeping 20 seconds takes 20 * scale
+    seconds and the clock then reads 20 seconds later. Sleeps are real, so the waits of concurrent threads
+    overlap as they do against live endpoints.
+    """
+    def __init__(self, scale: float = 1.0):
+        if scale <= 0:
+            raise FabfedException(f"clock scale must be positive:{scale}")
+
+        self.scale = scale
+        self._start = time.monotonic()
+
+    def __call__(self) -> float:
+        return (time.monotonic() - self._start) / self.scale
+
+    def sleep(self, seconds: float):
+        time.sleep(max(seconds, 0) * self.scale)
+
+    @contextmanager
+    def installed(self):
+        """
+        Makes the wait loops of the providers, which sleep and time their waits using tracing, use this clock.
+        """
+        previous = tracing.set_clock(self.sleep, self)
+
+        try:
+            yield self
+        finally:
+            tracing.set_clock(*previous)
+
+
+class Lifecycle:
+    """
+    The states a fake resource goes through once a transition starts. Each step is a state and the seconds it
+    lasts. The resource then stays in the final state.
+    """
+    def __init__(self, *, started: float, steps: List[Tuple[str, float]], final: str):
+        self.started = started
+        self.steps = steps
+        self.final = final
+
+    @property
+    def done_at(self) -> float:
+        return self.started + sum(duration for _, duration in self.steps)
+
+    def state(self, now: float) -> str:
+        elapsed = now - self.started
+
+        for state, duration in self.steps:
+            if elapsed < duration:
+                return state
+
+            elapsed -= duration
+
+        return self.final
+
+
+class FakeBackend:
+    """
+    Base of the in-process stand-ins for the AWS, GCP and SENSE endpoints.
+
+    timing maps each transition listed in TRANSITIONS to the seconds it takes, given as a number or as a
+    distribution like the dummy provider's simulation. The request transition is the latency of every call.
+    failures maps transitions to the probability that they fail, for the backends that can fail them.
+    Transitions without timing are immediate and never fail. Durations and failures are drawn from generators
+    seeded by the seed, the transition and the resource, so runs are reproducible.
+
+    Each call is counted in calls, keyed by operation, so that tests and benchmarks can check the number of
+    requests a code path makes.
+    """
+    TRANSITIONS: List[str] = [REQUEST]
+
+    def __init__(self, *, timing: dict = None, failures: dict = None, seed: int = 0,
+                 clock: Callable[[], float] = None):
+        timing = timing or {}
+        failures = failures or {}
+
+        for key in list(timing) + list(failures):
+            if key not in self.TRANSITIONS:
+                raise FabfedException(f"transition {key} not in {self.TRANSITIONS}")
+
+        self.timing = {transition: Distribution(v) for transition, v in timing.items()}
+        self.failures = {transition: float(v) for transition, v in failures.items()}
+        self.seed = seed
+        self.clock = clock or ScaledClock()
+        self.calls: Dict[str, int] = Counter()
+        self._ids = Counter()
+        self._lock = threading.RLock()
+
+    def sleeping(self):
+        """
+        Context making the wait loops of the providers use the clock of the backend, if it is a ScaledClock.
+        """
+        installed = getattr(self.clock, 'installed', None)
+        return installed() if installed else nullcontext()
+
+    def _sleep(self, seconds: float):
+        sleep = getattr(self.clock, 'sleep', time.sleep)
+        sleep(seconds)
+
+    def rng(self, transition: str, name: str) -> random.Random:
+        return random.Random(f"{self.seed}:{transition}:{name}")
+
+    def duration(self, transition: str, name: str) -> float:
+        distribution = self.timing.get(transition)
+        return distribution.sample(self.rng(transition, name)) if distribution else 0
+
+    def fails(self, transition: str, name: str) -> bool:
+        return self.rng(f"{transition}:failure", name).random() < self.failures.get(transition, 0)
+
+    def lifecycle(self, name: str, *steps: Tuple[str, str], final: str) -> Lifecycle:
+        """
+        A lifecycle starting now. Each step is a state and the transition whose timing it lasts.
+        """
+        return Lifecycle(started=self.clock(),
+                         steps=[(state, self.duration(transition, name)) for state, transition in steps],
+                         final=final)
+
+    def next_id(self, prefix: str) -> str:
+        with self._lock:
+            self._ids[prefix] += 1
+            return f"{prefix}-{self._ids[prefix]:08x}"
+
+    def call(self, operation: str):
+        """
+        Counts a call and takes the request latency.
+        """
+        with self._lock:
+            self.calls[operation] += 1
+            count = self.calls[operation]
+
+        latency = self.duration(REQUEST, f"{operation}:{count}")
+
+        if latency:
+            self._sleep(latency)
@@ -0,0 +1,169 @@
+import json
+import os
+import re
+import threading
+from typing import Dict
+
+from fabfed.util.utils import get_logger
+
+logger = get_logger()
+
+INVENTORY_INI = 'hosts.ini'
+INVENTORY_JSON = 'inventory.json'
+LABEL_GROUP_PREFIX = 'label_'
+PROVIDER_GROUP_PREFIX = 'provider_'
+
+
+def _group_name(prefix: str, name: str) -> str:
+    return prefix + re.sub(r'[^A-Za-z0-9_]', '_', name)
+
+
+class Inventory:
+    """
+    Ansible inventory of the nodes created under a provider name. Nodes are added and removed in memory and the
+    inventory is written once per phase by flush: an ini file in the inventory directory and the same hosts in
+    json dynamic inventory form next to it.
+
+    In the ini file, each node keeps its own group holding its host and vars. In the json form, each node is a host
+    named after the node. Nodes are also grouped per provider label and per resource label.
+    """
+    def __init__(self, friendly_name: str):
+        self.friendly_name = friendly_name
+        self.nodes: Dict[str, dict] = {}
+        self.dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    @property
+    def inventory_dir(self) -> str:
+        from fabfed.util.utils import get_inventory_dir
+
+        return get_inventory_dir(self.friendly_name)
+
+    @property
+    def ini_path(self) -> str:
+        return os.path.join(self.inventory_dir, INVENTORY_INI)
+
+    @property
+    def json_path(self) -> str:
+        return os.path.join(os.path.dirname(self.inventory_dir), INVENTORY_JSON)
+
+    def _load(self):
+        if not os.path.isfile(self.json_path):
+            return
+
+        try:
+            with open(self.json_path, 'r') as fp:
+                self.nodes = json.load(fp).get('_meta', {}).get('fabfed_nodes', {})
+        except Exception as e:
+            logger.warning(f"Could not load ansible inventory {self.json_path}:{e}")
+
+    def add(self, *, name: str, host: str, host_vars: dict, provider_label: str = None, label: str = None):
+        entry = dict(host=host, vars=host_vars, provider=provider_label, label=label)
+
+        with self._lock:
+            if self.nodes.get(name) != entry:
+                self.nodes[name] = entry
+                self.dirty = True
+
+    def remove(self, name: str):
+        with self._lock:
+            if self.nodes.pop(name, None) is not None:
+                self.dirty = True
+
+    def groups(self) -> Dict[str, list]:
+        groups = {}
+
+        for name, entry in self.nodes.items():
+            if entry.get('provider'):
+                groups.setdefault(_group_name(PROVIDER_GROUP_PREFIX, entry['provider']), []).append(name)
+
+            if entry.get('label'):
+                groups.setdefault(_group_name(LABEL_GROUP_PREFIX, entry['label']), []).append(name)
+
+        return groups
+
+    def to_ini(self) -> str:
+        lines = []
+
+        for name, entry in self.nodes.items():
+            lines.append(f"[{name}]")
+            lines.append(f"{entry['host']}")
+            lines.append(f"[{name}:vars]")
+            lines.extend(f"{k}={v if v is not None else ''}" for k, v in entry['vars'].items())
+
+        for group, children in self.groups().items():
+            lines.append(f"[{group}:children]")
+            lines.extend(children)
+
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def to_json(self) -> dict:
+        # Hosts are named after the nodes, not their addresses, as nodes can share an address, i.e. behind
+        # different ports of one host.
+        hostvars = {name: dict(entry['vars'], ansible_host=entry['host']) for name, entry in self.nodes.items()}
+        inventory = {group: dict(hosts=names) for group, names in self.groups().items()}
+        inventory['all'] = dict(hosts=list(self.nodes), children=list(inventory.keys()))
+        inventory['_meta'] = dict(hostvars=hostvars, fabfed_nodes=self.nodes)
+        return inventory
+
+    @staticmethod
+    def _write(path: str, content: str):
+        import shutil
+
+        temp_path = path + ".temp"
+
+        with open(temp_path, "w") as stream:
+            try:
+                stream.write(content)
+            except Exception as e:
+                from fabfed.exceptions import AnsibleException
+
+                raise AnsibleException(f'Exception while saving ansible inventory at {temp_path}:{e}')
+
+        shutil.move(temp_path, path)
+
+    def _remove_node_files(self):
+        prefix = f"{self.friendly_name}-"
+
+        for file_name in os.listdir(self.inventory_dir):
+            if file_name.startswith(prefix) and not file_name.endswith(".temp"):
+                try:
+                    os.unlink(os.path.join(self.inventory_dir, file_name))
+                except OSError:
+                    pass
+
+    def flush(self):
+        with self._lock:
+            if not self.dirty:
+                return
+
+            self._remove_node_files()
+            self._write(self.ini_path, self.to_ini())
+            self._write(self.json_path, json.dumps(self.to_json(), indent=2))
+            self.dirty = False
+
+        logger.info(f"Wrote ansible inventory {self.ini_path} with {len(self.nodes)} node(s)")
+
+
+_inventories: Dict[str, Inventory] = {}
+_inventories_lock = threading.Lock()
+
+
+def get_inventory(friendly_name: str) -> Inventory:
+    with _inventories_lock:
+        if friendly_name not in _inventories:
+            _inventories[friendly_name] = Inventory(friendly_name)
+
+        return _inventories[friendly_name]
+
+
+def flush_inventories():
+    with _inventories_lock:
+        inventories = list(_inventories.values())
+
+    for inventory in inventories:
+        try:
+            inventory.flush()
+        except Exception as e:
+            logger.warning(f"Exception while writing ansible inventory of {inventory.friendly_name}:{e}")
@@ -0,0 +1,224 @@
+from bisect import bisect_right
+from ipaddress import ip_address, IPv4Address, IPv6Address
+from typing import List, Tuple, Union
+
+from fabfed.exceptions import ResourceNotAvailable
+
+Address = Union[str, int, IPv4Address, IPv6Address]
+
+
+class IPPool:
+    """
+    Pool of free addresses kept as sorted, disjoint [first, last] integer intervals.
+
+    Addresses are handed out lazily so a /16 range costs a couple of integers rather than 65k address objects.
+    Finding the interval that holds an address is a binary search.
+    """
+
+    def __init__(self, first: Address, last: Address, version: int = None):
+        if version is None:
+            version = ip_address(first).version if not isinstance(first, int) else 4
+
+        self.version = version
+        self._address_class = IPv4Address if version == 4 else IPv6Address
+        first = self._to_int(first)
+        last = self._to_int(last)
+        self._firsts: List[int] = []
+        self._lasts: List[int] = []
+        self._size = 0
+
+        if first <= last:
+            self._firsts.append(first)
+            self._lasts.append(last)
+            self._size = last - first + 1
+
+    @staticmethod
+    def from_layer3(ip_start: Address, ip_end: Address):
+        """
+        Builds the pool handed out to nodes on a layer3 network. The start address of the dhcp range is
+        not handed out.
+        """
+        first = IPPool._as_address(ip_start)
+        return IPPool(int(first) + 1, ip_end, version=first.version)
+
+    @staticmethod
+    def _as_address(addr: Address):
+        return addr if isinstance(addr, (IPv4Address, IPv6Address)) else ip_address(addr)
+
+    def _to_int(self, addr: Address) -> int:
+        if isinstance(addr, int):
+            return addr
+
+        addr = self._as_address(addr)
+
+        if addr.version != self.version:
+            raise ValueError(f"expected an IPv{self.version} address: {addr}")
+
+        return int(addr)
+
+    def _find(self, value: int) -> int:
+        idx = bisect_right(self._firsts, value) - 1
+
+        if idx >= 0 and value <= self._lasts[idx]:
+            return idx
+
+        return -1
+
+    def __len__(self):
+        return self._size
+
+    def __bool__(self):
+        return self._size > 0
+
+    def __contains__(self, addr: Address):
+        try:
+            return self._find(self._to_int(addr)) >= 0
+        except ValueError:
+            return False
+
+    def __iter__(self):
+        for first, last in zip(list(self._firsts), list(self._lasts)):
+            for value in range(first, last + 1):
+                yield self._address_class(value)
+
+    def __repr__(self):
+        return f"IPPool(version={self.version}, free={self._size}, intervals={self.intervals()})"
+
+    def intervals(self) -> List[Tuple]:
+        return [(self._address_class(f), self._address_class(l)) for f, l in zip(self._firsts, self._lasts)]
+
+    def reserve(self, addr: Address) -> bool:
+        """
+        Removes addr from the pool. Returns False if addr was not free.
+        """
+        try:
+            value = self._to_int(addr)
+        except ValueError:
+            return False
+
+        idx = self._find(value)
+
+        if idx < 0:
+            return False
+
+        first, last = self._firsts[idx], self._lasts[idx]
+
+        if first == last:
+            del self._firsts[idx]
+            del self._lasts[idx]
+        elif value == first:
+            self._firsts[idx] = value + 1
+        elif value == last:
+            self._lasts[idx] = value - 1
+        else:
+            self._lasts[idx] = value - 1
+            self._firsts.insert(idx + 1, value + 1)
+            self._lasts.insert(idx + 1, last)
+
+        self._size -= 1
+        return True
+
+    def reserve_range(self, first: Address, last: Address) -> int:
+        """
+        Removes every free address in [first, last] from the pool. Returns how many were removed.
+        """
+        first = self._to_int(first)
+        last = self._to_int(last)
+        removed = 0
+        firsts = []
+        lasts = []
+
+        for f, l in zip(self._firsts, self._lasts):
+            if l < first or f > last:
+                firsts.append(f)
+                lasts.append(l)
+                continue
+
+            if f < first:
+                firsts.append(f)
+                lasts.append(first - 1)
+
+            if l > last:
+                firsts.append(last + 1)
+                lasts.append(l)
+
+            removed += min(l, last) - max(f, first) + 1
+
+        self._firsts = firsts
+        self._lasts = lasts
+        self._size -= removed
+        return removed
+
+    def release(self, addr: Address):
+        """
+        Returns addr to the pool, merging it with adjacent free intervals.
+        """
+        value = self._to_int(addr)
+
+        if self._find(value) >= 0:
+            return
+
+        idx = bisect_right(self._firsts, value)
+        merge_prev = idx > 0 and self._lasts[idx - 1] == value - 1
+        merge_next = idx < len(self._firsts) and self._firsts[idx] == value + 1
+
+        if merge_prev and merge_next:
+            self._lasts[idx - 1] = self._lasts[idx]
+            del self._firsts[idx]
+            del self._lasts[idx]
+        elif merge_prev:
+            self._lasts[idx - 1] = value
+        elif merge_next:
+            self._firsts[idx] = value
+        else:
+            self._firsts.insert(idx, value)
+            self._lasts.insert(idx, value)
+
+        self._size += 1
+
+    def allocate(self):
+        """
+        Hands out the lowest free address.
+        """
+        if not self._size:
+            raise ResourceNotAvailable(f"no free address left in {self}")
+
+        value = self._firsts[0]
+        self.reserve(value)
+        return self._address_class(value)
+
+    def allocate_block(self, size: int, aligned: bool = False) -> Tuple:
+        """
+        Hands out the lowest contiguous block of size addresses as a (first, last) tuple. When aligned is set
+        the block starts on a multiple of size, which is what carving a subnet out of a larger prefix needs.
+        """
+        assert size > 0
+
+        for first, last in zip(self._firsts, self._lasts):
+            start = -(-first // size) * size if aligned else first
+
+            if start + size - 1 <= last:
+                self.reserve_range(start, start + size - 1)
+                return self._address_class(start), self._address_class(start + size - 1)
+
+        raise ResourceNotAvailable(f"no free block of {size} address(es) left in {self}")
+
+    def partition(self, count: int) -> List[Tuple]:
+        """
+        Splits the span of the pool into count contiguous (first, last) ranges of near equal size.
+        """
+        assert count > 0
+
+        if not self._size:
+            return []
+
+        first, last = self._firsts[0], self._lasts[-1]
+        chunk = (last - first) // count + 1
+        ranges = []
+
+        for _ in range(count):
+            end = min(first + chunk - 1, last)
+            ranges.append((self._address_class(first), self._address_class(end)))
+            first = end + 1
+
+        return ranges
@@ -0,0 +1,236 @@
+from contextlib import contextmanager
+from ipaddress import ip_address, ip_network
+from typing import List, Tuple
+
+from fabfed.exceptions import ControllerException, ResourceNotAvailable
+from fabfed.util.constants import Constants
+from fabfed.util.ip_pool import IPPool
+from fabfed.util.utils import get_logger
+from fabfed.util.yaml_store import YamlStore
+
+logger = get_logger()
+
+SESSIONS = 'sessions'
+LAYER3 = 'layer3'
+DHCP_SLICES = 'dhcp_slices'
+NETWORKS = 'networks'
+
+DEFAULT_PREFIX_LENGTHS = {4: 24, 6: 64}
+
+
+class IpamStore(YamlStore):
+    """
+    Yaml file holding the allocations of every session, so concurrent fabfed runs see each other's allocations.
+    """
+    def __init__(self, file_path: str = None):
+        if not file_path:
+            from fabfed.util.utils import get_ipam_file
+
+            file_path = get_ipam_file()
+
+        super().__init__(file_path)
+
+
+class MemoryIpamStore:
+    def __init__(self, data: dict = None):
+        self.data = data or {}
+
+    @staticmethod
+    def exists() -> bool:
+        return True
+
+    @contextmanager
+    def transaction(self):
+        yield self.data
+
+
+def _host_range(net):
+    if net.num_addresses < 4:
+        raise ControllerException(f"subnet {net} is too small to hold a gateway and a dhcp range")
+
+    first = net.network_address + 1
+    last = net.broadcast_address - 1 if net.version == 4 else net.broadcast_address
+    return first, last
+
+
+def _parse_network(subnet, label: str):
+    try:
+        return ip_network(subnet, strict=False)
+    except ValueError:
+        raise ControllerException(f"Error parsing {subnet} for layer3 config in network {label}")
+
+
+class Ipam:
+    """
+    Allocates layer3 subnets, gateways and per network dhcp ranges and remembers them per session.
+
+    A layer3 config either fixes its subnet or names a subnet_pool (and optionally a prefix_length) to carve a
+    subnet from. Pooled subnets never overlap with subnets held by other sessions. Re-applying a session hands
+    back the same subnet and dhcp ranges.
+    """
+    def __init__(self, *, session: str = None, store=None):
+        self.session = session or ''
+        self.store = store or MemoryIpamStore()
+
+    def _session_entry(self, data: dict) -> dict:
+        sessions = data.setdefault(SESSIONS, {})
+        entry = sessions.setdefault(self.session, {})
+        entry.setdefault(LAYER3, {})
+        entry.setdefault(DHCP_SLICES, {})
+        return entry
+
+    def _held_subnets(self, data: dict, exclude_label: str = None):
+        for session, entry in data.get(SESSIONS, {}).items():
+            for label, record in entry.get(LAYER3, {}).items():
+                if session == self.session and label == exclude_label:
+                    continue
+
+                yield session, label, ip_network(record[Constants.RES_SUBNET])
+
+    def _allocate_subnet(self, data: dict, layer3, subnet_pool: str, prefix_length):
+        parent = _parse_network(subnet_pool, layer3.label)
+        prefix_length = int(prefix_length or DEFAULT_PREFIX_LENGTHS[parent.version])
+
+        if not parent.prefixlen <= prefix_length <= parent.max_prefixlen:
+            raise ControllerException(f"Bad prefix_length {prefix_length} for {subnet_pool} in layer3 {layer3.label}")
+
+        pool = IPPool(parent.network_address, parent.broadcast_address)
+
+        for _, _, held in self._held_subnets(data, exclude_label=layer3.label):
+            if held.version == parent.version and held.overlaps(parent):
+                pool.reserve_range(max(held.network_address, parent.network_address),
+                                   min(held.broadcast_address, parent.broadcast_address))
+
+        try:
+            first, _ = pool.allocate_block(2 ** (parent.max_prefixlen - prefix_length), aligned=True)
+        except ResourceNotAvailable:
+            raise ResourceNotAvailable(f"subnet_pool {subnet_pool} has no free /{prefix_length} for {layer3.label}")
+
+        return ip_network(f"{first}/{prefix_length}")
+
+    def assign_layer3(self, *, layer3, network_label: str):
+        attrs = layer3.attributes
+
+        with self.store.transaction() as data:
+            records = self._session_entry(data)[LAYER3]
+            record = records.get(layer3.label, {})
+            subnet_pool = attrs.get(Constants.RES_SUBNET_POOL)
+            prefix_length = attrs.get(Constants.RES_SUBNET_PREFIX_LENGTH)
+
+            if not attrs.get(Constants.RES_SUBNET):
+                if not subnet_pool:
+                    raise ControllerException(
+                        f"network {network_label} must have a subnet or a subnet_pool in its layer3 config")
+
+                if record.get(Constants.RES_SUBNET_POOL) == subnet_pool \
+                        and record.get(Constants.RES_SUBNET_PREFIX_LENGTH) == prefix_length:
+                    attrs[Constants.RES_SUBNET] = record[Constants.RES_SUBNET]
+                else:
+                    net = self._allocate_subnet(data, layer3, subnet_pool, prefix_length)
+                    attrs[Constants.RES_SUBNET] = str(net)
+                    logger.info(f"ipam: allocated {net} from {subnet_pool} for layer3 {layer3.label}")
+            elif not subnet_pool:
+                net = _parse_network(attrs[Constants.RES_SUBNET], network_label)
+
+                for session, label, held in self._held_subnets(data, exclude_label=layer3.label):
+                    if held.version == net.version and held.overlaps(net):
+                        logger.warning(f"ipam: subnet {net} of layer3 {layer3.label} overlaps {held} "
+                                       f"held by layer3 {label} in session {session}")
+
+            net = _parse_network(attrs[Constants.RES_SUBNET], network_label)
+
+            if record.get(Constants.RES_SUBNET) == str(net):
+                defaults = record
+            else:
+                first, last = _host_range(net)
+                defaults = {Constants.RES_NET_GATEWAY: str(first),
+                            Constants.RES_LAYER3_DHCP_START: str(first + 1),
+                            Constants.RES_LAYER3_DHCP_END: str(last)}
+
+            for key in [Constants.RES_NET_GATEWAY, Constants.RES_LAYER3_DHCP_START, Constants.RES_LAYER3_DHCP_END]:
+                if key not in attrs:
+                    attrs[key] = defaults[key]
+
+            record = {Constants.RES_SUBNET: str(net)}
+
+            if subnet_pool:
+                record[Constants.RES_SUBNET_POOL] = subnet_pool
+                record[Constants.RES_SUBNET_PREFIX_LENGTH] = prefix_length
+
+            for key in [Constants.RES_NET_GATEWAY, Constants.RES_LAYER3_DHCP_START, Constants.RES_LAYER3_DHCP_END]:
+                record[key] = str(attrs[key])
+
+            records[layer3.label] = record
+
+    def assign_dhcp_slices(self, *, layer3, network_labels: List[str]) -> List[Tuple[str, str]]:
+        """
+        Splits the dhcp range of layer3 among network_labels. Networks that already hold a slice keep it.
+        """
+        ip_start = str(layer3.attributes[Constants.RES_LAYER3_DHCP_START])
+        ip_end = str(layer3.attributes[Constants.RES_LAYER3_DHCP_END])
+
+        with self.store.transaction() as data:
+            slices = self._session_entry(data)[DHCP_SLICES]
+            record = slices.get(layer3.label, {})
+            pool = IPPool(ip_start, ip_end)
+            assigned = {}
+
+            if (record.get(Constants.RES_LAYER3_DHCP_START), record.get(Constants.RES_LAYER3_DHCP_END)) \
+                    == (ip_start, ip_end):
+                assigned = {label: tuple(r) for label, r in record.get(NETWORKS, {}).items() if label in network_labels}
+
+            if not assigned:
+                ranges = pool.partition(len(network_labels))
+                assigned = {label: (str(s), str(e)) for label, (s, e) in zip(network_labels, ranges)}
+            else:
+                for dhcp_start, dhcp_end in assigned.values():
+                    pool.reserve_range(dhcp_start, dhcp_end)
+
+                chunk = (int(ip_address(ip_end)) - int(ip_address(ip_start))) // len(network_labels) + 1
+
+                for label in network_labels:
+                    if label in assigned:
+                        continue
+
+                    if not pool:
+                        logger.warning(f"ipam: dhcp range of layer3 {layer3.label} is exhausted. Repartitioning")
+                        ranges = IPPool(ip_start, ip_end).partition(len(network_labels))
+                        assigned = {label: (str(s), str(e)) for label, (s, e) in zip(network_labels, ranges)}
+                        break
+
+                    try:
+                        dhcp_start, dhcp_end = pool.allocate_block(min(chunk, len(pool)))
+                    except ResourceNotAvailable:
+                        dhcp_start, dhcp_end = max(pool.intervals(), key=lambda i: int(i[1]) - int(i[0]))
+                        pool.reserve_range(dhcp_start, dhcp_end)
+
+                    assigned[label] = (str(dhcp_start), str(dhcp_end))
+
+            slices[layer3.label] = {Constants.RES_LAYER3_DHCP_START: ip_start,
+                                    Constants.RES_LAYER3_DHCP_END: ip_end,
+                                    NETWORKS: {label: list(assigned[label]) for label in network_labels}}
+
+        return [assigned[label] for label in network_labels]
+
+    def release(self):
+        with self.store.transaction() as data:
+            data.get(SESSIONS, {}).pop(self.session, None)
+
+
+def read_only_store() -> MemoryIpamStore:
+    """
+    In memory copy of the allocations on file. Runs that do not apply see the subnets held by other sessions
+    without writing the file.
+    """
+    from fabfed.util.utils import get_ipam_file
+
+    store = YamlStore(get_ipam_file(create_dir=False))
+    return MemoryIpamStore(store.read() if store.exists() else None)
+
+
+def release_session(session: str, store=None):
+    store = store or IpamStore()
+
+    if store.exists():
+        Ipam(session=session, store=store).release()
+        logger.info(f"ipam: released allocations of session {session}")
@@ -1,7 +1,7 @@
-import time
 import paramiko
 import sys
 
+from fabfed.util import tracing
 from fabfed.util.utils import get_logger
 
 logger = get_logger()
@@ -105,7 +105,7 @@ class SshNodeTester:
                     break
                 except Exception as e:
                     logger.warning(f"SSH test failed:{e}. Node:{helper.label}:attempts={attempt + 1}")
-                    time.sleep(retry_interval)
+                    tracing.sleep(retry_interval, name='ssh_test')
                     failed_attempts += 1
                 finally:
                     helper.close_quietly()
@@ -141,7 +141,7 @@ class SshNodeTester:
                     break
                 except Exception as e:
                     logger.warning(f"SSH ping failed: {e}. Node: {helper.label}:attempts={attempt + 1}")
-                    time.sleep(retry_interval)
+                    tracing.sleep(retry_interval, name='ssh_test')
                 finally:
                     helper.close_quietly()
 
@@ -177,7 +177,7 @@ class SshNodeTester:
                     break
                 except Exception as e:
                     logger.warning(f"SSH ping failed: {e}. Node: {helper.label}:attempts={attempt + 1}")
-                    time.sleep(retry_interval)
+                    tracing.sleep(retry_interval, name='ssh_test')
                 finally:
                     helper.close_quietly()
 
@@ -0,0 +1,113 @@
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+from fabfed.util.utils import get_logger
+
+logger = get_logger()
+
+PROFILE_DIR = 'profile'
+DEFAULT_TOP = 25
+
+
+def get_profile_dir(friendly_name: str) -> str:
+    from fabfed.util.utils import get_stats_base_dir
+
+    return os.path.join(get_stats_base_dir(friendly_name), PROFILE_DIR)
+
+
+class PhaseProfiler:
+    """
+    Runs cProfile around each phase of a workflow and, optionally, tracks the peak memory of each phase using
+    tracemalloc. Only the thread running the phase is profiled; time spent waiting on provider threads shows up
+    as time in the call that waits on them.
+
+    save writes one <phase>.prof file per phase, loadable with pstats or snakeviz, and a summary of the top
+    hotspots of each phase.
+    """
+    def __init__(self, *, enabled=False, memory=False, top=DEFAULT_TOP):
+        self.enabled = enabled
+        self.memory = memory
+        self.top = top
+        self.profiles: Dict[str, object] = {}
+        self.durations: Dict[str, float] = {}
+        self.peaks: Dict[str, int] = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        if not self.enabled:
+            yield
+            return
+
+        import cProfile
+
+        if self.memory:
+            import tracemalloc
+
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+
+            tracemalloc.reset_peak()
+
+        profile = self.profiles.get(name) or cProfile.Profile()
+        start = time.perf_counter()
+        profile.enable()
+
+        try:
+            yield
+        finally:
+            profile.disable()
+            self.profiles[name] = profile
+            self.durations[name] = self.durations.get(name, 0) + time.perf_counter() - start
+
+            if self.memory:
+                _, peak = tracemalloc.get_traced_memory()
+                self.peaks[name] = max(peak, self.peaks.get(name, 0))
+
+    def summary(self) -> str:
+        import io
+        import pstats
+
+        stream = io.StringIO()
+
+        for name, profile in self.profiles.items():
+            stream.write(f"===== phase={name} duration={self.durations[name]:.3f}s")
+
+            if name in self.peaks:
+                stream.write(f" peak_memory={self.peaks[name] / (1024 * 1024):.2f}MiB")
+
+            stream.write("\n")
+            stats = pstats.Stats(profile, stream=stream)
+            stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top)
+            stats.sort_stats(pstats.SortKey.TIME).print_stats(self.top)
+
+        return stream.getvalue()
+
+    def save(self, friendly_name: str):
+        if not self.profiles:
+            return None
+
+        dir_path = get_profile_dir(friendly_name)
+
+        try:
+            os.makedirs(dir_path, exist_ok=True)
+
+            for name, profile in self.profiles.items():
+                profile.dump_stats(os.path.join(dir_path, f"{name}.prof"))
+
+            file_path = os.path.join(dir_path, 'hotspots.txt')
+
+            with open(file_path, 'w') as stream:
+                stream.write(self.summary())
+        except Exception as e:
+            logger.warning(f"Exception while saving profiles to {dir_path}:{e}")
+            return None
+        finally:
+            if self.memory:
+                import tracemalloc
+
+                tracemalloc.stop()
+
+        logger.info(f"Saved profiles and hotspots to {dir_path}")
+        return dir_path
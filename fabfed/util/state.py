@@ -284,9 +284,38 @@ def dump_states(states, to_json: bool, summary: bool = False):
             yaml.dump(output, Dumper=get_dumper(), width=float("inf"), default_flow_style=False, sort_keys=False))
 
 
-def dump_stats(stats, to_json: bool):
+def summarize_stats(stats) -> dict:
+    """
+    Reduces saved stats to the duration of each provider and the per resource breakdown, in seconds rounded to
+    milliseconds.
+    """
+    summary = []
+
+    for provider_stats in stats.get('stats', {}).get('provider_stats', []):
+        resources = []
+
+        for resource_stats in provider_stats.get('resources') or []:
+            resource_summary = {'label': resource_stats['label']}
+
+            for k, v in resource_stats.items():
+                if k.endswith('_duration'):
+                    resource_summary[k[:-len('_duration')]] = round(v, 3)
+
+            resources.append(resource_summary)
+
+        summary.append(dict(provider=provider_stats['provider'],
+                            duration=round(provider_stats['provider_duration']['duration'], 3),
+                            resources=resources))
+
+    return dict(action=stats.get('stats', {}).get('action'), provider_stats=summary)
+
+
+def dump_stats(stats, to_json: bool, summary: bool = False):
     import sys
 
+    if summary and stats:
+        stats = summarize_stats(stats)
+
     if to_json:
         import json
 
@@ -482,14 +511,27 @@ def load_sessions():
 
 
 def delete_stats(friendly_name: str):
+    """
+    Deletes the stats, trace and profiles of the last run. The stats history of the session is kept.
+    """
+    import os
     import shutil
+    from fabfed.util.profiling import get_profile_dir
 
     dir_path = get_stats_base_dir(friendly_name)
-    shutil.rmtree(dir_path)
+    shutil.rmtree(get_profile_dir(friendly_name), ignore_errors=True)
+
+    for file_name in [friendly_name + '-stats.yml', friendly_name + '-trace.json']:
+        file_path = os.path.join(dir_path, file_name)
+
+        if os.path.exists(file_path):
+            os.remove(file_path)
 
 
 def destroy_session(friendly_name: str):
     import shutil
+    from fabfed.util.ipam import release_session
 
     dir_path = get_base_dir(friendly_name)
     shutil.rmtree(dir_path)
+    release_session(friendly_name)
@@ -1,11 +1,111 @@
 from collections import namedtuple
+from typing import Dict, List
 
 Duration = namedtuple("Duration", "duration comment")
 
 Stages = namedtuple("Stages", "setup_duration plan_duration create_duration delete_duration")
 
+ResourceStats = namedtuple("ResourceStats",
+                           "label add_duration create_duration wait_duration delete_duration "
+                           "post_config_duration listener_duration sleep_duration active_duration")
+
 ProviderStats = namedtuple("ProviderStats",
-                           "provider provider_duration has_failures has_pending stages")
+                           "provider provider_duration has_failures has_pending stages resources")
 
 FabfedStats = namedtuple("FabfedStats",
                          "action has_failures workflow_duration workflow_config controller providers provider_stats")
+
+STAGE_FIELDS = dict(validate='add_duration', add='add_duration', create='create_duration',
+                    wait='wait_duration', delete='delete_duration')
+
+
+def _covered(intervals: List[tuple]) -> float:
+    """
+    Returns the time covered by the intervals. Overlapping intervals, i.e. nested spans or spans of threads
+    running in parallel, are counted once.
+    """
+    total = 0
+    end = None
+
+    for start, stop in sorted(intervals):
+        if end is None or start > end:
+            total += stop - start
+            end = stop
+        elif stop > end:
+            total += stop - end
+            end = stop
+
+    return total
+
+
+def resource_stats(spans: list, provider: str) -> List[ResourceStats]:
+    """
+    Breaks down the time a provider spent on each resource label using the spans of a workflow.
+
+    The stage durations are the time spent in the add, create, wait and delete calls of the provider. Post
+    config, listener and sleep durations are the parts of those calls spent configuring networking once
+    resources are up, in resource listener callbacks and sleeping between polls. Active is the time in those
+    calls minus the time sleeping.
+    """
+    from fabfed.util import tracing
+
+    by_id = {span.id: span for span in spans}
+    owners = {}
+
+    def owner_of(span):
+        if span.id not in owners:
+            parent = by_id.get(span.parent_id)
+
+            if parent is None:
+                owners[span.id] = None
+            elif parent.cat == tracing.PROVIDER:
+                owners[span.id] = parent
+            else:
+                owners[span.id] = owner_of(parent)
+
+        return owners[span.id]
+
+    details: Dict[str, dict] = {}
+
+    def details_of(label):
+        if label not in details:
+            details[label] = dict(stages=dict.fromkeys(set(STAGE_FIELDS.values()), 0), intervals={})
+
+        return details[label]
+
+    categories = {tracing.POST_CONFIG, tracing.LISTENER, tracing.SLEEP, tracing.PROVIDER}
+
+    for span in spans:
+        if span.cat not in categories:
+            continue
+
+        interval = (span.start, span.start + span.duration)
+
+        if span.cat == tracing.PROVIDER:
+            if span.args.get('provider') != provider or span.args.get('phase') not in STAGE_FIELDS:
+                continue
+
+            entry = details_of(span.args.get('label'))
+            entry['stages'][STAGE_FIELDS[span.args['phase']]] += span.duration
+            entry['intervals'].setdefault(span.cat, []).append(interval)
+            continue
+
+        owner = owner_of(span)
+
+        if owner is not None and owner.args.get('provider') == provider:
+            details_of(owner.args.get('label'))['intervals'].setdefault(span.cat, []).append(interval)
+
+    stats = []
+
+    for label, entry in details.items():
+        intervals = entry['intervals']
+        total = _covered(intervals.get(tracing.PROVIDER, []))
+        sleep = _covered(intervals.get(tracing.SLEEP, []))
+        stats.append(ResourceStats(label=label,
+                                   post_config_duration=_covered(intervals.get(tracing.POST_CONFIG, [])),
+                                   listener_duration=_covered(intervals.get(tracing.LISTENER, [])),
+                                   sleep_duration=sleep,
+                                   active_duration=max(total - sleep, 0),
+                                   **entry['stages']))
+
+    return stats
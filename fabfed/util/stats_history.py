@@ -0,0 +1,213 @@
+import json
+import os
+import time
+from typing import Dict, List, Union
+
+from fabfed.util.utils import get_logger
+from fabfed.util.yaml_store import file_lock
+
+logger = get_logger()
+
+PERCENTILES = (50, 90, 99)
+
+
+def _to_dict(obj):
+    if hasattr(obj, '_asdict'):
+        return {k: _to_dict(v) for k, v in obj._asdict().items()}
+
+    if isinstance(obj, dict):
+        return {k: _to_dict(v) for k, v in obj.items()}
+
+    if isinstance(obj, (list, tuple)):
+        return [_to_dict(v) for v in obj]
+
+    return obj
+
+
+class StatsHistory:
+    """
+    Append only history of workflow stats, one json record per line. Records are appended under an exclusive lock
+    so concurrent fabfed runs can share a history.
+    """
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+
+    def append(self, record: dict):
+        line = json.dumps(record, default=str)
+
+        with file_lock(self.file_path):
+            with open(self.file_path, "a") as stream:
+                stream.write(line + "\n")
+
+    def records(self) -> List[dict]:
+        records = []
+
+        if not os.path.isfile(self.file_path):
+            return records
+
+        with open(self.file_path, "r") as stream:
+            for number, line in enumerate(stream, 1):
+                if not line.strip():
+                    continue
+
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError as e:
+                    logger.warning(f"Skipping bad record at {self.file_path}:{number}:{e}")
+
+        return records
+
+
+def get_history(session: str = None) -> StatsHistory:
+    from fabfed.util.utils import get_stats_history_file
+
+    return StatsHistory(get_stats_history_file(session))
+
+
+def to_record(stats, *, session: str, config_digest: str, now: float = None) -> dict:
+    now = now or time.time()
+    stats = _to_dict(stats)
+    return dict(timestamp=time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(now)),
+                time=now,
+                session=session,
+                action=stats.get('action'),
+                config_digest=config_digest,
+                has_failures=bool(stats.get('has_failures')),
+                stats=stats)
+
+
+def record_stats(stats, *, session: str, config_digest: str):
+    """
+    Appends the stats of a run to the history of its session and to the history shared by all sessions.
+    """
+    record = to_record(stats, session=session, config_digest=config_digest)
+
+    for history in [get_history(session), get_history()]:
+        try:
+            history.append(record)
+        except Exception as e:
+            logger.warning(f"Exception while appending stats to {history.file_path}:{e}")
+
+
+def select(records: List[dict], *, session: str = None, prefix: str = None, action: str = None, config: str = None,
+           include_failures=False) -> List[dict]:
+    return [r for r in records
+            if (not session or r.get('session') == session)
+            and (not prefix or str(r.get('session', '')).startswith(prefix))
+            and (not action or r.get('action') == action)
+            and (not config or str(r.get('config_digest', '')).startswith(config))
+            and (include_failures or not r.get('has_failures'))]
+
+
+def metrics(record: dict) -> Dict[str, float]:
+    """
+    Flattens the durations of a record. Keys are workflow wide (i.e. workflow), per provider (i.e. fabric@prov,
+    fabric@prov:create) and per resource (i.e. fabric@prov/node@fab:wait).
+    """
+    stats = record.get('stats', {})
+    ret = {}
+
+    for key, name in [('workflow_duration', 'workflow'), ('workflow_config', 'config'),
+                      ('controller', 'controller'), ('providers', 'providers')]:
+        if isinstance(stats.get(key), dict):
+            ret[name] = stats[key]['duration']
+
+    for provider_stats in stats.get('provider_stats') or []:
+        provider = provider_stats['provider']
+        ret[provider] = provider_stats['provider_duration']['duration']
+
+        for stage, duration in (provider_stats.get('stages') or {}).items():
+            ret[f"{provider}:{stage[:-len('_duration')]}"] = duration
+
+        for resource_stats in provider_stats.get('resources') or []:
+            label = resource_stats['label']
+
+            for k, v in resource_stats.items():
+                if k.endswith('_duration'):
+                    ret[f"{provider}/{label}:{k[:-len('_duration')]}"] = v
+
+    return ret
+
+
+def percentile(values: List[float], p: float) -> float:
+    values = sorted(values)
+
+    if not values:
+        raise ValueError("no values")
+
+    rank = (len(values) - 1) * p / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (rank - lower)
+
+
+def percentiles(records: List[dict], ps=PERCENTILES, round_to=3) -> Dict[str, dict]:
+    values: Dict[str, List[float]] = {}
+
+    for record in records:
+        for k, v in metrics(record).items():
+            values.setdefault(k, []).append(v)
+
+    summary = {}
+
+    for k, v in values.items():
+        summary[k] = dict(count=len(v))
+        summary[k].update({f"p{p}": round(percentile(v, p), round_to) for p in ps})
+
+    return summary
+
+
+def resolve(records: List[dict], ref: str) -> Dict[str, float]:
+    """
+    Resolves a reference to durations. An integer picks a run by its index in records, negative indexes counting
+    from the latest run. Anything else is a config digest prefix and resolves to the median of its runs.
+    """
+    from fabfed.exceptions import FabfedException
+
+    try:
+        index = int(ref)
+    except ValueError:
+        index = None
+
+    if index is not None:
+        try:
+            return metrics(records[index])
+        except IndexError:
+            raise FabfedException(f"No run {ref} in {len(records)} run(s)")
+
+    matching = select(records, config=ref)
+
+    if not matching:
+        raise FabfedException(f"No runs with config digest {ref}")
+
+    return {k: v['p50'] for k, v in percentiles(matching, ps=(50,)).items()}
+
+
+def diff(a: Dict[str, float], b: Dict[str, float], round_to=3) -> Dict[str, dict]:
+    ret = {}
+
+    for k in list(a) + [k for k in b if k not in a]:
+        first, second = a.get(k), b.get(k)
+        entry = dict(a=first, b=second)
+
+        if first is not None and second is not None:
+            entry['delta'] = round(second - first, round_to)
+            entry['change'] = f"{(second - first) / first * 100:+.1f}%" if first else None
+
+        ret[k] = entry
+
+    return ret
+
+
+def runs(records: List[dict]) -> List[dict]:
+    return [dict(index=idx,
+                 timestamp=r.get('timestamp'),
+                 session=r.get('session'),
+                 action=r.get('action'),
+                 config_digest=r.get('config_digest'),
+                 has_failures=r.get('has_failures'),
+                 workflow=round(metrics(r).get('workflow', 0), 3)) for idx, r in enumerate(records)]
+
+
+def load_records(session: Union[str, None] = None) -> List[dict]:
+    return get_history(session).records()
@@ -0,0 +1,226 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, List, Tuple, Union
+
+PHASE = 'phase'
+PROVIDER = 'provider'
+REMOTE = 'remote'
+SLEEP = 'sleep'
+POST_CONFIG = 'post_config'
+LISTENER = 'listener'
+
+MAX_SPANS = 200000
+
+
+class Span:
+    __slots__ = ('id', 'parent_id', 'name', 'cat', 'tid', 'start', 'end', 'args')
+
+    def __init__(self, *, id: int, parent_id: Union[int, None], name: str, cat: str, tid: int, start: float,
+                 args: dict):
+        self.id = id
+        self.parent_id = parent_id
+        self.name = name
+        self.cat = cat
+        self.tid = tid
+        self.start = start
+        self.end = None
+        self.args = args
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+
+class Tracer:
+    """
+    Records nested spans in memory. Spans opened by a thread nest under the span that thread has open, so the
+    phases of a workflow contain the provider calls made while they run and those contain remote calls and
+    poll sleeps. Calls handed to other threads through propagate keep nesting under the span that started them.
+
+    The spans are exported in chrome trace event format, which chrome://tracing and https://ui.perfetto.dev
+    load as is. The span tree is kept in the args of each event (id, parent_id).
+    """
+    def __init__(self, *, max_spans=MAX_SPANS, clock: Callable[[], float] = time.perf_counter):
+        self.max_spans = max_spans
+        self.clock = clock
+        self.spans: List[Span] = []
+        self.dropped = 0
+        self.origin = clock()
+        self.epoch = time.time()
+        self._threads: Dict[int, str] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _stack(self) -> List[Span]:
+        stack = getattr(self._local, 'stack', None)
+
+        if stack is None:
+            stack = self._local.stack = []
+
+        return stack
+
+    def current(self) -> Union[Span, None]:
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    @contextmanager
+    def span(self, name: str, *, cat: str = REMOTE, **args):
+        stack = self._stack()
+        parent = stack[-1] if stack else None
+        thread = threading.current_thread()
+
+        with self._lock:
+            if len(self.spans) >= self.max_spans:
+                self.dropped += 1
+                span = None
+            else:
+                span = Span(id=len(self.spans) + 1, parent_id=parent.id if parent else None, name=name, cat=cat,
+                            tid=thread.ident, start=self.clock(), args=args)
+                self.spans.append(span)
+                self._threads.setdefault(thread.ident, thread.name)
+
+        if span is None:
+            yield None
+            return
+
+        stack.append(span)
+
+        try:
+            yield span
+        except BaseException as e:
+            span.args['error'] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.end = self.clock()
+            stack.pop()
+
+    def propagate(self, func: Callable) -> Callable:
+        """
+        Returns func wrapped so the spans it opens in another thread nest under the span open here.
+        """
+        parent = self.current()
+
+        if parent is None:
+            return func
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            stack = self._stack()
+            stack.append(parent)
+
+            try:
+                return func(*args, **kwargs)
+            finally:
+                stack.pop()
+
+        return wrapper
+
+    def clear(self):
+        with self._lock:
+            self.spans = []
+            self.dropped = 0
+            self.origin = self.clock()
+            self.epoch = time.time()
+            self._threads.clear()
+
+    def to_chrome_trace(self) -> dict:
+        pid = os.getpid()
+
+        with self._lock:
+            spans = list(self.spans)
+            threads = dict(self._threads)
+
+        tids = {ident: idx for idx, ident in enumerate(threads)}
+        events = [dict(name='thread_name', ph='M', pid=pid, tid=tids[ident], args=dict(name=name))
+                  for ident, name in threads.items()]
+
+        for span in spans:
+            args = dict(span.args, id=span.id, parent_id=span.parent_id)
+            events.append(dict(name=span.name, cat=span.cat, ph='X', pid=pid, tid=tids[span.tid],
+                               ts=round((span.start - self.origin) * 1e6, 3),
+                               dur=round(span.duration * 1e6, 3),
+                               args=args))
+
+        return dict(traceEvents=events,
+                    displayTimeUnit='ms',
+                    otherData=dict(start_time=self.epoch, dropped_spans=self.dropped))
+
+    def save(self, friendly_name: str) -> str:
+        import shutil
+        from fabfed.util.utils import get_stats_base_dir
+
+        file_path = os.path.join(get_stats_base_dir(friendly_name), friendly_name + '-trace.json')
+        temp_file_path = file_path + ".temp"
+
+        with open(temp_file_path, "w") as stream:
+            try:
+                json.dump(self.to_chrome_trace(), stream, default=str)
+            except Exception as e:
+                from fabfed.exceptions import FabfedException
+
+                raise FabfedException(f'Exception while saving trace at temp file {temp_file_path}:{e}')
+
+        shutil.move(temp_file_path, file_path)
+        return file_path
+
+
+_tracer = Tracer()
+_sleep = time.sleep
+_monotonic = time.monotonic
+
+
+def get_tracer() -> Tracer:
+    return _tracer
+
+
+def span(name: str, *, cat: str = REMOTE, **args):
+    return _tracer.span(name, cat=cat, **args)
+
+
+def propagate(func: Callable) -> Callable:
+    return _tracer.propagate(func)
+
+
+def traced(name: str = None, *, cat: str = REMOTE):
+    """
+    Decorator recording a span for each call. The span is named after the function unless a name is given.
+    """
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with _tracer.span(span_name, cat=cat):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def sleep(seconds: float, name: str = 'sleep', *, cat: str = SLEEP, **args):
+    with _tracer.span(name, cat=cat, seconds=seconds, **args):
+        _sleep(seconds)
+
+
+def monotonic() -> float:
+    return _monotonic()
+
+
+def set_clock(sleep: Callable[[float], None] = None,
+              monotonic: Callable[[], float] = None) -> Tuple[Callable[[float], None], Callable[[], float]]:
+    """
+    Replaces the clock the wait loops of the providers sleep and time their waits with, i.e. with a scaled clock
+    when running against fake endpoints. Returns the previous sleep and monotonic. Without functions, those of the
+    time module are restored.
+    """
+    global _sleep, _monotonic
+
+    previous = _sleep, _monotonic
+    _sleep = sleep or time.sleep
+    _monotonic = monotonic or time.monotonic
+    return previous
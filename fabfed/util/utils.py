@@ -1,4 +1,5 @@
 import logging
+import logging.handlers
 from argparse import ArgumentParser, RawDescriptionHelpFormatter
 
 from fabfed.util.constants import Constants
@@ -11,7 +12,7 @@ def create_parser(usage='%(prog)s [options]',
     return ArgumentParser(usage=usage, description=description, formatter_class=formatter_class)
 
 
-def build_parser(*, manage_workflow, manage_sessions, display_stitch_info):
+def build_parser(*, manage_workflow, manage_sessions, display_stitch_info, manage_stats):
     description = (
         'Fabfed'
         '\n'
@@ -23,6 +24,8 @@ def build_parser(*, manage_workflow, manage_sessions, display_stitch_info):
         "      fabfed workflow --config-dir . --session test-chi -validate"
         '\n'
         '      fabfed stitch-policy -providers "fabric,sense"'
+        '\n'
+        '      fabfed stats -s test-chi -diff -2 -1'
     )
 
     parser = create_parser(description=description)
@@ -48,11 +51,26 @@ def build_parser(*, manage_workflow, manage_sessions, display_stitch_info):
     workflow_parser.add_argument('-use-remote-policy', action='store_true', default=False, help='use remote policy')
     workflow_parser.add_argument('-show', action='store_true', default=False, help='display resource.')
     workflow_parser.add_argument('-summary', action='store_true', default=False,
-                                 help='display summary. used with -show')
+                                 help='display summary. used with -show and -stats')
     workflow_parser.add_argument('-stats', action='store_true', default=False, help='display stats')
     workflow_parser.add_argument('-json', action='store_true', default=False,
                                  help='use json output. relevant when used with -show or -plan')
     workflow_parser.add_argument('-destroy', action='store_true', default=False, help='delete resources')
+    workflow_parser.add_argument('--profile', action='store_true', default=False,
+                                 help='profile each phase of -apply or -destroy. Profiles and hotspots are saved '
+                                      'in the stats directory of the session')
+    workflow_parser.add_argument('--profile-memory', action='store_true', default=False,
+                                 help='also track the peak memory of each phase. used with --profile')
+    workflow_parser.add_argument('--profile-top', type=int, default=25,
+                                 help='number of hotspots listed per phase. Defaults to 25')
+    workflow_parser.add_argument('--record', action='store_true', default=False,
+                                 help='record the calls the providers make during -apply or -destroy to a cassette '
+                                      'in the stats directory of the session')
+    workflow_parser.add_argument('--replay', type=str, default=None,
+                                 help='replay -apply or -destroy against the calls recorded in this cassette')
+    workflow_parser.add_argument('--replay-scale', type=float, default=1.0,
+                                 help='scale of the recorded timings while replaying, i.e. 0.1 replays ten times '
+                                      'faster. Defaults to 1')
     workflow_parser.set_defaults(dispatch_func=manage_workflow)
 
     sessions_parser = subparsers.add_parser('sessions', help='Manage fabfed sessions ')
@@ -73,6 +91,25 @@ def build_parser(*, manage_workflow, manage_sessions, display_stitch_info):
                                required=False)
     stitch_parser.add_argument('-use-remote-policy', action='store_true', default=False, help='use remote policy')
     stitch_parser.set_defaults(dispatch_func=display_stitch_info)
+
+    stats_parser = subparsers.add_parser('stats', help='Display percentiles and differences of workflow stats')
+    stats_parser.add_argument('-s', '--session', type=str, default='',
+                              help='use the stats history of this session. Defaults to the history of all sessions',
+                              required=False)
+    stats_parser.add_argument('-prefix', type=str, default='',
+                              help='only use runs of sessions whose name starts with this value')
+    stats_parser.add_argument('-action', type=str, default='apply', choices=['apply', 'destroy'],
+                              help='workflow action. Defaults to apply')
+    stats_parser.add_argument('-config', type=str, default='',
+                              help='only use runs whose config digest starts with this value')
+    stats_parser.add_argument('-include-failures', action='store_true', default=False,
+                              help='include runs that had failures')
+    stats_parser.add_argument('-runs', action='store_true', default=False, help='list runs')
+    stats_parser.add_argument('-diff', type=str, nargs=2, metavar=('A', 'B'), default=None,
+                              help='compare two runs given by index (i.e -1 is the latest) '
+                                   'or two configs given by config digest')
+    stats_parser.add_argument('-json', action='store_true', default=False, help='use json format')
+    stats_parser.set_defaults(dispatch_func=manage_stats)
     return parser
 
 
@@ -86,11 +123,106 @@ def get_log_location():
     return os.environ.get('FABFED_LOG_LOCATION', "./fabfed.log")
 
 
+def get_log_format():
+    import os
+    return os.environ.get('FABFED_LOG_FORMAT', "text")
+
+
 def get_formatter():
     fmt = "%(asctime)s [%(filename)s:%(lineno)d] [%(levelname)s] %(message)s"
     return logging.Formatter(fmt)
 
 
+class JsonFormatter(logging.Formatter):
+    """
+    Formats each record as a json object on one line, for log files read by tools.
+    """
+    def format(self, record):
+        import json
+        from datetime import datetime, timezone
+
+        entry = dict(time=datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+                     level=record.levelname,
+                     logger=record.name,
+                     file=record.filename,
+                     line=record.lineno,
+                     thread=record.threadName,
+                     message=record.getMessage())
+
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+
+        if record.stack_info:
+            entry['stack'] = self.formatStack(record.stack_info)
+
+        return json.dumps(entry, default=str)
+
+
+class Lazy:
+    """
+    A message, or an argument of a message, built only if the record is logged:
+
+        logger.debug("intent=%s", Lazy(json.dumps, intent, indent=2))
+    """
+    __slots__ = ('func', 'args', 'kwargs')
+
+    def __init__(self, func, *args, **kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+
+    def __str__(self):
+        return str(self.func(*self.args, **self.kwargs))
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    Puts records on a queue read by a listener thread, which formats and writes them using the handlers. Once the
+    listener is stopped, i.e. for records logged by exit handlers, records are written by the logging thread.
+    """
+    def __init__(self, *handlers):
+        import queue
+
+        super().__init__(queue.SimpleQueue())
+        self._listener = logging.handlers.QueueListener(self.queue, *handlers, respect_handler_level=True)
+        self._listener.start()
+        self._stopped = False
+
+    def prepare(self, record):
+        # The message is merged with its arguments by the logging thread, as they may change once the call returns.
+        import copy
+
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def emit(self, record):
+        if not self._stopped:
+            super().emit(record)
+            return
+
+        for handler in self._listener.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def stop(self):
+        """
+        Writes the queued records and stops the listener.
+        """
+        if not self._stopped:
+            self._stopped = True
+            self._listener.stop()
+
+    def close(self):
+        self.stop()
+
+        for handler in self._listener.handlers:
+            handler.close()
+
+        super().close()
+
+
 _LOGGER = None
 
 
@@ -103,7 +235,19 @@ def get_logger():
     return _LOGGER
 
 
+def stop_logger():
+    if _LOGGER:
+        for handler in _LOGGER.handlers:
+            if isinstance(handler, _QueueHandler):
+                handler.stop()
+
+
 def init_logger():
+    """
+    Records are written to the log file and the console by a listener thread, so that logging does not block the
+    provider threads. Set FABFED_LOG_FORMAT to json to write the log file as json lines.
+    """
+    import atexit
     from logging.handlers import RotatingFileHandler
 
     log_config = {'log-file': get_log_location(),
@@ -116,17 +260,22 @@ def init_logger():
     log_level = log_config.get(Constants.PROPERTY_CONF_LOG_LEVEL, "INFO")
     logger.setLevel(log_level)
 
+    for handler in [h for h in logger.handlers if isinstance(h, _QueueHandler)]:
+        logger.removeHandler(handler)
+        handler.close()
+
     formatter = get_formatter()
     file_handler = RotatingFileHandler(log_config.get(Constants.PROPERTY_CONF_LOG_FILE),
                                        backupCount=int(log_config.get(Constants.PROPERTY_CONF_LOG_RETAIN)),
                                        maxBytes=int(log_config.get(Constants.PROPERTY_CONF_LOG_SIZE)))
 
-    file_handler.setFormatter(formatter)
+    file_handler.setFormatter(JsonFormatter() if get_log_format() == 'json' else formatter)
     logger.propagate = False
-    logger.addHandler(file_handler)
     stream_handler = logging.StreamHandler()
     stream_handler.setFormatter(formatter)
-    logger.addHandler(stream_handler)
+    logger.addHandler(_QueueHandler(file_handler, stream_handler))
+    atexit.unregister(stop_logger)
+    atexit.register(stop_logger)
 
     global _LOGGER
 
@@ -210,6 +359,48 @@ def get_stats_base_dir(friendly_name):
     return base_dir
 
 
+def get_stats_history_file(friendly_name=None):
+    from pathlib import Path
+    import os
+
+    if friendly_name:
+        return os.path.join(get_stats_base_dir(friendly_name), friendly_name + '-history.jsonl')
+
+    base_dir = os.path.join(str(Path.home()), '.fabfed', 'history')
+    os.makedirs(base_dir, exist_ok=True)
+    return os.path.join(base_dir, 'stats-history.jsonl')
+
+
+def get_benchmark_history_file():
+    from pathlib import Path
+    import os
+
+    base_dir = os.path.join(str(Path.home()), '.fabfed', 'history')
+    os.makedirs(base_dir, exist_ok=True)
+    return os.path.join(base_dir, 'benchmark-history.jsonl')
+
+
+def config_digest(*, dir_path, var_dict=None):
+    """
+    Digest of the .fab files in dir_path and of the variable overrides. Runs with the same digest used the same
+    config.
+    """
+    import hashlib
+    import json
+    import os
+
+    digest = hashlib.sha256()
+
+    for config in sorted(conf for conf in os.listdir(dir_path) if conf.endswith(Constants.FAB_EXTENSION)):
+        digest.update(config.encode())
+
+        with open(os.path.join(dir_path, config), 'rb') as stream:
+            digest.update(stream.read())
+
+    digest.update(json.dumps(var_dict or {}, sort_keys=True, default=str).encode())
+    return digest.hexdigest()[:12]
+
+
 def get_base_dir(friendly_name):
     from pathlib import Path
     import os
@@ -219,6 +410,27 @@ def get_base_dir(friendly_name):
     return base_dir
 
 
+def get_ipam_file(create_dir=True):
+    from pathlib import Path
+    import os
+
+    base_dir = os.path.join(str(Path.home()), '.fabfed', 'ipam')
+
+    if create_dir:
+        os.makedirs(base_dir, exist_ok=True)
+
+    return os.path.join(base_dir, 'ipam.yml')
+
+
+def get_cache_file(name):
+    from pathlib import Path
+    import os
+
+    base_dir = os.path.join(str(Path.home()), '.fabfed', 'cache')
+    os.makedirs(base_dir, exist_ok=True)
+    return os.path.join(base_dir, name)
+
+
 def get_inventory_dir(friendly_name):
     import os
     inv_dir = os.path.join(get_base_dir(friendly_name), "inventory")
@@ -0,0 +1,154 @@
+from collections import namedtuple
+from typing import Callable, Dict, List
+
+from fabfed.util import tracing
+from fabfed.util.utils import get_logger
+
+logger = get_logger()
+
+WaitPolicy = namedtuple("WaitPolicy", "initial_interval max_interval backoff timeout cancel_ready_settle")
+
+
+def _sleep(seconds: float):
+    tracing.sleep(seconds, name='poll')
+
+
+class Backoff:
+    def __init__(self, policy: WaitPolicy):
+        self.policy = policy
+        self.interval = policy.initial_interval
+
+    def next(self) -> float:
+        interval = self.interval
+        self.interval = min(self.interval * self.policy.backoff, self.policy.max_interval)
+        return interval
+
+    def reset(self):
+        self.interval = self.policy.initial_interval
+
+
+class InstanceState:
+    """
+    Tracks the status of one instance until it reaches a target or a failure state.
+
+    A target state only counts once it has been observed for settle seconds. This guards against states the
+    orchestrator reports prematurely, such as CANCEL - READY right after a cancel is issued.
+    """
+    def __init__(self, *, name: str, targets: List[str], failures: List[str] = None, settle: float = 0):
+        self.name = name
+        self.targets = targets
+        self.failures = failures or []
+        self.settle = settle
+        self.status = None
+        self.changed = False
+        self._target_since = None
+
+    @property
+    def reached(self) -> bool:
+        return self.status is not None and any(t in self.status for t in self.targets)
+
+    @property
+    def failed(self) -> bool:
+        return self.status is not None and any(f in self.status for f in self.failures)
+
+    def observe(self, status: str, now: float) -> bool:
+        """
+        Records status and returns True when the instance is done waiting.
+        """
+        self.changed = status != self.status
+        self.status = status
+
+        if self.failed:
+            return True
+
+        if not self.reached:
+            self._target_since = None
+            return False
+
+        if self._target_since is None:
+            self._target_since = now
+
+        if now - self._target_since >= self.settle:
+            return True
+
+        logger.info(f"{self.name}: {status} observed. Confirming it holds for {self.settle}s")
+        return False
+
+
+def wait_for_statuses(get_status: Callable[[str], str], *, names: List[str], targets: List[str],
+                      failures: List[str] = None, settle: float = 0, policy: WaitPolicy,
+                      sleep: Callable[[float], None] = _sleep,
+                      clock: Callable[[], float] = tracing.monotonic) -> Dict[str, str]:
+    """
+    Polls get_status(name) for every name in one loop until each reaches a target or a failure state or the
+    policy times out, and returns the last status of each. Polling starts at the initial interval, backs off
+    while no status changes and starts over whenever one does. An exception while polling one name is logged
+    and retried on the next sweep.
+    """
+    states = {name: InstanceState(name=name, targets=targets, failures=failures, settle=settle) for name in names}
+    waiting = list(names)
+    backoff = Backoff(policy)
+    start = clock()
+
+    while waiting:
+        changed = False
+
+        for name in list(waiting):
+            state = states[name]
+
+            try:
+                if state.observe(get_status(name), clock()):
+                    waiting.remove(name)
+
+                changed = changed or state.changed
+            except Exception as e:
+                logger.warning(f"{name}: exception while getting status {e}")
+
+        if changed:
+            backoff.reset()
+
+        if not waiting:
+            break
+
+        elapsed = clock() - start
+
+        if elapsed >= policy.timeout:
+            logger.warning(f"timed out after {int(elapsed)}s waiting on {targets}: "
+                           f"{dict((name, states[name].status) for name in waiting)}")
+            break
+
+        interval = min(backoff.next(), policy.timeout - elapsed)
+        logger.info(f"waiting on {targets}: {dict((name, states[name].status) for name in waiting)}:"
+                    f"elapsed={int(elapsed)}s:next={interval:.1f}s")
+        sleep(interval)
+
+    return {name: states[name].status or '' for name in names}
+
+
+def wait_for_status(get_status: Callable[[], str], *, name: str, targets: List[str], failures: List[str] = None,
+                    settle: float = 0, policy: WaitPolicy,
+                    sleep: Callable[[float], None] = _sleep, clock: Callable[[], float] = tracing.monotonic) -> str:
+    """
+    Waits on a single status. See wait_for_statuses.
+    """
+    return wait_for_statuses(lambda _: get_status(), names=[name], targets=targets, failures=failures,
+                             settle=settle, policy=policy, sleep=sleep, clock=clock)[name]
+
+
+def retry_operation(call: Callable, *, name: str, operation: str, attempts: int, policy: WaitPolicy,
+                    sleep: Callable[[float], None] = _sleep):
+    """
+    Runs an operation, retrying with backoff when it raises.
+    """
+    backoff = Backoff(policy)
+
+    for attempt in range(attempts):
+        try:
+            return call()
+        except Exception as e:
+            if attempt == attempts - 1:
+                raise
+
+            logger.warning(f"{name}: exception from {operation} {e}:attempt={attempt + 1} out of {attempts}")
+
+        sleep(backoff.next())
@@ -0,0 +1,74 @@
+import os
+from contextlib import contextmanager
+
+
+@contextmanager
+def file_lock(file_path: str):
+    """
+    Exclusive lock shared by fabfed processes on file_path, held through a companion .lock file.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        fcntl = None
+
+    with open(file_path + ".lock", "w") as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class YamlStore:
+    """
+    Yaml file shared by concurrent fabfed runs. Each transaction reads the file under an exclusive lock and
+    writes it back through a temp file.
+    """
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+
+    def exists(self) -> bool:
+        return os.path.isfile(self.file_path)
+
+    def _lock(self):
+        return file_lock(self.file_path)
+
+    def _load(self) -> dict:
+        import yaml
+
+        if not self.exists():
+            return {}
+
+        with open(self.file_path, 'r') as stream:
+            return yaml.load(stream, Loader=yaml.SafeLoader) or {}
+
+    def _save(self, data: dict):
+        import yaml
+        import shutil
+
+        temp_file_path = self.file_path + ".temp"
+
+        with open(temp_file_path, "w") as stream:
+            try:
+                stream.write(yaml.safe_dump(data, default_flow_style=False, sort_keys=False))
+            except Exception as e:
+                from fabfed.exceptions import FabfedException
+
+                raise FabfedException(f'Exception while saving {self.file_path} at temp file {temp_file_path}:{e}')
+
+        shutil.move(temp_file_path, self.file_path)
+
+    def read(self) -> dict:
+        with self._lock():
+            return self._load()
+
+    @contextmanager
+    def transaction(self):
+        with self._lock():
+            data = self._load()
+            yield data
+            self._save(data)
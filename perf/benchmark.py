@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+import argparse
+import os
+import sys
+import tempfile
+
+# The fabfed logger is created when fabfed is imported, so its log file is set first. Benchmark runs log thousands of
+# lines that do not belong in the fabfed.log of the current directory.
+os.environ.setdefault('FABFED_LOG_LOCATION', os.path.join(tempfile.gettempdir(), 'fabfed-benchmark.log'))
+
+from fabfed.util import benchmark
+from fabfed.util import state as sutil
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks the parser and controller hot paths using generated "
+                                                 "workflows run against the dummy provider")
+    parser.add_argument('-scales', type=str, default='10,100,1000',
+                        help=f"comma separated number of resources. Up to {benchmark.SCALES[-1]} is supported")
+    parser.add_argument('-fan-out', type=int, default=2, help="number of dependencies of dependent services")
+    parser.add_argument('-stitch-ratio', type=float, default=0.1,
+                        help="fraction of the resources that are networks stitched in pairs across providers")
+    parser.add_argument('-providers', type=int, default=2, help="number of dummy providers")
+    parser.add_argument('-threshold', type=float, default=benchmark.DEFAULT_THRESHOLD,
+                        help="slowdown relative to the median of previous runs reported as a regression")
+    parser.add_argument('-log-level', type=str, default='WARNING', help="fabfed log level while benchmarking")
+    parser.add_argument('-no-save', action='store_true', default=False, help="do not record the results")
+    parser.add_argument('-json', action='store_true', default=False, help="use json output. default is yaml")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    benchmark.logger.setLevel(args.log_level)
+    history = benchmark.get_history()
+    records = history.records()
+    results = []
+    failed = False
+
+    for resources in [int(scale) for scale in args.scales.split(',')]:
+        stitch = int(resources * args.stitch_ratio / 2) if args.providers > 1 else 0
+        result = benchmark.run_benchmark(resources=resources, fan_out=args.fan_out, stitch=stitch,
+                                         providers=args.providers)
+        result['regressions'] = benchmark.regressions(result, records, threshold=args.threshold)
+        failed = failed or bool(result['regressions'])
+        results.append(result)
+
+        if not args.no_save:
+            history.append(benchmark.to_record(result))
+
+    sutil.dump_objects(results, args.json)
+
+    if not args.no_save:
+        print(f"\nRecorded results in {history.file_path}", file=sys.stderr)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
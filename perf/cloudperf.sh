@@ -247,13 +247,10 @@ done
 # Generate stats
 #
 
-stat_tool=$SCRIPT_DIR/fabfed_stats.py
-if [[ -e $stat_tool ]]; then
-    cd $data_directory
-    echo $stat_tool $data_directory/data $session_prefix $data_directory/mydata.csv
-    $stat_tool $data_directory $session_prefix $data_directory/mydata.csv
-    cat $data_directory/mydata.csv
-fi
+cd $data_directory
+fabfed stats -prefix $session_prefix -runs -include-failures -json > $data_directory/runs.json
+fabfed stats -prefix $session_prefix -action apply | tee $data_directory/stats-apply-percentiles.yml
+fabfed stats -prefix $session_prefix -action destroy | tee $data_directory/stats-destroy-percentiles.yml
 
 #
 # Zip up
@@ -88,9 +88,12 @@ waitFor "${all_pids[@]}"
 save /Users/AEssiari/FABRIC/testing2/fabfed/examples/demos/chameleon/tacc tacc-con 2 destroy 
 save /Users/AEssiari/FABRIC/testing2/fabfed/examples/demos/chameleon/star star-con 2 destroy 
 
-script_dir=$(dirname $0)
-echo $script_dir/fabfed_stats.py $dest_dir tacc-con 
-$script_dir/fabfed_stats.py $dest_dir tacc-con- 
-echo $script_dir/fabfed_stats.py $dest_dir star-con
-$script_dir/fabfed_stats.py $dest_dir star-con- 
+echo fabfed stats -prefix tacc-con- -action apply
+fabfed stats -prefix tacc-con- -action apply
+echo fabfed stats -prefix tacc-con- -action destroy
+fabfed stats -prefix tacc-con- -action destroy
+echo fabfed stats -prefix star-con- -action apply
+fabfed stats -prefix star-con- -action apply
+echo fabfed stats -prefix star-con- -action destroy
+fabfed stats -prefix star-con- -action destroy
 exit 0
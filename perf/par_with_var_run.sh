@@ -69,7 +69,8 @@ do
    mv fabfed.log fabfed-destroy.log
 done
 
-script_dir=$(dirname $0)
-echo $script_dir/fabfed_stats.py /tmp $session_prefix-
-$script_dir/fabfed_stats.py /tmp $session_prefix-
+echo fabfed stats -prefix $session_prefix- -action apply
+fabfed stats -prefix $session_prefix- -action apply
+echo fabfed stats -prefix $session_prefix- -action destroy
+fabfed stats -prefix $session_prefix- -action destroy
 exit 0
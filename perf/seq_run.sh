@@ -49,6 +49,8 @@ do
    fabfed workflow -s $session_prefix-$i -show > show-destroy.yml
 done
 
-script_dir=$(dirname $0)
-$script_dir/fabfed_stats.py /tmp $session_prefix- 
+echo fabfed stats -prefix $session_prefix- -action apply
+fabfed stats -prefix $session_prefix- -action apply
+echo fabfed stats -prefix $session_prefix- -action destroy
+fabfed stats -prefix $session_prefix- -action destroy
 exit 0
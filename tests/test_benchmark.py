@@ -0,0 +1,45 @@
+from fabfed.util import benchmark, utils
+from fabfed.util.config import WorkflowConfig
+
+
+def test_generate_config():
+    config = WorkflowConfig.parse(content=benchmark.generate_config(resources=20, fan_out=2, stitch=2, providers=3))
+    resources = {r.label: r for r in config.get_resource_configs()}
+    assert len(resources) == 20
+    assert len([r for r in resources.values() if r.is_network]) == 4
+    assert len([r for r in resources.values() if r.is_node]) == 3
+
+    dependencies = resources['svc8@service'].dependencies
+    assert len(dependencies) == 2
+    assert all(d.is_external for d in dependencies)
+
+
+def test_run_benchmark(monkeypatch, tmp_path):
+    monkeypatch.setenv('HOME', str(tmp_path))
+    monkeypatch.setenv('FABFED_LOG_LOCATION', str(tmp_path / 'fabfed.log'))
+    utils.init_logger()
+
+    try:
+        result = benchmark.run_benchmark(resources=10, fan_out=2, stitch=1, session='test-benchmark')
+    finally:
+        monkeypatch.undo()
+        utils.init_logger()
+
+    assert result['resource_count'] == 10 and result['networks'] == 2
+    assert list(result['stages'])[0] == 'load_yaml' and list(result['stages'])[-1] == 'reconcile_states'
+    assert all(stage['duration'] >= 0 and stage['peak_memory'] >= 0 for stage in result['stages'].values())
+    assert not (tmp_path / '.fabfed' / 'sessions' / 'test-benchmark').exists()
+
+
+def test_regressions():
+    def make_result(plan, apply):
+        return dict(resources=10, fan_out=1, stitch=0, providers=2,
+                    stages=dict(plan=dict(duration=plan, peak_memory=0), apply=dict(duration=apply, peak_memory=0)))
+
+    records = [benchmark.to_record(make_result(1.0, 0.001)) for _ in range(3)]
+    records.append(benchmark.to_record(dict(make_result(0.1, 0.1), resources=100)))
+
+    assert benchmark.regressions(make_result(1.2, 0.004), records) == {}
+    assert benchmark.regressions(make_result(1.5, 0.004), records) == {
+        'plan': dict(baseline=1.0, duration=1.5, change='+50.0%')}
+    assert benchmark.regressions(dict(make_result(1.5, 0.004), fan_out=2), records) == {}
@@ -0,0 +1,140 @@
+import json
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from fabfed.exceptions import CassetteException
+from fabfed.provider.aws.aws_fake import FakeAws
+from fabfed.provider.sense.sense_fake import FakeSense
+from fabfed.util.cassette import Cassette, RECORD, REPLAY, wrap
+from fabfed.util.constants import Constants
+from fabfed.util.fakes import ScaledClock
+
+
+def create_aws_network(vpc_id):
+    from fabfed.provider.aws.aws_network import AwsNetwork
+    from fabfed.provider.aws.aws_provider import AwsProvider
+
+    provider = AwsProvider(type='aws', label='aws_provider', name='aws', config=dict(ACCESS_KEY='a', SECRET_KEY='s'))
+    peering = SimpleNamespace(attributes={Constants.RES_CLOUD_REGION: 'us-east-1', Constants.RES_CLOUD_VPC: vpc_id,
+                                          Constants.RES_ID: 'dxcon-fabfed', Constants.RES_REMOTE_ASN: '64512',
+                                          Constants.RES_LOCAL_ASN: 55038, Constants.RES_SECURITY: 'key',
+                                          Constants.RES_LOCAL_ADDRESS: '192.168.1.1/30',
+                                          Constants.RES_REMOTE_ADDRESS: '192.168.1.2/30'})
+    network = AwsNetwork(label='net', name='net', provider=provider, peering=peering, stitch_port={},
+                         layer3=SimpleNamespace(attributes=dict(subnet='10.0.1.0/24')))
+    network.create()
+    return network
+
+
+def test_aws_network_replays_without_endpoint(tmp_path):
+    from fabfed.provider.aws import aws_utils
+
+    file_path = str(tmp_path / 'apply.jsonl')
+    fake = FakeAws(timing={'vpn_gateway.attach': 30, 'vif.create': 200}, page_size=1, clock=ScaledClock(0.001))
+    vpc_id = fake.add_vpc()
+    fake.add_connection('dxcon-fabfed', vlan=100)
+
+    with fake.installed(), Cassette(file_path, mode=RECORD).installed() as cassette:
+        recorded = create_aws_network(vpc_id)
+
+    calls = sum(fake.calls.values())
+    assert len([entry for entry in cassette.interactions if entry['operation'] != 'can_paginate']) == calls
+    assert aws_utils.client_pool._factory is None
+
+    with open(file_path) as stream:
+        entries = [json.loads(line) for line in stream]
+
+    assert {entry['service'] for entry in entries} >= {'aws:ec2:us-east-1', 'aws:directconnect:us-east-1'}
+    assert all(entry['duration'] >= 0 for entry in entries)
+
+    with Cassette(file_path, mode=REPLAY, scale=0.01).installed() as cassette:
+        replayed = create_aws_network(vpc_id)
+
+    aws_utils.client_pool.clear()
+    assert sum(fake.calls.values()) == calls
+    assert not cassette.unused()
+    assert replayed.vif_details == recorded.vif_details
+    assert replayed.route_table_details == recorded.route_table_details
+
+
+def test_replays_errors_and_timings(tmp_path):
+    file_path = str(tmp_path / 'sense.jsonl')
+    fake = FakeSense(timing={'request': 0.05})
+    fake.add_profile('l2')
+
+    with Cassette(file_path, mode=RECORD).installed():
+        client = wrap('sense', lambda: fake)
+        si_uuids = [client.request('GET', '/instance') for _ in range(2)]
+
+        with pytest.raises(ValueError, match='Returned code 404'):
+            client.request('GET', f'/instance/{si_uuids[0]}/status')
+
+    cassette = Cassette(file_path, mode=REPLAY)
+
+    with cassette.installed():
+        client = wrap('sense', lambda: pytest.fail('clients are not built while replaying'),
+                      attributes=dict(config=dict(headers={})))
+        assert client.config == dict(headers={})
+        start = time.monotonic()
+        assert [client.request('GET', '/instance') for _ in range(2)] == si_uuids
+        assert time.monotonic() - start >= 0.1
+
+        # Arguments with generated values fall back to the next call of the same operation.
+        with pytest.raises(ValueError, match='Returned code 404'):
+            client.request('GET', '/instance/other/status')
+
+        with pytest.raises(CassetteException, match='no recorded call'):
+            client.request('GET', '/instance')
+
+    with Cassette(file_path, mode=REPLAY, scale=0.01).installed():
+        client = wrap('sense', lambda: fake)
+        start = time.monotonic()
+        assert [client.request('GET', '/instance') for _ in range(2)] == si_uuids
+        assert time.monotonic() - start < 0.1
+
+    assert fake.calls['GET /instance'] == 2
+
+
+def test_records_http_traffic(tmp_path):
+    urllib3 = pytest.importorskip('urllib3')
+
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = json.dumps(dict(path=self.path)).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    url = f"http://127.0.0.1:{server.server_port}/slices?name=net"
+    file_path = str(tmp_path / 'http.jsonl')
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    try:
+        with Cassette(file_path, mode=RECORD).installed():
+            response = urllib3.PoolManager().request('GET', url)
+            assert json.loads(response.data) == dict(path='/slices?name=net')
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    with Cassette(file_path, mode=REPLAY).installed() as cassette:
+        response = urllib3.PoolManager().request('GET', url)
+
+    assert response.status == 200
+    assert response.headers['Content-Type'] == 'application/json'
+    assert json.loads(response.data) == dict(path='/slices?name=net')
+    assert not cassette.unused()
+    assert os.path.getsize(file_path) > 0
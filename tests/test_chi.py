@@ -0,0 +1,305 @@
+import logging
+import re
+import sys
+from types import ModuleType, SimpleNamespace
+
+import pytest
+
+from fabfed.util import tracing
+
+
+class FakeServer:
+    def __init__(self, chi, id, name, active_after=1, status=None):
+        self.chi = chi
+        self.id = id
+        self.name = name
+        self.active_after = active_after
+        self._status = status
+
+    @property
+    def status(self):
+        return self._status or ('ACTIVE' if self.chi.list_calls >= self.active_after else 'BUILD')
+
+    def to_dict(self):
+        addresses = [{'addr': f"192.168.0.{self.id}", 'OS-EXT-IPS:type': 'fixed'},
+                     {'addr': f"10.0.0.{self.id}", 'OS-EXT-IPS:type': 'floating'}]
+        return {'OS-EXT-STS:vm_state': 'active', 'addresses': {'sharednet1': addresses}}
+
+
+class FakeChi:
+    def __init__(self):
+        self.calls = []
+        self.servers = []
+        self.leases = {}
+        self.list_calls = 0
+
+    # chi
+    def set(self, key, value):
+        self.calls.append(('set', key, value))
+
+    def use_site(self, site):
+        self.calls.append(('use_site', site))
+
+    # chi.lease
+    @staticmethod
+    def add_node_reservation(reservations, count, node_type):
+        reservations.append(dict(resource_type='physical:host', min=count, max=count, node_type=node_type))
+
+    def get_lease(self, name):
+        if name not in self.leases:
+            raise ValueError(f"No leases found for name {name}")
+
+        return self.leases[name]
+
+    def create_lease(self, lease_name, reservations):
+        self.calls.append(('create_lease', lease_name, reservations))
+        reservations = [dict(r, id=f"{lease_name}-r{i}") for i, r in enumerate(reservations)]
+        self.leases[lease_name] = dict(status='ACTIVE', reservations=reservations)
+
+    def wait_for_active(self, name):
+        pass
+
+    # chi.server
+    def get_server_id(self, name):
+        self.calls.append(('get_server_id', name))
+        server = next((s for s in self.servers if s.name == name), None)
+
+        if not server:
+            raise ValueError(f"No matching instance found for name {name}")
+
+        return server.id
+
+    def create_server(self, server_name, **kwargs):
+        server = FakeServer(self, id=str(len(self.servers) + 1), name=server_name, active_after=2)
+        self.servers.append(server)
+        return server
+
+    # chi.clients
+    def nova(self):
+        return SimpleNamespace(servers=SimpleNamespace(list=self.list_servers))
+
+    def list_servers(self, search_opts=None):
+        self.list_calls += 1
+        pattern = re.compile((search_opts or {}).get('name', '.*'))
+        return [s for s in self.servers if pattern.search(s.name)]
+
+
+@pytest.fixture
+def chi(monkeypatch, tmp_path):
+    fake = FakeChi()
+    modules = {
+        "chi": dict(set=fake.set, use_site=fake.use_site),
+        "chi.lease": dict(add_node_reservation=fake.add_node_reservation, get_lease=fake.get_lease,
+                          create_lease=fake.create_lease, wait_for_active=fake.wait_for_active),
+        "chi.server": dict(get_server_id=fake.get_server_id, create_server=fake.create_server),
+        "chi.clients": dict(nova=fake.nova),
+        "chi.network": dict(PUBLIC_NETWORK="public"),
+        "paramiko": dict(RSAKey=SimpleNamespace(from_private_key_file=lambda *args, **kwargs: "key")),
+        "keystoneauth1": {},
+        "keystoneauth1.exceptions": {},
+        "keystoneauth1.exceptions.connection": dict(ConnectFailure=type("ConnectFailure", (Exception,), {})),
+    }
+
+    for name, attributes in modules.items():
+        module = ModuleType(name)
+        module.__dict__.update(attributes)
+        monkeypatch.setitem(sys.modules, name, module)
+
+    for name in [n for n in modules if '.' in n]:
+        parent, _, child = name.rpartition('.')
+        monkeypatch.setattr(sys.modules[parent], child, sys.modules[name], raising=False)
+
+    monkeypatch.setenv('OS_SLICE_PRIVATE_KEY_FILE', str(tmp_path / "id_rsa"))
+    loaded = set(sys.modules)
+    previous = tracing.set_clock(sleep=lambda seconds: None)
+    yield fake
+    tracing.set_clock(*previous)
+
+    # The chi modules were imported against the stubs, so they are not left behind for other tests.
+    for name in set(sys.modules) - loaded:
+        if name.startswith("fabfed.provider.chi"):
+            del sys.modules[name]
+
+
+def make_node(name, site="CHI@UC", **kwargs):
+    from fabfed.provider.chi.chi_node import ChiNode
+
+    return ChiNode(label="node@chi", name=name, image="image", site=site, flavor="flavor", project_name="project",
+                   key_pair="key", network="sharednet1", **kwargs)
+
+
+def test_wait_for_active_nodes_in_one_sweep(chi):
+    from fabfed.provider.chi.chi_node import wait_for_active_nodes
+    from fabfed.provider.chi.chi_util import LeaseHelper
+
+    lease_helper = LeaseHelper(lease_name="site-lease", logger=logging.getLogger(__name__))
+    chi.create_lease("site-lease", [dict(resource_type='physical:host')])
+    lease_helper.lease = chi.get_lease("site-lease")
+    nodes = [make_node(f"n{i}", lease_helper=lease_helper) for i in range(2)]
+
+    for node in nodes:
+        node.create()
+
+    # A failed server of another run shares a name with a node and must not be taken for it.
+    chi.servers.append(FakeServer(chi, id="9", name="n0", status='ERROR'))
+    wait_for_active_nodes(nodes)
+
+    assert chi.list_calls == 2
+    assert [node.mgmt_ip for node in nodes] == ["10.0.0.1", "10.0.0.2"]
+    assert [node.id for node in nodes] == ["site-lease-r0"] * 2
+
+
+def test_site_session_is_shared_by_the_process(chi):
+    from fabfed.provider.chi.chi_util import SiteSession
+
+    first, second = SiteSession(project_name="project"), SiteSession(project_name="project")
+    first.use("CHI@UC")
+    first.use("CHI@UC")
+    second.use("CHI@UC")
+    assert [call for call in chi.calls if call[0] == 'use_site'] == [('use_site', 'CHI@UC')]
+
+    # Another session moving chi to another site makes the first one select its site again.
+    second.use("CHI@TACC")
+    first.use("CHI@UC")
+    assert [call for call in chi.calls if call[0] == 'use_site'] == [('use_site', 'CHI@UC'),
+                                                                     ('use_site', 'CHI@TACC'),
+                                                                     ('use_site', 'CHI@UC')]
+
+
+def test_one_lease_per_site(chi):
+    from fabfed.provider.chi.chi_provider import ChiProvider
+
+    provider = ChiProvider(type="chi", label="chi_provider", name="session",
+                           config=dict(project_name="project"))
+    nodes = [make_node(name, site=site, site_session=provider.site_session)
+             for name, site in [("n0", "CHI@UC"), ("n1", "CHI@UC"), ("n2", "CHI@TACC")]]
+    provider.nodes.extend(nodes)
+
+    provider._ensure_site_lease(site="CHI@UC")
+    provider._ensure_site_lease(site="CHI@UC")
+
+    leases = [call for call in chi.calls if call[0] == 'create_lease']
+    assert [(name, [r['min'] for r in reservations]) for _, name, reservations in leases] == \
+           [("session-chi-uc-lease", [2])]
+    assert [node.lease_name for node in nodes] == ["session-chi-uc-lease"] * 2 + ["n2-lease"]
+
+    for node in nodes[:2]:
+        node.create()
+
+    assert not [call for call in chi.calls if call[0] == 'create_lease'][1:]
+    assert [node.server_id for node in nodes[:2]] == ["1", "2"]
+
+
+class FakeChannel:
+    def __init__(self, data=b'', exit_status=0, chunk_size=1000):
+        self.data = data
+        self.exit_status = exit_status
+        self.chunk_size = chunk_size
+        self.sent = bytearray()
+        self.write_closed = False
+
+    def sendall(self, data):
+        self.sent += data
+
+    def shutdown_write(self):
+        self.write_closed = True
+
+    def recv(self, size):
+        chunk, self.data = self.data[:min(size, self.chunk_size)], self.data[min(size, self.chunk_size):]
+        return chunk
+
+    def recv_exit_status(self):
+        return self.exit_status
+
+    @staticmethod
+    def recv_stderr(size):
+        return b"tar: no space left on device"
+
+
+@pytest.fixture
+def directory(tmp_path):
+    directory = tmp_path / "data"
+    (directory / "sub").mkdir(parents=True)
+    (directory / "a.txt").write_text("a" * 5000)
+    (directory / "sub" / "b.bin").write_bytes(bytes(range(256)) * 64)
+    return directory
+
+
+def read_tree(directory):
+    return {str(p.relative_to(directory)): p.read_bytes() for p in sorted(directory.rglob("*")) if p.is_file()}
+
+
+def test_stream_upload_directory(chi, directory, tmp_path):
+    import io
+    import tarfile
+    from fabfed.provider.chi.chi_util import SshHelper
+
+    channel, commands = FakeChannel(), []
+    helper = SshHelper("host", "cc", "key")
+    helper._exec = lambda command: commands.append(command) or channel
+
+    count = helper.stream_upload_directory(str(directory) + "/", "/home/cc/my data")
+
+    assert commands == ["mkdir -p '/home/cc/my data' && tar -xzf - -C '/home/cc/my data'"]
+    assert channel.write_closed and count == len(channel.sent)
+
+    with tarfile.open(fileobj=io.BytesIO(bytes(channel.sent)), mode="r:gz") as tar:
+        tar.extractall(tmp_path / "remote")
+
+    assert read_tree(tmp_path / "remote" / "data") == read_tree(directory)
+
+
+def test_stream_download_directory(chi, directory, tmp_path):
+    import io
+    import tarfile
+    from fabfed.provider.chi.chi_util import SshHelper
+
+    buffer = io.BytesIO()
+
+    with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
+        tar.add(str(directory), arcname="data")
+
+    channel, commands = FakeChannel(buffer.getvalue()), []
+    helper = SshHelper("host", "cc", "key")
+    helper._exec = lambda command: commands.append(command) or channel
+
+    count = helper.stream_download_directory(str(tmp_path / "local"), "data")
+
+    assert commands == ["tar -czf - data"]
+    assert count == len(buffer.getvalue())
+    assert read_tree(tmp_path / "local" / "data") == read_tree(directory)
+
+    helper._exec = lambda command: FakeChannel(buffer.getvalue(), exit_status=2)
+
+    with pytest.raises(Exception, match="exit_status=2:tar: no space left on device"):
+        helper.stream_download_directory(str(tmp_path / "other"), "data")
+
+
+def test_transfer_retries(chi, directory, monkeypatch):
+    from fabfed.provider.chi import chi_util
+
+    channels = [ConnectionResetError("reset"), FakeChannel()]
+    sleeps = []
+
+    def exec_command(helper, command):
+        channel = channels.pop(0)
+
+        if isinstance(channel, Exception):
+            raise channel
+
+        return channel
+
+    monkeypatch.setattr(chi_util.SshHelper, "_exec", exec_command)
+    tracing.set_clock(sleep=sleeps.append)
+    node = SimpleNamespace(name="n0", mgmt_ip="host", username="cc", keyfile="key", logger=logging.getLogger())
+
+    stats = chi_util.transfer(node, 'stream_upload_directory', str(directory), "data", retry=2, retry_interval=5)
+    assert stats.node == "n0" and stats.bytes > 0
+    assert sleeps == [5]
+
+    channels = [ConnectionResetError("reset"), ConnectionResetError("reset again")]
+
+    with pytest.raises(Exception, match="stream_upload_directory failed for node n0: reset again"):
+        chi_util.transfer(node, 'stream_upload_directory', str(directory), "data", retry=2, retry_interval=5)
+
+    assert sleeps == [5, 5]
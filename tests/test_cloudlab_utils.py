@@ -0,0 +1,113 @@
+import threading
+
+import pytest
+
+from fabfed.provider.cloudlab.cloudlab_exceptions import CloudlabException
+from fabfed.provider.cloudlab.cloudlab_utils import ExperimentPoller, parse_rspec
+
+RSPEC = """<?xml version="1.0" encoding="UTF-8"?>
+<rspec xmlns="http://www.geni.net/resources/rspec/3"
+       xmlns:jacks="http://www.protogeni.net/resources/rspec/ext/jacks/1" type="manifest">
+  <node client_id="stitch" component_manager_id="urn:publicid:IDN+stitch.geniracks.net+authority+cm">
+    <interface client_id="stitch:if0"><ip address="10.0.0.1" type="ipv4"/></interface>
+    <jacks:site id="site-0"/>
+  </node>
+  <node client_id="node0" component_manager_id="urn:publicid:IDN+utah.cloudlab.us+authority+cm">
+    <interface client_id="node0:if0"><ip address="10.0.0.2" type="ipv4"/></interface>
+    <jacks:site id="site-1"/>
+  </node>
+  <link client_id="link-0" vlantag="3105"><interface_ref client_id="node0:if0"/></link>
+</rspec>
+"""
+
+
+def test_parse_rspec():
+    manifest = parse_rspec(RSPEC)
+
+    assert manifest['vlantag'] == '3105'
+    assert [n['site'] for n in manifest['nodes']] == ['site-0', 'site-1']
+    assert manifest['nodes'][1]['ips'] == [dict(address='10.0.0.2', type='ipv4')]
+    assert manifest['nodes'][1]['component_manager_id'] == 'urn:publicid:IDN+utah.cloudlab.us+authority+cm'
+
+
+def test_experiments_polled_together():
+    polls = []
+
+    def poller(name, ready_after, fail=False):
+        def poll():
+            polls.append(name)
+
+            if fail:
+                raise CloudlabException(message="Experiment failed to instantiate")
+
+            return polls.count(name) >= ready_after, name
+
+        return poll
+
+    experiments = ExperimentPoller(sleep_time=0, retry=10)
+    experiments.register("exp1", poller("exp1", 2))
+    experiments.register("exp2", poller("exp2", 3))
+    experiments.register("exp3", poller("exp3", 1, fail=True))
+
+    assert experiments.wait("exp1") == "exp1"
+    assert polls == ["exp1", "exp2", "exp3", "exp1", "exp2"]
+    assert experiments.wait("exp2") == "exp2"
+
+    with pytest.raises(CloudlabException):
+        experiments.wait("exp3")
+
+
+def test_wait_does_not_block_other_threads():
+    polled, released = threading.Event(), threading.Event()
+    results = []
+
+    def slow():
+        polled.set()
+        return released.is_set(), "exp1"
+
+    experiments = ExperimentPoller(sleep_time=0.05, retry=40)
+    experiments.register("exp1", slow)
+    waiter = threading.Thread(target=lambda: results.append(experiments.wait("exp1")))
+    waiter.start()
+    assert polled.wait(5)
+
+    experiments.register("exp2", lambda: (True, "exp2"))
+    assert experiments.wait("exp2") == "exp2"
+    released.set()
+    waiter.join(5)
+
+    assert results == ["exp1"]
+
+
+def test_rpc_server_is_shared(monkeypatch):
+    import sys
+    from concurrent.futures import ThreadPoolExecutor
+    from types import ModuleType
+    from fabfed.provider.cloudlab.cloudlab_constants import CLOUDLAB_CERTIFICATE
+    from fabfed.provider.cloudlab.cloudlab_provider import CloudlabProvider
+
+    configs = []
+    barrier = threading.Barrier(8)
+
+    class EmulabXMLRPC:
+        def __init__(self, config):
+            configs.append(config)
+
+    for name in ["emulab_sslxmlrpc", "emulab_sslxmlrpc.xmlrpc"]:
+        monkeypatch.setitem(sys.modules, name, ModuleType(name))
+
+    sys.modules["emulab_sslxmlrpc.xmlrpc"].EmulabXMLRPC = EmulabXMLRPC
+    monkeypatch.setattr(sys.modules["emulab_sslxmlrpc"], "xmlrpc", sys.modules["emulab_sslxmlrpc.xmlrpc"],
+                        raising=False)
+    provider = CloudlabProvider(type="cloudlab", label="cloudlab_provider", name="session",
+                                config={CLOUDLAB_CERTIFICATE: "cloudlab.pem"})
+
+    def rpc_server():
+        barrier.wait(5)
+        return provider.rpc_server()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        servers = list(executor.map(lambda _: rpc_server(), range(8)))
+
+    assert len(set(map(id, servers))) == 1 and isinstance(servers[0], EmulabXMLRPC)
+    assert [config["certificate"] for config in configs] == ["cloudlab.pem"]
@@ -0,0 +1,154 @@
+import logging
+
+import pytest
+
+from fabfed.controller.controller import Controller
+from fabfed.controller.provider_factory import ProviderFactory
+from fabfed.exceptions import ControllerException, FabfedException, ProviderException
+from fabfed.provider.dummy.dummy_simulator import ResourceProfile, Simulator, STATUS_PENDING, STATUS_READY, \
+    STATUS_FAILED
+from fabfed.util import tracing
+from fabfed.util.distribution import Distribution
+from fabfed.util.config import WorkflowConfig
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_distributions():
+    import random
+
+    assert Distribution(3).sample(random.Random(1)) == 3
+    assert Distribution(None).sample(random.Random(1)) == 0
+    assert 1 <= Distribution(dict(distribution='uniform', min=1, max=2)).sample(random.Random(1)) <= 2
+    assert Distribution(dict(distribution='normal', mean=-100, stddev=1)).sample(random.Random(1)) == 0
+
+    with pytest.raises(FabfedException):
+        Distribution(dict(distribution='zipf'))
+
+    with pytest.raises(ProviderException):
+        ResourceProfile(dict(pending=dict(distribution='uniform', low=1)))
+
+
+def test_seeded_runs_are_reproducible():
+    config = dict(seed=7, simulate=dict(node=dict(pending=dict(distribution='uniform', min=0, max=100))))
+
+    def sample(names, seed=7):
+        simulator = Simulator(dict(config, seed=seed), clock=Clock())
+
+        for name in names:
+            simulator.create('node', name)
+
+        return {name: simulator.resources[name].ready_at for name in names}
+
+    first = sample(['n1', 'n2', 'n3'])
+    assert first == sample(['n3', 'n1', 'n2'])
+    assert len(set(first.values())) == 3
+    assert first != sample(['n1', 'n2', 'n3'], seed=8)
+
+
+def test_pending_and_read_delay():
+    clock = Clock()
+    config = dict(seed=1, poll_initial_interval=1, poll_backoff=1, wait_timeout=20,
+                  simulate=dict(node=dict(pending=5, read_delay=2), default=dict(failure=dict(wait=1))))
+    simulator = Simulator(config, clock=clock, sleep=clock.sleep)
+
+    simulator.create('node', 'n1')
+    assert simulator.status('node', 'n1') is None
+    clock.now = 2
+    assert simulator.status('node', 'n1') == STATUS_PENDING
+
+    assert simulator.wait('node', ['n1']) == dict(n1=STATUS_READY)
+    assert clock.now == 5
+
+    simulator.create('service', 's1')
+    assert simulator.wait('service', ['s1']) == dict(s1=STATUS_FAILED)
+
+    simulator = Simulator(dict(config, wait_timeout=3), clock=clock, sleep=clock.sleep)
+    simulator.create('node', 'n2')
+    assert simulator.wait('node', ['n2']) == dict(n2=STATUS_PENDING)
+
+
+
+def test_runs_on_the_tracing_clock():
+    clock = Clock()
+    config = dict(seed=1, poll_initial_interval=1, poll_backoff=1,
+                  simulate=dict(node=dict(latency=dict(create=3), pending=5)))
+    previous = tracing.set_clock(sleep=clock.sleep, monotonic=clock)
+
+    try:
+        simulator = Simulator(config)
+        simulator.create('node', 'n1')
+        assert clock.now == 3
+        assert simulator.wait('node', ['n1']) == dict(n1=STATUS_READY)
+    finally:
+        tracing.set_clock(*previous)
+
+    assert clock.now == 8
+
+
+CONFIG = '''
+provider:
+  - dummy:
+    - sim:
+        seed: 3
+        poll_initial_interval: 0.01
+        simulate:
+          node:
+            latency: { create: 0.01 }
+            pending: 0.02
+            failure: { create: FAILURE }
+          service:
+            latency: { create: { distribution: uniform, min: 0, max: 0.01 } }
+            read_delay: 0.01
+            pending: 0.02
+resource:
+  - node:
+      - node1:
+          provider: '{{ dummy.sim }}'
+          image: ubuntu
+  - service:
+      - svc:
+          provider: '{{ dummy.sim }}'
+          image: ubuntu
+          count: 2
+'''
+
+
+def run_apply(session, failure):
+    config = WorkflowConfig.parse(content=CONFIG.replace('FAILURE', str(failure)))
+    controller = Controller(config=config, logger=logging.getLogger(__name__))
+    controller.init(session=session, provider_factory=ProviderFactory(), provider_states=[])
+    controller.plan(provider_states=[])
+    controller.add(provider_states=[])
+
+    try:
+        controller.apply(provider_states=[])
+    finally:
+        state, = controller.get_states()
+
+    return state
+
+
+def test_simulated_workflow(monkeypatch, tmp_path):
+    monkeypatch.setenv('HOME', str(tmp_path))
+    state = run_apply('test-simulator', failure=0)
+    assert not state.failed
+    assert state.number_of_created_resources() == state.number_of_total_resources() == 3
+
+
+def test_simulated_failures_fail_the_workflow(monkeypatch, tmp_path):
+    monkeypatch.setenv('HOME', str(tmp_path))
+
+    with pytest.raises(ControllerException) as e:
+        run_apply('test-simulator', failure=1)
+
+    assert 'Simulated failure of create of node10' in str(e.value)
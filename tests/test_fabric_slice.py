@@ -0,0 +1,130 @@
+import logging
+import sys
+from types import ModuleType, SimpleNamespace
+
+import pytest
+
+from fabfed.util import tracing
+from fabfed.util.constants import Constants
+
+
+class FakeFablibNode:
+    def __init__(self, name, fablib):
+        self.name = name
+        self.fablib = fablib
+
+    def get_name(self):
+        return self.name
+
+    def get_management_ip(self):
+        return f"10.0.0.{self.name[1:]}" if self.fablib.get_slice_calls >= self.fablib.ips_after else None
+
+
+class FakeFablibSlice:
+    def __init__(self, name, fablib):
+        self.name = name
+        self.fablib = fablib
+        self.deleted = False
+
+    def get_name(self):
+        return self.name
+
+    def get_state(self):
+        return "StableOK"
+
+    def get_nodes(self):
+        return [FakeFablibNode(name, self.fablib) for name in self.fablib.node_names]
+
+    def get_networks(self):
+        return []
+
+    def submit(self, wait=False):
+        return self.name
+
+    def wait(self, timeout=None, progress=False):
+        pass
+
+    def wait_ssh(self):
+        pass
+
+    def post_boot_config(self):
+        pass
+
+    def delete(self):
+        self.deleted = True
+
+
+class FakeFablib:
+    def __init__(self, node_names, ips_after):
+        self.node_names = node_names
+        self.ips_after = ips_after
+        self.get_slice_calls = 0
+
+    def get_slice(self, name):
+        self.get_slice_calls += 1
+        return FakeFablibSlice(name, self)
+
+
+@pytest.fixture
+def fablib(monkeypatch):
+    fake = FakeFablib(node_names=["n1", "n2"], ips_after=3)
+    modules = dict(fablib=dict(fablib=fake), slice=dict(Slice=object), node=dict(Node=object),
+                   network_service=dict(NetworkService=object))
+
+    for name in ["fabrictestbed_extensions", "fabrictestbed_extensions.fablib"]:
+        monkeypatch.setitem(sys.modules, name, ModuleType(name))
+
+    for name, attributes in modules.items():
+        module = ModuleType(f"fabrictestbed_extensions.fablib.{name}")
+        module.__dict__.update(attributes)
+        monkeypatch.setitem(sys.modules, module.__name__, module)
+
+    loaded = set(sys.modules)
+    previous = tracing.set_clock(sleep=lambda seconds: None)
+    yield fake
+    tracing.set_clock(*previous)
+
+    # The fabric modules were imported against the stubs, so they are not left behind for other tests.
+    for name in set(sys.modules) - loaded:
+        if name.startswith("fabfed.provider.fabric"):
+            del sys.modules[name]
+
+
+def test_slice_snapshot_fetches(fablib):
+    from fabfed.provider.fabric.fabric_slice import FabricSlice
+
+    provider = SimpleNamespace(name="slice1", label="fabric@slice1", failed={}, pending=[], networks=[],
+                               nodes=[SimpleNamespace(name=name) for name in fablib.node_names])
+    fabric_slice = FabricSlice(provider=provider, logger=logging.getLogger(__name__))
+
+    fabric_slice.init(destroy_phase=False)
+    assert fablib.get_slice_calls == 1
+    assert fabric_slice.existing_nodes == ["n1", "n2"]
+
+    # Management ips show up on the third fetch, so the retries refresh the snapshot twice.
+    fabric_slice._ensure_management_ips()
+    assert fablib.get_slice_calls == 3
+    assert fabric_slice.snapshot.fetch_count == 2
+
+    fabric_slice._reload_networks()
+    assert fabric_slice.snapshot.get_management_ip("n2") == "10.0.0.2"
+    assert fablib.get_slice_calls == 3
+
+    # A submit drops the snapshot and the slice object left by the wait becomes the new one.
+    provider.nodes = []
+    fabric_slice.slice_created = False
+    resource = {Constants.LABEL: "net1@network", Constants.RES_TYPE: Constants.RES_TYPE_NETWORK.lower()}
+    fabric_slice.create_resource(resource=resource)
+    assert fabric_slice.submitted and fabric_slice.snapshot.stale
+
+    fabric_slice.wait_for_create_resource(resource=resource)
+    assert not fabric_slice.snapshot.stale
+    assert fablib.get_slice_calls == 3
+
+    # A delete drops it too, so the next read fetches the slice again.
+    slice_object = fabric_slice.slice_object
+    fabric_slice.delete_resource(resource=resource)
+    assert slice_object.deleted and fabric_slice.snapshot.stale
+
+    fabric_slice.snapshot.get_slice()
+    assert fablib.get_slice_calls == 4
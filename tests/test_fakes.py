@@ -0,0 +1,157 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from fabfed.provider.aws.aws_fake import FakeAws
+from fabfed.provider.sense.sense_fake import FakeSense
+from fabfed.util.constants import Constants
+from fabfed.util.fakes import ScaledClock
+
+
+def test_aws_network_against_fake():
+    from fabfed.provider.aws import aws_utils
+    from fabfed.provider.aws.aws_network import AwsNetwork
+    from fabfed.provider.aws.aws_provider import AwsProvider
+
+    clock = ScaledClock(0.001)
+    fake = FakeAws(timing={'vpn_gateway.create': 60, 'vpn_gateway.attach': 30, 'connection.confirm': 40,
+                           'vif.create': 200, 'vif.delete': 100, 'vpn_gateway.detach': 30},
+                   page_size=1, clock=clock)
+    vpc_id = fake.add_vpc()
+    fake.add_connection('dxcon-fabfed', vlan=100)
+    fake.add_connection('other', vlan=101)
+
+    provider = AwsProvider(type='aws', label='aws_provider', name='aws', config=dict(ACCESS_KEY='a', SECRET_KEY='s'))
+    peering = SimpleNamespace(attributes={Constants.RES_CLOUD_REGION: 'us-east-1', Constants.RES_CLOUD_VPC: vpc_id,
+                                          Constants.RES_ID: 'dxcon-fabfed', Constants.RES_REMOTE_ASN: '64512',
+                                          Constants.RES_LOCAL_ASN: 55038, Constants.RES_SECURITY: 'key',
+                                          Constants.RES_LOCAL_ADDRESS: '192.168.1.1/30',
+                                          Constants.RES_REMOTE_ADDRESS: '192.168.1.2/30'})
+    network = AwsNetwork(label='net', name='net', provider=provider, peering=peering, stitch_port={},
+                         layer3=SimpleNamespace(attributes=dict(subnet='10.0.1.0/24')))
+
+    with fake.installed():
+        network.create()
+
+        # The vif is created while waiting on the vpn gateway attachment. The connection is confirmed first.
+        assert clock() >= 240
+        assert network.vif_details['virtualInterfaceState'] == 'available'
+        assert network.vif_details['vlan'] == 100
+        route_table = fake.route_tables[network.route_table_details['RouteTableId']]
+        assert {'GatewayId': network.vpn_id} in route_table['PropagatingVgws']
+        assert fake.calls['ec2:create_vpn_gateway'] == 1
+
+        network._state = SimpleNamespace(attributes=dict(route_table_details=network.route_table_details))
+        network.delete()
+
+    assert aws_utils.client_pool._factory is None
+    vgw, = fake.vpn_gateways.values()
+    assert fake.view(vgw, 'State')['State'] == 'deleted'
+    assert fake.route_tables[network.route_table_details['RouteTableId']]['_lifecycle'].final == 'deleted'
+
+
+def test_aws_fake_pages_and_rejects():
+    from fabfed.provider.aws import aws_utils
+    from fabfed.provider.aws.aws_exceptions import AwsException
+
+    fake = FakeAws(page_size=2)
+
+    for idx in range(5):
+        fake.add_connection(f"con{idx}", vlan=idx)
+
+    client = fake.client(service='directconnect')
+    assert len(aws_utils.describe(client, 'describe_connections', 'connections')) == 5
+    assert fake.calls['directconnect:describe_connections'] == 3
+
+    with pytest.raises(AwsException, match='InvalidVpcID.NotFound'):
+        fake.client(service='ec2').create_subnet(CidrBlock='10.0.0.0/24', VpcId='vpc-missing')
+
+
+def sense_create(fake, alias, profile):
+    si_uuid = fake.request('GET', '/instance')
+    profile_uuid = json.loads(fake.request('GET', f'/profile/{profile}'))['uuid']
+    body = json.dumps(dict(service_profile_uuid=profile_uuid, alias=alias))
+    response = json.loads(fake.request('POST', f'/instance/{si_uuid}', body_params=body))
+    assert response['service_uuid'] == si_uuid
+    return si_uuid
+
+
+def test_sense_workflow_against_fake():
+    from fabfed.util.waiter import WaitPolicy, wait_for_statuses
+
+    clock = ScaledClock(0.001)
+    fake = FakeSense(timing={'provision': 100, 'verify': {'distribution': 'uniform', 'min': 10, 'max': 20},
+                             'cancel': 50}, failures={'provision': 0.5}, seed=6, clock=clock)
+    fake.add_profile('l2', intent=dict(service='dnc', data={}), manifest={'Switch Ports': []})
+    policy = WaitPolicy(initial_interval=5, max_interval=30, backoff=1.5, timeout=1000, cancel_ready_settle=0)
+    si_uuids = [sense_create(fake, f"net{idx}", 'l2') for idx in range(4)]
+
+    with pytest.raises(ValueError, match='Returned code 409'):
+        fake.request('PUT', f'/instance/{si_uuids[0]}/cancel')
+
+    with fake.sleeping():
+        for si_uuid in si_uuids:
+            assert fake.request('GET', f'/instance/{si_uuid}/status') == 'CREATE - COMPILED'
+            fake.request('PUT', f'/instance/{si_uuid}/provision', query_params=[('sync', 'false')])
+
+        statuses = wait_for_statuses(lambda si_uuid: fake.request('GET', f'/instance/{si_uuid}/status'),
+                                     names=si_uuids, targets=['CREATE - READY'], failures=['FAILED'], policy=policy)
+
+    assert clock() >= 110
+    assert set(statuses.values()) == {'CREATE - READY', 'CREATE - FAILED'}
+    assert fake.calls['PUT /instance/{uuid}/provision'] == 4
+
+    instances = json.loads(fake.request('GET', '/discover/service/instances', query_params=[('search', 'net1')]))
+    instance, = instances['instances']
+    assert json.loads(instance['intents'][0]['json'])['service'] == 'dnc'
+
+    ready = [si_uuid for si_uuid, status in statuses.items() if status == 'CREATE - READY']
+    fake.request('PUT', f'/instance/{ready[0]}/cancel', query_params=[('sync', 'false')])
+    assert fake.status(ready[0]) == 'CANCEL - COMMITTING'
+
+    with pytest.raises(ValueError, match='Returned code 409'):
+        fake.request('DELETE', f'/instance/{ready[0]}')
+
+    clock.sleep(100)
+    assert fake.status(ready[0]) == 'CANCEL - READY'
+    fake.request('DELETE', f'/instance/{ready[0]}')
+    assert ready[0] not in fake.instances
+
+    # Runs are reproducible given the seed.
+    other = FakeSense(failures={'provision': 0.5}, seed=6)
+    other.add_profile('l2')
+
+    for idx in range(4):
+        si_uuid = sense_create(other, f"net{idx}", 'l2')
+        other.request('PUT', f'/instance/{si_uuid}/provision')
+        assert other.instances[si_uuid].lifecycle.final == statuses[si_uuids[idx]]
+
+
+def test_gcp_network_against_fake():
+    pytest.importorskip('google.cloud.compute_v1')
+
+    from fabfed.provider.gcp.gcp_fake import FakeGcp
+    from fabfed.provider.gcp.gcp_network import GcpNetwork
+    from fabfed.provider.gcp.gcp_provider import GcpProvider
+
+    clock = ScaledClock(0.001)
+    fake = FakeGcp(timing={'router.insert': 30, 'attachment.insert': 300, 'attachment.delete': 60}, clock=clock)
+    fake.add_network('vpc')
+    provider = GcpProvider(type='gcp', label='gcp_provider', name='gcp', config=dict(PROJECT='fabfed'))
+    peering = SimpleNamespace(attributes={Constants.RES_CLOUD_REGION: 'us-east4', Constants.RES_CLOUD_VPC: 'vpc',
+                                          Constants.RES_REMOTE_ASN: 16550, Constants.RES_SECURITY: 'key'})
+    network = GcpNetwork(label='net', name='net', provider=provider, layer3=None, peering=peering, stitch_port={})
+
+    with fake.installed():
+        network.create()
+        assert network.interface[0]['id'].endswith('/us-east4/1')
+        assert clock() >= 330
+
+        router = fake.routers[('us-east4', 'net-router')]
+        assert router.md5_authentication_keys[0].key == 'key'
+        assert router.bgp_peers[0].md5_authentication_key_name == 'md5-key-name-1'
+
+        network.delete()
+
+    assert not fake.routers and not fake.attachments
@@ -0,0 +1,53 @@
+import json
+import os
+
+from fabfed.util.inventory import Inventory
+
+
+def test_inventory_flushed_once_with_groups(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    inventory = Inventory("session")
+    legacy_file = os.path.join(inventory.inventory_dir, "session-dtn@fabric-dtn-0")
+
+    with open(legacy_file, "w") as fp:
+        fp.write("[dtn-0]\n10.0.0.1\n")
+
+    for i in range(3):
+        inventory.add(name=f"dtn-{i}", host=f"10.0.0.{i + 1}",
+                      host_vars=dict(ansible_user="ubuntu", node=f"192.168.1.{i}"),
+                      provider_label="fabric_provider", label="dtn@fabric")
+
+    inventory.remove("dtn-2")
+    assert not os.path.exists(inventory.ini_path)
+
+    inventory.flush()
+    assert not os.path.exists(legacy_file)
+    assert os.listdir(inventory.inventory_dir) == ["hosts.ini"]
+
+    with open(inventory.ini_path) as fp:
+        ini = fp.read()
+
+    assert "[dtn-1]\n10.0.0.2\n[dtn-1:vars]\nansible_user=ubuntu\nnode=192.168.1.1\n" in ini
+    assert "[label_dtn_fabric:children]\ndtn-0\ndtn-1\n" in ini
+    assert "[provider_fabric_provider:children]" in ini
+
+    with open(inventory.json_path) as fp:
+        dynamic = json.load(fp)
+
+    assert dynamic["_meta"]["hostvars"]["dtn-0"] == dict(ansible_user="ubuntu", node="192.168.1.0",
+                                                          ansible_host="10.0.0.1")
+    assert dynamic["label_dtn_fabric"]["hosts"] == ["dtn-0", "dtn-1"]
+    assert dynamic["all"]["hosts"] == ["dtn-0", "dtn-1"]
+    assert Inventory("session").nodes == inventory.nodes
+
+
+def test_nodes_sharing_an_address_keep_their_vars(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    inventory = Inventory("session")
+
+    for i in range(2):
+        inventory.add(name=f"vm-{i}", host="10.0.0.1", host_vars=dict(ansible_port=2200 + i))
+
+    hostvars = inventory.to_json()["_meta"]["hostvars"]
+    assert hostvars["vm-0"] == dict(ansible_port=2200, ansible_host="10.0.0.1")
+    assert hostvars["vm-1"] == dict(ansible_port=2201, ansible_host="10.0.0.1")
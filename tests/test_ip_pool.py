@@ -0,0 +1,140 @@
+from ipaddress import IPv4Address, IPv6Address
+
+import pytest
+
+from fabfed.exceptions import ResourceNotAvailable
+from fabfed.util.config_models import Config
+from fabfed.util.constants import Constants
+from fabfed.util.ip_pool import IPPool
+
+
+def test_allocate_and_reserve():
+    pool = IPPool.from_layer3("192.168.1.2", "192.168.1.254")
+    assert len(pool) == 252
+    assert IPv4Address("192.168.1.2") not in pool
+
+    assert pool.reserve("192.168.1.3")
+    assert pool.reserve(IPv4Address("192.168.1.10"))
+    assert not pool.reserve("192.168.1.10")
+    assert not pool.reserve("10.0.0.1")
+
+    assert pool.allocate() == IPv4Address("192.168.1.4")
+    assert len(pool) == 249
+    assert len(pool.intervals()) == 2
+
+    pool.release("192.168.1.10")
+    pool.release("192.168.1.3")
+    assert len(pool.intervals()) == 2
+    assert len(pool) == 251
+
+
+def test_large_pool_is_lazy():
+    pool = IPPool("10.0.0.1", "10.0.255.254")
+    assert len(pool) == 65534
+    assert len(pool.intervals()) == 1
+
+    for addr in ["10.0.100.1", "10.0.0.1", "10.0.255.254"]:
+        pool.reserve(addr)
+
+    assert pool.allocate() == IPv4Address("10.0.0.2")
+    assert len(pool) == 65530
+
+
+def test_exhausted_pool():
+    pool = IPPool("10.0.0.1", "10.0.0.2")
+    pool.allocate()
+    pool.allocate()
+    assert not pool
+
+    with pytest.raises(ResourceNotAvailable):
+        pool.allocate()
+
+
+def test_reserve_range_and_ipv6():
+    pool = IPPool("2001:db8::1", "2001:db8::ff")
+    assert pool.version == 6
+    assert pool.reserve_range("2001:db8::10", "2001:db8::1f") == 16
+    assert "2001:db8::10" not in pool
+    assert pool.allocate() == IPv6Address("2001:db8::1")
+
+
+def test_partition_layer3_config():
+    from fabfed.controller.helper import partition_layer3_config
+    from types import SimpleNamespace
+
+    layer3 = Config("layer3", "my_layer", {Constants.RES_SUBNET: "192.168.1.0/24",
+                                           Constants.RES_LAYER3_DHCP_START: "192.168.1.2",
+                                           Constants.RES_LAYER3_DHCP_END: "192.168.1.254"})
+    networks = [SimpleNamespace(label=f"net{i}", attributes={Constants.RES_LAYER3: layer3}) for i in range(3)]
+    partition_layer3_config(networks=networks)
+    ranges = [(n.attributes[Constants.RES_LAYER3].attributes[Constants.RES_LAYER3_DHCP_START],
+               n.attributes[Constants.RES_LAYER3].attributes[Constants.RES_LAYER3_DHCP_END]) for n in networks]
+
+    assert ranges == [("192.168.1.2", "192.168.1.86"),
+                      ("192.168.1.87", "192.168.1.171"),
+                      ("192.168.1.172", "192.168.1.254")]
+
+
+def test_ipam_populate_and_reuse(tmp_path):
+    from fabfed.controller.helper import populate_layer3_config, partition_layer3_config
+    from fabfed.util.ipam import Ipam, IpamStore, release_session
+    from types import SimpleNamespace
+
+    store = IpamStore(str(tmp_path / "ipam.yml"))
+
+    def networks_for(session, labels):
+        ipam = Ipam(session=session, store=store)
+        layer3 = Config("layer3", "my_layer", {Constants.RES_SUBNET_POOL: "10.10.0.0/16"})
+        v6_layer3 = Config("layer3", "my_v6_layer", {Constants.RES_SUBNET: "2001:db8:1::/64"})
+        networks = [SimpleNamespace(label=label, attributes={Constants.RES_LAYER3: layer3}) for label in labels]
+        v6_network = SimpleNamespace(label="v6_net", attributes={Constants.RES_LAYER3: v6_layer3})
+        populate_layer3_config(networks=networks + [v6_network], ipam=ipam)
+        partition_layer3_config(networks=networks, ipam=ipam)
+        return networks, v6_layer3
+
+    def ranges(networks):
+        return [(n.attributes[Constants.RES_LAYER3].attributes[Constants.RES_SUBNET],
+                 n.attributes[Constants.RES_LAYER3].attributes[Constants.RES_LAYER3_DHCP_START],
+                 n.attributes[Constants.RES_LAYER3].attributes[Constants.RES_LAYER3_DHCP_END]) for n in networks]
+
+    networks, v6_layer3 = networks_for("s1", ["net0", "net1", "net2"])
+    assert ranges(networks) == [("10.10.0.0/24", "10.10.0.2", "10.10.0.86"),
+                                ("10.10.0.0/24", "10.10.0.87", "10.10.0.171"),
+                                ("10.10.0.0/24", "10.10.0.172", "10.10.0.254")]
+    assert v6_layer3.attributes[Constants.RES_NET_GATEWAY] == "2001:db8:1::1"
+    assert v6_layer3.attributes[Constants.RES_LAYER3_DHCP_END] == "2001:db8:1:0:ffff:ffff:ffff:ffff"
+
+    other_networks, _ = networks_for("s2", ["net0", "net1"])
+    assert other_networks[0].attributes[Constants.RES_LAYER3].attributes[Constants.RES_SUBNET] == "10.10.1.0/24"
+
+    # a re-apply keeps the slices already handed out
+    networks, _ = networks_for("s1", ["net0", "net2", "net3"])
+    assert ranges(networks) == [("10.10.0.0/24", "10.10.0.2", "10.10.0.86"),
+                                ("10.10.0.0/24", "10.10.0.172", "10.10.0.254"),
+                                ("10.10.0.0/24", "10.10.0.87", "10.10.0.171")]
+
+    release_session("s1", store=store)
+    third_networks, _ = networks_for("s3", ["net0"])
+    assert third_networks[0].attributes[Constants.RES_LAYER3].attributes[Constants.RES_SUBNET] == "10.10.0.0/24"
+
+
+def test_ipam_read_only_store(tmp_path, monkeypatch):
+    from fabfed.util.ipam import Ipam, IpamStore, read_only_store
+
+    monkeypatch.setenv("HOME", str(tmp_path))
+    ipam_file = tmp_path / ".fabfed" / "ipam" / "ipam.yml"
+
+    def assign(session, store):
+        layer3 = Config("layer3", "my_layer", {Constants.RES_SUBNET_POOL: "10.10.0.0/16"})
+        Ipam(session=session, store=store).assign_layer3(layer3=layer3, network_label="net0")
+        return layer3.attributes[Constants.RES_SUBNET]
+
+    assert assign("s1", read_only_store()) == "10.10.0.0/24"
+    assert not (tmp_path / ".fabfed").exists()
+
+    assert assign("s1", IpamStore()) == "10.10.0.0/24"
+    saved = ipam_file.read_text()
+
+    # a plan of another session sees the subnet held by s1 but leaves the file alone
+    assert assign("s2", read_only_store()) == "10.10.1.0/24"
+    assert ipam_file.read_text() == saved
@@ -0,0 +1,112 @@
+import logging
+import sys
+from types import ModuleType, SimpleNamespace
+
+import pytest
+import yaml
+
+runs = []
+
+
+class FakeRunnerConfig:
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+
+    def prepare(self):
+        pass
+
+
+class FakeRunner:
+    def __init__(self, config, event_handler=None):
+        self.config = config
+        self.event_handler = event_handler
+        self.stats = {}
+        self.status = 'successful'
+        self.rc = 0
+
+    def run(self):
+        runs.append(dict(self.config.kwargs))
+        inventory = self.config.kwargs['inventory']
+
+        if isinstance(inventory, list):
+            with open(inventory[1]) as stream:
+                runs[-1]['host_vars'] = yaml.safe_load(stream)
+
+        self.event_handler(dict(event='runner_on_ok', event_data=dict(host='n1', res=dict(changed=True))))
+        self.event_handler(dict(event='runner_on_unreachable', event_data=dict(host='n2', res=dict(msg='down'))))
+        self.event_handler(dict(event='playbook_on_stats', event_data={}))
+
+
+@pytest.fixture
+def ansible(monkeypatch, tmp_path):
+    modules = {
+        "ansible": dict(context=ModuleType("ansible.context")),
+        "ansible.executor": {},
+        "ansible.executor.playbook_executor": dict(PlaybookExecutor=object),
+        "ansible.inventory": {},
+        "ansible.inventory.manager": dict(InventoryManager=object),
+        "ansible.module_utils": {},
+        "ansible.module_utils.common": {},
+        "ansible.module_utils.common.collections": dict(ImmutableDict=dict),
+        "ansible.parsing": {},
+        "ansible.parsing.dataloader": dict(DataLoader=object),
+        "ansible.plugins": {},
+        "ansible.plugins.callback": dict(CallbackBase=object),
+        "ansible.vars": {},
+        "ansible.vars.manager": dict(VariableManager=object),
+        "ansible_runner": dict(Runner=FakeRunner, RunnerConfig=FakeRunnerConfig),
+    }
+
+    for name, attributes in modules.items():
+        module = ModuleType(name)
+        module.__dict__.update(attributes)
+        monkeypatch.setitem(sys.modules, name, module)
+
+    monkeypatch.setenv("HOME", str(tmp_path))
+    runs.clear()
+    loaded = set(sys.modules)
+    yield runs
+
+    # The janus modules were imported against the stubs, so they are not left behind for other tests.
+    for name in set(sys.modules) - loaded:
+        if name.startswith("fabfed.provider.janus"):
+            del sys.modules[name]
+
+
+def test_janus_service_configured_in_one_run(ansible):
+    from fabfed.provider.janus.janus_provider import JanusService
+
+    provider = SimpleNamespace(name="session-janus", config=dict(url="https://janus:5000", username="admin"))
+    service = JanusService(label="dtn@janus", name="dtn", image="image", nodes=[], provider=provider,
+                           controller_url="https://10.0.0.1:5000", controller_host="10.0.0.1",
+                           controller_web=None, ssh_tunnel_cmd=None, logger=logging.getLogger(__name__))
+
+    service.create()
+    service.delete()
+
+    assert [run['tags'] for run in ansible] == ["docker,janus,controller,janus-add", "janus-del"]
+    assert [run['forks'] for run in ansible] == [100, 100]
+    assert ansible[0]['playbook'].endswith("ansible/janus.yml") and ansible[0]['limit'] is None
+    assert ansible[0]['extravars'] == dict(url="https://10.0.0.1:5000", username="admin",
+                                           janus_controller_host="10.0.0.1")
+    assert ansible[0]['envvars']['ANSIBLE_PIPELINING'] == 'True'
+    assert 'ControlPersist=300s' in ansible[0]['envvars']['ANSIBLE_SSH_ARGS']
+
+
+def test_host_vars_and_results(ansible, tmp_path):
+    from fabfed.provider.janus.util.ansible_helper import AnsibleRunnerHelper
+
+    helper = AnsibleRunnerHelper(str(tmp_path / "inventory"), logging.getLogger(__name__), forks=10)
+    helper.run_playbook("janus.yml", tags=["docker"])
+    assert ansible[0]['inventory'] == str(tmp_path / "inventory")
+
+    helper.add_vars("n1", "janus_port", "5000")
+    helper.run_playbook("janus.yml", tags=["docker"])
+    assert ansible[1]['inventory'][0] == str(tmp_path / "inventory")
+    assert ansible[1]['host_vars'] == dict(all=dict(hosts=dict(n1=dict(janus_port="5000"))))
+    assert ansible[1]['forks'] == 10
+
+    results = helper.get_result_callback()
+    assert results.host_ok == dict(n1=dict(changed=True))
+    assert results.host_unreachable == dict(n2=dict(msg='down'))
+    assert not results.host_failed
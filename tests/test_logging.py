@@ -0,0 +1,44 @@
+import json
+import threading
+
+from fabfed.util import utils
+from fabfed.util.utils import Lazy
+
+
+def test_queued_json_logging(tmp_path, monkeypatch):
+    log_file = tmp_path / 'fabfed.log'
+    monkeypatch.setenv('FABFED_LOG_LOCATION', str(log_file))
+    monkeypatch.setenv('FABFED_LOG_FORMAT', 'json')
+    monkeypatch.setenv('FABFED_LOG_LEVEL', 'INFO')
+    built = []
+
+    def payload(name):
+        built.append(name)
+        return json.dumps(dict(name=name), indent=2)
+
+    try:
+        logger = utils.init_logger()
+        logger.debug("intent=%s", Lazy(payload, 'debug'))
+        logger.info("intent=%s", Lazy(payload, 'info'))
+
+        worker = threading.Thread(target=logger.warning, args=("from %s", 'worker'), name='worker')
+        worker.start()
+        worker.join()
+
+        try:
+            raise ValueError('boom')
+        except ValueError as e:
+            logger.error(e, exc_info=True)
+
+        utils.stop_logger()
+        logger.info("after %s", 'stop')
+        entries = [json.loads(line) for line in log_file.read_text().splitlines()]
+    finally:
+        monkeypatch.undo()
+        utils.init_logger()
+
+    assert 'debug' not in built and 'info' in built
+    assert [e['message'] for e in entries] == ['intent={\n  "name": "info"\n}', 'from worker', 'boom', 'after stop']
+    assert entries[1]['thread'] == 'worker' and entries[1]['level'] == 'WARNING'
+    assert 'ValueError: boom' in entries[2]['exception']
+    assert entries[0]['file'] == 'test_logging.py'
@@ -0,0 +1,92 @@
+from fabfed.model import Node
+from fabfed.model.node_group import NodeGroup, DEFAULT_RELAY_COMMAND
+
+
+class FakeNode(Node):
+    def __init__(self, name, files: dict, fail=False, exit_code=0, upload_fails=False):
+        super().__init__(label="dtn@node", name=name, image=None, site=None, flavor=None)
+        self.user = "ubuntu"
+        self.host = name
+        self.files = files
+        self.fail = fail
+        self.exit_code = exit_code
+        self.upload_fails = upload_fails
+
+    def get_reservation_state(self) -> str:
+        return "Active"
+
+    def get_reservation_id(self) -> str:
+        return self.name
+
+    def add_route(self, subnet, gateway):
+        pass
+
+    def get_dataplane_address(self, network=None, interface=None, af=None):
+        return None
+
+    def upload_file(self, local_file_path, remote_file_path, retry=3, retry_interval=10):
+        if self.upload_fails:
+            raise Exception("upload failed")
+
+        self.files.setdefault("uploads", []).append(self.name)
+        self.files.setdefault(self.name, set()).add(remote_file_path)
+
+    def execute_with_status(self, command, retry=3, retry_interval=10):
+        if self.fail:
+            raise Exception("unreachable")
+
+        if self.exit_code:
+            return "", "command failed", self.exit_code
+
+        if command.startswith("scp"):
+            peer = command.split("@")[1].split(":")[0]
+            self.files.setdefault(peer, set()).add(command.split()[-5])
+
+        return f"{self.name}:{command}", "", 0
+
+
+def test_execute_isolates_failures():
+    nodes = [FakeNode(f"n{i}", {}, fail=(i == 3)) for i in range(10)]
+    result = NodeGroup(nodes, max_workers=4).execute("hostname")
+
+    assert len(result) == 10
+    assert not result.ok
+    assert [r.node for r in result.failed] == ["n3"]
+    assert result["n0"].stdout == "n0:hostname"
+    assert result.summary()["failed"] == 1
+
+
+def test_upload_over_relay_tree(tmp_path):
+    local_file = tmp_path / "data.bin"
+    local_file.write_bytes(b"x" * 1024)
+    files = {}
+    nodes = [FakeNode(f"n{i}", files) for i in range(9)]
+    result = NodeGroup(nodes).upload_file(str(local_file), "/tmp/data.bin",
+                                          relay_threshold=1, relay_command=DEFAULT_RELAY_COMMAND)
+
+    assert result.ok
+    assert files["uploads"] == ["n0"]
+    assert all("/tmp/data.bin" in files[n.name] for n in nodes)
+    assert {r.source for r in result} != {"local"}
+
+
+def test_non_zero_exit_codes_and_failed_uploads(tmp_path):
+    local_file = tmp_path / "data.bin"
+    local_file.write_bytes(b"x" * 1024)
+    files = {}
+    nodes = [FakeNode(f"n{i}", files, exit_code=(2 if i == 1 else 0)) for i in range(5)]
+    group = NodeGroup(nodes)
+
+    result = group.execute("false")
+    assert [(r.node, r.exit_code) for r in result.failed] == [("n1", 2)]
+    assert result["n1"].stderr == "command failed"
+
+    # n1 cannot forward the file, so n3, which it was paired with, gets it directly.
+    result = group.upload_file(str(local_file), "/tmp/data.bin", relay_threshold=1,
+                               relay_command=DEFAULT_RELAY_COMMAND, seeds=2)
+    assert result.ok
+    assert files["uploads"] == ["n0", "n1", "n3"]
+
+    nodes[2].upload_fails = True
+    result = group.upload_file(str(local_file), "/tmp/data.bin")
+    assert [(r.node, r.error) for r in result.failed] == [("n2", "upload failed")]
@@ -0,0 +1,42 @@
+import os
+
+from fabfed.util.profiling import PhaseProfiler
+
+
+def busy(n):
+    return sum(i * i for i in range(n))
+
+
+def test_disabled_profiler_records_nothing(monkeypatch, tmp_path):
+    monkeypatch.setenv('HOME', str(tmp_path))
+    profiler = PhaseProfiler()
+
+    with profiler.phase('parse'):
+        busy(10)
+
+    assert not profiler.profiles
+    assert profiler.save('test-session') is None
+
+
+def test_phases_are_profiled_and_saved(monkeypatch, tmp_path):
+    monkeypatch.setenv('HOME', str(tmp_path))
+    profiler = PhaseProfiler(enabled=True, memory=True, top=5)
+
+    with profiler.phase('parse'):
+        busy(1000)
+
+    with profiler.phase('apply'):
+        data = [bytearray(1024) for _ in range(1024)]
+        del data
+
+    assert list(profiler.profiles) == ['parse', 'apply']
+    assert profiler.peaks['apply'] >= 1024 * 1024
+
+    dir_path = profiler.save('test-session')
+    assert sorted(os.listdir(dir_path)) == ['apply.prof', 'hotspots.txt', 'parse.prof']
+
+    with open(os.path.join(dir_path, 'hotspots.txt')) as stream:
+        hotspots = stream.read()
+
+    assert '===== phase=parse' in hotspots and 'busy' in hotspots
+    assert 'peak_memory=' in hotspots
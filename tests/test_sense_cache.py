@@ -0,0 +1,37 @@
+import json
+
+from fabfed.provider.sense.sense_cache import ProfileCache
+from fabfed.util.yaml_store import YamlStore
+
+
+class Orchestrator:
+    def __init__(self):
+        self.calls = []
+        self.profile = dict(uuid="u1", name="p1", intent={"service": "dnc"})
+
+    def search(self):
+        self.calls.append("search")
+        return json.dumps(self.profile)
+
+    def describe(self):
+        self.calls.append("describe")
+        return json.dumps(dict(intent=self.profile["intent"]))
+
+
+def test_profile_cache_shared_across_sessions_and_invalidated(tmp_path):
+    now = [1000.0]
+    store = YamlStore(str(tmp_path / "sense_profiles.yml"))
+    orchestrator = Orchestrator()
+
+    def lookup(cache):
+        uuid = cache.get_uuid(endpoint="e", profile="p1", fetch=orchestrator.search)
+        return json.loads(cache.get_description(endpoint="e", uuid=uuid, fetch=orchestrator.describe))
+
+    lookup(ProfileCache(store=store, ttl=60, clock=lambda: now[0]))
+    assert lookup(ProfileCache(store=store, ttl=60, clock=lambda: now[0]))["intent"]["service"] == "dnc"
+    assert orchestrator.calls == ["search", "describe"]
+
+    orchestrator.profile["intent"] = {"service": "vcn"}
+    now[0] += 61
+    assert lookup(ProfileCache(store=store, ttl=60, clock=lambda: now[0]))["intent"]["service"] == "vcn"
+    assert orchestrator.calls == ["search", "describe", "search", "describe"]
@@ -0,0 +1,59 @@
+from fabfed.provider.sense.sense_waiter import WaitPolicy, wait_for_status
+
+POLICY = WaitPolicy(initial_interval=2, max_interval=30, backoff=2, timeout=600, cancel_ready_settle=10)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_wait_backs_off_and_confirms_premature_cancel_ready():
+    clock = Clock()
+    statuses = iter(["CANCEL - COMMITTING"] * 4 + ["CANCEL - READY", "CANCEL - COMMITTED"] + ["CANCEL - READY"] * 10)
+    status = wait_for_status(lambda: next(statuses), name="si", targets=["CANCEL - READY"], settle=10,
+                             policy=POLICY, sleep=clock.sleep, clock=lambda: clock.now)
+
+    assert status == "CANCEL - READY"
+    assert clock.sleeps[:4] == [2, 4, 8, 16]
+    assert clock.sleeps[4:] == [2, 2, 2, 4, 8]
+
+
+def test_wait_stops_on_failure_and_timeout():
+    clock = Clock()
+    assert wait_for_status(lambda: "CREATE - FAILED", name="si", targets=["CREATE - READY"],
+                           policy=POLICY, sleep=clock.sleep, clock=lambda: clock.now) == "CREATE - FAILED"
+    assert not clock.sleeps
+
+    wait_for_status(lambda: "CREATE - COMMITTING", name="si", targets=["CREATE - READY"],
+                    policy=POLICY, sleep=clock.sleep, clock=lambda: clock.now)
+    assert clock.now == 600
+
+
+def test_wait_on_instances_as_a_batch():
+    from fabfed.provider.sense.sense_waiter import wait_for_statuses
+
+    clock = Clock()
+    polls = []
+    sequences = dict(a=iter(["CREATE - COMMITTING", "CREATE - READY"]),
+                     b=iter(["CREATE - COMMITTING", "CREATE - FAILED"]),
+                     c=iter(["CREATE - COMMITTING"] * 3 + ["CREATE - READY"]))
+
+    def get_status(name):
+        polls.append(name)
+
+        if name == "c" and len(polls) == 1:
+            raise Exception("transient")
+
+        return next(sequences[name])
+
+    statuses = wait_for_statuses(get_status, names=["c", "a", "b"], targets=["CREATE - READY"],
+                                 policy=POLICY, sleep=clock.sleep, clock=lambda: clock.now)
+
+    assert statuses == dict(a="CREATE - READY", b="CREATE - FAILED", c="CREATE - READY")
+    assert len(clock.sleeps) == 4
@@ -0,0 +1,88 @@
+from fabfed.util import tracing
+from fabfed.util.state import summarize_stats
+from fabfed.util.stats import resource_stats
+from fabfed.util.tracing import Tracer
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+def test_resource_stats():
+    clock = Clock()
+    tracer = Tracer(clock=clock)
+
+    def stage(phase, label, provider='fabric@prov'):
+        return tracer.span(f"{phase}:{label}", cat=tracing.PROVIDER, phase=phase, provider=provider, label=label)
+
+    with tracer.span('apply', cat=tracing.PHASE):
+        with stage('add', 'node@fab'):
+            clock.advance(1)
+
+        with stage('create', 'node@fab'):
+            with tracer.span('fabric:submit'):
+                clock.advance(2)
+
+        with stage('wait', 'node@fab'):
+            with tracer.span('fabric:wait'):
+                for _ in range(3):
+                    with tracer.span('sleep', cat=tracing.SLEEP):
+                        clock.advance(10)
+
+                    clock.advance(1)
+
+            with tracer.span('fabric:node_networking', cat=tracing.POST_CONFIG):
+                clock.advance(4)
+
+            with tracer.span('on_created', cat=tracing.LISTENER):
+                clock.advance(0.5)
+
+        with stage('wait', 'net@sense', provider='sense@prov'):
+            clock.advance(7)
+
+    node, = resource_stats(tracer.spans, 'fabric@prov')
+    assert node.label == 'node@fab'
+    assert (node.add_duration, node.create_duration, node.wait_duration, node.delete_duration) == (1, 2, 37.5, 0)
+    assert (node.post_config_duration, node.listener_duration) == (4, 0.5)
+    assert (node.sleep_duration, node.active_duration) == (30, 10.5)
+
+    net, = resource_stats(tracer.spans, 'sense@prov')
+    assert (net.wait_duration, net.sleep_duration, net.active_duration) == (7, 0, 7)
+
+
+def test_overlapping_sleeps_are_counted_once():
+    clock = Clock()
+    tracer = Tracer(clock=clock)
+
+    with tracer.span('wait:vpc@aws', cat=tracing.PROVIDER, phase='wait', provider='aws@prov', label='vpc@aws'):
+        first = tracer.span('sleep', cat=tracing.SLEEP)
+        second = tracer.span('sleep', cat=tracing.SLEEP)
+        first.__enter__()
+        second.__enter__()
+        clock.advance(20)
+        second.__exit__(None, None, None)
+        first.__exit__(None, None, None)
+        clock.advance(5)
+
+    vpc, = resource_stats(tracer.spans, 'aws@prov')
+    assert (vpc.wait_duration, vpc.sleep_duration, vpc.active_duration) == (25, 20, 5)
+
+
+def test_summarize_stats():
+    stats = dict(stats=dict(action='apply', provider_stats=[
+        dict(provider='fabric@prov', provider_duration=dict(duration=12.34567), resources=[
+            dict(label='node@fab', add_duration=1.0001, wait_duration=11.3456)]),
+        dict(provider='old@prov', provider_duration=dict(duration=1))]))
+
+    summary = summarize_stats(stats)
+    assert summary['action'] == 'apply'
+    assert summary['provider_stats'][0] == dict(provider='fabric@prov', duration=12.346,
+                                                resources=[dict(label='node@fab', add=1.0, wait=11.346)])
+    assert summary['provider_stats'][1]['resources'] == []
@@ -0,0 +1,74 @@
+import pytest
+
+from fabfed.exceptions import FabfedException
+from fabfed.util import stats_history
+from fabfed.util.stats import Duration, FabfedStats, ProviderStats, ResourceStats, Stages
+from fabfed.util.stats_history import StatsHistory
+
+
+def make_stats(workflow, wait, action='apply', has_failures=False):
+    resource = ResourceStats(label='node@fab', add_duration=1, create_duration=2, wait_duration=wait,
+                             delete_duration=0, post_config_duration=0, listener_duration=0, sleep_duration=0,
+                             active_duration=wait)
+    provider = ProviderStats(provider='fabric@prov', provider_duration=Duration(duration=wait + 3, comment=''),
+                             has_failures=has_failures, has_pending=False,
+                             stages=Stages(setup_duration=0, plan_duration=1, create_duration=wait + 2,
+                                           delete_duration=0),
+                             resources=[resource])
+    return FabfedStats(action=action, has_failures=has_failures,
+                       workflow_duration=Duration(duration=workflow, comment=''),
+                       workflow_config=Duration(duration=0.1, comment=''),
+                       controller=Duration(duration=0.2, comment=''),
+                       providers=Duration(duration=wait + 3, comment=''),
+                       provider_stats=[provider])
+
+
+def test_history_appends(tmp_path):
+    history = StatsHistory(str(tmp_path / 'history.jsonl'))
+
+    for idx in range(3):
+        history.append(stats_history.to_record(make_stats(10 + idx, 5), session=f'perf-{idx}',
+                                               config_digest='abc', now=1000 + idx))
+
+    with open(history.file_path, 'a') as stream:
+        stream.write("not json\n")
+
+    records = history.records()
+    assert [r['session'] for r in records] == ['perf-0', 'perf-1', 'perf-2']
+    assert records[0]['stats']['provider_stats'][0]['resources'][0]['label'] == 'node@fab'
+    assert stats_history.metrics(records[2])['workflow'] == 12
+    assert stats_history.metrics(records[2])['fabric@prov/node@fab:wait'] == 5
+    assert stats_history.metrics(records[2])['fabric@prov:create'] == 7
+
+
+def test_percentiles():
+    assert stats_history.percentile([3, 1, 2], 50) == 2
+    assert stats_history.percentile(list(range(101)), 90) == 90
+    assert stats_history.percentile([1, 2], 99) == pytest.approx(1.99)
+
+    records = [stats_history.to_record(make_stats(w, w), session='s', config_digest='abc') for w in range(1, 11)]
+    summary = stats_history.percentiles(records)
+    assert summary['workflow'] == dict(count=10, p50=5.5, p90=9.1, p99=9.91)
+
+
+def test_select_and_diff():
+    records = [stats_history.to_record(make_stats(10, 5), session='perf-1', config_digest='aaa111'),
+               stats_history.to_record(make_stats(12, 7), session='perf-2', config_digest='aaa111'),
+               stats_history.to_record(make_stats(20, 15), session='perf-3', config_digest='bbb222'),
+               stats_history.to_record(make_stats(99, 99, has_failures=True), session='perf-4', config_digest='bbb'),
+               stats_history.to_record(make_stats(5, 1, action='destroy'), session='other', config_digest='aaa')]
+
+    selected = stats_history.select(records, prefix='perf-', action='apply')
+    assert [r['session'] for r in selected] == ['perf-1', 'perf-2', 'perf-3']
+
+    diff = stats_history.diff(stats_history.resolve(selected, '0'), stats_history.resolve(selected, '-1'))
+    assert diff['workflow'] == dict(a=10, b=20, delta=10, change='+100.0%')
+
+    diff = stats_history.diff(stats_history.resolve(selected, 'aaa'), stats_history.resolve(selected, 'bbb'))
+    assert diff['fabric@prov/node@fab:wait'] == dict(a=6, b=15, delta=9, change='+150.0%')
+
+    with pytest.raises(FabfedException):
+        stats_history.resolve(selected, 'ccc')
+
+    with pytest.raises(FabfedException):
+        stats_history.resolve(selected, '5')
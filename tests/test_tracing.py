@@ -0,0 +1,81 @@
+import json
+import threading
+
+import pytest
+
+from fabfed.util import tracing
+from fabfed.util.tracing import Tracer
+
+
+def test_spans_nest_per_thread():
+    tracer = Tracer()
+
+    def describe():
+        with tracer.span('aws:describe_vpcs'):
+            pass
+
+    with tracer.span('apply', cat=tracing.PHASE):
+        with tracer.span('create:net', cat=tracing.PROVIDER, label='net'):
+            with tracer.span('sense:create_instance'):
+                pass
+
+        thread = threading.Thread(target=describe)
+        thread.start()
+        thread.join()
+
+    apply, create, remote, other = tracer.spans
+    assert apply.parent_id is None
+    assert create.parent_id == apply.id
+    assert remote.parent_id == create.id
+    assert other.parent_id is None and other.tid != apply.tid
+    assert create.args == dict(label='net')
+    assert apply.end >= create.end >= remote.end
+
+
+def test_error_is_recorded():
+    tracer = Tracer()
+
+    with pytest.raises(ValueError):
+        with tracer.span('wait:net'):
+            raise ValueError("boom")
+
+    assert tracer.spans[0].args['error'] == "ValueError: boom"
+    assert tracer.current() is None
+
+
+def test_chrome_trace():
+    tracer = Tracer(max_spans=2)
+
+    with tracer.span('init', cat=tracing.PHASE):
+        with tracer.span('setup:fabric', cat=tracing.PROVIDER):
+            with tracer.span('dropped'):
+                pass
+
+    trace = tracer.to_chrome_trace()
+    events = [e for e in trace['traceEvents'] if e['ph'] == 'X']
+    assert [e['name'] for e in events] == ['init', 'setup:fabric']
+    assert events[1]['args']['parent_id'] == events[0]['args']['id']
+    assert events[0]['dur'] >= events[1]['dur']
+    assert trace['otherData']['dropped_spans'] == 1
+    assert any(e['ph'] == 'M' for e in trace['traceEvents'])
+
+
+def test_traced_and_sleep(monkeypatch, tmp_path):
+    monkeypatch.setenv('HOME', str(tmp_path))
+    tracer = tracing.get_tracer()
+    tracer.clear()
+
+    @tracing.traced('gcp:find_vpc')
+    def find_vpc():
+        tracing.sleep(0, name='gcp:poll')
+        return 'vpc'
+
+    assert find_vpc() == 'vpc'
+    remote, sleep = tracer.spans
+    assert remote.cat == tracing.REMOTE and sleep.cat == tracing.SLEEP
+    assert sleep.parent_id == remote.id
+
+    with open(tracer.save('test-session')) as fp:
+        assert len(json.load(fp)['traceEvents']) == 3
+
+    tracer.clear()
@@ -5,7 +5,10 @@ from fabfed.controller.provider_factory import default_provider_factory
 from fabfed.exceptions import ControllerException
 from fabfed.util import utils
 from fabfed.util import state as sutil
+from fabfed.util import tracing
 from fabfed.util.config import WorkflowConfig
+from fabfed.util.ipam import IpamStore
+from fabfed.util.profiling import PhaseProfiler
 from fabfed.util.stats import FabfedStats, Duration
 from fabfed.util.constants import Constants
 
@@ -17,6 +20,44 @@ def delete_session_if_empty(*, session):
         sutil.destroy_session(session)
 
 
+def save_trace(session):
+    logger = utils.get_logger()
+
+    try:
+        file_path = tracing.get_tracer().save(session)
+        logger.info(f"Saved trace to {file_path}")
+    except Exception as e:
+        logger.warning(f"Exception while saving trace for session {session}:{e}")
+
+
+def record_stats(fabfed_stats, *, session, config_dir, var_dict):
+    from fabfed.util import stats_history
+
+    try:
+        digest = utils.config_digest(dir_path=config_dir, var_dict=var_dict)
+    except Exception as e:
+        utils.get_logger().warning(f"Exception while computing config digest of {config_dir}:{e}")
+        digest = None
+
+    stats_history.record_stats(fabfed_stats, session=session, config_digest=digest)
+
+
+def start_cassette(args, action):
+    from fabfed.util.cassette import Cassette, RECORD, REPLAY, get_cassette_path
+
+    if args.replay:
+        cassette = Cassette(args.replay, mode=REPLAY, scale=args.replay_scale)
+    elif args.record:
+        cassette = Cassette(get_cassette_path(args.session, action), mode=RECORD)
+    else:
+        return
+
+    import atexit
+
+    cassette.start()
+    atexit.register(cassette.stop)
+
+
 def manage_workflow(args):
     logger = utils.init_logger()
     config_dir = utils.absolute_path(args.config_dir)
@@ -46,17 +87,28 @@ def manage_workflow(args):
     if args.apply:
         sutil.save_meta_data(dict(config_dir=config_dir), args.session)
         sutil.delete_stats(args.session)
+        import atexit
         import time
 
+        profiler = PhaseProfiler(enabled=args.profile, memory=args.profile_memory, top=args.profile_top)
+
+        # Registered at exit so the trace and profiles are kept when the workflow exits early on errors.
+        atexit.register(save_trace, args.session)
+        atexit.register(profiler.save, args.session)
+        start_cassette(args, 'apply')
         start = time.time()
-        config = WorkflowConfig.parse(dir_path=config_dir, var_dict=var_dict)
+
+        with tracing.span('parse', cat=tracing.PHASE), profiler.phase('parse'):
+            config = WorkflowConfig.parse(dir_path=config_dir, var_dict=var_dict)
+
         parse_and_validate_config_duration = time.time() - start
         controller_duration_start = time.time()
 
         try:
             controller = Controller(config=config,
                                     policy=policy,
-                                    use_local_policy=not args.use_remote_policy)
+                                    use_local_policy=not args.use_remote_policy,
+                                    ipam_store=IpamStore())
         except Exception as e:
             logger.error(f"Exceptions while initializing controller .... {e}", exc_info=True)
             sys.exit(1)
@@ -65,13 +117,16 @@ def manage_workflow(args):
         # have_created_resources = next(filter(lambda s: s.number_of_created_resources() > 0, states), None)
 
         try:
-            controller.init(session=args.session, provider_factory=default_provider_factory, provider_states=states)
+            with profiler.phase('init'):
+                controller.init(session=args.session, provider_factory=default_provider_factory,
+                                provider_states=states)
         except Exception as e:
             logger.error(f"Exceptions while initializing providers  .... {e}", exc_info=True)
             sys.exit(1)
 
         try:
-            controller.plan(provider_states=states)
+            with profiler.phase('plan'):
+                controller.plan(provider_states=states)
         except Exception as e:
             logger.error(f"Exception while planning ... {e}")
             sys.exit(1)
@@ -80,7 +135,8 @@ def manage_workflow(args):
             sys.exit(1)
 
         try:
-            controller.add(provider_states=states)
+            with profiler.phase('add'):
+                controller.add(provider_states=states)
         except Exception as e:
             logger.error(f"Exception while adding ... {e}")
             sys.exit(1)
@@ -91,7 +147,8 @@ def manage_workflow(args):
         workflow_failed = False
 
         try:
-            controller.apply(provider_states=states)
+            with profiler.phase('apply'):
+                controller.apply(provider_states=states)
         except KeyboardInterrupt as kie:
             logger.error(f"Keyboard Interrupt while creating resources ... {kie}")
             workflow_failed = True
@@ -117,7 +174,9 @@ def manage_workflow(args):
         if Constants.RECONCILE_STATES:
             states = sutil.reconcile_states(states, args.session)
 
-        sutil.save_states(states, args.session)
+        with tracing.span('save_states', cat=tracing.PHASE), profiler.phase('save_states'):
+            sutil.save_states(states, args.session)
+
         provider_stats = controller.get_stats()
         workflow_duration = time.time() - start
         workflow_duration = Duration(duration=workflow_duration,
@@ -139,6 +198,7 @@ def manage_workflow(args):
         logger.info(f"STATS:duration_in_seconds={workflow_duration}")
         logger.info(f"nodes={nodes}, networks={networks}, services={services}, pending={pending}, failed={failed}")
         sutil.save_stats(dict(comment="all durations are in seconds", stats=fabfed_stats), args.session)
+        record_stats(fabfed_stats, session=args.session, config_dir=config_dir, var_dict=var_dict)
         sys.exit(1 if workflow_failed else 0)
 
     if args.init:
@@ -231,7 +291,7 @@ def manage_workflow(args):
 
     if args.stats:
         stats = sutil.load_stats(args.session)
-        sutil.dump_stats(stats, args.json)
+        sutil.dump_stats(stats, args.json, args.summary)
         delete_session_if_empty(session=args.session)
         return
 
@@ -247,10 +307,18 @@ def manage_workflow(args):
             sutil.destroy_session(args.session)
             return
 
+        import atexit
         import time
 
+        profiler = PhaseProfiler(enabled=args.profile, memory=args.profile_memory, top=args.profile_top)
+        atexit.register(save_trace, args.session)
+        atexit.register(profiler.save, args.session)
+        start_cassette(args, 'destroy')
         start = time.time()
-        config = WorkflowConfig.parse(dir_path=config_dir, var_dict=var_dict)
+
+        with tracing.span('parse', cat=tracing.PHASE), profiler.phase('parse'):
+            config = WorkflowConfig.parse(dir_path=config_dir, var_dict=var_dict)
+
         parse_and_validate_config_duration = time.time() - start
         controller_duration_start = time.time()
 
@@ -258,7 +326,10 @@ def manage_workflow(args):
             controller = Controller(config=config,
                                     policy=policy,
                                     use_local_policy=not args.use_remote_policy)
-            controller.init(session=args.session, provider_factory=default_provider_factory, provider_states=states)
+
+            with profiler.phase('init'):
+                controller.init(session=args.session, provider_factory=default_provider_factory,
+                                provider_states=states)
         except Exception as e:
             logger.error(f"Exceptions while initializing controller .... {e}")
             sys.exit(1)
@@ -266,7 +337,8 @@ def manage_workflow(args):
         destroy_failed = False
 
         try:
-            controller.destroy(provider_states=states)
+            with profiler.phase('destroy'):
+                controller.destroy(provider_states=states)
         except ControllerException as e:
             logger.error(f"Exceptions while deleting resources ...{e}")
             destroy_failed = True
@@ -286,7 +358,8 @@ def manage_workflow(args):
             logger.info(f"Destroying session {args.session} ...")
             sutil.destroy_session(args.session)
         else:
-            sutil.save_states(states, args.session)
+            with tracing.span('save_states', cat=tracing.PHASE), profiler.phase('save_states'):
+                sutil.save_states(states, args.session)
 
         end = time.time()
         workflow_duration = end - start
@@ -308,6 +381,7 @@ def manage_workflow(args):
                                    provider_stats=provider_stats)
         logger.info(f"STATS:duration_in_seconds={workflow_duration}")
         sutil.save_stats(dict(comment="all durations are in seconds", stats=fabfed_stats), args.session)
+        record_stats(fabfed_stats, session=args.session, config_dir=config_dir, var_dict=var_dict)
         sys.exit(1 if destroy_failed else 0)
 
 
@@ -317,6 +391,37 @@ def manage_sessions(args):
         return
 
 
+def manage_stats(args):
+    from fabfed.exceptions import FabfedException
+    from fabfed.util import stats_history
+
+    logger = utils.init_logger()
+    records = stats_history.load_records(args.session or None)
+    records = stats_history.select(records, prefix=args.prefix, action=args.action, config=args.config,
+                                   include_failures=args.include_failures)
+
+    if args.runs:
+        sutil.dump_objects(dict(runs=stats_history.runs(records)), args.json)
+        return
+
+    if args.diff:
+        try:
+            first, second = [stats_history.resolve(records, ref) for ref in args.diff]
+        except FabfedException as e:
+            logger.error(f"{e}")
+            sys.exit(1)
+
+        sutil.dump_objects(dict(a=args.diff[0], b=args.diff[1], diff=stats_history.diff(first, second)), args.json)
+        return
+
+    if not records:
+        logger.warning(f"No {args.action} runs found in stats history")
+        return
+
+    sutil.dump_objects(dict(action=args.action, runs=len(records), percentiles=stats_history.percentiles(records)),
+                       args.json)
+
+
 def display_stitch_info(args):
     logger = utils.init_logger()
 
@@ -385,7 +490,8 @@ def main(argv=None):
     argv = argv or sys.argv[1:]
     parser = utils.build_parser(manage_workflow=manage_workflow,
                                 manage_sessions=manage_sessions,
-                                display_stitch_info=display_stitch_info)
+                                display_stitch_info=display_stitch_info,
+                                manage_stats=manage_stats)
     args = parser.parse_args(argv)
 
     if len(args.__dict__) == 0: